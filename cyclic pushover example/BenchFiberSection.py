@@ -0,0 +1,89 @@
+"""
+Purpose :
+    Benchmark of the definition of the RC column fiber section: time to define
+    the same section again and again, as in a sweep, with
+        Baseline      the opsvis list and opsvis.fib_sec_list_to_cmds, as the
+                      original BuildRCrectSection (without its plot)
+        Build         BuildRCrectSection(PlotSection=False): the same list and
+                      FibSecListToCmds, without the import of opsvis
+    and the time of the fiber array (LibFiberSection.FibSecFibers), which is
+    only computed by the callers that need the fibers, and of the same array
+    from the cache of LibFiberSection.CachedFibers with a new tag every time.
+
+    Run : python BenchFiberSection.py
+"""
+
+# ===========================================================================
+# Import Libraries
+# ===========================================================================
+import time
+import openseespy.opensees as os
+from LibUnits import *
+from LibMaterialsRC import DefineMaterialsRC, IDconcCore, IDconcCover, IDSteel
+from BuildRCrectSection import BuildRCrectSection, RCrectFibSec
+from LibFiberSection import FibSecFibers, CachedFibers
+
+
+# ===========================================================================
+# Main Code
+# ===========================================================================
+HSec, BSec, cover = 28*inch, 28*inch, 2.5*inch
+Bars = [8, 1.*in2, 8, 1.*in2, 6, 1.*in2]
+
+
+def SectionList(secTag, nf):
+    coverY, coverZ = HSec/2.0, BSec/2.0
+    return RCrectFibSec(secTag, coverY, coverZ, coverY - cover, coverZ - cover, IDconcCore, IDconcCover, IDSteel,
+                        Bars[0], Bars[1], Bars[2], Bars[3], int(Bars[4]/2), Bars[5], nf, nf, nf, nf)
+
+
+def BaselineSection(secTag, nf):
+    """
+    Section definition of the original BuildRCrectSection, without the plot.
+    """
+    import opsvis as osv
+    fibSec = SectionList(secTag, nf)
+    osv.fib_sec_list_to_cmds(fibSec)
+    return fibSec
+
+
+def BuildSection(secTag, nf):
+    return BuildRCrectSection(secTag, HSec, BSec, cover, cover, IDconcCore, IDconcCover, IDSteel, *Bars,
+                              nf, nf, nf, nf, PlotSection=False)
+
+
+def TimeSections(Define, Nsections, nf):
+    """
+    Mean time to define one column section with Define(secTag, nf), over Nsections sections with new tags.
+    """
+    os.wipe()
+    os.model('basic', '-ndm', 3, '-ndf', 6)
+    DefineMaterialsRC()
+    Define(1, nf)       # imports out of the timing
+
+    tStart = time.perf_counter()
+    for secTag in range(2, Nsections + 2):
+        Define(secTag, nf)
+    Time = (time.perf_counter() - tStart)/Nsections
+    os.wipe()
+    return Time
+
+
+if __name__ == "__main__":
+    Nsections = 500
+    print("%4s %14s %14s %16s %12s %8s" % ("nf", "Baseline (us)", "Build (us)", "Fiber array (us)", "Cached (us)",
+                                           "Fibers"))
+    for nf in [6, 20]:
+        tBaseline = min(TimeSections(BaselineSection, Nsections, nf) for _ in range(3))
+        tBuild = min(TimeSections(BuildSection, Nsections, nf) for _ in range(3))
+        fibSec = SectionList(1, nf)
+        tStart = time.perf_counter()
+        for _ in range(Nsections):
+            Fibers = FibSecFibers(fibSec)
+        tFibers = (time.perf_counter() - tStart)/Nsections
+        tStart = time.perf_counter()
+        for secTag in range(1, Nsections + 1):
+            Fibers = CachedFibers(SectionList(secTag, nf))
+        tCached = (time.perf_counter() - tStart)/Nsections
+        print("%4i %14.1f %14.1f %16.1f %12.1f %8i" % (nf, 1e6*tBaseline, 1e6*tBuild, 1e6*tFibers, 1e6*tCached,
+                                                      len(Fibers)))
@@ -0,0 +1,52 @@
+"""
+Purpose :
+    Benchmark of the frame generator (LibFrameGenerator.py): build time of the
+    3D RC frame against model size, from the 3x1x1 frame of the main script to
+    a 40-storey building with several thousand elements. The time per element
+    stays about constant, i.e. the build time is linear in the model size.
+
+    Run : python BenchFrameBuild.py
+"""
+
+# ===========================================================================
+# Import Libraries
+# ===========================================================================
+import time
+import openseespy.opensees as os
+from LibFrameGenerator import FrameLayout, TributaryWeights
+from LibFrameModel import FrameParameters, BuildFrameModel
+
+
+# ===========================================================================
+# Main Code
+# ===========================================================================
+Sizes = [(3, 1, 1), (10, 2, 2), (20, 3, 3), (30, 4, 3), (40, 4, 4)]
+
+
+def TimeBuild(NStory, NBay, NBayZ):
+    """
+    Time of the NumPy layout (geometry, numbering, weights) and of the whole model build
+    (materials, fiber sections, nodes, diaphragms, elements, masses).
+    """
+    Params = FrameParameters(NStory=NStory, NBay=NBay, NBayZ=NBayZ, nfCoreY=6, nfCoreZ=6, nfCoverY=6, nfCoverZ=6)
+
+    tStart = time.perf_counter()
+    Layout = FrameLayout(NStory, NBay, NBayZ, Params['LCol'], Params['LBeam'], Params['LGird'])
+    TributaryWeights(Layout, 1.0, 1.0, 1.0, 1.0)
+    tLayout = time.perf_counter() - tStart
+
+    tStart = time.perf_counter()
+    Model = BuildFrameModel(Params)
+    tBuild = time.perf_counter() - tStart
+    os.wipe()
+
+    Nelements = len(Model['Columns']) + len(Model['Beams']) + len(Model['Girders'])
+    return Layout['NodeTag'].size + NStory, Nelements, tLayout, tBuild
+
+
+if __name__ == "__main__":
+    print("%-10s %8s %8s %12s %12s %14s" % ("Frame", "Nodes", "Elements", "Layout (s)", "Build (s)", "us/element"))
+    for NStory, NBay, NBayZ in Sizes:
+        Nnodes, Nelements, tLayout, tBuild = TimeBuild(NStory, NBay, NBayZ)
+        print("%-10s %8i %8i %12.4f %12.3f %14.1f" % ("%ix%ix%i" % (NStory, NBay, NBayZ), Nnodes, Nelements,
+                                                     tLayout, tBuild, 1e6*tBuild/Nelements))
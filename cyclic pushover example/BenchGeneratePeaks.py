@@ -0,0 +1,97 @@
+"""
+Purpose :
+    Micro-benchmark of the displacement-protocol generators in LibGeneratePeaks.py.
+    The step-by-step list implementation that GeneratePeaks used before it was
+    vectorized is kept here as the reference: every case is first checked for
+    bit-for-bit identical targets and then timed.
+
+    Run : python BenchGeneratePeaks.py
+"""
+
+# ===========================================================================
+# Import Libraries
+# ===========================================================================
+import timeit
+import numpy as np
+from LibGeneratePeaks import GeneratePeaks, GenerateProtocol
+
+
+# ===========================================================================
+# Main Code
+# ===========================================================================
+def GeneratePeaksLoop(Dmax, DincrStatic=0.01, CycleType="Full", Fact=1):
+    """
+    Reference (list based) implementation of GeneratePeaks.
+    """
+    Disp = 0.0
+    iDstep = [0.0, 0.0]
+    Dmax *= Fact
+    if Dmax < 0:
+        dx = -DincrStatic
+    else:
+        dx = DincrStatic
+    NstepsPeak = int(abs(Dmax) / DincrStatic)
+    for _ in range(NstepsPeak):
+        Disp += dx
+        iDstep.append(Disp)
+    if CycleType != "Push":
+        for _ in range(NstepsPeak):
+            Disp -= dx
+            iDstep.append(Disp)
+        if CycleType != "Half":
+            for _ in range(NstepsPeak):
+                Disp -= dx
+                iDstep.append(Disp)
+            for _ in range(NstepsPeak):
+                Disp += dx
+                iDstep.append(Disp)
+    return np.array(iDstep)
+
+
+def GenerateProtocolLoop(iDmax, DincrStatic, CycleType, Fact, Ncycles):
+    """
+    Protocol as the cyclic analysis loop builds it: one GeneratePeaks call per peak and cycle.
+    """
+    iDstep = []
+    for Dmax in iDmax:
+        for _ in range(Ncycles):
+            iDstep.extend(GeneratePeaksLoop(Dmax, DincrStatic, CycleType, Fact))
+    return np.array(iDstep)
+
+
+def CheckSameTargets():
+    """
+    Compare the vectorized generators against the reference implementation.
+    """
+    for CycleType in ["Push", "Half", "Full"]:
+        for Dmax, DincrStatic, Fact in [(2.0, 0.02, 1.5), (-0.05, 0.001, 432.), (0.1, 0.0001, 432.), (0.0, 0.01, 1.)]:
+            New = GeneratePeaks(Dmax, DincrStatic, CycleType, Fact)
+            Old = GeneratePeaksLoop(Dmax, DincrStatic, CycleType, Fact)
+            assert np.array_equal(New, Old), (Dmax, DincrStatic, CycleType, Fact)
+
+        iDmax = [0.005, 0.01, 0.025, 0.05, 0.1]
+        New, _ = GenerateProtocol(iDmax, 0.432, CycleType, 432., 3)
+        Old = GenerateProtocolLoop(iDmax, 0.432, CycleType, 432., 3)
+        assert np.array_equal(New, Old), CycleType
+
+
+def TimeIt(Func, Repeat=5):
+    """
+    Best wall time of Func over Repeat runs, in seconds.
+    """
+    Number, _ = timeit.Timer(Func).autorange()
+    return min(timeit.repeat(Func, number=Number, repeat=Repeat))/Number
+
+
+if __name__ == "__main__":
+    CheckSameTargets()
+    print('Vectorized targets are identical to the reference implementation')
+
+    fmt = "%-32s %10i steps   loop %9.3f ms   numpy %9.3f ms   speedup %6.1fx"
+    iDmax = [0.005, 0.01, 0.025, 0.05, 0.1]
+    LBuilding = 432.
+    for DincrStatic, Ncycles in [(0.001*LBuilding, 1), (0.0001*LBuilding, 1), (0.00001*LBuilding, 3)]:
+        Nsteps = len(GenerateProtocol(iDmax, DincrStatic, "Full", LBuilding, Ncycles)[0])
+        tLoop = TimeIt(lambda: GenerateProtocolLoop(iDmax, DincrStatic, "Full", LBuilding, Ncycles))
+        tNumpy = TimeIt(lambda: GenerateProtocol(iDmax, DincrStatic, "Full", LBuilding, Ncycles))
+        print(fmt % ("GenerateProtocol, Dincr=%.4g" % DincrStatic, Nsteps, 1e3*tLoop, 1e3*tNumpy, tLoop/tNumpy))
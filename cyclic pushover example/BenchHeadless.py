@@ -0,0 +1,86 @@
+"""
+Purpose :
+    Benchmark of the headless mode (LibPlotting.py).
+    Each case runs in a fresh interpreter, so import times are not hidden by
+    modules that are already loaded: the import of BuildRCrectSection.py in
+    headless mode against the import of opsvis and matplotlib that every run
+    paid before, and the time to build a fiber section with and without its
+    plot (offscreen, Agg backend, written to a temporary FigDir after the
+    sections as in a headless run).
+
+    Run : python BenchHeadless.py
+"""
+
+# ===========================================================================
+# Import Libraries
+# ===========================================================================
+import os as os1
+import sys
+import subprocess
+import tempfile
+
+
+# ===========================================================================
+# Main Code
+# ===========================================================================
+ImportHeadless = """
+import time
+tStart = time.perf_counter()
+import BuildRCrectSection
+print(time.perf_counter() - tStart)
+"""
+
+ImportPlotting = """
+import time
+tStart = time.perf_counter()
+import opsvis, matplotlib.pyplot
+import BuildRCrectSection
+print(time.perf_counter() - tStart)
+"""
+
+BuildSections = """
+import time
+import openseespy.opensees as os
+os.model('basic', '-ndm', 3, '-ndf', 6)
+from LibUnits import *
+from LibMaterialsRC import *
+from BuildRCrectSection import BuildRCrectSection
+from LibPlotting import WriteDeferredFigures
+DefineMaterialsRC()
+tStart = time.perf_counter()
+for secTag in range(1, %i + 1):
+    BuildRCrectSection(secTag, 24*inch, 24*inch, 1.5*inch, 1.5*inch, IDconcCore, IDconcCover, IDSteel,
+                       3, 1.0*inch**2, 3, 1.0*inch**2, 2, 1.0*inch**2, 20, 20, 20, 20, PlotSection=%s)
+WriteDeferredFigures()
+print((time.perf_counter() - tStart)/%i)
+"""
+
+
+def RunTimed(Code, Env):
+    """
+    Run Code in a new interpreter and return the time it prints.
+    """
+    Output = subprocess.run([sys.executable, "-c", Code], env=Env, capture_output=True, text=True,
+                            cwd=os1.path.dirname(os1.path.abspath(__file__)), check=True)
+    return float(Output.stdout.split()[-1])
+
+
+def BestOf(Code, Env, Repeat=3):
+    return min(RunTimed(Code, Env) for _ in range(Repeat))
+
+
+if __name__ == "__main__":
+    Env = dict(os1.environ, OPS_HEADLESS="1", MPLBACKEND="Agg")
+    Env.pop("OPS_FIGDIR", None)
+    Nsections = 20
+
+    tHeadless = BestOf(ImportHeadless, Env)
+    tPlotting = BestOf(ImportPlotting, Env)
+    print("Import BuildRCrectSection   headless %8.3f s   with opsvis/matplotlib %8.3f s   (%.1fx)"
+          % (tHeadless, tPlotting, tPlotting/tHeadless))
+
+    tNoPlot = BestOf(BuildSections % (Nsections, "False", Nsections), Env)
+    with tempfile.TemporaryDirectory() as FigDir:
+        tPlot = BestOf(BuildSections % (Nsections, "True", Nsections), dict(Env, OPS_FIGDIR=FigDir))
+    print("Fiber section build         headless %8.4f s   with section plot      %8.4f s   (%.1fx)"
+          % (tNoPlot, tPlot, tPlot/tNoPlot))
@@ -0,0 +1,259 @@
+"""
+Purpose :
+    Benchmark suite of the whole cyclic pushover pipeline, with fixed problem
+    sizes so that runs on the same machine can be compared (the pipeline draws
+    no random numbers, there is no seed to fix).
+
+    For each case the stages are timed separately:
+        Section   definition of the column fiber section (mean of Nsections calls)
+        Build     model build (materials, sections, nodes, elements, masses)
+        Gravity   NstepGravity load-controlled gravity steps
+        Cyclic    the cyclic protocol of iDmax
+        Load      reading the DFree and RBase recorder files
+        Plot      force-displacement plot written offscreen (Agg), without the import of matplotlib
+    The case 'frame3' is the frame and protocol of the main script, the other
+    cases scale it up (more stories and bays, finer fibers) with a shorter
+    protocol.
+    The constraints are Transformation instead of the Lagrange multipliers of
+    the main script, which fail on some OpenSeesPy builds; the displacement is
+    then controlled at the roof diaphragm master node, since a slave node of a
+    diaphragm can not be controlled with Transformation. The times are thus
+    those of this variant of the model, not of the main script's; the report
+    and the .json results say so (ModelNote).
+
+    The results are written to a .json file; with --compare the times are
+    checked against a saved baseline and the stages that are slower by more
+    than --tol are flagged (exit status 1 if any).
+
+    Run : python BenchSuite.py [--cases frame3,frame3-fine] [--repeat 3] [--out Bench.json]
+          python BenchSuite.py --compare BenchBaseline.json
+"""
+
+# ===========================================================================
+# Import Libraries
+# ===========================================================================
+import os as os1
+import sys
+import time
+import json
+import platform
+import argparse
+import tempfile
+import numpy as np
+import openseespy.opensees as os
+import LibPlotting
+from LibFiberSection import FibSecFibers
+from LibMaterialsRC import DefineMaterialsRC, IDconcCore, IDconcCover, IDSteel
+from BuildRCrectSection import BuildRCrectSection
+from LibFrameGenerator import FrameLayout
+from LibFrameModel import FrameParameters, BuildFrameModel, DefineRecorders, RunGravityAnalysis, RunCyclicProtocol
+
+
+# ===========================================================================
+# Main Code
+# ===========================================================================
+Stages = ['Section', 'Build', 'Gravity', 'Cyclic', 'Load', 'Plot']
+
+# parameters common to all cases, and the overrides of each case
+BaseParams = {'constraintsType': "Transformation", 'Output': "recorders"}
+ModelNote = ("Transformation constraints, displacement control at the roof diaphragm master node "
+             "(the main script uses Lagrange multipliers and a slave node of the roof)")
+Cases = {
+    'frame3':        {},
+    'frame3-fine':   {'nfCoreY': 40, 'nfCoreZ': 40, 'nfCoverY': 40, 'nfCoverZ': 40, 'iDmax': [0.005, 0.01]},
+    'frame6-2x2':    {'NStory': 6, 'NBay': 2, 'NBayZ': 2, 'iDmax': [0.005, 0.01]},
+    'frame10-3x2':   {'NStory': 10, 'NBay': 3, 'NBayZ': 2, 'iDmax': [0.005, 0.01]},
+}
+
+
+def TimeSection(Params, Nsections=20):
+    """
+    Mean time to define the column fiber section of Params in a clean domain.
+    """
+    os.wipe()
+    os.model('basic', '-ndm', 3, '-ndf', 6)
+    DefineMaterialsRC(*[Params[Key] for Key in ['fc', 'Kfc', 'Kres', 'Fy', 'Es', 'Bs', 'R0', 'cR1', 'cR2']])
+    nf = [Params[Key] for Key in ['nfCoreY', 'nfCoreZ', 'nfCoverY', 'nfCoverZ']]
+
+    tStart = time.perf_counter()
+    for secTag in range(1, Nsections + 1):
+        fibSec = BuildRCrectSection(secTag, Params['HCol'], Params['BCol'], Params['cover'], Params['cover'],
+                                    IDconcCore, IDconcCover, IDSteel, Params['numBarsTopCol'], Params['barAreaTopCol'],
+                                    Params['numBarsBotCol'], Params['barAreaBotCol'], Params['numBarsIntCol'],
+                                    Params['barAreaIntCol'], *nf, PlotSection=False)
+    Time = (time.perf_counter() - tStart)/Nsections
+    os.wipe()
+
+    return Time, len(FibSecFibers(fibSec))
+
+
+def RunCase(Overrides, dataDir, Nsections=20):
+    """
+    Run all the stages of one case, recording to dataDir.
+
+    Returns:
+    Times: Dictionary with the wall time of each stage.
+    Size: Dictionary with the size of the problem (nodes, elements, fibers of the column section, steps).
+    ok: 0 if the gravity analysis and the whole protocol were analysed.
+    """
+    Params = FrameParameters(**dict(BaseParams, **Overrides))
+    if Params['IDctrlNode'] is None:
+        Layout = FrameLayout(Params['NStory'], Params['NBay'], Params['NBayZ'], Params['LCol'], Params['LBeam'], Params['LGird'])
+        Params['IDctrlNode'] = int(Layout['MasterTag'][-1])
+    Times, Size = {}, {}
+
+    Times['Section'], Size['FibersCol'] = TimeSection(Params, Nsections)
+
+    tStart = time.perf_counter()
+    Model = BuildFrameModel(Params)
+    Times['Build'] = time.perf_counter() - tStart
+    Size['Nodes'] = len(os.getNodeTags())
+    Size['Elements'] = len(os.getEleTags())
+
+    DefineRecorders(Model, Params, dataDir)
+    tStart = time.perf_counter()
+    ok = RunGravityAnalysis(Model, Params)
+    Times['Gravity'] = time.perf_counter() - tStart
+
+    Stats = {}
+    if ok == 0:
+        tStart = time.perf_counter()
+        ok, Stats = RunCyclicProtocol(Model, Params)
+        Times['Cyclic'] = time.perf_counter() - tStart
+    Size['Nsteps'] = Stats.get('Nsteps', 0)
+    os.wipe()      # closes the recorder files
+
+    tStart = time.perf_counter()
+    DFree = np.loadtxt(f"{dataDir}/DFree.out", ndmin=2)
+    RBase = np.loadtxt(f"{dataDir}/RBase.out", ndmin=2)
+    Times['Load'] = time.perf_counter() - tStart
+
+    plt = LibPlotting.Pyplot()       # the import of matplotlib is not part of the plot time
+    tStart = time.perf_counter()
+    plt.plot(DFree[:, Params['IDctrlDOF']], -RBase[:, Params['IDctrlDOF']::3].sum(axis=1), 'b-')
+    plt.xlabel('Displacement')
+    plt.ylabel('Base shear')
+    LibPlotting.FinishFigure('ForceDisplacement')
+    Times['Plot'] = time.perf_counter() - tStart
+
+    return Times, Size, ok
+
+
+def RunSuite(CaseNames=None, Repeat=1, Nsections=20, Verbose=True):
+    """
+    Run the cases of the suite, Repeat times each, keeping the best time of every stage.
+
+    Returns:
+    Results: Dictionary with the machine and library versions ('Meta') and, for each case,
+             its overrides, problem size, status and stage times ('Cases').
+    """
+    CaseNames = CaseNames or list(Cases)
+    Results = {'Meta': {'Python': platform.python_version(), 'NumPy': np.__version__,
+                        'OpenSeesPy': os.version() if hasattr(os, 'version') else "",
+                        'Machine': platform.platform(), 'Processor': platform.processor(),
+                        'Model': ModelNote, 'Repeat': Repeat, 'Nsections': Nsections,
+                        'Date': time.strftime("%Y-%m-%d %H:%M:%S")},
+               'Cases': {}}
+
+    if Verbose:
+        print("Model: %s" % ModelNote)
+    # no figures left open, figures offscreen
+    Headless, FigDir = LibPlotting.Headless, LibPlotting.FigDir
+    try:
+        with tempfile.TemporaryDirectory() as TmpDir:
+            LibPlotting.SetHeadless(True, os1.path.join(TmpDir, "Figures"))
+            for Name in CaseNames:
+                Best = {}
+                for Run in range(Repeat):
+                    dataDir = os1.path.join(TmpDir, "%s_%i" % (Name, Run))
+                    os1.makedirs(dataDir)
+                    Times, Size, ok = RunCase(Cases[Name], dataDir, Nsections)
+                    Best = {Stage: min(Time, Best.get(Stage, np.inf)) for Stage, Time in Times.items()}
+                Results['Cases'][Name] = {'Overrides': Cases[Name], 'Size': Size, 'ok': ok, 'Times': Best}
+                if Verbose:
+                    print(CaseReport(Name, Results['Cases'][Name]))
+    finally:
+        LibPlotting.SetHeadless(Headless, FigDir)
+
+    return Results
+
+
+def CaseReport(Name, Case):
+    """
+    One line with the size, status and stage times of a case.
+    """
+    Size = Case['Size']
+    Line = "%-12s %5i nodes %5i elements %5i fibers %5i steps %-10s" % (
+        Name, Size['Nodes'], Size['Elements'], Size['FibersCol'], Size['Nsteps'], "DONE" if Case['ok'] == 0 else "INCOMPLETE")
+    return Line + "  " + "  ".join("%s %.3f s" % (Stage, Case['Times'][Stage]) for Stage in Stages if Stage in Case['Times'])
+
+
+def CompareResults(Results, Baseline, Tol=0.2, MinTime=0.005):
+    """
+    Compare the stage times of two runs of the suite.
+
+    Args:
+    Results, Baseline: Results of RunSuite (e.g. read from the .json files).
+    Tol: Relative slowdown above which a stage is a regression (optional, default=0.2, i.e. 20%).
+    MinTime: Differences below MinTime seconds are timing noise, never a regression (optional, default=0.005).
+
+    Returns:
+    Rows: List of (case, stage, baseline time, time, ratio, flag) with flag 'REGRESSION', 'faster' or ''.
+    Regressions: Number of regressions.
+    """
+    Rows = []
+    for Name, Case in Results['Cases'].items():
+        if Name not in Baseline['Cases']:
+            continue
+        Base = Baseline['Cases'][Name]
+        if Base['Size'] != Case['Size']:
+            Rows.append((Name, 'Size', np.nan, np.nan, np.nan, 'size changed %s -> %s' % (Base['Size'], Case['Size'])))
+        for Stage in Stages:
+            if Stage not in Case['Times'] or Stage not in Base['Times']:
+                continue
+            tBase, tNew = Base['Times'][Stage], Case['Times'][Stage]
+            Ratio = tNew/tBase if tBase > 0 else np.inf
+            Flag = ''
+            if Ratio > 1 + Tol and tNew - tBase > MinTime:
+                Flag = 'REGRESSION'
+            elif Ratio < 1/(1 + Tol) and tBase - tNew > MinTime:
+                Flag = 'faster'
+            Rows.append((Name, Stage, tBase, tNew, Ratio, Flag))
+
+    return Rows, sum(Row[5] == 'REGRESSION' for Row in Rows)
+
+
+def ComparisonReport(Rows):
+    """
+    Text table of CompareResults.
+    """
+    Lines = ["%-12s %-8s %12s %12s %7s" % ("Case", "Stage", "Baseline (s)", "Now (s)", "Ratio")]
+    for Name, Stage, tBase, tNew, Ratio, Flag in Rows:
+        Lines.append("%-12s %-8s %12.4f %12.4f %7.2f  %s" % (Name, Stage, tBase, tNew, Ratio, Flag))
+    return "\n".join(Lines)
+
+
+if __name__ == "__main__":
+    Parser = argparse.ArgumentParser(description="Benchmark suite of the cyclic pushover pipeline")
+    Parser.add_argument("--cases", default=",".join(Cases), help="comma-separated cases (default: all)")
+    Parser.add_argument("--repeat", type=int, default=1, help="runs of each case, the best time is kept")
+    Parser.add_argument("--out", default="BenchResults.json", help=".json file of the results")
+    Parser.add_argument("--compare", default=None, help=".json baseline to compare with")
+    Parser.add_argument("--tol", type=float, default=0.2, help="relative slowdown flagged as a regression")
+    Args = Parser.parse_args()
+
+    Baseline = None
+    if Args.compare:
+        with open(Args.compare) as File:
+            Baseline = json.load(File)
+
+    Results = RunSuite(Args.cases.split(","), Args.repeat)
+    with open(Args.out, 'w') as File:
+        json.dump(Results, File, indent=1)
+    print("Results written to %s" % Args.out)
+
+    if Baseline is not None:
+        Rows, Regressions = CompareResults(Results, Baseline, Args.tol)
+        print(ComparisonReport(Rows))
+        print("%i regressions (tolerance %.0f%%)" % (Regressions, 100*Args.tol))
+        sys.exit(1 if Regressions else 0)
@@ -30,6 +30,11 @@ Formal arguments
    nfCoreZ - number of fibers in the core patch in the z direction
    nfCoverY - number of fibers in the cover patches with long sides in the y direction
    nfCoverZ - number of fibers in the cover patches with long sides in the z direction
+   PlotSection - True/False to plot the section or not, None (default) to plot it unless the run is headless without
+                 a figure directory; headless runs write the plot after the analysis (LibPlotting.WriteDeferredFigures)
+
+Returns the opsvis fiber section list of the section; LibFiberSection.FibSecFibers(fibSec) turns it into an array
+with one row (y, z, area, matTag) per fiber when the fibers are needed
    
                         y
                         ^
@@ -71,29 +76,46 @@ Formal arguments
 # =========================================================================== 
 # Import Libraries
 # ===========================================================================
-import opsvis as osv
-import matplotlib.pyplot as plt
+import openseespy.opensees as os
 from LibUnits import *
 from LibMaterialsRC import *
+from LibPlotting import PlotMode, Pyplot, Opsvis, DeferFigure
 
 # ===========================================================================
 # Main Code
 # ===========================================================================
-def BuildRCrectSection (id, HSec, BSec, coverH, coverB, coreID, coverID, 
-                        steelID, numBarsTop, barAreaTop, numBarsBot, 
-                        barAreaBot, numBarsIntTot, barAreaInt, nfCoreY, 
-                        nfCoreZ, nfCoverY, nfCoverZ):
-       
-    coverY = HSec/2.0		# The distance from the section z-axis to the edge of the cover concrete -- outer edge of cover concrete
-    coverZ = BSec/2.0		# The distance from the section y-axis to the edge of the cover concrete -- outer edge of cover concrete
-    coreY = coverY-coverH		# The distance from the section z-axis to the edge of the core concrete --  edge of the core concrete/inner edge of cover concrete
-    coreZ = coverZ-coverB		# The distance from the section y-axis to the edge of the core concrete --  edge of the core concrete/inner edge of cover concrete
-    numBarsInt = int(numBarsIntTot/2)	# number of intermediate bars per side    
-
-
-
-    secTag = id   # Fiber section tag
-    
+def FibSecListToCmds(fibSec):
+    """
+    Define a fiber section in OpenSees from an opsvis fiber section list, like
+    opsvis.fib_sec_list_to_cmds but without importing opsvis (and matplotlib).
+    Supports the 'quad'/'quadr'/'rect' patches and 'straight' layers used in this project.
+    """
+    for dat in fibSec:
+        if dat[0] == 'section':
+            os.section('Fiber', dat[2], '-GJ', dat[4])
+        elif dat[0] == 'patch' and dat[1] in ['quad', 'quadr']:
+            os.patch('quad', *dat[2:13])
+        elif dat[0] == 'patch' and dat[1] == 'rect':
+            os.patch('rect', *dat[2:9])
+        elif dat[0] == 'layer' and dat[1] == 'straight':
+            os.layer('straight', *dat[2:9])
+        else:
+            raise ValueError("Unsupported fiber section command: %s %s" % (dat[0], dat[1]))
+
+
+def PlotFiberSection(fibSec):
+    """
+    Plot an opsvis fiber section list with equal axes.
+    """
+    Opsvis().plot_fiber_section(fibSec)
+    Pyplot().axis('equal')
+
+
+def RCrectFibSec(secTag, coverY, coverZ, coreY, coreZ, coreID, coverID, steelID, numBarsTop, barAreaTop, 
+                 numBarsBot, barAreaBot, numBarsInt, barAreaInt, nfCoreY, nfCoreZ, nfCoverY, nfCoverZ):
+    """
+    opsvis fiber section list of the rectangular RC section: confined core, four cover patches and the bar layers.
+    """
     fibSec = [['section', 'Fiber', secTag, '-GJ', 1e-10],
 		      # Define the core patch
               ['patch', 'quadr', coreID, nfCoreZ, nfCoreY, *[-coreY, coreZ], *[-coreY, -coreZ], *[coreY, -coreZ], *[coreY, coreZ]],
@@ -110,10 +132,38 @@ def BuildRCrectSection (id, HSec, BSec, coverH, coverB, coreID, coverID,
               ['layer', 'straight', steelID, numBarsTop, barAreaTop, *[ coreY,  coreZ], *[ coreY, -coreZ]], # top layer reinfocement
               ['layer', 'straight', steelID, numBarsBot, barAreaBot, *[-coreY,  coreZ], *[-coreY, -coreZ]]] # bottom layer reinforcement
 
-    osv.fib_sec_list_to_cmds(fibSec) # This command converts the opsvis list to openseespy section object    
+    return fibSec
+
+
+def BuildRCrectSection (id, HSec, BSec, coverH, coverB, coreID, coverID, 
+                        steelID, numBarsTop, barAreaTop, numBarsBot, 
+                        barAreaBot, numBarsIntTot, barAreaInt, nfCoreY, 
+                        nfCoreZ, nfCoverY, nfCoverZ, PlotSection=None):
+       
+    coverY = HSec/2.0		# The distance from the section z-axis to the edge of the cover concrete -- outer edge of cover concrete
+    coverZ = BSec/2.0		# The distance from the section y-axis to the edge of the cover concrete -- outer edge of cover concrete
+    coreY = coverY-coverH		# The distance from the section z-axis to the edge of the core concrete --  edge of the core concrete/inner edge of cover concrete
+    coreZ = coverZ-coverB		# The distance from the section y-axis to the edge of the core concrete --  edge of the core concrete/inner edge of cover concrete
+    numBarsInt = int(numBarsIntTot/2)	# number of intermediate bars per side    
+
+
+
+    secTag = id   # Fiber section tag
     
-    osv.plot_fiber_section(fibSec)
-    plt.axis('equal')
+    fibSec = RCrectFibSec(secTag, coverY, coverZ, coreY, coreZ, coreID, coverID, steelID, numBarsTop, barAreaTop, 
+                          numBarsBot, barAreaBot, numBarsInt, barAreaInt, nfCoreY, nfCoreZ, nfCoverY, nfCoverZ)
+
+    FibSecListToCmds(fibSec) # This command converts the opsvis list to openseespy section object    
+    
+    # PlotSection=None plots the section unless no figure is kept (see LibPlotting.py), in headless runs
+    # only after the analysis
+    if PlotSection is None:
+        PlotSection = PlotMode() != "skip"
+
+    if PlotSection:
+        DeferFigure("FiberSection%i" % secTag, lambda: PlotFiberSection(fibSec))
+
+    return fibSec
    
 
 
@@ -0,0 +1,142 @@
+"""
+Purpose :
+    LibAdaptiveStep.py contains an adaptive increment controller for
+    displacement-controlled static analyses.
+
+    The controller moves the control node to a target displacement with steps of
+    variable size: a step that does not converge is bisected down to DincrMin
+    (and only then goes through the fallback algorithms), and the step grows
+    again, up to DincrMax, while the convergence test needs few iterations.
+    It can be used on its own (e.g. a monotonic pushover) or passed to
+    RunDisplacementProtocol to analyse every branch of a cyclic protocol.
+"""
+
+# ===========================================================================
+# Import Libraries
+# ===========================================================================
+import openseespy.opensees as os
+from LibAnalysisDriver import TryFallbacks, StepHooks
+
+
+# ===========================================================================
+# Main Code
+# ===========================================================================
+class AdaptiveDisplacementControl:
+    """
+    Adaptive DisplacementControl increments for the current model.
+
+    Args:
+    IDctrlNode: Node where the displacement is controlled.
+    IDctrlDOF: Degree of freedom of the controlled displacement.
+    DincrMax: Largest displacement increment.
+    DincrMin: Smallest displacement increment, bisection stops here.
+    Test: Arguments of the default convergence test, e.g. ('EnergyIncr', 1.e-8, 6, 0).
+    Algorithm: Arguments of the default algorithm, e.g. ('Newton',).
+    TolConverge: Tolerance of the fallback NormDispIncr test (optional, default=1.e-6).
+    NiterEasy: The step grows after a step that converged in NiterEasy iterations or less (optional, default=2).
+    NiterHard: The step shrinks after a step that needed more than NiterHard iterations (optional, default=5).
+    Factor: Growth/reduction factor of the step (optional, default=2.0).
+    Dincr: Initial increment (optional, default=DincrMax).
+    Verbose: Print the bisections and fallback algorithms (optional, default=False).
+    Fallback: StrategyEngine (LibConvergence.py) used after the last bisection instead of TryFallbacks (optional, default=None).
+    """
+
+    def __init__(self, IDctrlNode, IDctrlDOF, DincrMax, DincrMin, Test, Algorithm, TolConverge=1.e-6,
+                 NiterEasy=2, NiterHard=5, Factor=2.0, Dincr=None, Verbose=False, Fallback=None):
+        self.IDctrlNode = IDctrlNode
+        self.IDctrlDOF = IDctrlDOF
+        self.DincrMax = abs(DincrMax)
+        self.DincrMin = abs(DincrMin)
+        self.Test = Test
+        self.Algorithm = Algorithm
+        self.TolConverge = TolConverge
+        self.NiterEasy = NiterEasy
+        self.NiterHard = NiterHard
+        self.Factor = Factor
+        self.Dincr = self.DincrMax if Dincr is None else abs(Dincr)
+        self.Verbose = Verbose
+        self.Fallback = Fallback
+        self.Stats = {'Nsteps': 0, 'Nanalyze': 0, 'Nintegrator': 0, 'Niter': 0, 'Nbisect': 0, 'Ngrow': 0, 'Nfallback': 0}
+        self._DincrIntegrator = None
+        self.StopReason = None
+
+    def _Integrator(self, Dincr):
+        # the integrator is only redefined when the increment changes
+        if Dincr != self._DincrIntegrator:
+            os.integrator("DisplacementControl", self.IDctrlNode, self.IDctrlDOF, Dincr)
+            self._DincrIntegrator = Dincr
+            self.Stats['Nintegrator'] += 1
+
+    def Step(self, Dremain):
+        """
+        Analyse one step towards a remaining displacement Dremain.
+
+        Returns:
+        ok: 0 if the step converged, possibly after bisections and fallbacks.
+        """
+        Sign = 1.0 if Dremain > 0 else -1.0
+        while True:
+            Dincr = Sign*min(self.Dincr, abs(Dremain))
+            self._Integrator(Dincr)
+            self.Stats['Nanalyze'] += 1
+            ok = os.analyze(1)
+            if ok == 0:
+                break
+
+            if abs(Dincr)/self.Factor >= self.DincrMin:
+                # bisect the failing increment and retry from the last converged state
+                self.Dincr = abs(Dincr)/self.Factor
+                self.Stats['Nbisect'] += 1
+                if self.Verbose:
+                    print("Reducing displacement increment to %.4g .." % self.Dincr)
+                continue
+
+            self.Stats['Nfallback'] += 1
+            if self.Fallback is not None:
+                ok = self.Fallback.Try()
+            else:
+                ok = TryFallbacks(self.Test, self.Algorithm, self.TolConverge, self.Verbose)
+            if ok != 0:
+                return ok
+            break
+
+        Niter = os.testIter()
+        self.Stats['Nsteps'] += 1
+        self.Stats['Niter'] += Niter
+
+        if ok == 0 and Niter <= self.NiterEasy and self.Dincr < self.DincrMax:
+            self.Dincr = min(self.Dincr*self.Factor, self.DincrMax)
+            self.Stats['Ngrow'] += 1
+        elif Niter > self.NiterHard:
+            self.Dincr = max(self.Dincr/self.Factor, self.DincrMin)
+
+        return ok
+
+    def AnalyzeTo(self, Dtarget, OnStep=None, Stop=None):
+        """
+        Move the control node to the displacement Dtarget.
+        OnStep: Function or list of functions called after every converged step (optional, default=None).
+        Stop: Function called after every converged step, a true value stops there and is kept in StopReason
+              (optional, default=None).
+
+        Returns:
+        ok: 0 if the target was reached, or if Stop ended it.
+        """
+        Tol = 1.e-9*self.DincrMax
+        self._DincrIntegrator = None
+        self.StopReason = None
+        Hooks = StepHooks(OnStep)
+        ok = 0
+        while ok == 0:
+            Dremain = Dtarget - os.nodeDisp(self.IDctrlNode, self.IDctrlDOF)
+            if abs(Dremain) <= Tol:
+                break
+            ok = self.Step(Dremain)
+            if ok == 0:
+                for Hook in Hooks:
+                    Hook()
+                self.StopReason = Stop() if Stop is not None else None
+                if self.StopReason:
+                    break
+
+        return ok
@@ -0,0 +1,260 @@
+"""
+Purpose :
+    LibAnalysisDriver.py contains the driver that runs a displacement-controlled
+    static protocol (e.g. the targets from GenerateProtocol) on the current model.
+
+    The protocol is split into runs of equal displacement increments. Each run
+    defines the DisplacementControl integrator once and is analysed with a single
+    analyze(n) call, instead of one integrator, analysis and analyze(1) per step.
+    Steps right after a load reversal or a convergence failure are analysed one
+    at a time, and a failing step goes through the fallback algorithms
+    (TryFallbacks, or a StrategyEngine from LibConvergence.py).
+    With an adaptive controller (LibAdaptiveStep.py) each run is instead
+    analysed to its end target with adaptive increments.
+    OnStep functions (e.g. ResultCapture.Sample from LibCapture.py) are called
+    after every converged step; the runs are then analysed with analyze(1)
+    calls, still with one integrator definition per run.
+"""
+
+# ===========================================================================
+# Import Libraries
+# ===========================================================================
+import openseespy.opensees as os
+import numpy as np
+import time
+
+
+# ===========================================================================
+# Main Code
+# ===========================================================================
+def EqualIncrementRuns(iDincr, RelTol=1.e-6):
+    """
+    Split a sequence of displacement increments into runs of equal increments.
+
+    Args:
+    iDincr: Numpy array of displacement increments.
+    RelTol: Increments closer than RelTol*max(|iDincr|) are taken as equal (optional, default=1.e-6).
+            The increments from ProtocolIncrements differ in the last bits because they are
+            differences of accumulated targets.
+
+    Returns:
+    RunStart: Index of the first step of each run.
+    RunLength: Number of steps in each run.
+    RunDincr: Increment of each run, the mean of its steps so that the run ends on its last target.
+    """
+    iDincr = np.asarray(iDincr, dtype=float)
+    if len(iDincr) == 0:
+        return np.empty(0, dtype=int), np.empty(0, dtype=int), np.empty(0)
+
+    Tol = RelTol*np.max(np.abs(iDincr))
+    RunStart = np.concatenate(([0], np.flatnonzero(np.abs(np.diff(iDincr)) > Tol) + 1))
+    RunLength = np.diff(np.append(RunStart, len(iDincr)))
+    RunDincr = np.add.reduceat(iDincr, RunStart)/RunLength
+
+    return RunStart, RunLength, RunDincr
+
+
+def StepHooks(OnStep):
+    """
+    List of the functions to call after each converged step: OnStep can be None, a function or a list of functions.
+    """
+    if OnStep is None:
+        return []
+    if callable(OnStep):
+        return [OnStep]
+    return list(OnStep)
+
+
+def TryFallbacks(Test, Algorithm, TolConverge=1.e-6, Verbose=True):
+    """
+    Retry the current step with the fallback algorithms of the cyclic analysis:
+    Newton with initial tangent, Broyden and NewtonLineSearch.
+    The convergence test and algorithm are reset to Test and Algorithm afterwards.
+
+    Args:
+    Test: Arguments of the default convergence test, e.g. ('EnergyIncr', 1.e-8, 6, 0).
+    Algorithm: Arguments of the default algorithm, e.g. ('Newton',).
+    TolConverge: Tolerance of the NormDispIncr test used with the initial tangent (optional, default=1.e-6).
+    Verbose: Print the algorithm being tried (optional, default=True).
+
+    Returns:
+    ok: 0 if one of the fallbacks converged.
+    """
+    ok = -1
+
+    if Verbose:
+        print("Trying Newton with Initial Tangent ..")
+    os.test('NormDispIncr', TolConverge, 2000, 0)
+    os.algorithm('Newton', '-initial')
+    ok = os.analyze(1)
+    os.test(*Test)
+    os.algorithm(*Algorithm)
+
+    if ok != 0:
+        if Verbose:
+            print("Trying Broyden ..")
+        os.algorithm('Broyden', 8)
+        ok = os.analyze(1)
+        os.algorithm(*Algorithm)
+
+    if ok != 0:
+        if Verbose:
+            print("Trying NewtonWithLineSearch ..")
+        os.algorithm('NewtonLineSearch', 0.8)
+        ok = os.analyze(1)
+        os.algorithm(*Algorithm)
+
+    return ok
+
+
+def RunDisplacementProtocol(IDctrlNode, IDctrlDOF, iDincr, Test, Algorithm, TolConverge=1.e-6,
+                            Batch=True, NstepsSingle=2, Controller=None, OnStep=None, Verbose=True, Fallback=None,
+                            Stop=None):
+    """
+    Run a displacement-controlled static protocol on the current model.
+
+    Args:
+    IDctrlNode: Node where the displacement is controlled.
+    IDctrlDOF: Degree of freedom of the controlled displacement.
+    iDincr: Numpy array of displacement increments (see ProtocolIncrements).
+    Test: Arguments of the default convergence test, e.g. ('EnergyIncr', 1.e-8, 6, 0).
+    Algorithm: Arguments of the default algorithm, e.g. ('Newton',).
+    TolConverge: Tolerance of the fallback NormDispIncr test (optional, default=1.e-6).
+    Batch: True to analyse runs of equal increments with one analyze(n) call,
+           False for one integrator, analysis and analyze(1) per step (optional, default=True).
+    NstepsSingle: Number of steps analysed one at a time after a reversal or a convergence failure (optional, default=2).
+    Controller: AdaptiveDisplacementControl object that analyses each run to its end target
+                with its own increments, Batch and NstepsSingle are then not used (optional, default=None).
+    OnStep: Function or list of functions called after every converged step (optional, default=None).
+    Verbose: Print the fallback algorithms being tried (optional, default=True).
+    Fallback: StrategyEngine (LibConvergence.py) for the failed steps instead of TryFallbacks (optional, default=None).
+    Stop: Function called after every converged step (after OnStep) that returns the reason to end the protocol
+          there, e.g. TerminationMonitor.Stop (LibTermination.py); the steps are then analysed one at a time
+          (optional, default=None).
+
+    Returns:
+    ok: 0 if the whole protocol was analysed, or if Stop ended it.
+    Stats: Dictionary with the number of steps, analyze and integrator calls, fallbacks, the wall time and
+           the reason of Stop ('StopReason', None if the protocol was not stopped).
+    """
+    Stats = {'Nsteps': 0, 'NstepsTotal': len(iDincr), 'Nanalyze': 0, 'Nintegrator': 0,
+             'Nfallback': 0, 'Nruns': 0, 'WallTime': 0.0, 'StopReason': None}
+    tStart = time.perf_counter()
+    ok = 0
+    Hooks = StepHooks(OnStep)
+    if Fallback is not None:
+        Retry = Fallback.Try
+    else:
+        Retry = lambda: TryFallbacks(Test, Algorithm, TolConverge, Verbose)
+
+    if not Batch:
+        # one integrator, analysis object and analyze(1) per step
+        for Dincr in iDincr:
+            os.integrator("DisplacementControl", IDctrlNode, IDctrlDOF, Dincr)
+            os.analysis("Static")
+            Stats['Nintegrator'] += 1
+            Stats['Nanalyze'] += 1
+            ok = os.analyze(1)
+            if ok != 0:
+                Stats['Nfallback'] += 1
+                ok = Retry()
+                if ok != 0:
+                    break
+            Stats['Nsteps'] += 1
+            for Hook in Hooks:
+                Hook()
+            Stats['StopReason'] = Stop() if Stop is not None else None
+            if Stats['StopReason']:
+                break
+
+        Stats['WallTime'] = time.perf_counter() - tStart
+        return ok, Stats
+
+    RunStart, RunLength, RunDincr = EqualIncrementRuns(iDincr)
+    Stats['Nruns'] = len(RunStart)
+    os.analysis("Static")
+
+    if Controller is not None:
+        # end target of every run, measured from the displacement at the start of the protocol
+        RunTarget = os.nodeDisp(IDctrlNode, IDctrlDOF) + np.cumsum(RunLength*RunDincr)
+        Stats0 = dict(Controller.Stats)
+        for Dtarget in RunTarget:
+            ok = Controller.AnalyzeTo(Dtarget, Hooks, Stop)
+            Stats['StopReason'] = Controller.StopReason
+            if ok != 0 or Stats['StopReason']:
+                break
+        Stats.update({Key: Value - Stats0[Key] for Key, Value in Controller.Stats.items()})
+        Stats['WallTime'] = time.perf_counter() - tStart
+        return ok, Stats
+
+    DirectionPrev = 0.0
+    for Nrun, Dincr in zip(RunLength, RunDincr):
+        os.integrator("DisplacementControl", IDctrlNode, IDctrlDOF, Dincr)
+        Stats['Nintegrator'] += 1
+
+        # a change of direction is a load reversal: start the run with single steps
+        Direction = np.sign(Dincr)
+        Nsingle = NstepsSingle if Direction*DirectionPrev < 0 else 0
+        if Direction != 0:
+            DirectionPrev = Direction
+
+        Nleft = int(Nrun)
+        while Nleft > 0:
+            # zero increments are analysed one by one, the completed steps can not be counted from the displacement
+            if Nsingle > 0 or Dincr == 0.0 or Hooks or Stop is not None:
+                Nstep = 1
+            else:
+                Nstep = Nleft
+            D0 = os.nodeDisp(IDctrlNode, IDctrlDOF)
+            Stats['Nanalyze'] += 1
+            ok = os.analyze(Nstep)
+
+            if ok == 0:
+                Ndone = Nstep
+            else:
+                # steps of this call that converged before the failing one
+                Ndone = 0
+                if Nstep > 1:
+                    Ndone = int(round((os.nodeDisp(IDctrlNode, IDctrlDOF) - D0)/Dincr))
+                Stats['Nsteps'] += Ndone
+                Nleft -= Ndone
+
+                Stats['Nfallback'] += 1
+                ok = Retry()
+                if ok != 0:
+                    break
+                Ndone = 1
+                Nsingle = NstepsSingle + 1
+
+            Stats['Nsteps'] += Ndone
+            Nleft -= Ndone
+            Nsingle = max(Nsingle - Ndone, 0)
+            for Hook in Hooks:
+                Hook()
+            Stats['StopReason'] = Stop() if Stop is not None else None
+            if Stats['StopReason']:
+                break
+
+        if ok != 0 or Stats['StopReason']:
+            break
+
+    Stats['WallTime'] = time.perf_counter() - tStart
+    return ok, Stats
+
+
+def ProtocolReport(Stats):
+    """
+    Text summary of the statistics returned by RunDisplacementProtocol.
+    """
+    fmt = ("%i steps for a protocol of %i steps in %.3f s (%.3f ms/step), %i analyze calls, "
+           "%i integrator definitions, %i fallbacks")
+    Nsteps = max(Stats['Nsteps'], 1)
+    Report = fmt % (Stats['Nsteps'], Stats['NstepsTotal'], Stats['WallTime'], 1e3*Stats['WallTime']/Nsteps,
+                    Stats['Nanalyze'], Stats['Nintegrator'], Stats['Nfallback'])
+    if 'Niter' in Stats:
+        Report += ", %i Newton iterations, %i bisections" % (Stats['Niter'], Stats['Nbisect'])
+    if 'Ncheckpoints' in Stats:
+        Report += ", %i checkpoints in %.3f s, %i retries" % (Stats['Ncheckpoints'], Stats['CheckpointTime'], Stats['Nretries'])
+    if Stats.get('StopReason'):
+        Report += "\nStopped at %s" % Stats['StopReason']
+    return Report
@@ -0,0 +1,213 @@
+"""
+Purpose :
+    LibCapture.py contains an in-memory alternative to the text recorders.
+
+    ResultCapture samples node and element responses directly from the domain
+    after each converged step and stores them in preallocated NumPy buffers that
+    grow as needed. With SpillDir, full chunks of ChunkSize rows are written to
+    .npy files so that the memory stays bounded on very long protocols; Close()
+    (or Data()) combines the chunks of a channel into a single <Name>.npy file,
+    one chunk at a time, and Data() returns a memory map of it.
+    There is no text formatting during the analysis and no np.loadtxt after it.
+
+    Each channel has the layout of the equivalent '-time' recorder: the first
+    column is the pseudo-time, followed by the responses node by node (or
+    element by element).
+"""
+
+# ===========================================================================
+# Import Libraries
+# ===========================================================================
+import openseespy.opensees as os
+import numpy as np
+import os as os1
+import glob
+from numpy.lib.format import open_memmap
+
+
+# ===========================================================================
+# Main Code
+# ===========================================================================
+class CaptureChannel:
+    """
+    Growable buffer of one captured quantity, with optional spilling to .npy chunks.
+    """
+
+    def __init__(self, Name, Ncols, Capacity=1024, ChunkSize=100000, SpillDir=None):
+        self.Name = Name
+        self.Ncols = Ncols
+        self.ChunkSize = ChunkSize
+        self.SpillDir = SpillDir
+        self.Buffer = np.empty((min(Capacity, ChunkSize), Ncols))
+        self.Nrows = 0
+        self.NrowsSpilled = 0
+        self.Chunks = []
+
+    def Append(self, Row):
+        if self.Nrows == len(self.Buffer):
+            if self.SpillDir is not None and self.Nrows >= self.ChunkSize:
+                self.Spill()
+            else:
+                # double the buffer, up to ChunkSize rows when spilling
+                Nnew = 2*len(self.Buffer)
+                if self.SpillDir is not None:
+                    Nnew = min(Nnew, self.ChunkSize)
+                Buffer = np.empty((Nnew, self.Ncols))
+                Buffer[:self.Nrows] = self.Buffer[:self.Nrows]
+                self.Buffer = Buffer
+        self.Buffer[self.Nrows] = Row
+        self.Nrows += 1
+
+    def Spill(self):
+        if self.Nrows == 0:
+            return
+        FileName = os1.path.join(self.SpillDir, "%s_%05i.npy" % (self.Name, len(self.Chunks)))
+        np.save(FileName, self.Buffer[:self.Nrows])
+        self.Chunks.append(FileName)
+        self.NrowsSpilled += self.Nrows
+        self.Nrows = 0
+
+    def Merge(self):
+        """
+        Spill the buffer and combine the chunks into <Name>.npy, copied chunk by chunk.
+
+        Returns:
+        FileName: Path of the combined file.
+        """
+        FileName = os1.path.join(self.SpillDir, "%s.npy" % self.Name)
+        self.Spill()
+        if self.Chunks == [FileName]:
+            return FileName
+        Merged = open_memmap(FileName + ".tmp", mode='w+', shape=(len(self), self.Ncols))
+        Row = 0
+        for Chunk in self.Chunks:
+            Part = np.load(Chunk, mmap_mode='r')
+            Merged[Row:Row + len(Part)] = Part
+            Row += len(Part)
+            del Part
+        Merged.flush()
+        del Merged
+        os1.replace(FileName + ".tmp", FileName)
+        for Chunk in self.Chunks:
+            if Chunk != FileName:
+                os1.remove(Chunk)
+        self.Chunks = [FileName]
+        return FileName
+
+    def Data(self):
+        if self.SpillDir is None:
+            return self.Buffer[:self.Nrows].copy()
+        return np.load(self.Merge(), mmap_mode='r')
+
+    def __len__(self):
+        return self.NrowsSpilled + self.Nrows
+
+
+class ResultCapture:
+    """
+    Capture of node and element responses after each converged step.
+
+    Args:
+    SpillDir: Directory for the spilled chunks, None to keep everything in memory (optional, default=None).
+    ChunkSize: Number of rows per spilled chunk (optional, default=100000).
+    Capacity: Initial number of rows of each buffer (optional, default=1024).
+
+    Usage:
+    Capture = ResultCapture()
+    Capture.AddNode('DFree', [141], [1, 2, 3], 'disp')
+    Capture.AddElement('Fel1', [1111], 'localForce')
+    ... Capture.Sample() after each converged step (e.g. OnStep=Capture.Sample in RunDisplacementProtocol)
+    freeDisp = Capture.Data('DFree')
+    """
+
+    NodeResponses = {'disp': os.nodeDisp, 'vel': os.nodeVel, 'accel': os.nodeAccel, 'reaction': os.nodeReaction}
+
+    def __init__(self, SpillDir=None, ChunkSize=100000, Capacity=1024):
+        self.SpillDir = SpillDir
+        self.ChunkSize = ChunkSize
+        self.Capacity = Capacity
+        self.Nodes = {}
+        self.Elements = {}
+        self.Channels = {}
+        self.Reactions = False
+        if SpillDir is not None and not os1.path.exists(SpillDir):
+            os1.makedirs(SpillDir)
+
+    def _Channel(self, Name, Ncols):
+        if Name in self.Channels:
+            raise ValueError("Capture channel %s is already defined" % Name)
+        if self.SpillDir is not None:
+            # chunks of an earlier capture of this channel are not part of this one
+            for FileName in glob.glob(os1.path.join(self.SpillDir, "%s_[0-9][0-9][0-9][0-9][0-9].npy" % Name)):
+                os1.remove(FileName)
+            if os1.path.exists(os1.path.join(self.SpillDir, "%s.npy" % Name)):
+                os1.remove(os1.path.join(self.SpillDir, "%s.npy" % Name))
+        self.Channels[Name] = CaptureChannel(Name, Ncols, self.Capacity, self.ChunkSize, self.SpillDir)
+
+    def AddNode(self, Name, Nodes, DOFs, Response='disp'):
+        """
+        Capture a node response ('disp', 'vel', 'accel' or 'reaction') at the DOFs of Nodes,
+        like os.recorder('Node', '-time', '-node', *Nodes, '-dof', *DOFs, Response).
+        """
+        self._Channel(Name, 1 + len(Nodes)*len(DOFs))
+        self.Nodes[Name] = (list(Nodes), [DOF - 1 for DOF in DOFs], self.NodeResponses[Response])
+        self.Reactions = self.Reactions or Response == 'reaction'
+
+    def AddElement(self, Name, Elements, *Args):
+        """
+        Capture an element response, like os.recorder('Element', '-time', '-ele', *Elements, *Args),
+        e.g. AddElement('ForceEle1sec1', [1111], 'section', 1, 'force').
+        The number of columns is taken from the response of the current domain.
+        """
+        Ncols = sum(len(os.eleResponse(Element, *Args)) for Element in Elements)
+        self._Channel(Name, 1 + Ncols)
+        self.Elements[Name] = (list(Elements), Args)
+
+    def Sample(self):
+        """
+        Store the current state of the domain, call after each converged step.
+        """
+        if self.Reactions:
+            os.reactions()
+        Time = os.getTime()
+
+        for Name, (Nodes, DOFs, Response) in self.Nodes.items():
+            Row = [Time]
+            for Node in Nodes:
+                Values = Response(Node)
+                Row.extend([Values[DOF] for DOF in DOFs])
+            self.Channels[Name].Append(Row)
+
+        for Name, (Elements, Args) in self.Elements.items():
+            Row = [Time]
+            for Element in Elements:
+                Row.extend(os.eleResponse(Element, *Args))
+            self.Channels[Name].Append(Row)
+
+    def Data(self, Name):
+        """
+        Captured history of a channel, with the same columns as the equivalent '-time' recorder file
+        (a read-only memory map of <Name>.npy when a SpillDir is used).
+        """
+        return self.Channels[Name].Data()
+
+    def Close(self):
+        """
+        Spill what is left in the buffers and combine the chunks of every channel into <Name>.npy, when a
+        SpillDir is used (call it when the analysis ends, also on an error). Data() can be called after it.
+        """
+        if self.SpillDir is not None:
+            for Channel in self.Channels.values():
+                Channel.Merge()
+
+
+def RecorderSetCapture(IDctrlNode, iSupportNode, SpillDir=None, ChunkSize=100000):
+    """
+    Capture equivalent to the DFree, DBase and RBase recorders of the main script.
+    """
+    Capture = ResultCapture(SpillDir, ChunkSize)
+    Capture.AddNode('DFree', [IDctrlNode], [1, 2, 3], 'disp')
+    Capture.AddNode('DBase', iSupportNode, [1, 2, 3], 'disp')
+    Capture.AddNode('RBase', iSupportNode, [1, 2, 3], 'reaction')
+
+    return Capture
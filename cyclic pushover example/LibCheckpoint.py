@@ -0,0 +1,395 @@
+"""
+Purpose :
+    LibCheckpoint.py contains checkpoints of a long cyclic protocol at the
+    boundaries of its (peak, cycle) blocks, so that a run does not have to
+    start again from the gravity analysis.
+
+    RunCheckpointedProtocol runs the protocol of GenerateProtocol with
+    RunDisplacementProtocol, Interval blocks at a time, and saves a checkpoint
+    before each group of blocks:
+
+    DatabaseCheckpoint   the domain is saved with the OpenSees File database
+                         (os.database/os.save) in a directory, with a .json
+                         manifest of the position in the protocol and of the
+                         size of the recorder files (Last), for os.restore in a
+                         model defined in the same way. There are no retries and
+                         the protocol is not resumed from it: os.restore crashes
+                         on force-based beam-columns (nonlinearBeamColumn/
+                         forceBeamColumn) in OpenSeesPy 3.7.1, as in the frame
+                         of the main script.
+    ForkCheckpoint       the state is a copy of the whole process (os.fork,
+                         copy-on-write, POSIX only), blocked until it is needed:
+                         when a group of blocks fails, the copy analyses the
+                         group again with the increments divided by the factors
+                         of Refine and the rest of the protocol, then sends its
+                         result back and ends. The calling process waits for it
+                         and RunCheckpointedProtocol returns that result, with
+                         the state of the OnStep/Stop hook objects, Fallback and
+                         Controller (e.g. a ResultCapture) carried back; the
+                         recorder files are the ones written by the copy. The
+                         OpenSees domain of the calling process stays at the
+                         failed step: Stats['Disp'] is the control displacement
+                         at the end, the response is read from the recorder
+                         files or the carried captures, never from the domain.
+                         It works for every element, but only within the run
+                         (nothing is written to disk).
+
+    The cost of the checkpoints is measured in the statistics of the protocol
+    ('Ncheckpoints', 'CheckpointTime'), Interval sets how often they are taken.
+"""
+
+# ===========================================================================
+# Import Libraries
+# ===========================================================================
+import openseespy.opensees as os
+import numpy as np
+import os as os1
+import sys
+import io
+import json
+import time
+import pickle
+from LibAnalysisDriver import RunDisplacementProtocol, StepHooks
+
+
+# ===========================================================================
+# Main Code
+# ===========================================================================
+def _FileSize(Path):
+    return os1.path.getsize(Path) if os1.path.exists(Path) else 0
+
+
+def RecorderSizes(RecorderFiles):
+    """
+    Size in bytes of the text/binary recorder files (OpenSees writes every row of these files at once,
+    xml files are only complete when the recorder is closed).
+    """
+    return {os1.path.abspath(Path): _FileSize(Path) for Path in RecorderFiles}
+
+
+def RewindRecorders(Sizes):
+    """
+    Cut the recorder files back to Sizes, and move the open recorder streams of this process to the new ends
+    (Linux: the streams are found in /proc/self/fd), so that the next rows follow the checkpoint ones.
+    """
+    for Path, Size in Sizes.items():
+        if os1.path.exists(Path):
+            os1.truncate(Path, Size)
+    if not os1.path.isdir('/proc/self/fd'):
+        return
+    for Fd in os1.listdir('/proc/self/fd'):
+        try:
+            Path = os1.readlink(os1.path.join('/proc/self/fd', Fd))
+        except OSError:
+            continue
+        if Path in Sizes:
+            os1.lseek(int(Fd), Sizes[Path], os1.SEEK_SET)
+
+
+class DatabaseCheckpoint:
+    """
+    Checkpoints in the OpenSees File database of a directory, kept after the run.
+
+    Args:
+    Dir: Directory of the database files and of the manifest Checkpoint.json.
+    """
+
+    Retries = False
+
+    def __init__(self, Dir):
+        self.Dir = Dir
+        self.Defined = False
+        self.Tag = None
+        self.Stats = {'Ncheckpoints': 0, 'CheckpointTime': 0.0}
+
+    @property
+    def Manifest(self):
+        return os1.path.join(self.Dir, "Checkpoint.json")
+
+    def _Database(self):
+        if not self.Defined:
+            if not os1.path.exists(self.Dir):
+                os1.makedirs(self.Dir)
+            os.database('File', os1.path.join(self.Dir, "Domain"))
+            self.Defined = True
+
+    def Save(self, State):
+        """
+        Save the domain and the position State (block, step, recorder sizes) of the protocol.
+        Two database tags are used in turn (also across runs in the same directory), so that the last
+        complete checkpoint is never overwritten.
+
+        Returns:
+        Attempt: 0 (there are no retries from a database checkpoint within a run).
+        """
+        tStart = time.perf_counter()
+        self._Database()
+        if self.Tag is None:
+            self.Tag = (self.Last() or {}).get('Tag', 2)
+        self.Tag = 3 - self.Tag
+        os.save(self.Tag)
+
+        # the manifest is replaced only once the domain is saved
+        TmpPath = self.Manifest + ".tmp"
+        with open(TmpPath, 'w') as File:
+            json.dump(dict(State, Tag=self.Tag), File, indent=1)
+        os1.replace(TmpPath, self.Manifest)
+
+        self.Stats['Ncheckpoints'] += 1
+        self.Stats['CheckpointTime'] += time.perf_counter() - tStart
+        return 0
+
+    def Last(self):
+        """
+        State of the last checkpoint, None if there is none.
+        """
+        if not os1.path.exists(self.Manifest):
+            return None
+        with open(self.Manifest) as File:
+            return json.load(File)
+
+    def Close(self):
+        pass
+
+    def Finish(self, Carry, Result=None, Error=None):
+        pass
+
+
+def CarriedObjects(Options):
+    """
+    Objects of the options of RunDisplacementProtocol whose state changes during the protocol: the owners of the
+    OnStep and Stop methods (ResultCapture, StepProfiler, TerminationMonitor...), the Fallback and the Controller.
+    """
+    Objects = [getattr(Hook, '__self__', None) for Hook in StepHooks(Options.get('OnStep')) + [Options.get('Stop')]]
+    Objects += [Options.get('Fallback'), Options.get('Controller')]
+    Carry = []
+    for Object in Objects:
+        if Object is not None and hasattr(Object, '__dict__') and all(Object is not Other for Other in Carry):
+            Carry.append(Object)
+    return Carry
+
+
+class _StatePickler(pickle.Pickler):
+    """
+    Pickler of the states of the carried objects, the references to the objects themselves kept as references,
+    so that the receiving process updates its own objects.
+    """
+
+    def __init__(self, File, Carry):
+        super().__init__(File)
+        self.Ids = {id(Object): i for i, Object in enumerate(Carry)}
+
+    def persistent_id(self, Object):
+        return self.Ids.get(id(Object))
+
+
+class _StateUnpickler(pickle.Unpickler):
+
+    def __init__(self, File, Carry):
+        super().__init__(File)
+        self.Carry = Carry
+
+    def persistent_load(self, Index):
+        return self.Carry[Index]
+
+
+class ForkCheckpoint:
+    """
+    Checkpoint kept as a copy of the process (os.fork) blocked on a pipe, for retries within the run.
+    Only the last checkpoint is kept: saving a new one ends the previous copy. A copy that takes over
+    sends its result back through a second pipe (Finish) and ends, the calling process never exits.
+    """
+
+    Retries = True
+
+    def __init__(self):
+        self.Pid = None
+        self.Write = None
+        self.ResultRead = None
+        self.Result = None          # in a copy that took over: the pipe of its result to the process it replaces
+        self.Stats = {'Ncheckpoints': 0, 'CheckpointTime': 0.0}
+
+    def Save(self, State):
+        """
+        Keep a copy of the process in its current state.
+
+        Returns:
+        Attempt: 0 in the running process. In the copy, which only returns when the running process
+                 called Retry(Attempt), the number of the retry; the copy then keeps a new copy of itself.
+        """
+        tStart = time.perf_counter()
+        self.Close()
+        Attempt = 0
+        while True:
+            sys.stdout.flush()
+            sys.stderr.flush()
+            Read, Write = os1.pipe()
+            ResultRead, ResultWrite = os1.pipe()
+            Pid = os1.fork()
+            if Pid != 0:
+                os1.close(Read)
+                os1.close(ResultWrite)
+                self.Pid, self.Write, self.ResultRead = Pid, Write, ResultRead
+                self.Stats['Ncheckpoints'] += 1
+                self.Stats['CheckpointTime'] += time.perf_counter() - tStart
+                return Attempt
+
+            # the copy: wait for a retry, or for the end of the running process (end of file)
+            os1.close(Write)
+            os1.close(ResultRead)
+            if self.Result is not None:
+                os1.close(self.Result)       # the result pipe of the process this one was copied from
+            try:
+                Message = os1.read(Read, 32)
+            except BaseException:
+                os1._exit(1)
+            if not Message:
+                os1._exit(0)
+            os1.close(Read)
+            Attempt = int(Message)
+            self.Result = ResultWrite
+            RewindRecorders(State['RecorderSizes'])
+            tStart = time.perf_counter()
+
+    def Retry(self, Attempt, Carry=()):
+        """
+        Hand the run over to the copy, which analyses the blocks since the checkpoint again and the rest of the
+        protocol, and wait for its result. An exception of the copy is raised here.
+
+        Args:
+        Carry: Objects whose state is replaced by their state at the end of the copy (see CarriedObjects).
+
+        Returns:
+        Result: (ok, Stats) of RunCheckpointedProtocol in the copy.
+        """
+        sys.stdout.flush()
+        sys.stderr.flush()
+        os1.write(self.Write, str(Attempt).encode())
+        os1.close(self.Write)
+        with os1.fdopen(self.ResultRead, 'rb') as File:
+            Data = File.read()
+        _, Status = os1.waitpid(self.Pid, 0)
+        self.Pid, self.Write, self.ResultRead = None, None, None
+        if not Data:
+            raise ChildProcessError("The copy of the checkpoint ended with exit status %i without a result"
+                                    % os1.waitstatus_to_exitcode(Status))
+
+        Result, Error, States = _StateUnpickler(io.BytesIO(Data), list(Carry)).load()
+        if Error is not None:
+            raise Error
+        for Object, State in zip(Carry, States):
+            Object.__dict__.update(State)
+        return Result
+
+    def Finish(self, Carry, Result=None, Error=None):
+        """
+        In a copy that took over: close its recorders, send the Result (or the exception Error) and the state of
+        the Carry objects to the process it replaces and end. Nothing in the process that started the run.
+        """
+        if self.Result is None:
+            return
+        self.Close()
+        os.wipe()         # the rows of the recorders are in the files before the calling process goes on
+        Buffer = io.BytesIO()
+        try:
+            _StatePickler(Buffer, Carry).dump((Result, Error, [vars(Object) for Object in Carry]))
+        except Exception as PickleError:
+            Buffer = io.BytesIO()
+            _StatePickler(Buffer, Carry).dump((None, RuntimeError("%r (result not picklable: %s)" % (Error, PickleError)), []))
+        sys.stdout.flush()
+        sys.stderr.flush()
+        with os1.fdopen(self.Result, 'wb') as File:
+            File.write(Buffer.getvalue())
+        os1._exit(0)
+
+    def Close(self):
+        """
+        End the copy of the last checkpoint.
+        """
+        if self.Pid is not None:
+            os1.close(self.Write)
+            os1.close(self.ResultRead)
+            os1.waitpid(self.Pid, 0)
+            self.Pid, self.Write, self.ResultRead = None, None, None
+
+
+def RunCheckpointedProtocol(IDctrlNode, IDctrlDOF, iDincr, iBlockStart, Test, Algorithm, TolConverge=1.e-6,
+                            Checkpoint=None, Interval=1, Refine=(2, 4), RecorderFiles=(), **Options):
+    """
+    Run a displacement-controlled protocol with a checkpoint every Interval (peak, cycle) blocks.
+
+    Args:
+    IDctrlNode, IDctrlDOF, iDincr, Test, Algorithm, TolConverge: As in RunDisplacementProtocol.
+    iBlockStart: Block start indices from GenerateProtocol.
+    Checkpoint: DatabaseCheckpoint or ForkCheckpoint (optional, default=ForkCheckpoint()).
+    Interval: Number of blocks between checkpoints, e.g. Ncycles for one checkpoint per peak (optional, default=1).
+    Refine: With a ForkCheckpoint, a group of blocks that fails is analysed again from the checkpoint
+            with its increments divided by each of these factors in turn (optional, default=(2, 4)).
+    RecorderFiles: Paths of the text/binary recorder files, cut back to the checkpoint on a retry (optional).
+    Options: Other arguments of RunDisplacementProtocol (Batch, Controller, OnStep, Verbose, Fallback, Stop).
+
+    Returns:
+    ok: 0 if the whole protocol was analysed.
+    Stats: Statistics of RunDisplacementProtocol summed over the groups of blocks ('Nsteps' in steps of the
+           protocol, also when refined), with the number and time of the checkpoints ('Ncheckpoints',
+           'CheckpointTime'), the number of retries ('Nretries') and the control displacement at the end ('Disp').
+           After a retry of a ForkCheckpoint they come from the copy that analysed the rest of the protocol,
+           the domain of this process stays at the failed step: read the response from the recorder files
+           or the carried OnStep captures, not from the domain (os.nodeDisp, os.eleResponse...).
+    """
+    Checkpoint = Checkpoint if Checkpoint is not None else ForkCheckpoint()
+    Carry = CarriedObjects(Options) if Checkpoint.Retries else []
+    try:
+        return _RunGroups(IDctrlNode, IDctrlDOF, iDincr, iBlockStart, Test, Algorithm, TolConverge, Checkpoint,
+                          Interval, Refine, RecorderFiles, Carry, Options)
+    except BaseException as Error:
+        Checkpoint.Finish(Carry, Error=Error)      # a copy that took over does not return to the caller
+        raise
+
+
+def _RunGroups(IDctrlNode, IDctrlDOF, iDincr, iBlockStart, Test, Algorithm, TolConverge, Checkpoint, Interval, Refine,
+               RecorderFiles, Carry, Options):
+    iDincr = np.asarray(iDincr, dtype=float)
+    Bounds = np.append(np.asarray(iBlockStart)[::max(int(Interval), 1)], len(iDincr))
+
+    Stats = {'Nsteps': 0, 'NstepsTotal': len(iDincr), 'WallTime': 0.0, 'Nretries': 0, 'StopReason': None}
+    tStart = time.perf_counter()
+    Group = 0
+    ok = 0
+    while Group < len(Bounds) - 1:
+        Start, End = Bounds[Group], Bounds[Group + 1]
+        State = {'Block': int(Group*max(int(Interval), 1)), 'Step': int(Start),
+                 'Disp': os.nodeDisp(IDctrlNode, IDctrlDOF), 'Time': os.getTime(),
+                 'RecorderSizes': RecorderSizes(RecorderFiles)}
+        Attempt = Checkpoint.Save(State)
+
+        Factor = Refine[Attempt - 1] if Attempt > 0 else 1
+        Stats['Nretries'] += Attempt
+        ok, GroupStats = RunDisplacementProtocol(IDctrlNode, IDctrlDOF, np.repeat(iDincr[Start:End]/Factor, Factor),
+                                                 Test, Algorithm, TolConverge, **Options)
+        GroupStats['Nsteps'] //= Factor         # in steps of the protocol
+        for Key, Value in GroupStats.items():
+            if Key not in ['NstepsTotal', 'WallTime', 'StopReason']:
+                Stats[Key] = Stats.get(Key, 0) + Value
+
+        if ok != 0:
+            if Checkpoint.Retries and Attempt < len(Refine):
+                print("Blocks from %i failed, analysed again from the checkpoint with increments / %i"
+                      % (State['Block'], Refine[Attempt]))
+                ok, Stats = Checkpoint.Retry(Attempt + 1, Carry)
+                # the recorder streams of this process go on at the end of the rows written by the copy
+                RewindRecorders({Path: _FileSize(Path) for Path in State['RecorderSizes']})
+                Checkpoint.Finish(Carry, (ok, Stats))
+                return ok, Stats
+            break
+        if GroupStats['StopReason']:
+            Stats['StopReason'] = GroupStats['StopReason']
+            break
+        Group += 1
+
+    Checkpoint.Close()
+    Stats.update(Checkpoint.Stats)
+    Stats['Disp'] = os.nodeDisp(IDctrlNode, IDctrlDOF)
+    Stats['WallTime'] = time.perf_counter() - tStart
+    Checkpoint.Finish(Carry, (ok, Stats))
+    return ok, Stats
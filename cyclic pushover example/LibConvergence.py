@@ -0,0 +1,188 @@
+"""
+Purpose :
+    LibConvergence.py contains a convergence fallback engine with statistics,
+    to use instead of the fixed fallback chain of TryFallbacks (LibAnalysisDriver.py).
+
+    A failed step is retried with a list of strategies (algorithm and, optionally,
+    convergence test). For each strategy the engine records the attempts, the
+    successes, the Newton iterations and the time spent, and orders the
+    strategies by their expected cost of a success (time per attempt divided by
+    the success rate), so that an expensive strategy that rarely helps (e.g. the
+    2000-iteration initial-tangent Newton) is no longer tried first. A strategy
+    that failed SkipAfter times in a row is skipped, it is only tried again when
+    all the other strategies failed. The statistics can be written at the end of
+    a run (Save) and given to the next runs (Load), so the order is tuned across
+    runs.
+
+    Usage:
+    Engine = StrategyEngine(Test, Algorithm)
+    ok, Stats = RunDisplacementProtocol(..., Fallback=Engine)
+    print(Engine.Report())
+"""
+
+# ===========================================================================
+# Import Libraries
+# ===========================================================================
+import openseespy.opensees as os
+import time
+import json
+
+
+# ===========================================================================
+# Main Code
+# ===========================================================================
+class Strategy:
+    """
+    Fallback strategy: an algorithm and the convergence test to use with it.
+
+    Args:
+    Name: Name of the strategy in the statistics.
+    Algorithm: Arguments of os.algorithm, e.g. ('Broyden', 8).
+    Test: Arguments of os.test, None for the default test of the analysis (optional, default=None).
+    """
+
+    def __init__(self, Name, Algorithm, Test=None):
+        self.Name = Name
+        self.Algorithm = tuple(Algorithm)
+        self.Test = tuple(Test) if Test is not None else None
+        self.Stats = {'Attempts': 0, 'Successes': 0, 'Iterations': 0, 'Time': 0.0, 'FailuresInRow': 0}
+
+    def ExpectedCost(self):
+        """
+        Expected time to a success: mean time per attempt divided by the success rate
+        (both with one prior success in one attempt of 10 ms, so untried strategies are tried early).
+        """
+        MeanTime = (self.Stats['Time'] + 0.01)/(self.Stats['Attempts'] + 1)
+        SuccessRate = (self.Stats['Successes'] + 1)/(self.Stats['Attempts'] + 1)
+        return MeanTime/SuccessRate
+
+
+def DefaultStrategies(TolConverge=1.e-6):
+    """
+    The fallbacks of TryFallbacks: Newton with initial tangent (NormDispIncr, 2000 iterations),
+    Broyden and NewtonLineSearch.
+    """
+    return [Strategy('NewtonInitial', ('Newton', '-initial'), ('NormDispIncr', TolConverge, 2000, 0)),
+            Strategy('Broyden', ('Broyden', 8)),
+            Strategy('NewtonLineSearch', ('NewtonLineSearch', 0.8))]
+
+
+class StrategyEngine:
+    """
+    Convergence fallback engine that orders its strategies by their statistics.
+
+    Args:
+    Test: Arguments of the default convergence test, e.g. ('EnergyIncr', 1.e-8, 6, 0).
+    Algorithm: Arguments of the default algorithm, e.g. ('Newton',).
+    Strategies: List of Strategy objects (optional, default=DefaultStrategies(TolConverge)).
+    TolConverge: Tolerance of the default strategies (optional, default=1.e-6).
+    Adaptive: False to always try the strategies in the given order (optional, default=True).
+    SkipAfter: Number of failures in a row after which a strategy is skipped (optional, default=3).
+    Verbose: Print the strategy being tried (optional, default=True).
+    """
+
+    def __init__(self, Test, Algorithm, Strategies=None, TolConverge=1.e-6, Adaptive=True, SkipAfter=3, Verbose=True):
+        self.Test = tuple(Test)
+        self.Algorithm = tuple(Algorithm)
+        self.Strategies = Strategies if Strategies is not None else DefaultStrategies(TolConverge)
+        self.Adaptive = Adaptive
+        self.SkipAfter = SkipAfter
+        self.Verbose = Verbose
+        self.Stats = {'Nfailures': 0, 'Nrecovered': 0, 'Time': 0.0}
+        # strategy that recovered the last failed step and its Newton iterations (e.g. for LibProfiler.py)
+        self.Last = None
+        self.LastIter = 0
+
+    def Order(self):
+        """
+        Strategies in the order they are tried: by expected cost, the skipped ones last.
+        """
+        if not self.Adaptive:
+            return list(self.Strategies)
+        Active = [S for S in self.Strategies if S.Stats['FailuresInRow'] < self.SkipAfter]
+        Skipped = [S for S in self.Strategies if S.Stats['FailuresInRow'] >= self.SkipAfter]
+        return sorted(Active, key=Strategy.ExpectedCost) + sorted(Skipped, key=Strategy.ExpectedCost)
+
+    def Attempt(self, S):
+        """
+        Retry the current step with strategy S, then restore the default test and algorithm.
+        """
+        if self.Verbose:
+            print("Trying %s .." % S.Name)
+        if S.Test is not None:
+            os.test(*S.Test)
+        os.algorithm(*S.Algorithm)
+        tStart = time.perf_counter()
+        ok = os.analyze(1)
+        Time = time.perf_counter() - tStart
+        Niter = os.testIter()
+        os.test(*self.Test)
+        os.algorithm(*self.Algorithm)
+
+        S.Stats['Attempts'] += 1
+        self.LastIter = Niter
+        S.Stats['Time'] += Time
+        if ok == 0:
+            S.Stats['Successes'] += 1
+            S.Stats['Iterations'] += Niter
+            S.Stats['FailuresInRow'] = 0
+        else:
+            S.Stats['FailuresInRow'] += 1
+
+        return ok
+
+    def Try(self):
+        """
+        Retry the current (failed) step with the strategies until one converges.
+
+        Returns:
+        ok: 0 if one of the strategies converged.
+        """
+        tStart = time.perf_counter()
+        self.Stats['Nfailures'] += 1
+        ok = -1
+        for S in self.Order():
+            ok = self.Attempt(S)
+            if ok == 0:
+                self.Stats['Nrecovered'] += 1
+                self.Last = S.Name
+                break
+        self.Stats['Time'] += time.perf_counter() - tStart
+
+        return ok
+
+    def Report(self):
+        """
+        Text table of the statistics of the strategies, in their current order.
+        """
+        Lines = ["%i failed steps, %i recovered, %.3f s in fallbacks" % (self.Stats['Nfailures'], self.Stats['Nrecovered'],
+                                                                       self.Stats['Time'])]
+        Lines.append("%-20s %8s %9s %12s %10s %12s" % ("Strategy", "Attempts", "Successes", "Iter/success", "Time (s)",
+                                                     "Cost (s)"))
+        for S in self.Order():
+            Lines.append("%-20s %8i %9i %12.1f %10.3f %12.4f" % (S.Name, S.Stats['Attempts'], S.Stats['Successes'],
+                                                              S.Stats['Iterations']/max(S.Stats['Successes'], 1),
+                                                              S.Stats['Time'], S.ExpectedCost()))
+        return "\n".join(Lines)
+
+    def Save(self, Path):
+        """
+        Write the statistics of the strategies to a .json file.
+        """
+        Data = {'Stats': self.Stats,
+                'Strategies': [{'Name': S.Name, 'Algorithm': S.Algorithm, 'Test': S.Test, 'Stats': S.Stats}
+                               for S in self.Strategies]}
+        with open(Path, 'w') as File:
+            json.dump(Data, File, indent=1)
+
+    def Load(self, Path):
+        """
+        Start from the statistics of earlier runs (written by Save), for the strategies with the same name.
+        The failures in a row are not carried over, every strategy is available again.
+        """
+        with open(Path) as File:
+            Saved = {Entry['Name']: Entry['Stats'] for Entry in json.load(File)['Strategies']}
+        for S in self.Strategies:
+            if S.Name in Saved:
+                S.Stats.update({Key: Saved[S.Name][Key] for Key in ['Attempts', 'Successes', 'Iterations', 'Time']})
+                S.Stats['FailuresInRow'] = 0
@@ -0,0 +1,583 @@
+"""
+Purpose :
+    LibFiberEngine.py contains a fiber-section engine in NumPy, that runs the
+    moment-curvature analysis of a batch of sections without an OpenSees model.
+
+    The Concrete02 and Steel02 materials of OpenSees are evaluated for all the
+    fibers of a batch of sections at once (stress, tangent and history variables
+    as arrays, same state rules as the OpenSees source). The fibers come from the
+    fiber arrays of BuildRCrectSection (y, z, area, material, LibFiberSection.py),
+    padded to a common number of fibers per material. For every curvature of a
+    history, monotonic or cyclic, the axial strain of each section is solved by
+    Newton iterations so that the axial force equals the axial load, then the
+    states are committed, as a zeroLengthSection under a constant axial load and
+    a DisplacementControl curvature (LibFiberTuner.MomentCurvature) does. The
+    sections that do not converge within a step are retried with the increment
+    halved, up to MaxHalving times, the others are left alone meanwhile.
+    For a curvature about z only, the fibers of equal y and material are merged
+    first (MergeFibers), which is exact and divides the work by about nfZ; the
+    merged rows of a BuildRCrectSection section are built directly from its
+    parameters (BendingFibers, 0.2 ms against 1.2 ms through the fiber array).
+
+    Usage:
+    Batch = SectionBatch([BendingFibers(Section, nf) for Section in Sections])
+    M, Eps0, ok = MomentCurvatureBatch(Batch, P, Kappa)
+
+    Run : python LibFiberEngine.py   (check against OpenSees on the sections of the
+          main script, and throughput of a batch of 1000 column designs x 100
+          curvature steps, fiber rows included: about 120 curves/s at nf 6, 210 at
+          nf 10 and 150 at nf 20 on one core, against 95-170, 70-120 and 35-50 for
+          OpenSees one section at a time. Not thousands per second, and no faster
+          than OpenSees at nf 6, where the steps halved for a few sections cost
+          Newton iterations of the whole batch)
+"""
+
+# ===========================================================================
+# Import Libraries
+# ===========================================================================
+import openseespy.opensees as os
+import numpy as np
+import time
+import LibMaterialsRC
+from LibMaterialsRC import MaterialsRC, DefineMaterialsRC, IDconcCore, IDconcCover, IDSteel
+from BuildRCrectSection import BuildRCrectSection, RCrectFibSec
+from LibFiberSection import FibSecFibers
+from LibFiberTuner import SectionParams, MeshDensity, MaterialKeys
+
+
+# ===========================================================================
+# Main Code
+# ===========================================================================
+DBL_EPSILON = np.finfo(float).eps
+
+
+class Concrete02Fibers:
+    """
+    Concrete02 state of an array of fibers; the material arguments are arrays of the shape of the fibers.
+    """
+
+    def __init__(self, fpc, epsc0, fpcu, epscu, rat, ft, Ets):
+        self.fc, self.epsc0, self.fcu, self.epscu, self.rat, self.ft, self.Ets = fpc, epsc0, fpcu, epscu, rat, ft, Ets
+        self.Ec0 = 2.0*fpc/epsc0
+        Zero = np.zeros(np.shape(fpc))
+        self.ecminP, self.deptP, self.epsP, self.sigP = Zero.copy(), Zero.copy(), Zero.copy(), Zero.copy()
+        self.eP = self.Ec0.copy()
+        self.epsr = (fpcu - rat*self.Ec0*epscu)/(self.Ec0*(1.0 - rat))
+        self.sigmr = self.Ec0*self.epsr
+        self.History()
+
+    def History(self, Where=Ellipsis):
+        """
+        Quantities of the unloading/reloading branches that only depend on the committed state: stress sigmm on the
+        envelope at the smallest strain, reloading slope er, strain ept of zero stress, tensile reloading slope.
+        Where: Index of the fibers to update (optional, default=all of them).
+        """
+        ecmin, dept, Ec0 = self.ecminP[Where], self.deptP[Where], self.Ec0[Where]
+        sigmm, _ = self.ComprEnvelope(ecmin, Where)
+        er = (sigmm - self.sigmr[Where])/(ecmin - self.epsr[Where])
+        sicn, _ = self.TensEnvelope(dept, Where)
+        NonZero = dept != 0.0
+        ERel = np.where(NonZero, sicn/np.where(NonZero, dept, 1.0), Ec0)
+        if Where is Ellipsis:
+            self.sigmm, self.er, self.ept, self.ERel = sigmm, er, ecmin - sigmm/er, ERel
+        else:
+            self.sigmm[Where], self.er[Where], self.ept[Where], self.ERel[Where] = sigmm, er, ecmin - sigmm/er, ERel
+
+    def ComprEnvelope(self, epsc, Where=Ellipsis):
+        fc, fcu, epsc0, epscu = self.fc[Where], self.fcu[Where], self.epsc0[Where], self.epscu[Where]
+        Ratio = epsc/epsc0
+        Slope = (fcu - fc)/(epscu - epsc0)
+        sig = np.where(epsc >= epsc0, fc*Ratio*(2.0 - Ratio), np.where(epsc > epscu, Slope*(epsc - epsc0) + fc, fcu))
+        E = np.where(epsc >= epsc0, self.Ec0[Where]*(1.0 - Ratio), np.where(epsc > epscu, Slope, 1.0e-10))
+        return sig, E
+
+    def TensEnvelope(self, epsc, Where=Ellipsis):
+        ft, Ec0, Ets = self.ft[Where], self.Ec0[Where], self.Ets[Where]
+        eps0 = ft/Ec0
+        epsu = ft*(1.0/Ets + 1.0/Ec0)
+        sig = np.where(epsc <= eps0, epsc*Ec0, np.where(epsc <= epsu, ft - Ets*(epsc - eps0), 0.0))
+        E = np.where(epsc <= eps0, Ec0, np.where(epsc <= epsu, -Ets, 1.0e-10))
+        return sig, E
+
+    def Trial(self, eps):
+        """
+        Stress and tangent at the trial strains eps, from the committed state.
+        """
+        ec0 = self.Ec0
+        deps = eps - self.epsP
+
+        # compression envelope beyond the smallest previous strain
+        sigEnv, EEnv = self.ComprEnvelope(eps)
+
+        # unloading/reloading between the envelope and the strain ept of zero stress
+        sigmm, er, ept = self.sigmm, self.er, self.ept
+        sigmin = sigmm + er*(eps - self.ecminP)
+        sigmax = 0.5*er*(eps - ept)
+        sigUnl = self.sigP + ec0*deps
+        EUnl = np.broadcast_to(ec0, np.shape(eps)).copy()
+        Low = sigUnl <= sigmin
+        sigUnl, EUnl = np.where(Low, sigmin, sigUnl), np.where(Low, er, EUnl)
+        High = sigUnl >= sigmax
+        sigUnl, EUnl = np.where(High, sigmax, sigUnl), np.where(High, 0.5*er, EUnl)
+
+        # reloading in tension up to the remaining tensile strength, then the shifted tension envelope
+        ERel = self.ERel
+        sigRel = ERel*(eps - ept)
+        sigTen, ETen = self.TensEnvelope(eps - ept)
+
+        Compr = eps < self.ecminP
+        Unl = ~Compr & (eps <= ept)
+        Rel = ~Compr & ~Unl & (eps <= ept + self.deptP)
+        Ten = ~Compr & ~Unl & ~Rel
+        Same = np.abs(deps) < DBL_EPSILON
+
+        sig = np.select([Same, Compr, Unl, Rel], [self.sigP, sigEnv, sigUnl, sigRel], sigTen)
+        E = np.select([Same, Compr, Unl, Rel], [self.eP, EEnv, EUnl, ERel], ETen)
+        self.ecmin = np.where(Compr & ~Same, eps, self.ecminP)
+        self.dept = np.where(Ten & ~Same, eps - ept, self.deptP)
+        self.eps, self.sig, self.e = eps, sig, E
+
+        return sig, E
+
+    def Commit(self):
+        # the history quantities only change with the smallest strain and the tensile excursion
+        Changed = np.nonzero((self.ecmin != self.ecminP) | (self.dept != self.deptP))
+        self.ecminP, self.deptP, self.epsP, self.sigP, self.eP = self.ecmin, self.dept, self.eps, self.sig, self.e
+        if len(Changed[0]):
+            self.History(Changed)
+
+
+class Steel02Fibers:
+    """
+    Steel02 state of an array of fibers (without isotropic hardening and initial stress, as LibMaterialsRC.Steel02);
+    the material arguments are arrays of the shape of the fibers.
+    """
+
+    def __init__(self, Fy, E0, b, R0, cR1, cR2):
+        self.Fy, self.E0, self.b, self.R0, self.cR1, self.cR2 = Fy, E0, b, R0, cR1, cR2
+        self.Esh = b*E0
+        self.epsy = Fy/E0
+        Zero = np.zeros(np.shape(Fy))
+        self.konP = np.zeros(np.shape(Fy), dtype=int)
+        self.epsmaxP, self.epsminP = self.epsy.copy(), -self.epsy
+        self.epsplP, self.epss0P, self.sigs0P, self.epsrP, self.sigrP = Zero.copy(), Zero.copy(), Zero.copy(), Zero.copy(), Zero.copy()
+        self.epsP, self.sigP, self.eP = Zero.copy(), Zero.copy(), E0.copy()
+
+    def Trial(self, eps):
+        """
+        Stress and tangent at the trial strains eps, from the committed state.
+        """
+        Fy, E0, Esh, epsy = self.Fy, self.E0, self.Esh, self.epsy
+        deps = eps - self.epsP
+        kon = self.konP.copy()
+        epsmax, epsmin, epspl = self.epsmaxP.copy(), self.epsminP.copy(), self.epsplP.copy()
+        epss0, sigs0, epsr, sigr = self.epss0P.copy(), self.sigs0P.copy(), self.epsrP.copy(), self.sigrP.copy()
+
+        # first loading
+        Init = (kon == 0) | (kon == 3)
+        Tiny = Init & (np.abs(deps) < 10.0*DBL_EPSILON)
+        Start = Init & ~Tiny
+        epsmax = np.where(Start, epsy, epsmax)
+        epsmin = np.where(Start, -epsy, epsmin)
+        Sign = np.where(deps < 0.0, -1.0, 1.0)
+        kon = np.where(Start, np.where(deps < 0.0, 2, 1), kon)
+        epss0 = np.where(Start, Sign*epsy, epss0)
+        sigs0 = np.where(Start, Sign*Fy, sigs0)
+        epspl = np.where(Start, Sign*epsy, epspl)
+
+        # load reversals: last reversal point and new intersection of the elastic and hardening asymptotes
+        ToTension = (kon == 2) & (deps > 0.0)
+        ToCompr = (kon == 1) & (deps < 0.0)
+        Reversal = ToTension | ToCompr
+        epsr = np.where(Reversal, self.epsP, epsr)
+        sigr = np.where(Reversal, self.sigP, sigr)
+        epsmin = np.where(ToTension, np.minimum(self.epsP, epsmin), epsmin)
+        epsmax = np.where(ToCompr, np.maximum(self.epsP, epsmax), epsmax)
+        Sign = np.where(ToTension, 1.0, -1.0)
+        epss0Rev = (Sign*Fy - Sign*Esh*epsy - sigr + E0*epsr)/(E0 - Esh)
+        epss0 = np.where(Reversal, epss0Rev, epss0)
+        sigs0 = np.where(Reversal, Sign*Fy + Esh*(epss0Rev - Sign*epsy), sigs0)
+        epspl = np.where(ToTension, epsmax, np.where(ToCompr, epsmin, epspl))
+        kon = np.where(ToTension, 1, np.where(ToCompr, 2, kon))
+
+        # Menegotto-Pinto curve
+        Denom = np.where(Tiny, 1.0, epss0 - epsr)
+        xi = np.abs((epspl - epss0)/epsy)
+        R = self.R0*(1.0 - (self.cR1*xi)/(self.cR2 + xi))
+        epsrat = (eps - epsr)/Denom
+        dum1 = 1.0 + np.abs(epsrat)**R
+        dum2 = dum1**(1.0/R)
+        sig = (self.b*epsrat + (1.0 - self.b)*epsrat/dum2)*(sigs0 - sigr) + sigr
+        E = (self.b + (1.0 - self.b)/(dum1*dum2))*(sigs0 - sigr)/Denom
+        sig = np.where(Tiny, 0.0, sig)
+        E = np.where(Tiny, E0, E)
+        kon = np.where(Tiny, 3, kon)
+
+        self.kon, self.epsmax, self.epsmin, self.epspl = kon, epsmax, epsmin, epspl
+        self.epss0, self.sigs0, self.epsr, self.sigr = epss0, sigs0, epsr, sigr
+        self.eps, self.sig, self.e = eps, sig, E
+
+        return sig, E
+
+    def Commit(self):
+        self.konP, self.epsmaxP, self.epsminP, self.epsplP = self.kon, self.epsmax, self.epsmin, self.epspl
+        self.epss0P, self.sigs0P, self.epsrP, self.sigrP = self.epss0, self.sigs0, self.epsr, self.sigr
+        self.epsP, self.sigP, self.eP = self.eps, self.sig, self.e
+
+
+def SectionFibers(Section, nf):
+    """
+    Fiber array (y, z, area, matTag) of a BuildRCrectSection section, without an OpenSees domain.
+
+    Args:
+    Section: Arguments of BuildRCrectSection (see LibFiberTuner.SectionParams).
+    nf: Mesh density, or tuple (nfCoreY, nfCoreZ, nfCoverY, nfCoverZ).
+    """
+    nf = MeshDensity(nf) if np.isscalar(nf) else tuple(nf)
+    coverY, coverZ = Section['HSec']/2.0, Section['BSec']/2.0
+    coreY, coreZ = coverY - Section['coverH'], coverZ - Section['coverB']
+    fibSec = RCrectFibSec(1, coverY, coverZ, coreY, coreZ, Section['coreID'], Section['coverID'], Section['steelID'],
+                          Section['numBarsTop'], Section['barAreaTop'], Section['numBarsBot'], Section['barAreaBot'],
+                          int(Section['numBarsIntTot']/2), Section['barAreaInt'], *nf)
+    return FibSecFibers(fibSec)
+
+
+def _Trapezoids(u0, u1, w0, w1, c0, c1):
+    # area and centroid of trapezoids with parallel sides of lengths w0, w1 centred at c0, c1 (along the sides),
+    # at u0, u1 across them: the centroid is on the line joining the centres of the sides
+    Area = 0.5*(w0 + w1)*np.abs(u1 - u0)
+    f = (w0 + 2.0*w1)/(3.0*(w0 + w1))
+    return Area, u0 + f*(u1 - u0), c0 + f*(c1 - c0)
+
+
+def BendingFibers(Section, nf):
+    """
+    Fibers of a BuildRCrectSection section for a curvature about z only, from the section parameters: the rows of
+    MergeFibers(SectionFibers(Section, nf)), one per y and material with the areas summed and z at the centroid
+    (0, the section is symmetric about y), computed from the patch and layer geometry without the fiber array.
+
+    Args:
+    Section: Arguments of BuildRCrectSection (see LibFiberTuner.SectionParams).
+    nf: Mesh density, or tuple (nfCoreY, nfCoreZ, nfCoverY, nfCoverZ).
+    """
+    nfCoreY, _, nfCoverY, _ = MeshDensity(nf) if np.isscalar(nf) else tuple(nf)
+    coverY, coverZ = Section['HSec']/2.0, Section['BSec']/2.0
+    coreY, coreZ = coverY - Section['coverH'], coverZ - Section['coverB']
+    Rows = []
+
+    # core: nfCoreY strips across the whole width
+    Edges = np.linspace(-coreY, coreY, nfCoreY + 1)
+    Rows.append((0.5*(Edges[:-1] + Edges[1:]), np.full(nfCoreY, 4.0*coreY*coreZ/nfCoreY), Section['coreID']))
+
+    # top and bottom cover: 2 strips each, as wide as the section at the outer edge and as the core at the inner one
+    t = np.linspace(0.0, 1.0, 3)
+    y, w = coverY - t*(coverY - coreY), 2.0*(coverZ - t*(coverZ - coreZ))
+    Area, yc, _ = _Trapezoids(y[:-1], y[1:], w[:-1], w[1:], 0.0, 0.0)
+    Rows.append((np.concatenate((-yc, yc)), np.concatenate((Area, Area)), Section['coverID']))
+
+    # side cover (both sides): 2 x nfCoverY cells between the core and the faces, mitred at the corners; the
+    # cells of a column span the half depth Y at their edges z, the ones of a row the fractions t of it
+    s = np.linspace(0.0, 1.0, 3)
+    Y, z = coverY - s*(coverY - coreY), coverZ - s*(coverZ - coreZ)
+    t = np.linspace(0.0, 1.0, nfCoverY + 1)
+    dt, tMid = np.diff(t)[:, None], 0.5*(t[:-1] + t[1:])[:, None]
+    Area, _, yc = _Trapezoids(z[:-1], z[1:], 2.0*Y[:-1]*dt, 2.0*Y[1:]*dt, Y[:-1]*(2.0*tMid - 1.0), Y[1:]*(2.0*tMid - 1.0))
+    Rows.append((yc.ravel(), 2.0*Area.ravel(), Section['coverID']))
+
+    # bars: the intermediate layers of both sides, the top and bottom layers
+    numBarsInt = int(Section['numBarsIntTot']/2)
+    if numBarsInt > 0:
+        Position = np.array([0.5]) if numBarsInt == 1 else np.linspace(0.0, 1.0, numBarsInt)
+        Rows.append((-coreY + 2.0*coreY*Position, np.full(numBarsInt, 2.0*Section['barAreaInt']), Section['steelID']))
+    for yBar, numBars, barArea in [(coreY, Section['numBarsTop'], Section['barAreaTop']),
+                                   (-coreY, Section['numBarsBot'], Section['barAreaBot'])]:
+        if numBars > 0:
+            Rows.append((np.array([yBar]), np.array([numBars*barArea]), Section['steelID']))
+
+    return np.concatenate([np.column_stack((y, np.zeros(len(y)), A, np.full(len(y), matTag))) for y, A, matTag in Rows])
+
+
+def MergeFibers(Fibers):
+    """
+    Fibers of equal y and material merged into one (area summed, z at the centroid of the areas): under a
+    curvature about z only they have the same strain history, and the same N, Mz and My as the fibers they
+    replace. The rectangular sections of BuildRCrectSection shrink from about nfY*nfZ to nfY fibers per patch.
+    """
+    Fibers = np.asarray(Fibers, dtype=float)
+    Scale = max(np.abs(Fibers[:, 0]).max(), DBL_EPSILON)
+    Key = np.column_stack((np.round(Fibers[:, 0]/Scale*1.0e9), Fibers[:, 3]))
+    _, Index, Inverse = np.unique(Key, axis=0, return_index=True, return_inverse=True)
+    Inverse = Inverse.ravel()
+    A = np.bincount(Inverse, Fibers[:, 2])
+    zA = np.bincount(Inverse, Fibers[:, 1]*Fibers[:, 2])
+    return np.column_stack((Fibers[Index, 0], zA/np.where(A > 0.0, A, 1.0), A, Fibers[Index, 3]))
+
+
+def MaterialMap(Materials=None):
+    """
+    LibMaterialsRC material objects by tag (IDconcCore, IDconcCover, IDSteel) for the material constants
+    of DefineMaterialsRC (optional, default=module constants).
+    """
+    Set = MaterialsRC(**(Materials or {}))
+    return {IDconcCore: Set.Core, IDconcCover: Set.Cover, IDSteel: Set.Steel}
+
+
+class SectionBatch:
+    """
+    Fibers of a batch of sections, grouped by material model and padded (with fibers of zero area) to the
+    largest number of fibers of each group.
+
+    Args:
+    FiberArrays: List of the fiber arrays (y, z, area, matTag) of the sections, e.g. from SectionFibers.
+    Materials: Dictionary of material objects by tag (see MaterialMap), or a list with one per section
+               (optional, default=MaterialMap()).
+    """
+
+    Models = [(LibMaterialsRC.Concrete02, Concrete02Fibers), (LibMaterialsRC.Steel02, Steel02Fibers)]
+
+    def __init__(self, FiberArrays, Materials=None):
+        self.Nsec = len(FiberArrays)
+        Materials = Materials if Materials is not None else MaterialMap()
+        if isinstance(Materials, dict):
+            Materials = [Materials]*self.Nsec
+
+        Known = tuple(Class for Class, _ in self.Models)
+        for Fibers, MatMap in zip(FiberArrays, Materials):
+            Unknown = {int(Tag) for Tag in Fibers[:, 3] if not isinstance(MatMap.get(int(Tag)), Known)}
+            if Unknown:
+                raise ValueError("Fibers with materials that are not Concrete02 or Steel02: %s" % sorted(Unknown))
+
+        self.Groups = []
+        for Class, Model in self.Models:
+            Rows = []
+            for Fibers, MatMap in zip(FiberArrays, Materials):
+                Tags = [Tag for Tag, Material in MatMap.items() if isinstance(Material, Class)]
+                Fibers = Fibers[np.isin(Fibers[:, 3], Tags)]
+                Args = np.array([MatMap[Tag].Args for Tag in Tags], dtype=float).reshape(len(Tags), -1)
+                Rows.append((Fibers, Args[np.searchsorted(Tags, Fibers[:, 3], sorter=np.argsort(Tags))]
+                             if len(Fibers) else Args[:0]))
+            Nmax = max(len(Fibers) for Fibers, _ in Rows)
+            if Nmax == 0:
+                continue
+            First = next(Args[0] for _, Args in Rows if len(Args))
+            y, z, A = np.zeros((self.Nsec, Nmax)), np.zeros((self.Nsec, Nmax)), np.zeros((self.Nsec, Nmax))
+            Args = np.tile(First, (self.Nsec, Nmax, 1))
+            for i, (Fibers, FiberArgs) in enumerate(Rows):
+                y[i, :len(Fibers)], z[i, :len(Fibers)], A[i, :len(Fibers)] = Fibers[:, :3].T
+                Args[i, :len(Fibers)] = FiberArgs
+            self.Groups.append((Model(*np.moveaxis(Args, -1, 0)), y, z, A))
+
+        # scale of the axial force: squash load of the concrete and yield force of the steel
+        self.Scale = sum(np.sum(A*np.abs(State.fc if isinstance(State, Concrete02Fibers) else State.Fy), axis=1)
+                         for State, y, z, A in self.Groups)
+
+    def Trial(self, Eps0, KappaZ, KappaY=0.0):
+        """
+        Section forces at the trial deformations (axial strain, curvatures about z and y) of every section,
+        with the OpenSees fiber strains eps = Eps0 - y*KappaZ + z*KappaY.
+
+        Returns:
+        N, Mz, My: Axial force and moments of the sections.
+        EA: Axial tangent stiffness of the sections.
+        """
+        N, Mz, My, EA = 0.0, 0.0, 0.0, 0.0
+        for State, y, z, A in self.Groups:
+            eps = Eps0[:, None] - y*np.asarray(KappaZ)[..., None] + z*np.asarray(KappaY)[..., None]
+            sig, E = State.Trial(eps)
+            N = N + np.sum(sig*A, axis=1)
+            Mz = Mz - np.sum(sig*A*y, axis=1)
+            My = My + np.sum(sig*A*z, axis=1)
+            EA = EA + np.sum(E*A, axis=1)
+        return N, Mz, My, EA
+
+    def Commit(self):
+        for State, _, _, _ in self.Groups:
+            State.Commit()
+
+
+def MomentCurvatureBatch(Batch, P, Kappa, Tol=1.e-10, MaxIter=20, MaxHalving=6):
+    """
+    Moment-curvature response of a batch of sections under constant axial loads: the axial load is applied
+    at zero curvature, then the curvature about z follows the history Kappa (monotonic or cyclic). A section
+    that does not converge within a step is taken back to its last committed state and retried with half the
+    increment, the sections that converged keep their state (a trial at the committed state is the committed
+    state, so they are committed again unchanged).
+
+    Args:
+    Batch: SectionBatch.
+    P: Axial load of every section, compression negative (scalar or array of Batch.Nsec).
+    Kappa: Curvature history, array of Nsteps values, or (Nsec, Nsteps) with one history per section.
+    Tol: Tolerance on the axial force, relative to the squash load of the section (optional, default=1.e-10).
+    MaxIter: Maximum number of Newton iterations per step; a section that does not converge within it is mostly
+             caught in a cycle between two branches of the fibers, which only a smaller step resolves
+             (optional, default=20).
+    MaxHalving: Maximum number of halvings of the increment of a step (optional, default=6).
+
+    Returns:
+    M: Moments about z (Nsec, Nsteps), NaN from the first step that did not converge.
+    Eps0: Axial strains (Nsec, Nsteps).
+    ok: Boolean array of the sections whose whole history converged (convergence mask).
+    """
+    P = np.broadcast_to(np.asarray(P, dtype=float), (Batch.Nsec,))
+    Kappa = np.broadcast_to(np.asarray(Kappa, dtype=float), (Batch.Nsec, np.shape(Kappa)[-1]))
+    Nsteps = Kappa.shape[1]
+    M, Eps0 = np.full((Batch.Nsec, Nsteps), np.nan), np.full((Batch.Nsec, Nsteps), np.nan)
+    ok = np.ones(Batch.Nsec, dtype=bool)
+    e0 = np.zeros(Batch.Nsec)
+    Rate = np.zeros(Batch.Nsec)         # d(Eps0)/d(Kappa) of the last step, to predict the next axial strain
+
+    for Step in range(-1, Nsteps):
+        k = Kappa[:, Step] if Step >= 0 else np.zeros(Batch.Nsec)
+        kLast = Kappa[:, Step - 1] if Step >= 1 else np.zeros(Batch.Nsec)
+        e0Last = e0
+        # committed curvature and axial strain of every section, and substeps done of 2**Level for the step
+        kC, e0C = kLast.copy(), e0.copy()
+        Level, Done = np.zeros(Batch.Nsec, dtype=int), np.zeros(Batch.Nsec, dtype=int)
+        Pending = ok.copy()
+        while Pending.any():
+            Last = Done + 1 == 2**Level
+            kT = np.where(Pending, np.where(Last, k, kLast + (k - kLast)*(Done + 1)/2.0**Level), kC)
+            e0 = np.where(Pending, e0C + Rate*(kT - kC), e0C)
+            for _ in range(MaxIter):
+                N, Mz, _, EA = Batch.Trial(e0, kT)
+                Residual = N - P
+                # the sections that are not in this substep are left as they are
+                Converged = (np.abs(Residual) <= Tol*Batch.Scale) | ~Pending
+                if Converged.all():
+                    break
+                e0 = np.where(Converged, e0, e0 - Residual/EA)
+            Failed = ~Converged
+            if Failed.any():
+                # back to the committed state before committing, then half the increment
+                kT, e0 = np.where(Failed, kC, kT), np.where(Failed, e0C, e0)
+                N, Mz, _, EA = Batch.Trial(e0, kT)
+                Done, Level = np.where(Failed, 2*Done, Done), np.where(Failed, Level + 1, Level)
+                ok &= ~(Failed & (Level > MaxHalving))
+            Batch.Commit()
+            Advanced = Pending & Converged
+            kC, e0C = np.where(Advanced, kT, kC), np.where(Advanced, e0, e0C)
+            Done = np.where(Advanced, Done + 1, Done)
+            Pending = ok & (Done < 2**Level)
+        e0 = e0C
+        Change = k - kLast
+        Rate = np.where(Change != 0.0, (e0 - e0Last)/np.where(Change != 0.0, Change, 1.0), 0.0)
+        if Step >= 0:
+            M[ok, Step] = Mz[ok]
+            Eps0[ok, Step] = e0[ok]
+
+    return M, Eps0, ok
+
+
+def OpenSeesMomentCurvature(Section, nf, P, Kappa, Materials=None):
+    """
+    Moment-curvature response of the same section in OpenSees (zeroLengthSection as in
+    LibFiberTuner.MomentCurvature), along the curvature history Kappa, in a clean domain.
+
+    Returns:
+    M: Moments about z at the curvatures of Kappa (NaN from the first step that did not converge).
+    """
+    nf = MeshDensity(nf) if np.isscalar(nf) else tuple(nf)
+    os.wipe()
+    os.model('basic', '-ndm', 3, '-ndf', 6)
+    DefineMaterialsRC(**(Materials or {}))
+    BuildRCrectSection(1, *Section.values(), *nf, PlotSection=False)
+    os.node(1, 0.0, 0.0, 0.0)
+    os.node(2, 0.0, 0.0, 0.0)
+    os.fix(1, 1, 1, 1, 1, 1, 1)
+    os.fix(2, 0, 1, 1, 1, 1, 0)
+    os.element('zeroLengthSection', 1, 1, 2, 1)
+    os.system('BandGeneral')
+    os.numberer('Plain')
+    os.constraints('Plain')
+    os.test('NormDispIncr', 1.e-12, 50)
+    os.algorithm('Newton')
+
+    os.timeSeries('Constant', 1)
+    os.pattern('Plain', 1, 1)
+    os.load(2, P, 0.0, 0.0, 0.0, 0.0, 0.0)
+    os.integrator('LoadControl', 0.0)
+    os.analysis('Static')
+    os.analyze(1)
+    os.loadConst('-time', 0.0)
+
+    os.timeSeries('Linear', 2)
+    os.pattern('Plain', 2, 2)
+    os.load(2, 0.0, 0.0, 0.0, 0.0, 0.0, 1.0)
+    M = np.full(len(Kappa), np.nan)
+    Previous, Moment = 0.0, 0.0
+    for Step, k in enumerate(Kappa):
+        if k != Previous:
+            os.integrator('DisplacementControl', 2, 6, k - Previous)
+            os.analysis('Static')
+            if os.analyze(1) != 0:
+                break
+            Moment, Previous = os.getLoadFactor(2), k
+        M[Step] = Moment
+    os.wipe()
+
+    return M
+
+
+def CompareWithOpenSees(Params, nf=None, AxialRatio=0.1, Ductility=10.0, Dkappa=0.05):
+    """
+    Cyclic moment-curvature response of the column, beam and girder sections of the frame with the engine
+    and with OpenSees. The columns are under an axial load of AxialRatio*fc*HCol*BCol, the curvature peaks
+    are 1, 2, ... Ductility times the yield curvature 2.1*Fy/Es/HSec, one full cycle each.
+
+    Args:
+    Params: Frame parameters (LibFrameModel.FrameParameters).
+    nf: Mesh density (optional, default=the nfCoreY of Params).
+
+    Returns:
+    Rows: List of (member, number of fibers, steps, largest difference relative to the peak moment).
+    """
+    from LibGeneratePeaks import GenerateProtocol
+    Materials = {Key: Params[Key] for Key in MaterialKeys}
+    nf = nf or Params['nfCoreY']
+    Rows = []
+    for Member in ['Col', 'Beam', 'Gird']:
+        Section = SectionParams(Params, Member)
+        P = AxialRatio*Params['fc']*Section['HSec']*Section['BSec'] if Member == 'Col' else 0.0
+        KappaY = 2.1*Params['Fy']/Params['Es']/Section['HSec']
+        Kappa, _ = GenerateProtocol(list(np.arange(1, Ductility + 1)*KappaY), Dkappa*KappaY, 'Full', 1.0, 1)
+        # exact multiples of the increment: a roundoff of the cumulated history (e.g. -3e-17 instead of 0) is a
+        # reversal for Steel02, and the two responses would follow different branches from there
+        Kappa = np.round(Kappa/(Dkappa*KappaY))*Dkappa*KappaY
+
+        M, _, _ = MomentCurvatureBatch(SectionBatch([BendingFibers(Section, nf)], MaterialMap(Materials)), P, Kappa)
+        MRef = OpenSeesMomentCurvature(Section, nf, P, Kappa, Materials)
+        Rows.append((Member, len(SectionFibers(Section, nf)), len(Kappa),
+                     np.nanmax(np.abs(M[0] - MRef))/np.nanmax(np.abs(MRef))))
+
+    return Rows
+
+
+if __name__ == "__main__":
+    from LibFrameModel import FrameParameters
+    Params = FrameParameters()
+    print("%-6s %7s %6s %12s" % ("Member", "Fibers", "Steps", "Difference"))
+    for Member, Nfibers, Nsteps, Difference in CompareWithOpenSees(Params):
+        print("%-6s %7i %6i %11.2e" % (Member, Nfibers, Nsteps, Difference))
+
+    # throughput: a batch of column designs (depth and axial load ratio) under a monotonic curvature
+    Nsec, Nsteps = 1000, 100
+    rng = np.random.default_rng(1)
+    Section = SectionParams(Params, 'Col')
+    Sections = [dict(Section, HSec=H, BSec=H) for H in rng.uniform(0.8, 1.2, Nsec)*Section['HSec']]
+    P = rng.uniform(0.0, 0.3, Nsec)*Params['fc']*np.array([S['HSec']*S['BSec'] for S in Sections])
+    Kappa = np.linspace(1, Nsteps, Nsteps)*20*Params['Fy']/Params['Es']/Section['HSec']/Nsteps
+    Materials = {Key: Params[Key] for Key in MaterialKeys}
+    for nf in [6, 10, 20]:
+        tStart = time.perf_counter()
+        Batch = SectionBatch([BendingFibers(S, nf) for S in Sections])
+        tBatch = time.perf_counter()
+        M, Eps0, ok = MomentCurvatureBatch(Batch, P, Kappa)
+        tEnd = time.perf_counter()
+
+        # the same curves one at a time in OpenSees, on a sample of the sections
+        Nref = 20
+        for i in range(Nref):
+            OpenSeesMomentCurvature(Sections[i], nf, P[i], Kappa, Materials)
+        tRef = (time.perf_counter() - tEnd)/Nref
+        print("nf %2i: %i sections x %i steps in %.2f s + %.2f s fibers, %.0f curves/s with the fibers (OpenSees %.0f), "
+              "%i converged" % (nf, Nsec, Nsteps, tEnd - tBatch, tBatch - tStart, Nsec/(tEnd - tStart), 1.0/tRef, ok.sum()))
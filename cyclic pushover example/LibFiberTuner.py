@@ -0,0 +1,277 @@
+"""
+Purpose :
+    LibFiberTuner.py contains an auto-tuner of the fiber mesh density of the
+    BuildRCrectSection sections.
+
+    The moment-curvature response of each section (zeroLengthSection under a
+    constant axial load) is computed about both local axes with an increasing
+    number of fibers, nfCoreY = nfCoreZ = nfCoverY = nfCoverZ = nf. The
+    bending about z is governed by the fibers across y (nfCoreY, nfCoverY) and
+    the bending about y by the fibers across z (nfCoreZ, nfCoverZ), so each
+    pair is tuned on its own axis: the coarsest density whose moments stay
+    within Tol of the converged (densest) mesh about that axis. Since the
+    state determination of the frame scales with the number of fibers, the
+    report gives the expected saving against the current mesh, together with
+    the measured times.
+
+    The result feeds the section construction directly:
+        nfSections, Report = TuneFrameSections(Params)
+        Params = FrameParameters(nfSections=nfSections)
+
+    Run : python LibFiberTuner.py   (tuning of the sections of the main script)
+"""
+
+# ===========================================================================
+# Import Libraries
+# ===========================================================================
+import openseespy.opensees as os
+import numpy as np
+import time
+from LibMaterialsRC import DefineMaterialsRC, IDconcCore, IDconcCover, IDSteel
+import LibMaterialsRC
+from BuildRCrectSection import BuildRCrectSection
+from LibFiberSection import CachedFibers
+from LibFrameGenerator import FrameLayout
+
+
+# ===========================================================================
+# Main Code
+# ===========================================================================
+MaterialKeys = ['fc', 'Kfc', 'Kres', 'Fy', 'Es', 'Bs', 'R0', 'cR1', 'cR2']
+
+
+def SectionParams(Params, Member):
+    """
+    Arguments of BuildRCrectSection (without the tag and the numbers of fibers) of a member
+    ('Col', 'Beam' or 'Gird') of the frame parameters of LibFrameModel.FrameParameters.
+    """
+    return {'HSec': Params['H' + Member], 'BSec': Params['B' + Member],
+            'coverH': Params['cover'], 'coverB': Params['cover'],
+            'coreID': IDconcCore, 'coverID': IDconcCover, 'steelID': IDSteel,
+            'numBarsTop': Params['numBarsTop' + Member], 'barAreaTop': Params['barAreaTop' + Member],
+            'numBarsBot': Params['numBarsBot' + Member], 'barAreaBot': Params['barAreaBot' + Member],
+            'numBarsIntTot': Params['numBarsInt' + Member], 'barAreaInt': Params['barAreaInt' + Member]}
+
+
+def MeshDensity(nf):
+    """
+    nfCoreY, nfCoreZ, nfCoverY, nfCoverZ of the mesh density nf.
+    """
+    return (nf, nf, nf, nf)
+
+
+def CountFibers(Section, nf, Materials=None):
+    """
+    Number of fibers of a section with the mesh nf (nfCoreY, nfCoreZ, nfCoverY, nfCoverZ), without analysis.
+    """
+    os.wipe()
+    os.model('basic', '-ndm', 3, '-ndf', 6)
+    DefineMaterialsRC(**(Materials or {}))
+    Nfibers = len(CachedFibers(BuildRCrectSection(1, *Section.values(), *nf, PlotSection=False)))
+    os.wipe()
+    return Nfibers
+
+
+def MomentCurvature(Section, nf, P=0.0, KappaMax=1.e-3, Nsteps=100, Materials=None, Axis='z'):
+    """
+    Moment-curvature analysis of a section, in a clean domain.
+
+    Args:
+    Section: Arguments of BuildRCrectSection (see SectionParams).
+    nf: Mesh density, or tuple (nfCoreY, nfCoreZ, nfCoverY, nfCoverZ).
+    P: Constant axial load, compression negative (optional, default=0).
+    KappaMax: Maximum curvature (optional, default=1.e-3).
+    Nsteps: Number of curvature increments (optional, default=100).
+    Materials: Dictionary of the material constants of DefineMaterialsRC (optional, default=module constants).
+    Axis: Local axis of the moment, 'z' or 'y' (optional, default='z').
+
+    Returns:
+    Kappa, M: Numpy arrays of the converged curvatures and moments (shorter if the analysis failed).
+    Nfibers: Number of fibers of the section.
+    Time: Wall time of the analysis (without the model definition).
+    """
+    nf = MeshDensity(nf) if np.isscalar(nf) else tuple(nf)
+    DOF = {'z': 6, 'y': 5}[Axis]
+
+    os.wipe()
+    os.model('basic', '-ndm', 3, '-ndf', 6)
+    DefineMaterialsRC(**(Materials or {}))
+    fibSec = BuildRCrectSection(1, *Section.values(), *nf, PlotSection=False)
+
+    os.node(1, 0.0, 0.0, 0.0)
+    os.node(2, 0.0, 0.0, 0.0)
+    os.fix(1, 1, 1, 1, 1, 1, 1)
+    os.fix(2, *[0 if Dof in (1, DOF) else 1 for Dof in range(1, 7)])
+    os.element('zeroLengthSection', 1, 1, 2, 1)
+
+    os.system('BandGeneral')
+    os.numberer('Plain')
+    os.constraints('Plain')
+    os.test('NormDispIncr', 1.e-9, 50)
+    os.algorithm('Newton')
+
+    # constant axial load
+    os.timeSeries('Constant', 1)
+    os.pattern('Plain', 1, 1)
+    os.load(2, P, 0.0, 0.0, 0.0, 0.0, 0.0)
+    os.integrator('LoadControl', 0.0)
+    os.analysis('Static')
+    os.analyze(1)
+    os.loadConst('-time', 0.0)
+
+    # reference moment about Axis, curvature = rotation of node 2 (zero-length section)
+    os.timeSeries('Linear', 2)
+    os.pattern('Plain', 2, 2)
+    os.load(2, *[1.0 if Dof == DOF else 0.0 for Dof in range(1, 7)])
+    os.integrator('DisplacementControl', 2, DOF, KappaMax/Nsteps)
+    os.analysis('Static')
+
+    tStart = time.perf_counter()
+    Kappa, M = [], []
+    for _ in range(Nsteps):
+        if os.analyze(1) != 0:
+            break
+        Kappa.append(os.nodeDisp(2, DOF))
+        M.append(os.getLoadFactor(2))
+    Time = time.perf_counter() - tStart
+    os.wipe()
+
+    return np.array(Kappa), np.array(M), len(CachedFibers(fibSec)), Time
+
+
+def TuneAxis(Section, Axis, P=0.0, Tol=0.01, Densities=(4, 6, 8, 10, 12, 16, 20), RefDensity=40,
+             Ductility=10.0, Nsteps=100, Materials=None):
+    """
+    Coarsest mesh density of a section whose moment-curvature response about Axis is within Tol of the
+    reference mesh (arguments as TuneSection).
+
+    Returns:
+    Result: Dictionary with the chosen density 'nf', its 'Error', and the 'Densities', 'Errors', 'Fibers' and
+            'Times' of every mesh analysed (the reference mesh last). The reference mesh is chosen if no
+            candidate is within Tol.
+    """
+    Materials = Materials or {}
+    Depth = Section['HSec'] if Axis == 'z' else Section['BSec']
+    KappaMax = Ductility*2.1*Materials.get('Fy', LibMaterialsRC.Fy)/Materials.get('Es', LibMaterialsRC.Es)/Depth
+
+    KappaRef, MRef, FibersRef, TimeRef = MomentCurvature(Section, RefDensity, P, KappaMax, Nsteps, Materials, Axis)
+    Scale = np.max(np.abs(MRef))
+
+    Result = {'Densities': [], 'Errors': [], 'Fibers': [], 'Times': [], 'nf': RefDensity, 'Error': 0.0}
+    for nf in sorted(Densities):
+        if nf >= RefDensity:
+            break
+        Kappa, M, Nfibers, Time = MomentCurvature(Section, nf, P, KappaMax, Nsteps, Materials, Axis)
+        # a mesh that fails before the reference does is not converged
+        Error = np.inf if len(M) < len(MRef) else np.max(np.abs(M - MRef))/Scale
+        for Key, Value in zip(['Densities', 'Errors', 'Fibers', 'Times'], [nf, Error, Nfibers, Time]):
+            Result[Key].append(Value)
+        if Error <= Tol:
+            Result['nf'], Result['Error'] = nf, Error
+            break
+
+    for Key, Value in zip(['Densities', 'Errors', 'Fibers', 'Times'], [RefDensity, 0.0, FibersRef, TimeRef]):
+        Result[Key].append(Value)
+
+    return Result
+
+
+def TuneSection(Section, P=0.0, Tol=0.01, Densities=(4, 6, 8, 10, 12, 16, 20), RefDensity=40,
+                Ductility=10.0, Nsteps=100, Materials=None):
+    """
+    Coarsest mesh of a section whose moment-curvature responses about z and about y are within Tol of the
+    reference mesh: the fibers across y (nfCoreY, nfCoverY) from the bending about z, the fibers across z
+    (nfCoreZ, nfCoverZ) from the bending about y.
+
+    Args:
+    Section: Arguments of BuildRCrectSection (see SectionParams).
+    P: Constant axial load, compression negative (optional, default=0).
+    Tol: Maximum error on the moments, relative to the peak moment of the reference mesh (optional, default=0.01).
+    Densities: Candidate mesh densities, tried in increasing order (optional, default=(4, 6, 8, 10, 12, 16, 20)).
+    RefDensity: Mesh density taken as converged (optional, default=40).
+    Ductility: Maximum curvature as a multiple of the yield curvature 2.1*Fy/Es/depth (optional, default=10).
+    Nsteps: Number of curvature increments (optional, default=100).
+    Materials: Dictionary of the material constants of DefineMaterialsRC (optional, default=module constants).
+
+    Returns:
+    Result: Dictionary with the TuneAxis result of each axis ('z' and 'y'), the chosen mesh 'nfSection'
+            (nfCoreY, nfCoreZ, nfCoverY, nfCoverZ), the larger 'Error' of the two axes, and the moment-curvature
+            'Time' of the chosen densities and 'TimeRef' of the reference mesh (both axes).
+    """
+    Result = {Axis: TuneAxis(Section, Axis, P, Tol, Densities, RefDensity, Ductility, Nsteps, Materials)
+              for Axis in ['z', 'y']}
+    nfY, nfZ = Result['z']['nf'], Result['y']['nf']
+    Result['nfSection'] = (nfY, nfZ, nfY, nfZ)
+    Result['Error'] = max(Result['z']['Error'], Result['y']['Error'])
+    Result['Time'] = sum(Result[Axis]['Times'][Result[Axis]['Densities'].index(Result[Axis]['nf'])] for Axis in 'zy')
+    Result['TimeRef'] = Result['z']['Times'][-1] + Result['y']['Times'][-1]
+
+    return Result
+
+
+def TuneFrameSections(Params, Tol=0.01, AxialRatio=0.1, **Options):
+    """
+    Tune the mesh of the column, beam and girder sections of the frame.
+    The columns are analysed under an axial load of AxialRatio*fc*HCol*BCol, beams and girders without axial load.
+
+    Args:
+    Params: Frame parameters (LibFrameModel.FrameParameters).
+    Tol: Tolerance on the moments (optional, default=0.01).
+    AxialRatio: Axial load ratio of the columns (optional, default=0.1).
+    Options: Other arguments of TuneSection (Densities, RefDensity, Ductility, Nsteps).
+
+    Returns:
+    nfSections: Dictionary of the chosen (nfCoreY, nfCoreZ, nfCoverY, nfCoverZ) of 'Col', 'Beam' and 'Gird',
+                to use as FrameParameters(nfSections=nfSections).
+    Report: Dictionary with the TuneSection result of each member, the number of fibers of the
+            current and chosen meshes and the expected saving of the frame (see TuningReport).
+    """
+    Materials = {Key: Params[Key] for Key in MaterialKeys}
+    Layout = FrameLayout(Params['NStory'], Params['NBay'], Params['NBayZ'], Params['LCol'], Params['LBeam'], Params['LGird'])
+    Count = {'Col': len(Layout['Columns']['Tag']), 'Beam': len(Layout['Beams']['Tag']), 'Gird': len(Layout['Girders']['Tag'])}
+    Current = [Params[Key] for Key in ['nfCoreY', 'nfCoreZ', 'nfCoverY', 'nfCoverZ']]
+    CurrentSections = Params.get('nfSections') or {}
+
+    nfSections = {}
+    Report = {'Members': {}, 'Tol': Tol}
+    FibersCurrent, FibersChosen = 0, 0
+    for Member in ['Col', 'Beam', 'Gird']:
+        Section = SectionParams(Params, Member)
+        P = AxialRatio*Params['fc']*Section['HSec']*Section['BSec'] if Member == 'Col' else 0.0
+        Result = TuneSection(Section, P, Tol, Materials=Materials, **Options)
+        nfSections[Member] = Result['nfSection']
+
+        Result['FibersCurrent'] = CountFibers(Section, CurrentSections.get(Member, Current), Materials)
+        Result['FibersChosen'] = CountFibers(Section, Result['nfSection'], Materials)
+        Result['Count'] = Count[Member]
+        Report['Members'][Member] = Result
+        FibersCurrent += Count[Member]*Result['FibersCurrent']
+        FibersChosen += Count[Member]*Result['FibersChosen']
+
+    Report['Saving'] = 1.0 - FibersChosen/FibersCurrent
+
+    return nfSections, Report
+
+
+def TuningReport(Report):
+    """
+    Text report of TuneFrameSections: chosen mesh, error and fibers of each member, expected saving.
+    """
+    Lines = ["Fiber mesh tuning, tolerance %.1f%% of the peak moment" % (100*Report['Tol'])]
+    Lines.append("%-6s %6s %5s %5s %9s %16s %18s" % ("Member", "Count", "nfY", "nfZ", "Error", "Fibers (now)",
+                                                     "M-phi time (ref)"))
+    for Member, Result in Report['Members'].items():
+        Lines.append("%-6s %6i %5i %5i %8.2f%% %7i (%6i) %8.3f s (%.3f)" % (
+            Member, Result['Count'], Result['z']['nf'], Result['y']['nf'], 100*Result['Error'], Result['FibersChosen'],
+            Result['FibersCurrent'], Result['Time'], Result['TimeRef']))
+    Lines.append("Expected saving on the fiber state determination of the frame: %.0f%%" % (100*Report['Saving']))
+
+    return "\n".join(Lines)
+
+
+if __name__ == "__main__":
+    from LibFrameModel import FrameParameters
+    Params = FrameParameters()
+    nfSections, Report = TuneFrameSections(Params)
+    print(TuningReport(Report))
+    print("FrameParameters(nfSections=%s)" % nfSections)
@@ -0,0 +1,199 @@
+"""
+Purpose :
+    LibFrameGenerator.py contains a generator of regular 3D frames with NStory
+    stories, NBay bays in X and NBayZ bays in Z, for models far larger than the
+    3x1x1 frame of "Main cyclic_pushover.py".
+
+    FrameLayout computes the node coordinates, tags, element connectivity and
+    rigid-diaphragm master nodes as NumPy arrays, TributaryWeights the gravity
+    loads, nodal masses and floor weights; nothing is defined in OpenSees until
+    DefineNodes, DefineElements, DefineMasses and DefineGravityLoads emit the
+    arrays in bulk.
+    The cost of a build is linear in the number of nodes and elements.
+
+    Tag numbering (with the field widths fitted to the frame size, so that the
+    3x1x1 frame keeps the tags of the main script):
+        nodes       frame | level | pier                  e.g. 141
+        masters     1 | 1 | level | 1, one per floor      e.g. 1141
+        columns     frame | 1 | level | pier              e.g. 1131
+        beams       frame | 2 | level | bay               e.g. 1241
+        girders     bayZ | 3 | level | pier               e.g. 1342
+    frames are the lines of nodes at constant Z, piers the lines at constant X.
+"""
+
+# ===========================================================================
+# Import Libraries
+# ===========================================================================
+import openseespy.opensees as os
+import numpy as np
+from LibUnits import g
+
+
+# ===========================================================================
+# Main Code
+# ===========================================================================
+def _Digits(N):
+    return len(str(N))
+
+
+def FrameLayout(NStory, NBay, NBayZ, LCol, LBeam, LGird):
+    """
+    Geometry and numbering of a regular 3D frame.
+
+    Args:
+    NStory: Number of stories above ground level.
+    NBay, NBayZ: Number of bays in the X and Z directions.
+    LCol, LBeam, LGird: Column height, beam length (X) and girder length (Z).
+
+    Returns:
+    Layout: Dictionary of NumPy arrays,
+            'NodeTag' (frame, level, pier) array of node tags and 'NodeXYZ' their coordinates,
+            'MasterTag'/'MasterXYZ' the diaphragm master node of each floor above ground,
+            'SlaveTag' (floor, node) the nodes of each floor, 'SupportNodes' the nodes at Y=0,
+            'Columns'/'Beams'/'Girders' dictionaries with 'Tag', 'Nodes' (element, 2) and 'Length',
+            'FloorHeight' and 'LBuilding'.
+    """
+    if min(NStory, NBay, NBayZ) < 1:
+        raise ValueError("NStory, NBay and NBayZ must be at least 1")
+
+    Nframe, Nlevel, Npier = NBayZ + 1, NStory + 1, NBay + 1
+    wPier, wLevel, wFrame = _Digits(Npier), _Digits(Nlevel), _Digits(Nframe)
+    X = LBeam*np.arange(Npier)
+    Y = LCol*np.arange(Nlevel)
+    Z = LGird*np.arange(Nframe)
+
+    Frame, Level, Pier = np.meshgrid(np.arange(1, Nframe + 1), np.arange(1, Nlevel + 1), np.arange(1, Npier + 1),
+                                     indexing='ij')
+    NodeTag = Frame*10**(wLevel + wPier) + Level*10**wPier + Pier
+    NodeXYZ = np.stack([X[Pier - 1], Y[Level - 1], Z[Frame - 1]], axis=-1)
+
+    # one master node per floor, in the center of the floor, numbered above all the frame nodes
+    Floors = np.arange(2, Nlevel + 1)
+    MasterTag = 10**(wFrame + wLevel + wPier) + 10**(wLevel + wPier) + Floors*10**wPier + 1
+    MasterXYZ = np.column_stack([np.full(NStory, X.mean()), Y[1:], np.full(NStory, Z.mean())])
+    SlaveTag = NodeTag[:, 1:, :].transpose(1, 0, 2).reshape(NStory, -1)
+
+    def ElementTag(Line, Type, Level, Position):
+        return Line*10**(wLevel + wPier + 1) + Type*10**(wLevel + wPier) + Level*10**wPier + Position
+
+    def Elements(Tag, NodeI, NodeJ, Length):
+        return {'Tag': Tag.ravel(), 'Nodes': np.column_stack([NodeI.ravel(), NodeJ.ravel()]),
+                'Length': np.full(Tag.size, float(Length))}
+
+    Columns = Elements(ElementTag(Frame[:, :-1, :], 1, Level[:, :-1, :], Pier[:, :-1, :]),
+                       NodeTag[:, :-1, :], NodeTag[:, 1:, :], LCol)
+    Beams = Elements(ElementTag(Frame[:, 1:, :-1], 2, Level[:, 1:, :-1], Pier[:, 1:, :-1]),
+                     NodeTag[:, 1:, :-1], NodeTag[:, 1:, 1:], LBeam)
+    Girders = Elements(ElementTag(Frame[:-1, 1:, :], 3, Level[:-1, 1:, :], Pier[:-1, 1:, :]),
+                       NodeTag[:-1, 1:, :], NodeTag[1:, 1:, :], LGird)
+    Beams['Frame'] = Frame[:, 1:, :-1].ravel()
+
+    Layout = {'NStory': NStory, 'NBay': NBay, 'NBayZ': NBayZ, 'X': X, 'Y': Y, 'Z': Z,
+              'NodeTag': NodeTag, 'NodeXYZ': NodeXYZ,
+              'MasterTag': MasterTag, 'MasterXYZ': MasterXYZ, 'SlaveTag': SlaveTag,
+              'SupportNodes': NodeTag[:, 0, :].ravel(),
+              'Columns': Columns, 'Beams': Beams, 'Girders': Girders,
+              'FloorHeight': Y[1:], 'LBuilding': Y[-1]}
+
+    return Layout
+
+
+def TributaryWeights(Layout, QdlCol, QBeam, QdlGird, QslabArea):
+    """
+    Gravity loads of the elements, nodal masses and floor weights.
+    Each beam carries its own weight and the one-way slab on both sides up to mid-span of the
+    girders (LGird/2 for the frames on the edges, as in the main script). Each node above ground
+    takes the mass of 1/2 of each element framing into it (mass=weight/g).
+
+    Args:
+    QdlCol, QBeam, QdlGird: Self weight of a column, beam and girder, weight per length.
+    QslabArea: Weight of the slab per area (e.g. GammaConcrete*Tslab*DLfactor).
+
+    Returns:
+    Weights: Dictionary with the distributed loads 'QdlCol', 'QdlBeam', 'QdlGird' of every element,
+             'NodeMass' with the shape of Layout['NodeTag'], 'FloorWeight', 'WeightTotal' and 'MassTotal'.
+    """
+    Z = Layout['Z']
+    SlabWidth = np.zeros(len(Z))
+    SlabWidth[1:] += np.diff(Z)/2
+    SlabWidth[:-1] += np.diff(Z)/2
+
+    Columns, Beams, Girders = Layout['Columns'], Layout['Beams'], Layout['Girders']
+    Q = {'QdlCol': np.full(len(Columns['Tag']), float(QdlCol)),
+         'QdlBeam': QBeam + QslabArea*SlabWidth[Beams['Frame'] - 1],
+         'QdlGird': np.full(len(Girders['Tag']), float(QdlGird))}
+
+    # half of the weight of every element to each of its end nodes
+    NodeTag = Layout['NodeTag']
+    Index = np.full(NodeTag.max() + 1, -1)
+    Index[NodeTag.ravel()] = np.arange(NodeTag.size)
+    NodeWeight = np.zeros(NodeTag.size)
+    for Elements, Qdl in [(Columns, Q['QdlCol']), (Beams, Q['QdlBeam']), (Girders, Q['QdlGird'])]:
+        HalfWeight = Qdl*Elements['Length']/2
+        np.add.at(NodeWeight, Index[Elements['Nodes'][:, 0]], HalfWeight)
+        np.add.at(NodeWeight, Index[Elements['Nodes'][:, 1]], HalfWeight)
+    NodeWeight = NodeWeight.reshape(NodeTag.shape)
+    NodeWeight[:, 0, :] = 0.0			# supports
+
+    FloorWeight = NodeWeight[:, 1:, :].sum(axis=(0, 2))
+    WeightTotal = FloorWeight.sum()
+
+    Weights = dict(Q, NodeMass=NodeWeight/g, FloorWeight=FloorWeight, WeightTotal=WeightTotal, MassTotal=WeightTotal/g)
+
+    return Weights
+
+
+def LateralLoads(FloorWeight, FloorHeight):
+    """
+    Lateral-load distribution for the static pushover, Fj = WjHj/sum(WiHi) * Weight at each floor j.
+    """
+    WiHi = FloorWeight*FloorHeight
+    return WiHi/WiHi.sum()*FloorWeight.sum()
+
+
+def DefineNodes(Layout, perpDirn=2):
+    """
+    Define the nodes, rigid floor diaphragms (dof perpDirn normal to the floors) and supports
+    (all Y=0 nodes pinned, as in the main script) of the layout in the current domain.
+    """
+    for Tag, XYZ in zip(Layout['NodeTag'].ravel().tolist(), Layout['NodeXYZ'].reshape(-1, 3).tolist()):
+        os.node(Tag, *XYZ)
+
+    for Master, XYZ, Slaves in zip(Layout['MasterTag'].tolist(), Layout['MasterXYZ'].tolist(), Layout['SlaveTag'].tolist()):
+        os.node(Master, *XYZ)
+        os.fix(Master, 0,  1,  0,  1, 0,  1)		# UX, UY=0, UZ, RX=0, RY, RZ=0
+        os.rigidDiaphragm(perpDirn, Master, *Slaves)
+
+    os.fixY(0.0, *[1, 1, 1, 0, 1, 0])
+
+
+def DefineElements(Layout, ColSecTag, BeamSecTag, GirdSecTag, IDColTransf, IDBeamTransf, IDGirdTransf, nIP):
+    """
+    Define the nonlinearBeamColumn columns, beams and girders of the layout, with nIP integration points.
+    """
+    for Elements, SecTag, TransfTag in [(Layout['Columns'], ColSecTag, IDColTransf),
+                                        (Layout['Beams'], BeamSecTag, IDBeamTransf),
+                                        (Layout['Girders'], GirdSecTag, IDGirdTransf)]:
+        for Tag, Nodes in zip(Elements['Tag'].tolist(), Elements['Nodes'].tolist()):
+            os.element('nonlinearBeamColumn', Tag, *Nodes, nIP, SecTag, TransfTag)
+
+
+def DefineMasses(Layout, NodeMass):
+    """
+    Assign the nodal masses (X and Z translations) of TributaryWeights.
+    """
+    NodeTag = Layout['NodeTag'][:, 1:, :].ravel().tolist()
+    for Tag, M in zip(NodeTag, NodeMass[:, 1:, :].ravel().tolist()):
+        os.mass(Tag, *[M, 0, M, 0., 0., 0.])
+
+
+def DefineGravityLoads(Layout, Weights):
+    """
+    Apply the distributed gravity loads of TributaryWeights to the elements, in the current load pattern.
+    Elements with the same load share one eleLoad command.
+    """
+    for Elements, Qdl, Local in [(Layout['Columns'], Weights['QdlCol'], lambda Q: (0., 0., -Q)),
+                                 (Layout['Beams'], Weights['QdlBeam'], lambda Q: (-Q, 0.)),
+                                 (Layout['Girders'], Weights['QdlGird'], lambda Q: (-Q, 0.))]:
+        for Q in np.unique(Qdl).tolist():
+            os.eleLoad('-ele', *Elements['Tag'][Qdl == Q].tolist(), '-type', '-beamUniform', *Local(Q))
@@ -0,0 +1,518 @@
+"""
+Purpose :
+    LibFrameModel.py contains the 3D RC frame of "Main cyclic_pushover.py"
+    (Example 7 - 3D RC Frame with inelastic fiber section) as functions, so that
+    the model can be rebuilt from a set of parameters, e.g. inside the worker
+    processes of a parametric sweep (LibSweep.py).
+
+    FrameParameters returns the parameters of the main script, with overrides.
+    RunCyclicPushover builds the model, runs the gravity analysis and the cyclic
+    protocol, and returns the control-node displacement and base reactions,
+    either from the text or binary recorders or captured in memory (Output="memory").
+    RunTimeHistory runs a ground-motion record (LibGroundMotion.py) on the frame
+    after the gravity analysis instead of the cyclic protocol (LibTransient.py).
+"""
+
+# ===========================================================================
+# Import Libraries
+# ===========================================================================
+import openseespy.opensees as os
+import numpy as np
+import os as os1
+from LibUnits import *
+from LibMaterialsRC import IDconcCore, IDconcCover, IDSteel, DefineMaterialsRC
+import LibMaterialsRC
+from BuildRCrectSection import BuildRCrectSection
+from LibFrameGenerator import FrameLayout, TributaryWeights, LateralLoads, DefineNodes, DefineElements, DefineMasses, DefineGravityLoads
+from LibGeneratePeaks import GenerateProtocol, ProtocolIncrements
+from LibAnalysisDriver import RunDisplacementProtocol, StepHooks
+from LibAdaptiveStep import AdaptiveDisplacementControl
+from LibConvergence import StrategyEngine
+from LibCapture import RecorderSetCapture
+from LibProfiler import StepProfiler
+from LibSolverConfig import AutoConfig, DefineConfig
+from LibCheckpoint import DatabaseCheckpoint, ForkCheckpoint, RunCheckpointedProtocol
+from LibRecorders import NodeRecorder, ElementRecorder, RecorderFile
+from LibGroundMotion import LoadRecord
+from LibTransient import RayleighDamping, GroundMotionPattern, RunTransient, StoryDriftMonitor
+from LibTermination import FrameTermination
+
+
+# ===========================================================================
+# Main Code
+# ===========================================================================
+# Parameters of the main script
+DefaultParams = {
+    # geometry
+    'LCol': 12*ft, 'LBeam': 20*ft, 'LGird': 20*ft, 'NStory': 3, 'NBay': 1, 'NBayZ': 1,
+    # sections
+    'HCol': 28*inch, 'BCol': None, 'HBeam': 24*inch, 'BBeam': 18*inch, 'HGird': 24*inch, 'BGird': 18*inch,
+    'cover': 2.5*inch,
+    'numBarsTopCol': 8, 'numBarsBotCol': 8, 'numBarsIntCol': 6,
+    'barAreaTopCol': 1.*in2, 'barAreaBotCol': 1.*in2, 'barAreaIntCol': 1.*in2,
+    'numBarsTopBeam': 6, 'numBarsBotBeam': 6, 'numBarsIntBeam': 2,
+    'barAreaTopBeam': 1.*in2, 'barAreaBotBeam': 1.*in2, 'barAreaIntBeam': 1.*in2,
+    'numBarsTopGird': 6, 'numBarsBotGird': 6, 'numBarsIntGird': 2,
+    'barAreaTopGird': 1.*in2, 'barAreaBotGird': 1.*in2, 'barAreaIntGird': 1.*in2,
+    'nfCoreY': 20, 'nfCoreZ': 20, 'nfCoverY': 20, 'nfCoverZ': 20,
+    # (nfCoreY, nfCoreZ, nfCoverY, nfCoverZ) of 'Col', 'Beam' or 'Gird' instead of the above, e.g. from LibFiberTuner
+    'nfSections': None,
+    # materials
+    'fc': LibMaterialsRC.fc, 'Kfc': LibMaterialsRC.Kfc, 'Kres': LibMaterialsRC.Kres,
+    'Fy': LibMaterialsRC.Fy, 'Es': LibMaterialsRC.Es, 'Bs': LibMaterialsRC.Bs,
+    'R0': LibMaterialsRC.R0, 'cR1': LibMaterialsRC.cR1, 'cR2': LibMaterialsRC.cR2,
+    # elements and loads
+    'ColTransfType': "Linear", 'np': 5, 'GammaConcrete': 150*pcf, 'Tslab': 6*inch, 'DLfactor': 1.0,
+    # analysis
+    'constraintsType': "Lagrange", 'IDctrlNode': None, 'IDctrlDOF': 1,
+    # constraint handler, numberer and system (LibSolverConfig): "fixed" (constraintsType, RCM, BandGeneral),
+    # "auto" (rules on the model size) or "calibrate" (fastest of the candidates on the first gravity steps,
+    # kept per model in the .json file SolverCache)
+    'SolverConfig': "fixed", 'SolverCache': None,
+    'NstepGravity': 10, 'TolGravity': 1.0e-8, 'Tol': 1.0e-6,
+    'testTypeStatic': "EnergyIncr", 'TolStatic': 1.e-8, 'maxNumIterStatic': 6, 'algorithmTypeStatic': "Newton",
+    # cyclic protocol, Dincr is a ratio of the building height
+    'iDmax': [0.005, 0.01, 0.025, 0.05, 0.1], 'Dincr': 0.001, 'CycleType': "Full", 'Ncycles': 1,
+    'BatchSteps': True, 'AdaptiveSteps': False,
+    # early termination of the protocol (LibTermination): None, or a dictionary of the criteria 'MinShearRatio'
+    # (base shear on the envelope below this fraction of its peak), 'DriftLimit' (roof drift ratio),
+    # 'ConcreteStrain' and 'SteelStrain' (strain limits of the fibers of the SSconcEle1sec1/SSreinfEle1sec1 recorders)
+    'Termination': None,
+    # fallbacks ordered by their statistics (LibConvergence), FallbackStats: .json file of the statistics,
+    # read before the protocol if it exists and written after it
+    'AdaptiveFallback': False, 'FallbackStats': None,
+    # per-step profile of the gravity and cyclic analyses (LibProfiler), written to dataDir/Profile.npy
+    'Profile': False,
+    # checkpoints of the cyclic protocol every CheckpointInterval blocks (LibCheckpoint): None, "fork" (retries of
+    # the failed blocks with the increments divided by CheckpointRefine) or "database" (in dataDir/Checkpoint, only
+    # saved: os.restore crashes on the nonlinearBeamColumn elements of this frame in OpenSeesPy 3.7.1)
+    'Checkpoint': None, 'CheckpointInterval': 1, 'CheckpointRefine': (2, 4),
+    # time-history analysis (LibTransient): records of GMdir scaled by GMfact in the direction GMdirection,
+    # Rayleigh damping DampingRatio at the periods of the modes DampingModes (None: the first two modes with a share
+    # of the mass in GMdirection, LibTransient.ParticipatingModes), time step DtAnalysis (None: the
+    # record dt) for TmaxAnalysis (None: the record duration), failed steps analysed again with the time step
+    # halved up to MaxHalvings times, and ended once the peak interstory drift ratio reaches CollapseDrift (None: never)
+    'GMdir': "../GMfiles", 'GMfact': 1.0, 'GMdirection': 1, 'DampingRatio': 0.05, 'DampingModes': None,
+    'DtAnalysis': None, 'TmaxAnalysis': None, 'MaxHalvings': 4, 'CollapseDrift': None,
+    'testTypeDynamic': "EnergyIncr", 'TolDynamic': 1.e-8, 'maxNumIterDynamic': 10, 'algorithmTypeDynamic': "Newton",
+    # results: "recorders" (text recorder files), "binary" (binary recorder files, LibRecorders)
+    # or "memory" (LibCapture, DFree/DBase/RBase only)
+    'Output': "recorders", 'SpillChunkSize': None,
+}
+
+
+def FrameParameters(**Overrides):
+    """
+    Parameters of the frame model: the values of the main script with Overrides.
+    Unknown parameter names raise a KeyError, so that misspelled sweep parameters are not ignored.
+    """
+    Unknown = set(Overrides) - set(DefaultParams)
+    if Unknown:
+        raise KeyError("Unknown frame parameters: %s" % ", ".join(sorted(Unknown)))
+
+    Params = dict(DefaultParams)
+    Params.update(Overrides)
+    if Params['BCol'] is None:
+        Params['BCol'] = Params['HCol']		# square column
+
+    return Params
+
+
+def BuildFrameModel(Params):
+    """
+    Build the 3D RC frame (NStory stories, NBay bays in X and NBayZ bays in Z, LibFrameGenerator.py)
+    in a clean domain.
+
+    Returns:
+    Model: Dictionary with the tags and quantities needed by the analyses
+           (control node, support nodes, diaphragm nodes, elements, loads, building height).
+    """
+    os.wipe()
+    os.model('basic', '-ndm', 3, '-ndf', 6)
+
+    DefineMaterialsRC(*[Params[Key] for Key in ['fc', 'Kfc', 'Kres', 'Fy', 'Es', 'Bs', 'R0', 'cR1', 'cR2']])
+
+    # sections
+    ColSecTag, BeamSecTag, GirdSecTag = 1, 2, 3
+    ColSecTagFiber, BeamSecTagFiber, GirdSecTagFiber = 4, 5, 6
+    SecTagTorsion = 70
+    nf = [Params[Key] for Key in ['nfCoreY', 'nfCoreZ', 'nfCoverY', 'nfCoverZ']]
+    nfSections = Params['nfSections'] or {}
+    for Tag, Member, H, B in [(ColSecTagFiber, 'Col', 'HCol', 'BCol'), (BeamSecTagFiber, 'Beam', 'HBeam', 'BBeam'),
+                              (GirdSecTagFiber, 'Gird', 'HGird', 'BGird')]:
+        BuildRCrectSection(Tag, Params[H], Params[B], Params['cover'], Params['cover'], IDconcCore, IDconcCover, IDSteel,
+                           Params['numBarsTop' + Member], Params['barAreaTop' + Member],
+                           Params['numBarsBot' + Member], Params['barAreaBot' + Member],
+                           Params['numBarsInt' + Member], Params['barAreaInt' + Member], *nfSections.get(Member, nf),
+                           PlotSection=False)
+
+    os.uniaxialMaterial('Elastic', SecTagTorsion, Ubig)
+    os.section('Aggregator', ColSecTag,  *[SecTagTorsion, 'T'], '-section', ColSecTagFiber)
+    os.section('Aggregator', BeamSecTag, *[SecTagTorsion, 'T'], '-section', BeamSecTagFiber)
+    os.section('Aggregator', GirdSecTag, *[SecTagTorsion, 'T'], '-section', GirdSecTagFiber)
+
+    IDColTransf, IDBeamTransf, IDGirdTransf = 1, 2, 3
+    os.geomTransf(Params['ColTransfType'], IDColTransf,  *[0, 0, 1])
+    os.geomTransf('Linear', IDBeamTransf, *[0, 0, 1])
+    os.geomTransf('Linear', IDGirdTransf, *[1, 0, 0])
+
+    # nodes, diaphragms, supports and elements
+    Layout = FrameLayout(Params['NStory'], Params['NBay'], Params['NBayZ'], Params['LCol'], Params['LBeam'], Params['LGird'])
+    DefineNodes(Layout)
+    DefineElements(Layout, ColSecTag, BeamSecTag, GirdSecTag, IDColTransf, IDBeamTransf, IDGirdTransf, Params['np'])
+
+    # gravity loads, weights and masses
+    GammaConcrete = Params['GammaConcrete']
+    QdlCol = GammaConcrete*Params['HCol']*Params['BCol']
+    QBeam  = GammaConcrete*Params['HBeam']*Params['BBeam']
+    QdlGird = GammaConcrete*Params['HGird']*Params['BGird']
+    Weights = TributaryWeights(Layout, QdlCol, QBeam, QdlGird, GammaConcrete*Params['Tslab']*Params['DLfactor'])
+    DefineMasses(Layout, Weights['NodeMass'])
+
+    IDctrlNode = Params['IDctrlNode']
+    if IDctrlNode is None:
+        IDctrlNode = int(Layout['NodeTag'][0, -1, 0])
+
+    Model = {'NStory': Params['NStory'], 'LBuilding': Layout['LBuilding'], 'FloorHeight': Layout['FloorHeight'],
+             'IDctrlNode': IDctrlNode, 'IDctrlDOF': Params['IDctrlDOF'],
+             'iSupportNode': Layout['SupportNodes'].tolist(), 'MasterNodes': Layout['MasterTag'].tolist(),
+             'RigidDiaphragm': "ON", 'Layout': Layout, 'Weights': Weights,
+             'Columns': Layout['Columns']['Tag'].tolist(), 'Beams': Layout['Beams']['Tag'].tolist(),
+             'Girders': Layout['Girders']['Tag'].tolist(),
+             'FloorWeight': Weights['FloorWeight'], 'WeightTotal': Weights['WeightTotal'], 'MassTotal': Weights['MassTotal'],
+             'FloorForce': LateralLoads(Weights['FloorWeight'], Layout['FloorHeight'])}
+
+    return Model
+
+
+def DefineRecorders(Model, Params, dataDir, Format="text"):
+    """
+    Recorders of the main script, written to dataDir.
+    Format: "text" for the text/xml files of the main script, "binary" for OpenSees -binary files
+            with .json column names, to be read with LibRecorders.RecorderFile (optional, default="text").
+
+    Returns:
+    RecorderFiles: Paths of the text/binary recorder files (without the xml files, only complete once closed).
+    """
+    IDele = Model['Columns'][0]
+    nIP = Params['np']
+    iSupportNode = Model['iSupportNode']
+    Xml = "xml" if Format == "text" else Format
+
+    RecorderFiles = [
+        NodeRecorder(dataDir, "DFree", [Model['IDctrlNode']], [1, 2, 3], 'disp', Format),
+        NodeRecorder(dataDir, "DBase", iSupportNode, [1, 2, 3], 'disp', Format),
+        NodeRecorder(dataDir, "RBase", iSupportNode, [1, 2, 3], 'reaction', Format),
+
+        ElementRecorder(dataDir, "Fel1",             [IDele], 'localForce', Format=Format)]
+    ElementRecorder(dataDir, "PlasticRotation1", [IDele], 'plasticRotation', Format=Xml)
+    RecorderFiles += [
+        ElementRecorder(dataDir, "ForceEle1sec1",    [IDele], 'section', 1,   'force', Format=Format),
+        ElementRecorder(dataDir, "DefoEle1sec1",     [IDele], 'section', 1,   'deformation', Format=Format),
+        ElementRecorder(dataDir, "ForceEle1secnp",   [IDele], 'section', nIP, 'force', Format=Format),
+        ElementRecorder(dataDir, "DefoEle1secnp",    [IDele], 'section', nIP, 'deformation', Format=Format)]
+
+    yFiber = Params['HCol']/2 - Params['cover']
+    zFiber = Params['BCol']/2 - Params['cover']
+    RecorderFiles += [
+        ElementRecorder(dataDir, "SSconcEle1sec1",  [IDele], 'section', nIP, 'fiber', yFiber, zFiber, IDconcCore, 'stressStrain', Format=Format),
+        ElementRecorder(dataDir, "SSreinfEle1sec1", [IDele], 'section', nIP, 'fiber', yFiber, zFiber, IDSteel,    'stressStrain', Format=Format)]
+
+    return RecorderFiles
+
+
+def DefineSolver(Model, Params, Define=None, Step=None):
+    """
+    Constraint handler, DOF numberer and system of equations of the analyses. With Params['SolverConfig']
+    "fixed": Params['constraintsType'] with the rigid diaphragms (Plain otherwise), RCM and BandGeneral;
+    "auto" or "calibrate": selected by LibSolverConfig.AutoConfig, calibrated with Define and Step.
+    The configuration is kept in Model['SolverConfig'] and used again by the next analyses of the model.
+    """
+    Config = Model.get('SolverConfig')
+    if Config is None and Params['SolverConfig'] == "fixed":
+        constraintsType = "Plain"
+        if Model['RigidDiaphragm'] == "ON":
+            constraintsType = Params['constraintsType']
+        Config = {'constraints': (constraintsType,), 'numberer': ('RCM',), 'system': ('BandGeneral',)}
+
+    if Config is None:
+        Config = AutoConfig(Params['SolverConfig'], Model['IDctrlNode'], Define, Step, Params['SolverCache'], Verbose=False)
+    else:
+        DefineConfig(Config)
+    Model['SolverConfig'] = Config
+
+
+def RunGravityAnalysis(Model, Params, OnStep=None, Profiler=None):
+    """
+    Apply the gravity loads in NstepGravity load-controlled steps and hold them constant.
+    OnStep: Function or list of functions called after every converged step (optional, default=None).
+    Profiler: StepProfiler (LibProfiler.py) that records every step (optional, default=None).
+
+    Returns:
+    ok: 0 if the gravity analysis converged.
+    """
+    tsTagGravity = 101
+    patternTagGravity = 101
+    os.timeSeries("Linear", tsTagGravity)
+    os.pattern("Plain", patternTagGravity, tsTagGravity)
+
+    DefineGravityLoads(Model['Layout'], Model['Weights'])
+
+    def DefineAnalysis():
+        os.test('EnergyIncr', Params['TolGravity'], 6)
+        os.algorithm('Newton')
+        os.integrator('LoadControl', 1./Params['NstepGravity'])
+        os.analysis('Static')
+
+    DefineSolver(Model, Params, DefineAnalysis, lambda: os.analyze(Params['NstepGravity']))
+    DefineAnalysis()
+    Hooks = StepHooks(OnStep)
+    if Profiler is not None:
+        Profiler.Start('gravity')
+        Hooks.append(Profiler.Sample)
+    if Hooks:
+        for _ in range(Params['NstepGravity']):
+            ok = os.analyze(1)
+            if ok != 0:
+                break
+            for Hook in Hooks:
+                Hook()
+    else:
+        ok = os.analyze(Params['NstepGravity'])
+
+    os.loadConst('-time', 0.0)
+
+    return ok
+
+
+def RunCyclicProtocol(Model, Params, Verbose=False, OnStep=None, Profiler=None, Checkpoint=None, RecorderFiles=()):
+    """
+    Apply the lateral load pattern and run the displacement-controlled cyclic protocol.
+    OnStep: Function or list of functions called after every converged step (optional, default=None).
+    Profiler: StepProfiler (LibProfiler.py) that records every step; the fallbacks then go through
+              a StrategyEngine in the fixed order of TryFallbacks, so that the strategy used is known (optional, default=None).
+    Checkpoint: DatabaseCheckpoint or ForkCheckpoint (LibCheckpoint.py) to checkpoint the protocol every
+                Params['CheckpointInterval'] blocks (optional, default=None).
+    RecorderFiles: Recorder files rewound to the checkpoints, from DefineRecorders (optional, default=()).
+
+    After a retry from a ForkCheckpoint the domain stays at the failed step, Stats['Disp'] is the control
+    displacement at the end of the protocol.
+
+    Returns:
+    ok: 0 if the whole protocol was analysed.
+    Stats: Statistics from RunDisplacementProtocol (RunCheckpointedProtocol with a Checkpoint), with the reason of
+           the early termination of Params['Termination'] in 'StopReason'.
+    """
+    tsTagPushover = 200
+    patternTagPushover = 200
+    os.timeSeries("Linear", tsTagPushover)
+    os.pattern("Plain", patternTagPushover, tsTagPushover)
+    for IDmaster, F in zip(Model['MasterNodes'], Model['FloorForce']):
+        os.load(IDmaster, F, 0.0, 0.0, 0.0, 0.0, 0.0)
+
+    Test = (Params['testTypeStatic'], Params['TolStatic'], Params['maxNumIterStatic'], 0)
+    Algorithm = (Params['algorithmTypeStatic'],)
+    DefineSolver(Model, Params)
+    os.test(*Test)
+    os.algorithm(*Algorithm)
+
+    LBuilding = Model['LBuilding']
+    Dincr = Params['Dincr']*LBuilding
+    os.integrator("DisplacementControl", Model['IDctrlNode'], Model['IDctrlDOF'], Dincr)
+    os.analysis("Static")
+
+    iDstep, iBlockStart = GenerateProtocol(Params['iDmax'], Dincr, Params['CycleType'], LBuilding, Params['Ncycles'])
+    iDincr = ProtocolIncrements(iDstep, iBlockStart)
+
+    Fallback = None
+    if Params['AdaptiveFallback']:
+        Fallback = StrategyEngine(Test, Algorithm, TolConverge=Params['Tol'], Verbose=Verbose)
+        if Params['FallbackStats'] and os1.path.exists(Params['FallbackStats']):
+            Fallback.Load(Params['FallbackStats'])
+    elif Profiler is not None:
+        Fallback = StrategyEngine(Test, Algorithm, TolConverge=Params['Tol'], Adaptive=False, Verbose=Verbose)
+
+    Hooks = StepHooks(OnStep)
+    if Profiler is not None:
+        Profiler.Fallback = Fallback
+        Profiler.Start('cyclic', iDincr, iBlockStart, Params['iDmax'], Params['Ncycles'])
+        Hooks.append(Profiler.Sample)
+
+    Controller = None
+    if Params['AdaptiveSteps']:
+        Controller = AdaptiveDisplacementControl(Model['IDctrlNode'], Model['IDctrlDOF'], 5*Dincr, Dincr/64,
+                                                 Test, Algorithm, Params['Tol'], Fallback=Fallback)
+
+    Stop = None
+    if Params['Termination']:
+        Monitor = FrameTermination(Model, Params)
+        Hooks.append(Monitor.Sample)
+        Stop = Monitor.Stop
+
+    Options = dict(Batch=Params['BatchSteps'], Controller=Controller, OnStep=Hooks, Verbose=Verbose, Fallback=Fallback,
+                   Stop=Stop)
+    if Checkpoint is not None:
+        ok, Stats = RunCheckpointedProtocol(Model['IDctrlNode'], Model['IDctrlDOF'], iDincr, iBlockStart, Test, Algorithm,
+                                            Params['Tol'], Checkpoint, Params['CheckpointInterval'],
+                                            Params['CheckpointRefine'], RecorderFiles, **Options)
+    else:
+        ok, Stats = RunDisplacementProtocol(Model['IDctrlNode'], Model['IDctrlDOF'], iDincr, Test, Algorithm, Params['Tol'],
+                                            **Options)
+
+    if Params['AdaptiveFallback']:
+        Stats['Fallback'] = Fallback.Stats
+        if Params['FallbackStats']:
+            Fallback.Save(Params['FallbackStats'])
+
+    return ok, Stats
+
+
+def LoadResponse(Model, Params, dataDir, Capture=None):
+    """
+    Control-node displacement and base shear of every recorded step, from the recorder files of dataDir
+    (closed with os.wipe) or from a RecorderSetCapture, never from the OpenSees domain (which stays at the
+    failed step after a retry from a ForkCheckpoint).
+
+    Returns:
+    Response: Dictionary with the 'Time', the displacement 'Disp' and the base shear 'BaseShear' (sum of the
+              support reactions in the control DOF, positive in the direction of the lateral loads).
+    """
+    if Capture is not None:
+        DFree = Capture.Data('DFree')
+        RBase = Capture.Data('RBase')
+    elif Params['Output'] == "binary":
+        DFree = RecorderFile(f"{dataDir}/DFree.bin").Data
+        RBase = RecorderFile(f"{dataDir}/RBase.bin").Data
+    else:
+        DFree = np.loadtxt(f"{dataDir}/DFree.out", ndmin=2).reshape(-1, 4)
+        RBase = np.loadtxt(f"{dataDir}/RBase.out", ndmin=2).reshape(-1, 1 + 3*len(Model['iSupportNode']))
+    IDctrlDOF = Model['IDctrlDOF']
+
+    return {'Time': DFree[:, 0], 'Disp': DFree[:, IDctrlDOF], 'BaseShear': -RBase[:, IDctrlDOF::3].sum(axis=1)}
+
+
+def RunCyclicPushover(Params, dataDir, Verbose=False):
+    """
+    Build the frame, run the gravity analysis and the cyclic protocol, recording to dataDir.
+    With Params['Output'] == "memory" there are no recorder files: DFree, DBase and RBase are
+    captured in memory (spilled to dataDir in chunks of SpillChunkSize rows if given).
+
+    Returns:
+    Result: Dictionary with ok, the protocol statistics, the gravity status, the control-node
+            displacement 'Disp' and the base shear 'BaseShear' (sum of the support reactions in
+            the control DOF, positive in the direction of the lateral loads) of every recorded step,
+            and with Params['Profile'] the per-step 'Profile' (LibProfiler.StepProfiler.Data).
+            After a retry from a ForkCheckpoint (Params['Checkpoint'] == "fork") the response comes from the
+            recorder files or captures written by the copy that finished the protocol, the domain of this
+            process stays at the failed step.
+    """
+    if not os1.path.exists(dataDir):
+        os1.makedirs(dataDir)
+
+    Checkpoint = None
+    if Params['Checkpoint'] == "fork":
+        Checkpoint = ForkCheckpoint()
+    elif Params['Checkpoint'] == "database":
+        Checkpoint = DatabaseCheckpoint(os1.path.join(dataDir, "Checkpoint"))
+    elif Params['Checkpoint'] is not None:
+        raise ValueError("Unknown checkpoint method: %s" % Params['Checkpoint'])
+
+    Model = BuildFrameModel(Params)
+    Capture = None
+    RecorderFiles = []
+    if Params['Output'] == "memory":
+        SpillDir = dataDir if Params['SpillChunkSize'] else None
+        Capture = RecorderSetCapture(Model['IDctrlNode'], Model['iSupportNode'], SpillDir, Params['SpillChunkSize'] or 100000)
+    else:
+        RecorderFiles = DefineRecorders(Model, Params, dataDir, "binary" if Params['Output'] == "binary" else "text")
+    OnStep = Capture.Sample if Capture is not None else None
+    Profiler = None
+    if Params['Profile']:
+        Profiler = StepProfiler(Model['IDctrlNode'], Model['IDctrlDOF'], Params['algorithmTypeStatic'])
+
+    try:
+        okGravity = RunGravityAnalysis(Model, Params, OnStep, Profiler)
+        ok, Stats = okGravity, {}
+        if okGravity == 0:
+            ok, Stats = RunCyclicProtocol(Model, Params, Verbose, OnStep, Profiler, Checkpoint, RecorderFiles)
+
+        os.wipe()      # closes the recorder files
+    finally:
+        if Capture is not None:
+            Capture.Close()
+
+    Result = {'ok': ok, 'okGravity': okGravity, 'Stats': Stats}
+    Result.update(LoadResponse(Model, Params, dataDir, Capture))
+    if Profiler is not None:
+        Profiler.Save(f"{dataDir}/Profile.npy")
+        Result['Profile'] = Profiler.Data()
+
+    return Result
+
+
+def RunTimeHistory(Params, Record, dataDir, Scale=1.0, Verbose=False):
+    """
+    Build the frame, run the gravity analysis and the time-history analysis of a ground-motion record,
+    recording to dataDir (Params['Output'] as in RunCyclicPushover).
+
+    Args:
+    Record: Record from LibGroundMotion.LoadRecord, or the path of its .AT2 file (relative to Params['GMdir']).
+    Scale: Scale factor of the record, times Params['GMfact'] (optional, default=1.0).
+
+    Returns:
+    Result: Dictionary with ok, okGravity, the statistics of RunTransient, the 'Periods' of the modes of the
+            damping, the 'Time', control-node displacement 'Disp' and base shear 'BaseShear' of every recorded
+            step (the gravity steps first), the largest roof drift ratio 'PeakDrift' of the record and, with
+            Params['CollapseDrift'], the largest interstory drift ratio 'PeakStoryDrift' (else None).
+    """
+    if not os1.path.exists(dataDir):
+        os1.makedirs(dataDir)
+    if isinstance(Record, str):
+        Record = LoadRecord(os1.path.join(Params['GMdir'], Record))
+
+    Model = BuildFrameModel(Params)
+    Capture = None
+    if Params['Output'] == "memory":
+        SpillDir = dataDir if Params['SpillChunkSize'] else None
+        Capture = RecorderSetCapture(Model['IDctrlNode'], Model['iSupportNode'], SpillDir, Params['SpillChunkSize'] or 100000)
+    else:
+        DefineRecorders(Model, Params, dataDir, "binary" if Params['Output'] == "binary" else "text")
+    OnStep = Capture.Sample if Capture is not None else None
+
+    try:
+        okGravity = RunGravityAnalysis(Model, Params, OnStep)
+        ok, Stats, Periods, Monitor = okGravity, {}, None, None
+        if okGravity == 0:
+            Periods = RayleighDamping(Params['DampingRatio'], Params['DampingModes'], Params['GMdirection'])
+            GroundMotionPattern(Record, Scale*Params['GMfact'], Params['GMdirection'])
+
+            Test = (Params['testTypeDynamic'], Params['TolDynamic'], Params['maxNumIterDynamic'], 0)
+            Algorithm = (Params['algorithmTypeDynamic'],)
+            os.wipeAnalysis()         # the static analysis of the gravity loads would keep its integrator
+            DefineSolver(Model, Params)
+            os.test(*Test)
+            os.algorithm(*Algorithm)
+            dt = Params['DtAnalysis'] or Record['dt']
+            Duration = Params['TmaxAnalysis'] or Record['Duration']
+            Stop = None
+            if Params['CollapseDrift'] is not None:
+                Monitor = StoryDriftMonitor(Model['MasterNodes'], Model['FloorHeight'], Params['GMdirection'],
+                                            Params['CollapseDrift'])
+                OnStep = StepHooks(OnStep) + [Monitor.Sample]
+                Stop = Monitor.Stop
+            ok, Stats = RunTransient(Duration, dt, Test, Algorithm, Params['Tol'], Params['MaxHalvings'], OnStep, Verbose,
+                                     Stop=Stop)
+
+        os.wipe()      # closes the recorder files
+    finally:
+        if Capture is not None:
+            Capture.Close()
+
+    Result = {'ok': ok, 'okGravity': okGravity, 'Stats': Stats, 'Periods': Periods, 'Record': Record['Name'],
+              'Scale': Scale*Params['GMfact']}
+    Result.update(LoadResponse(Model, Params, dataDir, Capture))
+    Lateral = Result['Disp'][Params['NstepGravity']:]
+    Result['PeakDrift'] = np.abs(Lateral).max()/Model['LBuilding'] if len(Lateral) else 0.0
+    Result['PeakStoryDrift'] = Monitor.Peak if Monitor is not None else None
+
+    return Result
@@ -14,6 +14,11 @@ Purpose :
 
     Returns:
     iDstep: Numpy array of displacement increments.
+
+    GenerateProtocol builds a complete multi-amplitude, multi-cycle protocol
+    (e.g. iDmax with Ncycles at each peak) as one contiguous array, and
+    FEMA461Peaks / ATC24Peaks return the amplitude sequences of these
+    standard loading protocols.
 """
 # ===========================================================================
 # Import Libraries
@@ -25,6 +30,12 @@ import numpy as np
 # Main Code
 # ===========================================================================
 
+# Direction of each branch of a cycle, relative to the direction of the peak
+CycleBranches = {"Push": [1.0],
+                 "Half": [1.0, -1.0],
+                 "Full": [1.0, -1.0, -1.0, 1.0]}
+
+
 def GeneratePeaks(Dmax, DincrStatic=0.01, CycleType="Full", Fact=1):
     """
     Generate incremental displacements for Dmax.
@@ -39,10 +50,6 @@ def GeneratePeaks(Dmax, DincrStatic=0.01, CycleType="Full", Fact=1):
     iDstep: Numpy array of displacement increments.
     """
 
-    # Generate incremental displacements for Dmax
-    Disp = 0.0
-    iDstep = [0.0, 0.0]
-
     # Scale value
     Dmax *= Fact
 
@@ -54,34 +61,123 @@ def GeneratePeaks(Dmax, DincrStatic=0.01, CycleType="Full", Fact=1):
 
     NstepsPeak = int(abs(Dmax) / DincrStatic)
 
+    # Any CycleType other than Push or Half is treated as a Full cycle
+    Branches = CycleBranches.get(CycleType, CycleBranches["Full"])
+
     # Generate incremental displacements
     # Note - 
-    #    We used underscore ( _ ) as an iterator variable in a for-loop, because here the value of the
-    #    iterator variable is not important, we just to repeat the for-loop NstepsPeak times.
-    for _ in range(NstepsPeak):
-        Disp += dx
-        iDstep.append(Disp)
-
-    # Handle different cycle types
-    if CycleType != "Push":
-        for _ in range(NstepsPeak):
-            Disp -= dx
-            iDstep.append(Disp)
-
-        if CycleType != "Half":
-            for _ in range(NstepsPeak):
-                Disp -= dx
-                iDstep.append(Disp)
-
-            for _ in range(NstepsPeak):
-                Disp += dx
-                iDstep.append(Disp)
-
-    # Convert the list to a Numpy array
-    iDstep = np.array(iDstep)
+    #    The increments of every branch are laid out first and then accumulated with cumsum.
+    #    cumsum adds them one after the other, exactly like Disp += dx in a loop, so the
+    #    targets are bit-for-bit identical to the step-by-step construction.
+    iDstep = np.empty(2 + len(Branches)*NstepsPeak)
+    iDstep[:2] = 0.0
+    np.cumsum(np.repeat(np.multiply(Branches, dx), NstepsPeak), out=iDstep[2:])
 
     return iDstep
 
+
+def GenerateProtocol(iDmax, DincrStatic=0.01, CycleType="Full", Fact=1, Ncycles=1):
+    """
+    Generate the displacement targets of a complete cyclic protocol in one call.
+
+    Args:
+    iDmax: Sequence of peak displacements.
+    DincrStatic: Displacement increment (default=0.01, independently of units).
+    CycleType: Push, Half or Full (optional, def=Full).
+    Fact: Scaling factor (optional, default=1).
+    Ncycles: Number of cycles at each peak, either one value for all peaks or one value per peak (optional, default=1).
+
+    Returns:
+    iDstep: Numpy array with the targets of every peak and cycle, one after the other.
+            Each block is identical to GeneratePeaks(Dmax, DincrStatic, CycleType, Fact).
+    iBlockStart: Numpy array with the index in iDstep where each (peak, cycle) block starts.
+    """
+
+    iDmax = np.atleast_1d(np.asarray(iDmax, dtype=float))
+    Ncycles = np.broadcast_to(np.asarray(Ncycles, dtype=int), iDmax.shape)
+
+    # Only one block per peak is generated, the repeated cycles are copies of it
+    Blocks = []
+    for Dmax, Ncycle in zip(iDmax, Ncycles):
+        Blocks.extend([GeneratePeaks(float(Dmax), DincrStatic, CycleType, Fact)]*Ncycle)
+
+    if not Blocks:
+        return np.empty(0), np.empty(0, dtype=int)
+
+    BlockSize = np.array([len(Block) for Block in Blocks])
+    iBlockStart = np.concatenate(([0], np.cumsum(BlockSize)[:-1]))
+    iDstep = np.concatenate(Blocks)
+
+    return iDstep, iBlockStart
+
+
+def ProtocolIncrements(iDstep, iBlockStart):
+    """
+    Displacement increments that take the control node from one target to the next.
+
+    The reference displacement is reset to 0.0 at the start of every block, exactly as the
+    cyclic analysis loop does with D0 at the beginning of each cycle.
+
+    Args:
+    iDstep: Protocol targets from GenerateProtocol.
+    iBlockStart: Block start indices from GenerateProtocol.
+
+    Returns:
+    iDincr: Numpy array of displacement increments, one per target.
+    """
+
+    D0 = np.empty_like(iDstep)
+    D0[1:] = iDstep[:-1]
+    D0[iBlockStart] = 0.0
+
+    return iDstep - D0
+
+
+def FEMA461Peaks(Dm, Nsteps=10, Ratio=1.4, NcyclesPeak=2):
+    """
+    Peak sequence of the FEMA 461 quasi-static cyclic loading protocol.
+
+    The amplitudes grow by Ratio from one step to the next (a_n+1 = 1.4*a_n)
+    and the last of the Nsteps amplitudes is the target displacement Dm.
+
+    Args:
+    Dm: Target (maximum) displacement of the protocol.
+    Nsteps: Number of amplitudes up to Dm (optional, default=10).
+    Ratio: Ratio between consecutive amplitudes (optional, default=1.4).
+    NcyclesPeak: Number of cycles at each amplitude (optional, default=2).
+
+    Returns:
+    iDmax: Numpy array of peak displacements.
+    Ncycles: Numpy array with the number of cycles at each peak.
+    """
+
+    iDmax = Dm*Ratio**np.arange(1 - Nsteps, 1, dtype=float)
+    Ncycles = np.full(Nsteps, NcyclesPeak, dtype=int)
+
+    return iDmax, Ncycles
+
+
+def ATC24Peaks(Dy, MuMax=6):
+    """
+    Peak sequence of the ATC-24 cyclic loading protocol.
+
+    Six elastic cycles (3 at 0.5*Dy and 3 at 0.75*Dy), 3 cycles each at Dy, 2*Dy
+    and 3*Dy, followed by 2 cycles at every further multiple of Dy up to MuMax*Dy.
+
+    Args:
+    Dy: Yield displacement.
+    MuMax: Largest displacement ductility of the protocol (optional, default=6).
+
+    Returns:
+    iDmax: Numpy array of peak displacements.
+    Ncycles: Numpy array with the number of cycles at each peak.
+    """
+
+    Mu = np.concatenate(([0.5, 0.75], np.arange(1, MuMax + 1, dtype=float)))
+    Ncycles = np.where(Mu <= 3, 3, 2)
+
+    return Dy*Mu, Ncycles
+
 # Example usage:
 # Dmax = 2.0
 # DincrStatic = 0.02
@@ -91,3 +187,6 @@ def GeneratePeaks(Dmax, DincrStatic=0.01, CycleType="Full", Fact=1):
 # result = GeneratePeaks(Dmax, DincrStatic, CycleType, Fact)
 # print(result)
 
+# iDstep, iBlockStart = GenerateProtocol([0.005, 0.01, 0.025], DincrStatic, CycleType, Fact, Ncycles=2)
+# iDmax, Ncycles = FEMA461Peaks(0.05)
+
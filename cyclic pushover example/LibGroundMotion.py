@@ -0,0 +1,225 @@
+"""
+Purpose :
+    LibGroundMotion.py contains the loader of the ground-motion records of GMdir
+    (PEER .AT2 files) for the time-history analyses (LibTransient.py).
+
+    A record is parsed from its text file only once: the accelerations are
+    written to a .npy file of a cache directory, with a .json file of the time
+    step, units, header and the size and modification time of the source. Every
+    later load, in this process or any other, memory-maps the .npy file (no text
+    parsing, no copy), and records already loaded in the process are kept in a
+    small LRU. A changed source file is parsed again. The cache files are named
+    after the record and a hash of its absolute path, so that records of the
+    same name in different directories do not share them in a common cache
+    (OPS_GM_CACHE).
+
+    Usage:
+    Record = LoadRecord("../GMfiles/RSN6_IMPVALL.I_I-ELC180.AT2")
+    Record['Accel'], Record['dt']                 # accelerations in Record['Units'] (g for PEER files)
+    Records = LoadRecords("../GMfiles")           # all the .AT2 files of a directory
+    Sa = SpectralAcceleration(Record, [0.2, 0.5, 1.0])
+
+    Run : python LibGroundMotion.py [GMdir]   (time of the first and of the cached loads,
+                                               on the records of GMdir or on synthetic ones)
+"""
+
+# ===========================================================================
+# Import Libraries
+# ===========================================================================
+import numpy as np
+import os as os1
+import re
+import glob
+import json
+import time
+import hashlib
+import collections
+
+
+# ===========================================================================
+# Main Code
+# ===========================================================================
+# header line with the number of points and the time step, new (NPTS=..., DT=...) and old (npts dt NPTS, DT) PEER formats
+HeaderNew = re.compile(r"NPTS\s*=\s*(\d+)\s*,\s*DT\s*=\s*([-+0-9.EeDd]+)", re.IGNORECASE)
+HeaderOld = re.compile(r"^\s*(\d+)\s+([-+0-9.EeDd]+)")
+
+Loaded = collections.OrderedDict()       # records loaded in this process, by source path
+MaxLoaded = 256
+
+
+def ParseAT2(Path):
+    """
+    Read a PEER .AT2 record: 3 lines of title, record and units, the line of NPTS and DT, then the accelerations.
+
+    Returns:
+    Accel: Numpy array of the NPTS accelerations.
+    Info: Dictionary with 'dt', 'Npts', 'Units' ('g' unless the header says otherwise) and the 'Header' lines.
+    """
+    with open(Path) as File:
+        Header = [File.readline().rstrip() for _ in range(4)]
+        Text = File.read()
+
+    Match = HeaderNew.search(Header[3]) or HeaderOld.match(Header[3])
+    if Match is None:
+        raise ValueError("%s: no NPTS and DT on the fourth line: %s" % (Path, Header[3]))
+    Npts, dt = int(Match.group(1)), float(Match.group(2).upper().replace('D', 'E'))
+
+    Accel = np.array(Text.upper().replace('D', 'E').split(), dtype=float)
+    if len(Accel) < Npts:
+        raise ValueError("%s: %i values for NPTS = %i" % (Path, len(Accel), Npts))
+    Units = "g"
+    UnitsMatch = re.search(r"UNITS OF\s+(\S+)", Header[2], re.IGNORECASE)
+    if UnitsMatch:
+        Units = UnitsMatch.group(1).lower()
+
+    return Accel[:Npts], {'dt': dt, 'Npts': Npts, 'Units': Units, 'Header': Header}
+
+
+def _CachePaths(Path, CacheDir):
+    Name = "%s.%s" % (os1.path.basename(Path), hashlib.sha1(Path.encode()).hexdigest()[:12])
+    return os1.path.join(CacheDir, Name + ".npy"), os1.path.join(CacheDir, Name + ".json")
+
+
+def LoadRecord(Path, CacheDir=None):
+    """
+    Record of a .AT2 file, memory-mapped from its cached .npy file (written on the first load).
+
+    Args:
+    Path: Path of the .AT2 file.
+    CacheDir: Directory of the cached records (optional, default=the environment variable OPS_GM_CACHE,
+              else GMcache next to the record).
+
+    Returns:
+    Record: Dictionary with the 'Name' (file name without extension), 'Path', read-only memory-mapped
+            'Accel', 'dt', 'Npts', 'Units', 'Header' and 'Duration'.
+    """
+    Path = os1.path.abspath(Path)
+    Stat = os1.stat(Path)
+    Source = {'Size': Stat.st_size, 'Mtime': Stat.st_mtime_ns}
+
+    Record = Loaded.get(Path)
+    if Record is not None and Record['Source'] == Source:
+        Loaded.move_to_end(Path)
+        return Record
+
+    CacheDir = CacheDir or os1.environ.get("OPS_GM_CACHE") or os1.path.join(os1.path.dirname(Path), "GMcache")
+    NpyPath, JsonPath = _CachePaths(Path, CacheDir)
+    Info = None
+    if os1.path.exists(NpyPath) and os1.path.exists(JsonPath):
+        with open(JsonPath) as File:
+            Info = json.load(File)
+        if Info.get('Source') != Source:
+            Info = None
+
+    if Info is None:
+        Accel, Info = ParseAT2(Path)
+        Info['Source'] = Source
+        if not os1.path.exists(CacheDir):
+            os1.makedirs(CacheDir, exist_ok=True)
+        # written under temporary names first, other processes only ever see complete files;
+        # the .json goes last, it validates the .npy
+        Tmp = ".%i.tmp" % os1.getpid()
+        np.save(NpyPath + Tmp + ".npy", Accel)
+        os1.replace(NpyPath + Tmp + ".npy", NpyPath)
+        with open(JsonPath + Tmp, 'w') as File:
+            json.dump(Info, File)
+        os1.replace(JsonPath + Tmp, JsonPath)
+
+    Record = dict(Info, Name=os1.path.splitext(os1.path.basename(Path))[0], Path=Path,
+                  Accel=np.load(NpyPath, mmap_mode='r'), Duration=Info['Npts']*Info['dt'])
+    Loaded[Path] = Record
+    if len(Loaded) > MaxLoaded:
+        Loaded.popitem(last=False)
+
+    return Record
+
+
+def LoadRecords(GMdir, Pattern="*.AT2", CacheDir=None):
+    """
+    Records of all the files of GMdir matching Pattern, sorted by file name (see LoadRecord).
+    """
+    Paths = sorted(glob.glob(os1.path.join(GMdir, Pattern)))
+    if not Paths:
+        raise FileNotFoundError("No %s records in %s" % (Pattern, GMdir))
+    return [LoadRecord(Path, CacheDir) for Path in Paths]
+
+
+def SpectralAcceleration(Record, Periods, Zeta=0.05):
+    """
+    Pseudo-spectral acceleration w**2 max|u| of linear oscillators under a record (e.g. Sa(T1), the intensity
+    measure of an IDA), by the Newmark average acceleration method on the record steps, all the periods at once.
+
+    Args:
+    Record: Record from LoadRecord.
+    Periods: Period or array of periods of the oscillators.
+    Zeta: Damping ratio (optional, default=0.05).
+
+    Returns:
+    Sa: Spectral accelerations in the record units, a float for a single period.
+    """
+    T = np.atleast_1d(np.asarray(Periods, dtype=float))
+    dt = Record['dt']
+    Omega = 2.0*np.pi/T
+    c = 2.0*Zeta*Omega
+    kEff = Omega**2 + 2.0*c/dt + 4.0/dt**2
+    u = np.zeros_like(T)
+    v = np.zeros_like(T)
+    a = np.zeros_like(T)
+    uMax = np.zeros_like(T)
+    dAccel = np.diff(np.asarray(Record['Accel'], dtype=float), prepend=0.0)
+    # incremental form for unit mass: du = (dp + (4/dt + 2c) v + 2a)/kEff
+    for dp in -dAccel:
+        du = (dp + (4.0/dt + 2.0*c)*v + 2.0*a)/kEff
+        dv = 2.0*du/dt - 2.0*v
+        a += 4.0*du/dt**2 - 4.0*v/dt - 2.0*a
+        u += du
+        v += dv
+        np.maximum(uMax, np.abs(u), out=uMax)
+    Sa = Omega**2*uMax
+
+    return float(Sa[0]) if np.ndim(Periods) == 0 else Sa
+
+
+def WriteAT2(Path, Accel, dt, Title="SYNTHETIC RECORD", Units="G"):
+    """
+    Write accelerations as a PEER .AT2 file (5 values per line), e.g. for synthetic or processed records.
+    """
+    Accel = np.asarray(Accel, dtype=float)
+    with open(Path, 'w') as File:
+        File.write("PEER NGA STRONG MOTION DATABASE RECORD\n%s\nACCELERATION TIME SERIES IN UNITS OF %s\n" % (Title, Units))
+        File.write("NPTS=%7i, DT=%9.4f SEC\n" % (len(Accel), dt))
+        Full = len(Accel) - len(Accel) % 5
+        np.savetxt(File, Accel[:Full].reshape(-1, 5), fmt="%15.7E")
+        if Full < len(Accel):
+            np.savetxt(File, Accel[None, Full:], fmt="%15.7E")
+
+
+if __name__ == "__main__":
+    import sys
+    import tempfile
+    with tempfile.TemporaryDirectory() as TmpDir:
+        if len(sys.argv) > 1:
+            GMdir = sys.argv[1]
+        else:
+            # 100 synthetic records of 40 s at 0.005 s
+            GMdir = TmpDir
+            rng = np.random.default_rng(1)
+            t = np.arange(8000)*0.005
+            for i in range(100):
+                WriteAT2(os1.path.join(GMdir, "SYN%03i.AT2" % i), 0.3*rng.standard_normal(len(t))*np.exp(-((t - 8.0)/6.0)**2), 0.005)
+        CacheDir = os1.path.join(TmpDir, "GMcache")
+
+        tStart = time.perf_counter()
+        Records = LoadRecords(GMdir, CacheDir=CacheDir)
+        tFirst = time.perf_counter() - tStart
+        Loaded.clear()        # as in a new process: from the cache files
+        tStart = time.perf_counter()
+        Records = LoadRecords(GMdir, CacheDir=CacheDir)
+        PGA = [np.abs(Record['Accel']).max() for Record in Records]
+        tCached = time.perf_counter() - tStart
+        tStart = time.perf_counter()
+        Records = LoadRecords(GMdir, CacheDir=CacheDir)
+        tMemory = time.perf_counter() - tStart
+        print("%i records, %i points: parsed and cached in %.3f s, loaded from the cache in %.4f s (with the PGA), "
+              "again in the process in %.4f s" % (len(Records), sum(Record['Npts'] for Record in Records), tFirst,
+                                                   tCached, tMemory))
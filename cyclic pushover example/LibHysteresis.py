@@ -0,0 +1,279 @@
+"""
+Purpose :
+    LibHysteresis.py contains the post-processing of the force-displacement
+    hysteresis of a cyclic run: base shear summed over the support nodes,
+    cycles split at the load reversals, the peaks at the reversals and at the
+    end of a history that stops loading (a monotonic push, or a cyclic run
+    ended or cut off at a peak), backbone per amplitude, dissipated
+    energy, secant and unloading stiffness per cycle and residual drift.
+
+    Everything is vectorized over the steps (np.diff, np.cumsum, searchsorted
+    on the reversal and zero-crossing indices), there is no loop
+    over the steps or the cycles, so that the arrays may be memory-mapped
+    recorder files (LibRecorders.RecorderFile, .npy from ConvertTextRecorder)
+    of millions of steps. RunMetrics gathers the metrics of many runs in one
+    table, every text recorder is converted to .npy once and memory-mapped
+    afterwards.
+
+    Usage:
+    BaseShear = SupportBaseShear(RBase, len(iSupportNode), DOF=1)
+    Metrics = HysteresisMetrics(DFree[:, 1], BaseShear, Height=LBuilding)
+    print(MetricsReport(Metrics))
+
+    Run : python LibHysteresis.py [dataDir ...]   (metrics of the runs recorded in the
+                                                  directories, or a timing on a synthetic history)
+"""
+
+# ===========================================================================
+# Import Libraries
+# ===========================================================================
+import numpy as np
+import pandas as pd
+import os as os1
+import time
+from LibRecorders import RecorderFile, ConvertTextRecorder
+
+
+# ===========================================================================
+# Main Code
+# ===========================================================================
+def SupportBaseShear(RBase, Nsupports, DOF=1, Ndof=3):
+    """
+    Base shear from the reactions of the support nodes, positive in the direction of the lateral loads.
+
+    Args:
+    RBase: Array of a '-time' reaction recorder (time, then Ndof columns per support node), e.g. DataOut/RBase.out.
+    Nsupports: Number of support nodes (len(iSupportNode)).
+    DOF: Degree of freedom of the base shear (optional, default=1).
+    Ndof: Number of recorded DOFs per node (optional, default=3).
+
+    Returns:
+    BaseShear: Minus the sum of the reactions of all the support nodes in DOF, at every step.
+    """
+    Columns = DOF + Ndof*np.arange(Nsupports)
+    if np.shape(RBase)[1] != 1 + Ndof*Nsupports:
+        raise ValueError("RBase has %i columns, not 1 + %i x %i" % (np.shape(RBase)[1], Ndof, Nsupports))
+    return -np.asarray(RBase)[:, Columns].sum(axis=1)
+
+
+def Reversals(Disp, Tol=None):
+    """
+    Indices of the load reversals of a displacement history: the steps where the direction of the
+    displacement changes. Increments smaller than Tol are holds, not reversals
+    (optional, default=1e-9 of the largest displacement).
+    """
+    Disp = np.asarray(Disp, dtype=float)
+    Increment = np.diff(Disp)
+    if Tol is None:
+        Tol = 1.e-9*np.abs(Disp).max()
+    Moving = np.flatnonzero(np.abs(Increment) > Tol)
+    Sign = np.sign(Increment[Moving])
+    return Moving[np.flatnonzero(Sign[1:] != Sign[:-1])] + 1
+
+
+def Peaks(Disp, Tol=None):
+    """
+    Indices of the peaks of a displacement history: the load reversals, and the end of the last movement if
+    it loads, i.e. moves away from zero (the end of a monotonic push, or of a cyclic history that ends or is
+    cut off at a peak rather than unloaded back to zero). Tol as in Reversals.
+    """
+    Disp = np.asarray(Disp, dtype=float)
+    Rev = Reversals(Disp, Tol)
+    Increment = np.diff(Disp)
+    if Tol is None:
+        Tol = 1.e-9*np.abs(Disp).max(initial=0.0)
+    Moving = np.flatnonzero(np.abs(Increment) > Tol)
+    if len(Moving) == 0:
+        return Rev
+    Last = Moving[-1] + 1
+    if np.abs(Disp[Last]) > Tol and np.sign(Increment[Moving[-1]]) == np.sign(Disp[Last]):
+        return np.append(Rev, Last)
+    return Rev
+
+
+def CumulativeEnergy(Disp, Force):
+    """
+    Energy dissipated up to every step, trapezoidal integral of Force dDisp.
+    """
+    Disp, Force = np.asarray(Disp, dtype=float), np.asarray(Force, dtype=float)
+    return np.concatenate(([0.0], np.cumsum(0.5*(Force[1:] + Force[:-1])*np.diff(Disp))))
+
+
+def _ZeroCrossings(Disp, Force, After, Before):
+    """
+    First crossing of zero force after each step of After and before the matching step of Before,
+    with the displacement at zero force interpolated on the step (NaN where there is none).
+    """
+    Cross = np.flatnonzero((Force[:-1] != 0.0) & (np.sign(Force[1:]) != np.sign(Force[:-1])))
+    First = np.searchsorted(Cross, After)
+    k = Cross[np.minimum(First, len(Cross) - 1)] if len(Cross) else np.zeros(len(After), dtype=int)
+    Found = (First < len(Cross)) & (k < Before)
+    Ratio = Force[k]/np.where(Found, Force[k] - Force[k + 1], 1.0)
+    return np.where(Found, Disp[k] + Ratio*(Disp[k + 1] - Disp[k]), np.nan)
+
+
+def Backbone(PeakDisp, PeakForce, RelTol=1.e-3, Method="first"):
+    """
+    Backbone of the cyclic response, one point per amplitude and direction.
+
+    Args:
+    PeakDisp, PeakForce: Displacement and force at the reversals (HysteresisMetrics).
+    RelTol: Peaks closer than RelTol times the largest amplitude are the same amplitude (optional, default=1e-3).
+    Method: "first" for the peak of the first cycle of each amplitude, "max" for the largest force of all
+            the cycles of the amplitude (optional, default="first").
+
+    Returns:
+    BackboneDisp, BackboneForce: Points of the backbone sorted by displacement, with the origin.
+    """
+    PeakDisp, PeakForce = np.asarray(PeakDisp, dtype=float), np.asarray(PeakForce, dtype=float)
+    if len(PeakDisp) == 0:
+        return np.zeros(1), np.zeros(1)
+    Key = np.round(PeakDisp/(RelTol*np.abs(PeakDisp).max())).astype(np.int64)
+    Keys, First, Group = np.unique(Key, return_index=True, return_inverse=True)
+    if Method == "first":
+        Force = PeakForce[First]
+    elif Method == "max":
+        # largest force in the direction of the displacement of each amplitude
+        Sign = np.where(Keys < 0, -1.0, 1.0)
+        Force = np.full(len(Keys), -np.inf)
+        np.maximum.at(Force, Group.ravel(), PeakForce*Sign[Group.ravel()])
+        Force *= Sign
+    else:
+        raise ValueError("Unknown backbone method: %s" % Method)
+    Disp = PeakDisp[First]
+    Order = np.argsort(np.append(Disp, 0.0))
+    return np.append(Disp, 0.0)[Order], np.append(Force, 0.0)[Order]
+
+
+def HysteresisMetrics(Disp, Force, Height=None, Tol=None, BackboneMethod="first"):
+    """
+    Cycle-by-cycle metrics of a force-displacement history (e.g. roof displacement and base shear
+    of the lateral protocol, without the gravity steps).
+
+    Args:
+    Disp, Force: Displacement and force at every step (arrays or memory maps).
+    Height: Height of the building, the residual displacements are then also given as drift ratios
+            (optional, default=None).
+    Tol: Displacement increments below Tol are holds, not reversals (optional, see Reversals).
+    BackboneMethod: "first" or "max" (optional, see Backbone).
+
+    Returns:
+    Metrics: Dictionary of arrays,
+             'Reversals' step indices, 'Peaks' the reversals and the end of a history that stops loading
+             (see Peaks), 'PeakDisp'/'PeakForce' the displacement and force at the peaks,
+             'Energy' the energy dissipated up to every step and 'EnergyTotal', 'HalfCycleEnergy' per half cycle,
+             'SecantStiffness' peak-to-peak stiffness of each positive peak and the next negative one (one per cycle),
+             'UnloadingStiffness' secant from each peak to zero force, 'ResidualDisp' the displacement at zero
+             force after each peak, NaN if there is none, e.g. after a last peak at the end of the history
+             (and 'ResidualDrift' with Height), 'BackboneDisp'/'BackboneForce',
+             'PeakShear' the largest absolute force and 'Nsteps'.
+    """
+    Disp, Force = np.asarray(Disp, dtype=float), np.asarray(Force, dtype=float)
+    Nsteps = len(Disp)
+    Rev = Reversals(Disp, Tol)
+    Peak = Peaks(Disp, Tol)
+    Ends = np.append(Rev, Nsteps - 1)           # the last step ends the last half cycle
+    Starts = np.concatenate(([0], Rev))
+
+    Energy = CumulativeEnergy(Disp, Force)
+    PeakDisp, PeakForce = Disp[Peak], Force[Peak]
+
+    # one cycle per positive peak followed by a negative one
+    Pair = np.flatnonzero((PeakDisp[:-1] > 0.0) & (PeakDisp[1:] < 0.0))
+    dU = PeakDisp[Pair + 1] - PeakDisp[Pair]
+    Secant = (PeakForce[Pair + 1] - PeakForce[Pair])/np.where(dU != 0.0, dU, np.nan)
+
+    # unloading: from each peak to the next zero force, before the next reversal
+    ResidualDisp = _ZeroCrossings(Disp, Force, Peak, np.append(Peak[1:], Nsteps - 1))
+    Unloading = PeakForce/(PeakDisp - ResidualDisp)
+
+    Metrics = {'Nsteps': Nsteps, 'Reversals': Rev, 'Peaks': Peak, 'PeakDisp': PeakDisp, 'PeakForce': PeakForce,
+               'Energy': Energy, 'EnergyTotal': float(Energy[-1]) if Nsteps else 0.0,
+               'HalfCycleEnergy': Energy[Ends] - Energy[Starts],
+               'SecantStiffness': Secant, 'UnloadingStiffness': Unloading, 'ResidualDisp': ResidualDisp,
+               'PeakShear': float(np.abs(Force).max()) if Nsteps else 0.0}
+    if Height is not None:
+        Metrics['ResidualDrift'] = ResidualDisp/Height
+    Metrics['BackboneDisp'], Metrics['BackboneForce'] = Backbone(PeakDisp, PeakForce, Method=BackboneMethod)
+
+    return Metrics
+
+
+def MetricsReport(Metrics):
+    """
+    Text summary of HysteresisMetrics.
+    """
+    Lines = ["%i steps, %i half cycles, peak base shear %.4g, dissipated energy %.4g" % (
+        Metrics['Nsteps'], len(Metrics['PeakDisp']), Metrics['PeakShear'], Metrics['EnergyTotal'])]
+    Lines.append("%10s %10s %12s %12s %12s" % ("Peak disp", "Force", "Energy", "Unloading K", "Residual"))
+    for Row in zip(Metrics['PeakDisp'], Metrics['PeakForce'], Metrics['HalfCycleEnergy'],
+                   Metrics['UnloadingStiffness'], Metrics['ResidualDisp']):
+        Lines.append("%10.4g %10.4g %12.4g %12.4g %12.4g" % Row)
+    return "\n".join(Lines)
+
+
+def _RecorderArray(dataDir, Name):
+    """
+    Memory map of a recorder of dataDir: Name.bin (binary recorder), Name.npy, or Name.out converted once to .npy.
+    """
+    Root = os1.path.join(dataDir, Name)
+    if os1.path.exists(Root + ".bin"):
+        return RecorderFile(Root + ".bin").Data
+    if not os1.path.exists(Root + ".npy") or os1.path.getmtime(Root + ".npy") < os1.path.getmtime(Root + ".out"):
+        ConvertTextRecorder(Root + ".out")
+    return np.load(Root + ".npy", mmap_mode='r')
+
+
+def RunMetrics(dataDirs, Nsupports, DOF=1, Height=None, Start=0):
+    """
+    Metrics of the runs recorded in dataDirs (DFree and RBase recorders of the main script).
+
+    Args:
+    dataDirs: List of the output directories of the runs.
+    Nsupports: Number of support nodes.
+    DOF: Degree of freedom of the control displacement and base shear (optional, default=1).
+    Height: Height of the building, for the residual drifts (optional, default=None).
+    Start: Number of first rows to skip, e.g. the gravity steps NstepGravity (optional, default=0).
+
+    Returns:
+    Table: pandas DataFrame with one row per run: steps, half cycles, peak base shear, dissipated energy,
+           last secant and unloading stiffness relative to the first ones, largest residual displacement (drift).
+    """
+    Rows = []
+    for dataDir in dataDirs:
+        DFree = _RecorderArray(dataDir, "DFree")
+        RBase = _RecorderArray(dataDir, "RBase")
+        Metrics = HysteresisMetrics(DFree[Start:, DOF], SupportBaseShear(RBase[Start:], Nsupports, DOF), Height)
+        Secant, Unloading = Metrics['SecantStiffness'], Metrics['UnloadingStiffness']
+        Row = {'dataDir': dataDir, 'Nsteps': Metrics['Nsteps'], 'NhalfCycles': len(Metrics['PeakDisp']),
+               'PeakShear': Metrics['PeakShear'], 'Energy': Metrics['EnergyTotal'],
+               'SecantRatio': Secant[-1]/Secant[0] if len(Secant) else np.nan,
+               'UnloadingRatio': Unloading[-1]/Unloading[0] if len(Unloading) else np.nan,
+               'ResidualDisp': np.nanmax(np.abs(Metrics['ResidualDisp']), initial=0.0)}
+        if Height is not None:
+            Row['ResidualDrift'] = Row['ResidualDisp']/Height
+        Rows.append(Row)
+
+    return pd.DataFrame(Rows)
+
+
+if __name__ == "__main__":
+    import sys
+    if len(sys.argv) > 1:
+        from LibFrameModel import FrameParameters
+        from LibFrameGenerator import FrameLayout
+        Params = FrameParameters()
+        Layout = FrameLayout(Params['NStory'], Params['NBay'], Params['NBayZ'], Params['LCol'], Params['LBeam'], Params['LGird'])
+        print(RunMetrics(sys.argv[1:], len(Layout['SupportNodes']), Params['IDctrlDOF'], Layout['LBuilding'],
+                         Params['NstepGravity']).to_string())
+    else:
+        # timing on a synthetic history of growing cycles, 5 million steps
+        Nsteps, Ncycles = 5000000, 500
+        Phase = np.linspace(0.0, 2*np.pi*Ncycles, Nsteps)
+        Disp = np.linspace(0.1, 10.0, Nsteps)*np.sin(Phase)
+        Force = 100.0*np.tanh(np.linspace(0.1, 10.0, Nsteps)*np.sin(Phase + 0.3)/3.0)
+        tStart = time.perf_counter()
+        Metrics = HysteresisMetrics(Disp, Force, Height=432.0)
+        print("%i steps, %i half cycles in %.2f s, energy %.4g, %i backbone points" % (
+            Nsteps, len(Metrics['PeakDisp']), time.perf_counter() - tStart, Metrics['EnergyTotal'],
+            len(Metrics['BackboneDisp'])))
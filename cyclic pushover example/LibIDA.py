@@ -0,0 +1,336 @@
+"""
+Purpose :
+    LibIDA.py contains the incremental dynamic analysis (IDA) of the frame: the
+    time-history analyses of LibFrameModel.RunTimeHistory under records scaled
+    to increasing intensities, up to the collapse of the frame under each one.
+
+    The intensity measure is the 5% damped spectral acceleration at the first
+    period of the frame Sa(T1) (LibGroundMotion.SpectralAcceleration), in g.
+    The intensities of a record are chosen by hunt and fill (HuntFill): steps
+    growing from IMstart up to the first collapse, bisection of the interval
+    between the last intensity without collapse and the first with collapse
+    down to Resolution, and the largest gaps below it are filled with the runs
+    left, while a bisection is pending as well as after it (the runs the
+    bisection still needs are kept for it). A run collapses when the analysis fails or when the peak interstory
+    drift ratio reaches CollapseDrift, where it is ended (Params['CollapseDrift']).
+
+    The runs of all the records are analysed in a pool of worker processes:
+    each time a worker is free, it gets the run of the longest expected time of
+    all the records that have one to run (a record in its hunt waits for the
+    result of its last run, one in its bisection runs fills meanwhile, the fill
+    runs do not wait). The collapse
+    intensities of the records give the lognormal collapse fragility
+    (FragilityFit), and the IDA curves the fragility of any drift limit
+    (LimitStateIntensity).
+
+    Usage:
+    Curves, Summary, Stats = RunIDA(Params, LoadRecords("../GMfiles"), "IDAOut")
+    Theta, Beta, N = FragilityFit(Summary['CollapseIM'])
+    print(IDAReport(Summary, Stats))
+
+    Run : python LibIDA.py [GMdir]   (IDA of the frame with smaller sections, on the records of GMdir
+                                      or on synthetic ones)
+"""
+
+# ===========================================================================
+# Import Libraries
+# ===========================================================================
+import openseespy.opensees as os
+import numpy as np
+import pandas as pd
+import os as os1
+import math
+import time
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from LibFrameModel import FrameParameters, BuildFrameModel, RunGravityAnalysis, RunTimeHistory
+from LibGroundMotion import LoadRecord, SpectralAcceleration
+
+
+# ===========================================================================
+# Main Code
+# ===========================================================================
+class HuntFill:
+    """
+    Intensities of the runs of one record by hunt and fill: Next() gives the intensity of the next run
+    (None when there is none to run now), Add() takes the outcome of a run. While a bisection run is pending,
+    Next() gives fill runs, as long as the runs left are more than the bisections still needed.
+    """
+
+    def __init__(self, IMstart=0.1, Step=0.1, StepIncr=0.1, Resolution=0.05, FillGap=0.2, MaxRuns=12, IMmax=5.0):
+        """
+        Args:
+        IMstart: Intensity of the first run (optional, default=0.1).
+        Step, StepIncr: The n-th step of the hunt is Step + (n-1) StepIncr (optional, default=0.1, 0.1).
+        Resolution: Bisection of the collapse interval down to this length (optional, default=0.05).
+        FillGap: Gaps below the collapse interval longer than this are filled (optional, default=0.2).
+        MaxRuns: Number of runs of the record at most (optional, default=12).
+        IMmax: The hunt ends without collapse above this intensity (optional, default=5.0).
+        """
+        self.IMstart, self.Step, self.StepIncr = IMstart, Step, StepIncr
+        self.Resolution, self.FillGap, self.MaxRuns, self.IMmax = Resolution, FillGap, MaxRuns, IMmax
+        self.Done = {}          # intensity: collapse
+        self.Pending = set()
+
+    def Bracket(self):
+        """
+        Lo, Hi: Largest intensity without collapse below the smallest one with collapse Hi (None before any collapse).
+        """
+        Collapsed = [IM for IM, Collapse in self.Done.items() if Collapse]
+        if not Collapsed:
+            return max(self.Done, default=0.0), None
+        Hi = min(Collapsed)
+        return max([IM for IM, Collapse in self.Done.items() if not Collapse and IM < Hi], default=0.0), Hi
+
+    def Next(self):
+        if len(self.Done) + len(self.Pending) >= self.MaxRuns:
+            return None
+        Lo, Hi = self.Bracket()
+        if Hi is None:
+            # hunt: the next intensity follows from the last one
+            if self.Pending:
+                return None
+            IM = self.IMstart if not self.Done else Lo + self.Step + (len(self.Done) - 1)*self.StepIncr
+            return IM if IM <= self.IMmax else None
+        if Hi - Lo > self.Resolution:
+            if not any(Lo < IM < Hi for IM in self.Pending):
+                return 0.5*(Lo + Hi)
+            # bisection pending: fill meanwhile, but keep the runs of the bisections after the pending one
+            Reserve = max(int(math.ceil(math.log2((Hi - Lo)/self.Resolution) - 1.e-9)) - 1, 0)
+            if len(self.Done) + len(self.Pending) + Reserve >= self.MaxRuns:
+                return None
+        # fill, the pending runs count as done
+        Points = np.sort([0.0] + [IM for IM, Collapse in self.Done.items() if not Collapse and IM < Hi]
+                         + [IM for IM in self.Pending if IM < Lo])
+        Gaps = np.diff(Points)
+        if len(Gaps) and Gaps.max() > self.FillGap:
+            i = int(np.argmax(Gaps))
+            return 0.5*(Points[i] + Points[i + 1])
+        return None
+
+    def Add(self, IM, Collapse):
+        self.Pending.discard(IM)
+        self.Done[IM] = bool(Collapse)
+
+    def Finished(self):
+        return not self.Pending and self.Next() is None
+
+    def CollapseIntensity(self):
+        """
+        Middle of the collapse interval, NaN if the record did not collapse the frame up to IMmax.
+        """
+        Lo, Hi = self.Bracket()
+        return np.nan if Hi is None else 0.5*(Lo + Hi)
+
+
+def FramePeriod(Params):
+    """
+    First period of the frame after the gravity analysis, as in RunTimeHistory.
+    """
+    Model = BuildFrameModel(Params)
+    if RunGravityAnalysis(Model, Params) != 0:
+        os.wipe()
+        raise RuntimeError("Gravity analysis failed")
+    T1 = 2.0*np.pi/np.sqrt(os.eigen(1)[0])
+    os.wipe()
+    return T1
+
+
+def RunIDAJob(Params, RecordPath, Scale, IM, dataDir):
+    """
+    One run of the IDA, this is the function executed in the worker processes: RunTimeHistory of the
+    record times Scale, results in memory, ended at Params['CollapseDrift'].
+
+    Returns:
+    Row: Dictionary with the 'Record', 'IM', 'Scale', 'Collapse', 'PeakStoryDrift', 'PeakDrift', ok, whether
+         the collapse drift ended the run ('Stopped'), the steps analysed and the wall time.
+    """
+    tStart = time.perf_counter()
+    Result = RunTimeHistory(dict(Params, Output="memory", SpillChunkSize=None), LoadRecord(RecordPath), dataDir, Scale)
+    if Result['okGravity'] != 0:
+        raise RuntimeError("Gravity analysis failed")
+    Stats = Result['Stats']
+    return {'Record': Result['Record'], 'IM': IM, 'Scale': Scale, 'Collapse': Result['ok'] != 0 or Stats['Stopped'],
+            'PeakStoryDrift': Result['PeakStoryDrift'], 'PeakDrift': Result['PeakDrift'], 'ok': Result['ok'],
+            'Stopped': Stats['Stopped'], 'Nsteps': Stats['Nsteps'], 'NstepsTotal': Stats['NstepsTotal'],
+            'WallTime': time.perf_counter() - tStart}
+
+
+def RunIDA(Params, Records, OutDir="IDAOut", Nproc=None, CollapseDrift=0.1, Period=None, Verbose=True, **HuntFillArgs):
+    """
+    IDA of the frame under every record, the runs of all the records in a pool of worker processes.
+
+    Args:
+    Params: Parameters of the frame (LibFrameModel.FrameParameters).
+    Records: Records from LibGroundMotion.LoadRecord.
+    OutDir: IDA.csv and IDAsummary.csv are written there (optional, default="IDAOut").
+    Nproc: Number of worker processes (optional, default=all cores).
+    CollapseDrift: Interstory drift ratio of collapse (optional, default=0.1).
+    Period: Period of the spectral accelerations (optional, default=the first period of the frame).
+    Verbose: Print every run (optional, default=True).
+    HuntFillArgs: Intensities of the runs (IMstart, Step, ... see HuntFill).
+
+    Returns:
+    Curves: pandas DataFrame of the runs (see RunIDAJob), sorted by record and intensity: the IDA curves.
+    Summary: pandas DataFrame with one row per record: 'Sa' of the unscaled record, number of runs,
+             collapse interval 'Lo', 'Hi' and 'CollapseIM'.
+    Stats: Dictionary with the number of runs 'Nruns' and of a fixed grid of the same resolution 'NrunsGrid',
+           the steps analysed and ended early, the wall time and the busy time of the workers.
+    """
+    Params = dict(Params, CollapseDrift=CollapseDrift)
+    if not os1.path.exists(OutDir):
+        os1.makedirs(OutDir)
+    Nproc = Nproc or os1.cpu_count()
+    Period = Period or FramePeriod(Params)
+
+    Records = {Record['Name']: Record for Record in Records}
+    Sa = {Name: SpectralAcceleration(Record, Period)*Params['GMfact'] for Name, Record in Records.items()}
+    Tracers = {Name: HuntFill(**HuntFillArgs) for Name in Records}
+    # expected time of a run: the mean of the record runs, else its number of steps times the mean time per step
+    Steps = {Name: int(round((Params['TmaxAnalysis'] or Record['Duration'])/(Params['DtAnalysis'] or Record['dt'])))
+             for Name, Record in Records.items()}
+    Times = {Name: [] for Name in Records}
+
+    def ExpectedTime(Name):
+        if Times[Name]:
+            return np.mean(Times[Name])
+        Runs = [(Steps[Other], WallTime) for Other in Times for WallTime in Times[Other]]
+        return Steps[Name]*(sum(WallTime for _, WallTime in Runs)/sum(N for N, _ in Runs) if Runs else 1.0)
+
+    tStart = time.perf_counter()
+    Rows = []
+    Running = {}
+    with ProcessPoolExecutor(max_workers=Nproc) as Pool:
+        while True:
+            # free workers get the longest runs first
+            while len(Running) < Nproc:
+                Ready = [(ExpectedTime(Name), Name, IM) for Name, Tracer in Tracers.items()
+                         for IM in [Tracer.Next()] if IM is not None]
+                if not Ready:
+                    break
+                _, Name, IM = max(Ready)
+                Tracers[Name].Pending.add(IM)
+                Future = Pool.submit(RunIDAJob, Params, Records[Name]['Path'], IM/Sa[Name], IM, OutDir)
+                Running[Future] = (Name, IM)
+            if not Running:
+                break
+            Done, _ = wait(Running, return_when=FIRST_COMPLETED)
+            for Future in Done:
+                Name, IM = Running.pop(Future)
+                Row = Future.result()
+                Rows.append(Row)
+                Tracers[Name].Add(IM, Row['Collapse'])
+                Times[Name].append(Row['WallTime'])
+                if Verbose:
+                    print("%s Sa = %.3f g: %s, peak story drift %.4f, %.1f s" % (
+                        Name, IM, "collapse" if Row['Collapse'] else "no collapse", Row['PeakStoryDrift'],
+                        Row['WallTime']))
+    WallTime = time.perf_counter() - tStart
+
+    Curves = pd.DataFrame(Rows).sort_values(['Record', 'IM'], ignore_index=True)
+    Summary = []
+    for Name, Tracer in Tracers.items():
+        Lo, Hi = Tracer.Bracket()
+        Summary.append({'Record': Name, 'Sa': Sa[Name], 'Nruns': len(Tracer.Done), 'Lo': Lo,
+                        'Hi': np.nan if Hi is None else Hi, 'CollapseIM': Tracer.CollapseIntensity()})
+    Summary = pd.DataFrame(Summary)
+    Curves.to_csv(os1.path.join(OutDir, "IDA.csv"), index=False)
+    Summary.to_csv(os1.path.join(OutDir, "IDAsummary.csv"), index=False)
+
+    # a fixed grid of step Resolution up to the largest collapse intensity, for every record
+    Resolution = HuntFillArgs.get('Resolution', HuntFill().Resolution)
+    IMtop = np.nanmax(Summary['Hi']) if Summary['Hi'].notna().any() else Curves['IM'].max()
+    Stats = {'Nrecords': len(Records), 'Nruns': len(Curves), 'NrunsGrid': len(Records)*int(math.ceil(IMtop/Resolution - 1.e-9)),
+             'Nsteps': int(Curves['Nsteps'].sum()), 'NstepsSkipped': int((Curves['NstepsTotal'] - Curves['Nsteps'])[Curves['Stopped']].sum()),
+             'Nproc': Nproc, 'WallTime': WallTime, 'BusyTime': Curves['WallTime'].sum(), 'Period': Period}
+
+    return Curves, Summary, Stats
+
+
+def LimitStateIntensity(Curves, DriftLimit):
+    """
+    Intensity of every record at which its IDA curve reaches the peak interstory drift ratio DriftLimit,
+    linear between the runs (the runs with collapse are above any limit), NaN if it never does.
+
+    Returns:
+    IM: pandas Series by record.
+    """
+    IMs = {}
+    for Name, Curve in Curves.groupby('Record'):
+        IM = Curve['IM'].to_numpy()
+        Drift = np.where(Curve['Collapse'], np.inf, Curve['PeakStoryDrift'].to_numpy())
+        Above = np.flatnonzero(Drift >= DriftLimit)
+        if len(Above) == 0:
+            IMs[Name] = np.nan
+        elif Above[0] == 0 or not np.isfinite(Drift[Above[0]]):
+            IMs[Name] = IM[Above[0]] if Above[0] == 0 else 0.5*(IM[Above[0] - 1] + IM[Above[0]])
+        else:
+            i = Above[0]
+            IMs[Name] = IM[i - 1] + (DriftLimit - Drift[i - 1])/(Drift[i] - Drift[i - 1])*(IM[i] - IM[i - 1])
+    return pd.Series(IMs)
+
+
+def FragilityFit(IMs):
+    """
+    Lognormal fragility of the intensities of the records (e.g. Summary['CollapseIM']), by the moments of
+    their logarithms, the records without intensity (NaN) left out.
+
+    Returns:
+    Theta, Beta: Median and logarithmic standard deviation.
+    N: Number of records of the fit.
+    """
+    lnIM = np.log(np.asarray(IMs, dtype=float))
+    lnIM = lnIM[np.isfinite(lnIM)]
+    if len(lnIM) < 2:
+        return (float(np.exp(lnIM[0])) if len(lnIM) else np.nan), np.nan, len(lnIM)
+    return float(np.exp(lnIM.mean())), float(lnIM.std(ddof=1)), len(lnIM)
+
+
+def FragilityCurve(IM, Theta, Beta):
+    """
+    Probability of exceedance of the lognormal fragility (Theta, Beta) at the intensities IM.
+    """
+    z = np.log(np.asarray(IM, dtype=float)/Theta)/(Beta*np.sqrt(2.0))
+    return 0.5*(1.0 + np.vectorize(math.erf)(z))
+
+
+def IDAReport(Summary, Stats):
+    """
+    Text summary of the results of RunIDA.
+    """
+    Theta, Beta, N = FragilityFit(Summary['CollapseIM'])
+    return ("%i records, T1 = %.3f s: %i runs (a fixed grid of the same resolution: %i), %i steps analysed, "
+            "%i skipped after collapse; %.1f s on %i processes, workers busy %.0f%% of the time\n"
+            "Collapse fragility: median Sa(T1) %.3f g, beta %.3f (%i records)" % (
+                Stats['Nrecords'], Stats['Period'], Stats['Nruns'], Stats['NrunsGrid'], Stats['Nsteps'],
+                Stats['NstepsSkipped'], Stats['WallTime'], Stats['Nproc'],
+                100.0*Stats['BusyTime']/(Stats['Nproc']*Stats['WallTime']), Theta, Beta, N))
+
+
+if __name__ == "__main__":
+    import sys
+    import tempfile
+    from LibFrameGenerator import FrameLayout
+    from LibGroundMotion import LoadRecords, WriteAT2
+
+    # Transformation and the roof diaphragm master as control node, as in BenchSuite.py
+    Params = FrameParameters(constraintsType="Transformation", nfCoreY=6, nfCoreZ=6, nfCoverY=6, nfCoverZ=6, np=3)
+    Layout = FrameLayout(Params['NStory'], Params['NBay'], Params['NBayZ'], Params['LCol'], Params['LBeam'], Params['LGird'])
+    Params['IDctrlNode'] = int(Layout['MasterTag'][-1])
+
+    with tempfile.TemporaryDirectory() as TmpDir:
+        if len(sys.argv) > 1:
+            Records = LoadRecords(sys.argv[1])
+        else:
+            # 4 synthetic records of 4 to 7 s at 0.02 s
+            rng = np.random.default_rng(2)
+            for i, Duration in enumerate([4.0, 5.0, 6.0, 7.0]):
+                t = np.arange(int(Duration/0.02))*0.02
+                WriteAT2(os1.path.join(TmpDir, "SYN%i.AT2" % i),
+                         0.3*rng.standard_normal(len(t))*np.exp(-((t - 2.0)/1.5)**2), 0.02)
+            Records = LoadRecords(TmpDir)
+        Curves, Summary, Stats = RunIDA(Params, Records, os1.path.join(TmpDir, "IDAOut"), CollapseDrift=0.04,
+                                        IMstart=0.5, Step=0.5, StepIncr=0.5, Resolution=0.2, FillGap=1.0, IMmax=12.0)
+    print(Summary)
+    print(IDAReport(Summary, Stats))
+    Theta, Beta, N = FragilityFit(LimitStateIntensity(Curves, 0.02))
+    print("Fragility of a 2%% story drift: median Sa(T1) %.3f g, beta %.3f (%i records)" % (Theta, Beta, N))
@@ -5,6 +5,10 @@ Tcl Script Translation to Python :
     elastropy.com, 2023
 Purpose : 
     LibMaterialsRC.py contains material definitions to model RC members
+
+    Importing the module only computes the material constants, it does not touch
+    the OpenSees domain: the materials are defined by an explicit call, e.g.
+    DefineMaterialsRC() or MaterialsRC(fc=-5.0*ksi).Define(TagOffset=10).
 """
 
 
@@ -13,6 +17,7 @@ Purpose :
 # ===========================================================================
 import openseespy.opensees as os
 import math as mt
+import functools
 from LibUnits import *
 
 # ===========================================================================
@@ -57,9 +62,6 @@ IDconcCore  = 1
 IDconcCover = 2
 
 
-os.uniaxialMaterial('Concrete02', IDconcCore,  fc1C, eps1C, fc2C, eps2C, Lambda, ftC, Ets)
-os.uniaxialMaterial('Concrete02', IDconcCover, fc1U, eps1U, fc2U, eps2U, Lambda, ftU, Ets)
-
 # ---------------------------------------------------------------------------
 # Reinforcing Steel
 # ---------------------------------------------------------------------------
@@ -71,4 +73,110 @@ cR1 = 0.925			# control the transition from elastic to plastic branches
 cR2 = 0.15			# control the transition from elastic to plastic branches
 
 IDSteel = 3
-os.uniaxialMaterial('Steel02', IDSteel, Fy, Es, Bs, R0, cR1, cR2)
\ No newline at end of file
+
+
+# ---------------------------------------------------------------------------
+# Material objects
+# ---------------------------------------------------------------------------
+class Concrete02:
+    """
+    Parameters of a Concrete02 material (+Tension, -Compression).
+
+    Args:
+    fpc, epsc0: Maximum stress and strain at maximum stress.
+    fpcu, epsU: Ultimate stress and strain at ultimate stress.
+    Lambda: Ratio between unloading slope at epsU and initial slope.
+    ft, Ets: Tensile strength and tension softening stiffness.
+    """
+
+    def __init__(self, fpc, epsc0, fpcu, epsU, Lambda, ft, Ets):
+        self.Args = (fpc, epsc0, fpcu, epsU, Lambda, ft, Ets)
+
+    def Define(self, Tag):
+        os.uniaxialMaterial('Concrete02', Tag, *self.Args)
+
+
+class Steel02:
+    """
+    Parameters of a Steel02 material.
+
+    Args:
+    Fy, E0, b: Yield stress, initial modulus and strain-hardening ratio.
+    R0, cR1, cR2: Control of the transition from elastic to plastic branches.
+    """
+
+    def __init__(self, Fy, E0, b, R0, cR1, cR2):
+        self.Args = (Fy, E0, b, R0, cR1, cR2)
+
+    def Define(self, Tag):
+        os.uniaxialMaterial('Steel02', Tag, *self.Args)
+
+
+class MaterialSetRC:
+    """
+    Confined concrete, unconfined concrete and reinforcing steel of the RC members.
+    The derived quantities follow the same relations as the module constants above and
+    are computed once, when the set is created; Define() only emits the OpenSees commands.
+
+    Usage:
+    Materials = MaterialsRC(fc=-5.0*ksi)
+    IDcore, IDcover, IDsteel = Materials.Define()      # tags IDconcCore, IDconcCover, IDSteel
+    """
+
+    def __init__(self, fc=fc, Kfc=Kfc, Kres=Kres, Fy=Fy, Es=Es, Bs=Bs, R0=R0, cR1=cR1, cR2=cR2):
+        self.Ec     = 57*ksi*mt.sqrt(-fc/psi)
+        self.fc1C   = Kfc*fc
+        self.eps1C  = 2.*self.fc1C/self.Ec
+        self.fc2C   = Kres*self.fc1C
+        self.eps2C  = 20*self.eps1C
+        self.fc1U   = fc
+        self.fc2U   = Kres*self.fc1U
+        self.ftC    = -0.14*self.fc1C
+        self.ftU    = -0.14*self.fc1U
+        self.Ets    = self.ftU/0.002
+
+        self.Core  = Concrete02(self.fc1C, self.eps1C, self.fc2C, self.eps2C, Lambda, self.ftC, self.Ets)
+        self.Cover = Concrete02(self.fc1U, eps1U, self.fc2U, eps2U, Lambda, self.ftU, self.Ets)
+        self.Steel = Steel02(Fy, Es, Bs, R0, cR1, cR2)
+
+    def Tags(self, TagOffset=0):
+        """
+        Tags of the core concrete, cover concrete and steel: IDconcCore, IDconcCover, IDSteel + TagOffset.
+        """
+        return IDconcCore + TagOffset, IDconcCover + TagOffset, IDSteel + TagOffset
+
+    def Define(self, TagOffset=0):
+        """
+        Define the three materials in the current domain.
+
+        Args:
+        TagOffset: Added to the material tags, to define several material sets in one model (optional, default=0).
+
+        Returns:
+        Tags: Tags of the core concrete, cover concrete and steel.
+        """
+        Tags = self.Tags(TagOffset)
+        for Material, Tag in zip([self.Core, self.Cover, self.Steel], Tags):
+            Material.Define(Tag)
+
+        return Tags
+
+
+@functools.lru_cache(maxsize=None)
+def MaterialsRC(fc=fc, Kfc=Kfc, Kres=Kres, Fy=Fy, Es=Es, Bs=Bs, R0=R0, cR1=cR1, cR2=cR2):
+    """
+    Material set for the given constants, created once per set of constants and reused by
+    repeated runs of the same process (e.g. the cases of a sweep handled by one worker).
+    """
+    return MaterialSetRC(fc, Kfc, Kres, Fy, Es, Bs, R0, cR1, cR2)
+
+
+def DefineMaterialsRC(fc=fc, Kfc=Kfc, Kres=Kres, Fy=Fy, Es=Es, Bs=Bs, R0=R0, cR1=cR1, cR2=cR2, TagOffset=0):
+    """
+    Define the materials IDconcCore, IDconcCover and IDSteel (+ TagOffset) in the current domain,
+    with the module constants or other constants in a parametric run.
+
+    Returns:
+    Tags: Tags of the core concrete, cover concrete and steel.
+    """
+    return MaterialsRC(fc, Kfc, Kres, Fy, Es, Bs, R0, cR1, cR2).Define(TagOffset)
@@ -0,0 +1,104 @@
+"""
+Purpose :
+    LibPlotting.py contains the switch between interactive and headless runs.
+
+    In headless mode (SetHeadless(True) or the environment variable
+    OPS_HEADLESS=1) nothing is drawn while the model is built or analysed:
+    section, model and result plots are skipped or written offscreen (Agg) to
+    FigDir after the analysis when a figure directory is given
+    (SetHeadless(True, FigDir) or OPS_FIGDIR): the figures requested while the
+    model is built (DeferFigure, e.g. the section plots of BuildRCrectSection)
+    are only drawn by WriteDeferredFigures. matplotlib and opsvis are only
+    imported by Pyplot()/Opsvis(), i.e. when a plot is actually requested.
+"""
+
+# ===========================================================================
+# Import Libraries
+# ===========================================================================
+import os as os1
+
+
+# ===========================================================================
+# Main Code
+# ===========================================================================
+Headless = os1.environ.get("OPS_HEADLESS", "") not in ("", "0")
+FigDir = os1.environ.get("OPS_FIGDIR") or None
+Deferred = []        # (Name, Draw) of the figures to write after the analysis in headless mode
+
+
+def SetHeadless(Flag=True, Dir=None):
+    """
+    Switch headless mode on or off.
+
+    Args:
+    Flag: True for headless runs (optional, default=True).
+    Dir: Directory where the figures are written in headless mode, None to skip all plots (optional, default=None).
+    """
+    global Headless, FigDir
+    Headless = bool(Flag)
+    FigDir = Dir
+
+
+def PlotMode():
+    """
+    'show' for interactive runs, 'save' to write figures to FigDir, 'skip' for no plots at all.
+    """
+    if not Headless:
+        return "show"
+    return "save" if FigDir is not None else "skip"
+
+
+def Pyplot():
+    """
+    matplotlib.pyplot, imported on first use (with the offscreen Agg backend in headless mode).
+    """
+    import matplotlib
+    if Headless:
+        matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    return plt
+
+
+def Opsvis():
+    """
+    opsvis, imported on first use.
+    """
+    Pyplot()
+    import opsvis
+    return opsvis
+
+
+def DeferFigure(Name, Draw):
+    """
+    Figure requested during the model construction: drawn now by the function Draw in interactive mode, kept
+    for WriteDeferredFigures in headless mode with a FigDir, dropped otherwise.
+    """
+    if PlotMode() == "show":
+        Draw()
+    elif PlotMode() == "save":
+        Deferred.append((Name, Draw))
+
+
+def WriteDeferredFigures():
+    """
+    Draw the figures kept by DeferFigure and write them to FigDir (call after the analysis).
+    """
+    while Deferred:
+        Name, Draw = Deferred.pop(0)
+        Draw()
+        FinishFigure(Name)
+
+
+def FinishFigure(Name, dpi=300):
+    """
+    Show the current figure in interactive mode, or write it to FigDir/Name.png and free it in headless mode.
+    """
+    plt = Pyplot()
+    if PlotMode() == "show":
+        plt.show()
+    else:
+        if PlotMode() == "save":
+            if not os1.path.exists(FigDir):
+                os1.makedirs(FigDir)
+            plt.savefig(os1.path.join(FigDir, Name + ".png"), dpi=dpi)
+        plt.close('all')
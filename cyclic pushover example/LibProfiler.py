@@ -0,0 +1,244 @@
+"""
+Purpose :
+    LibProfiler.py contains a per-step profiler of the gravity and cyclic analyses,
+    to find the slow regions of a long protocol without running it again under cProfile.
+
+    StepProfiler.Sample is an OnStep function (RunGravityAnalysis,
+    RunDisplacementProtocol): after every converged step it records the wall
+    time since the previous step, the Newton iterations (os.testIter), the last
+    norm of the convergence test (os.testNorm), the algorithm that converged
+    (the default one, or the fallback strategy of a StrategyEngine), the time
+    spent in fallbacks, the control-node displacement and where the step is:
+    phase (gravity, cyclic), peak, cycle and half-cycle of the protocol.
+    The rows go to a growable NumPy buffer (LibCapture.CaptureChannel), there
+    is no formatting during the analysis, so the profiler can be left on.
+
+    The log is written with Save (.npy structured array, or .csv) and read back
+    with LoadProfile; ProfileReport gives the time and iterations of every
+    half-cycle, the time spent in fallbacks and the slowest steps.
+
+    Usage:
+    Profiler = StepProfiler(IDctrlNode, IDctrlDOF, Fallback=Engine)
+    Profiler.Start('gravity') ... OnStep=Profiler.Sample
+    Profiler.Start('cyclic', iDincr, iBlockStart, iDmax, Ncycles) ... OnStep=Profiler.Sample
+    Profiler.Save("Profile.npy"); print(Profiler.Report())
+"""
+
+# ===========================================================================
+# Import Libraries
+# ===========================================================================
+import openseespy.opensees as os
+import numpy as np
+import time
+from LibCapture import CaptureChannel
+
+
+# ===========================================================================
+# Main Code
+# ===========================================================================
+ProfileColumns = ['Step', 'Phase', 'Peak', 'Cycle', 'HalfCycle', 'Time', 'Disp', 'WallTime', 'Niter', 'Norm',
+                  'Algorithm', 'FallbackTime']
+
+
+def HalfCycles(iDincr, iBlockStart, iDmax, Ncycles=1, Tol=0.0, D0=0.0):
+    """
+    Half-cycles of a protocol from GenerateProtocol/ProtocolIncrements: its monotonic parts,
+    split at every change of direction and at the start of every (peak, cycle) block.
+
+    Args:
+    iDincr, iBlockStart: Displacement increments and block starts of the protocol.
+    iDmax, Ncycles: Peaks and cycles per peak given to GenerateProtocol.
+    Tol: Increments smaller than Tol are not part of any half-cycle (optional, default=0).
+    D0: Displacement at the start of the protocol (optional, default=0).
+
+    Returns:
+    End: Displacement at the end of each half-cycle.
+    Direction: Direction (+1/-1) of each half-cycle.
+    Peak, Cycle: Peak index and cycle within the peak of each half-cycle.
+    """
+    Ncycles = np.broadcast_to(np.asarray(Ncycles, dtype=int), np.shape(np.atleast_1d(iDmax)))
+    BlockPeak = np.repeat(np.arange(len(Ncycles)), Ncycles)
+    BlockCycle = np.concatenate([np.arange(N) for N in Ncycles]) if len(Ncycles) else np.empty(0, dtype=int)
+
+    iDincr = np.asarray(iDincr, dtype=float)
+    Steps = np.flatnonzero(np.abs(iDincr) > Tol)
+    Sign = np.sign(iDincr[Steps])
+    Block = np.searchsorted(iBlockStart, Steps, side='right') - 1
+    New = np.concatenate(([True], (Sign[1:] != Sign[:-1]) | (Block[1:] != Block[:-1]))) if len(Steps) else np.empty(0, dtype=bool)
+    Last = Steps[np.append(np.flatnonzero(New)[1:] - 1, len(Steps) - 1)] if len(Steps) else np.empty(0, dtype=int)
+
+    End = D0 + np.cumsum(iDincr)[Last]
+    return End, Sign[New], BlockPeak[Block[New]], BlockCycle[Block[New]]
+
+
+class StepProfiler:
+    """
+    Per-step profile of the analyses, sampled after every converged step.
+
+    Args:
+    IDctrlNode: Node where the displacement is recorded.
+    IDctrlDOF: Degree of freedom of the recorded displacement.
+    Algorithm: Name of the default algorithm (optional, default='Newton').
+    Fallback: StrategyEngine (LibConvergence.py) of the failed steps, to record which strategy converged
+              and the time spent in it; without it only the total time of the steps is known (optional, default=None).
+    Capacity: Initial number of rows of the buffer (optional, default=1024).
+    """
+
+    def __init__(self, IDctrlNode, IDctrlDOF, Algorithm='Newton', Fallback=None, Capacity=1024):
+        self.IDctrlNode = IDctrlNode
+        self.IDctrlDOF = IDctrlDOF
+        self.Fallback = Fallback
+        self.Phases = []
+        self.Algorithms = [Algorithm]
+        self.Log = CaptureChannel('Profile', len(ProfileColumns), Capacity)
+        self.Phase = -1
+        self.HalfCycle = -1
+        self.End = np.empty(0)
+
+    def Start(self, Phase, iDincr=None, iBlockStart=None, iDmax=None, Ncycles=1):
+        """
+        Start a phase of the analysis ('gravity', 'cyclic', ...), call right before it.
+        For a cyclic protocol, the increments, block starts, peaks and cycles of GenerateProtocol
+        label the steps with their half-cycle, peak and cycle (see HalfCycles); the steps of other
+        phases have -1 labels.
+        """
+        if Phase not in self.Phases:
+            self.Phases.append(Phase)
+        self.Phase = self.Phases.index(Phase)
+
+        self.DispPrev = os.nodeDisp(self.IDctrlNode, self.IDctrlDOF)
+        self.HalfCycle = -1
+        self.End = np.empty(0)
+        if iDincr is not None and len(iDincr):
+            self.Tol = 1.e-6*np.max(np.abs(iDincr))
+            self.End, self.Direction, self.Peaks, self.Cycles = HalfCycles(iDincr, iBlockStart, iDmax, Ncycles, self.Tol,
+                                                                           self.DispPrev)
+            self.HalfCycle = 0 if len(self.End) else -1
+        self.Nrecovered = self.Fallback.Stats['Nrecovered'] if self.Fallback is not None else 0
+        self.FallbackTime = self.Fallback.Stats['Time'] if self.Fallback is not None else 0.0
+        self.tPrev = time.perf_counter()
+
+    def Sample(self):
+        """
+        Record the step that just converged, call after each converged step.
+        """
+        tNow = time.perf_counter()
+        Niter = os.testIter()
+        Norms = os.testNorm()
+        Norm = Norms[Niter - 1] if 0 < Niter <= len(Norms) else np.nan
+        Disp = os.nodeDisp(self.IDctrlNode, self.IDctrlDOF)
+
+        # the step belongs to the next half-cycle once the previous step reached the end of the current one
+        # (from the displacement, so that the labels are also right with adaptive increments)
+        Peak, Cycle = -1, -1
+        if self.HalfCycle >= 0:
+            while (self.HalfCycle < len(self.End) - 1 and
+                   (self.DispPrev - self.End[self.HalfCycle])*self.Direction[self.HalfCycle] >= -self.Tol):
+                self.HalfCycle += 1
+            Peak, Cycle = self.Peaks[self.HalfCycle], self.Cycles[self.HalfCycle]
+
+        Algorithm, FallbackTime = 0, 0.0
+        if self.Fallback is not None:
+            FallbackTime = self.Fallback.Stats['Time'] - self.FallbackTime
+            self.FallbackTime = self.Fallback.Stats['Time']
+            if self.Fallback.Stats['Nrecovered'] > self.Nrecovered:
+                self.Nrecovered = self.Fallback.Stats['Nrecovered']
+                if self.Fallback.Last not in self.Algorithms:
+                    self.Algorithms.append(self.Fallback.Last)
+                Algorithm = self.Algorithms.index(self.Fallback.Last)
+                # the default test is defined again after the fallback, its iterations are the ones of the engine
+                Niter, Norm = self.Fallback.LastIter, np.nan
+
+        self.Log.Append([len(self.Log), self.Phase, Peak, Cycle, self.HalfCycle, os.getTime(), Disp, tNow - self.tPrev,
+                         Niter, Norm, Algorithm, FallbackTime])
+        self.DispPrev = Disp
+        # the time of the sampling itself is not part of the next step
+        self.tPrev = time.perf_counter()
+
+    def Data(self):
+        """
+        Profile as a NumPy structured array with the fields of ProfileColumns, phase and algorithm by name.
+        """
+        Log = self.Log.Data()
+        Names = {'Phase': self.Phases, 'Algorithm': self.Algorithms}
+        dtype = [(Name, 'U16' if Name in Names else (int if Name in ['Step', 'Peak', 'Cycle', 'HalfCycle', 'Niter'] else float))
+                 for Name in ProfileColumns]
+        Data = np.empty(len(Log), dtype=dtype)
+        for i, Name in enumerate(ProfileColumns):
+            if Name in Names:
+                Data[Name] = np.array(Names[Name] + [''])[Log[:, i].astype(int)] if len(Log) else []
+            else:
+                Data[Name] = Log[:, i]
+        return Data
+
+    def Save(self, Path):
+        """
+        Write the profile to a .npy file (structured array) or, for any other extension, a .csv file.
+        """
+        Data = self.Data()
+        if Path.endswith('.npy'):
+            np.save(Path, Data)
+        else:
+            fmt = ['%s' if Data.dtype[Name].kind == 'U' else ('%i' if Data.dtype[Name].kind == 'i' else '%.6g')
+                   for Name in ProfileColumns]
+            np.savetxt(Path, Data, fmt=fmt, delimiter=',', header=','.join(ProfileColumns), comments='')
+
+    def Report(self, Nslowest=5):
+        return ProfileReport(self.Data(), Nslowest)
+
+
+def LoadProfile(Path):
+    """
+    Profile written by StepProfiler.Save, as a structured array.
+    """
+    if Path.endswith('.npy'):
+        return np.load(Path)
+    return np.genfromtxt(Path, delimiter=',', names=True, dtype=None, encoding=None)
+
+
+def ProfileSummary(Data):
+    """
+    Totals of the steps of each phase and half-cycle of a profile.
+
+    Returns:
+    Summary: List of dictionaries with 'Phase', 'HalfCycle', 'Peak', 'Cycle', 'Nsteps', 'WallTime',
+             'Niter', 'Nfallback' (steps that went through the fallbacks), 'FallbackTime' and 'DispMax'.
+    """
+    Summary = []
+    Group = np.array([Phase + ':%i' % HalfCycle for Phase, HalfCycle in zip(Data['Phase'], Data['HalfCycle'])])
+    # groups in the order of the steps
+    Keys, First = np.unique(Group, return_index=True)
+    for Key in Keys[np.argsort(First)]:
+        Rows = Data[Group == Key]
+        Summary.append({'Phase': Rows['Phase'][0], 'HalfCycle': int(Rows['HalfCycle'][0]),
+                        'Peak': int(Rows['Peak'][0]), 'Cycle': int(Rows['Cycle'][0]), 'Nsteps': len(Rows),
+                        'WallTime': Rows['WallTime'].sum(), 'Niter': int(Rows['Niter'].sum()),
+                        'Nfallback': int(np.count_nonzero(Rows['FallbackTime'] > 0)),
+                        'FallbackTime': Rows['FallbackTime'].sum(), 'DispMax': np.max(np.abs(Rows['Disp']))})
+    return Summary
+
+
+def ProfileReport(Data, Nslowest=5):
+    """
+    Text report of a profile: totals, time of every half-cycle, time in fallbacks and the slowest steps.
+    """
+    if len(Data) == 0:
+        return "Empty profile"
+    Lines = ["%i steps in %.3f s (%.3f ms/step), %i Newton iterations, %.3f s in fallbacks" % (
+        len(Data), Data['WallTime'].sum(), 1e3*Data['WallTime'].mean(), Data['Niter'].sum(), Data['FallbackTime'].sum())]
+    Lines.append("%-8s %5s %4s %5s %6s %9s %8s %6s %9s %8s %10s" % ("Phase", "Half", "Peak", "Cycle", "Steps", "Time (s)",
+                                                                    "ms/step", "Iter", "Fallbacks", "Fb (s)", "|D|max"))
+    for S in ProfileSummary(Data):
+        Lines.append("%-8s %5i %4i %5i %6i %9.3f %8.2f %6i %9i %8.3f %10.4g" % (
+            S['Phase'], S['HalfCycle'], S['Peak'], S['Cycle'], S['Nsteps'], S['WallTime'], 1e3*S['WallTime']/S['Nsteps'],
+            S['Niter'], S['Nfallback'], S['FallbackTime'], S['DispMax']))
+
+    Lines.append("Slowest steps:")
+    Lines.append("%6s %-8s %5s %9s %5s %10s %-16s %10s" % ("Step", "Phase", "Half", "Time (ms)", "Iter", "Norm",
+                                                          "Algorithm", "Disp"))
+    for i in np.argsort(Data['WallTime'])[::-1][:Nslowest]:
+        Row = Data[i]
+        Lines.append("%6i %-8s %5i %9.2f %5i %10.3g %-16s %10.4g" % (Row['Step'], Row['Phase'], Row['HalfCycle'],
+                                                                   1e3*Row['WallTime'], Row['Niter'], Row['Norm'],
+                                                                   Row['Algorithm'], Row['Disp']))
+    return "\n".join(Lines)
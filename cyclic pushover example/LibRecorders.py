@@ -0,0 +1,207 @@
+"""
+Purpose :
+    LibRecorders.py contains binary recorders with column metadata and a reader
+    that memory-maps them, for the recorders that have to go to disk.
+
+    NodeRecorder / ElementRecorder define an OpenSees '-binary' recorder (raw
+    doubles, each row followed by a newline byte) and write a .json file next
+    to it with the name of every column (time, node/dof/quantity or
+    element/component/quantity). RecorderFile opens such a file, or an .npy
+    container from ConvertTextRecorder, without reading it: columns are
+    selected by name and time windows are sliced from the memory map.
+"""
+
+# ===========================================================================
+# Import Libraries
+# ===========================================================================
+import openseespy.opensees as os
+import numpy as np
+import os as os1
+import json
+import itertools
+
+
+# ===========================================================================
+# Main Code
+# ===========================================================================
+RecorderFlags = {'binary': '-binary', 'text': '-file', 'xml': '-xml'}
+
+
+def _RecorderPath(dataDir, Name, Format):
+    if Format not in RecorderFlags:
+        raise ValueError("Recorder format must be one of %s" % ", ".join(RecorderFlags))
+    return os1.path.join(dataDir, Name + (".bin" if Format == 'binary' else ".out"))
+
+
+def _WriteColumns(Path, Columns):
+    with open(os1.path.splitext(Path)[0] + ".json", 'w') as File:
+        json.dump({'Columns': Columns}, File)
+
+
+def NodeRecorder(dataDir, Name, Nodes, DOFs, Response='disp', Format='binary'):
+    """
+    Node recorder with '-time', like os.recorder('Node', '-file', ..., '-time', '-node', *Nodes, '-dof', *DOFs, Response).
+
+    Args:
+    dataDir: Output directory.
+    Name: File name without extension, the data goes to Name.bin (Name.out for text/xml) and the columns to Name.json.
+    Format: 'binary' (OpenSees -binary), 'text' (-file) or 'xml' (-xml) (optional, default='binary').
+
+    Returns:
+    Path: Path of the recorder file.
+    """
+    Path = _RecorderPath(dataDir, Name, Format)
+    os.recorder('Node', RecorderFlags[Format], Path, '-time', '-node', *Nodes, '-dof', *DOFs, Response)
+
+    Columns = [{'quantity': 'time'}]
+    Columns += [{'node': Node, 'dof': DOF, 'quantity': Response} for Node in Nodes for DOF in DOFs]
+    _WriteColumns(Path, Columns)
+
+    return Path
+
+
+def ElementRecorder(dataDir, Name, Elements, *Args, Format='binary'):
+    """
+    Element recorder with '-time', like os.recorder('Element', '-file', ..., '-time', '-ele', *Elements, *Args),
+    e.g. ElementRecorder(dataDir, 'ForceEle1sec1', [1111], 'section', 1, 'force').
+    The elements must exist: the number of components is taken from their current response.
+
+    Returns:
+    Path: Path of the recorder file.
+    """
+    Path = _RecorderPath(dataDir, Name, Format)
+    os.recorder('Element', RecorderFlags[Format], Path, '-time', '-ele', *Elements, *Args)
+
+    Quantity = " ".join(str(Arg) for Arg in Args)
+    Columns = [{'quantity': 'time'}]
+    for Element in Elements:
+        Columns += [{'ele': Element, 'component': Component + 1, 'quantity': Quantity}
+                    for Component in range(len(os.eleResponse(Element, *Args)))]
+    _WriteColumns(Path, Columns)
+
+    return Path
+
+
+def ConvertTextRecorder(Path, Columns=None, ChunkRows=100000):
+    """
+    Convert a text recorder file to an .npy container (and .json columns) that RecorderFile can memory-map.
+    The file is converted ChunkRows rows at a time, so it is never held in memory as a whole.
+
+    Args:
+    Path: Text recorder file, e.g. DataOut/DFree.out.
+    Columns: Column names, as written by NodeRecorder/ElementRecorder (optional, default=names from the .json
+             next to the file if there is one, otherwise column numbers).
+    ChunkRows: Number of rows converted at a time (optional, default=100000).
+
+    Returns:
+    NpyPath: Path of the .npy file.
+    """
+    Root = os1.path.splitext(Path)[0]
+    if Columns is None and os1.path.exists(Root + ".json"):
+        with open(Root + ".json") as File:
+            Columns = json.load(File)['Columns']
+
+    with open(Path) as File:
+        Nrows = sum(1 for Line in File if Line.strip())
+        File.seek(0)
+        FirstLine = next((Line for Line in File if Line.strip()), "")
+        Ncols = len(FirstLine.split())
+        File.seek(0)
+
+        NpyPath = Root + ".npy"
+        Data = np.lib.format.open_memmap(NpyPath, mode='w+', dtype=float, shape=(Nrows, Ncols))
+        Row = 0
+        while Row < Nrows:
+            Chunk = np.loadtxt(itertools.islice(File, ChunkRows), ndmin=2)
+            Data[Row:Row + len(Chunk)] = Chunk
+            Row += len(Chunk)
+        Data.flush()
+        del Data
+
+    if Columns is None:
+        Columns = [{'quantity': 'time'}] + [{'column': Column} for Column in range(1, Ncols)]
+    _WriteColumns(NpyPath, Columns)
+
+    return NpyPath
+
+
+class RecorderFile:
+    """
+    Memory-mapped reader of a binary recorder (.bin) or converted recorder (.npy) with named columns.
+
+    Usage:
+    DFree = RecorderFile('DataOut/DFree.bin')
+    Disp = DFree.Column(node=141, dof=1)          # memory-mapped view, nothing is read yet
+    Rows = DFree.Window(0.5, 1.0)                 # rows with 0.5 <= time <= 1.0
+    Shear = RBase.Column(dof=1).sum(axis=1)       # several matching columns are read as a 2D array
+    """
+
+    def __init__(self, Path):
+        self.Path = Path
+        with open(os1.path.splitext(Path)[0] + ".json") as File:
+            self.Columns = json.load(File)['Columns']
+        Ncols = len(self.Columns)
+
+        if Path.endswith(".npy"):
+            self.Data = np.load(Path, mmap_mode='r')
+            return
+
+        Size = os1.path.getsize(Path)
+        RowSize = 8*Ncols
+        if Size == 0:
+            self.Data = np.empty((0, Ncols))
+        elif Size % (RowSize + 1) == 0 and self._ByteAt(Path, RowSize) == b'\n':
+            # OpenSees -binary output: the doubles of each row are followed by a newline byte
+            Rows = np.memmap(Path, dtype=np.dtype([('Values', '<f8', (Ncols,)), ('Newline', 'S1')]), mode='r')
+            self.Data = Rows['Values']
+        elif Size % RowSize == 0:
+            self.Data = np.memmap(Path, dtype='<f8', mode='r').reshape(-1, Ncols)
+        else:
+            raise ValueError("%s does not hold rows of %i doubles" % (Path, Ncols))
+
+    @staticmethod
+    def _ByteAt(Path, Position):
+        with open(Path, 'rb') as File:
+            File.seek(Position)
+            return File.read(1)
+
+    def __len__(self):
+        return len(self.Data)
+
+    def Select(self, **Match):
+        """
+        Indices of the columns whose names match all the given keys, e.g. Select(node=141, quantity='disp').
+        """
+        return [Index for Index, Column in enumerate(self.Columns)
+                if all(Column.get(Key) == Value for Key, Value in Match.items())]
+
+    def Column(self, **Match):
+        """
+        Data of the matching columns: a memory-mapped 1D view for a single column, a 2D array otherwise.
+        """
+        Index = self.Select(**Match)
+        if not Index:
+            raise KeyError("No column of %s matches %s" % (self.Path, Match))
+        if len(Index) == 1:
+            return self.Data[:, Index[0]]
+        return self.Data[:, Index]
+
+    @property
+    def Time(self):
+        return self.Data[:, 0]
+
+    def Window(self, tStart, tEnd, **Match):
+        """
+        Rows (of the matching columns, or all columns) with tStart <= time <= tEnd.
+        Only the time column is read to locate the window, with a binary search if time never decreases.
+        """
+        Time = self.Time
+        if len(Time) > 1 and np.all(Time[1:] >= Time[:-1]):
+            Rows = slice(np.searchsorted(Time, tStart, 'left'), np.searchsorted(Time, tEnd, 'right'))
+        else:
+            Rows = np.flatnonzero((Time >= tStart) & (Time <= tEnd))
+
+        if not Match:
+            return self.Data[Rows]
+        Index = self.Select(**Match)
+        return self.Data[Rows][:, Index[0] if len(Index) == 1 else Index]
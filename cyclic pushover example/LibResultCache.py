@@ -0,0 +1,304 @@
+"""
+Purpose :
+    LibResultCache.py contains an on-disk cache of complete analysis results,
+    addressed by the content of the analysis: the key is the SHA-256 of the
+    canonical JSON text of the model and protocol definition (geometry, sections,
+    materials, iDmax, Dincr, CycleType, Ncycles and the analysis options), so the
+    same definition gives the same key in any run or process, whatever the order
+    of its entries, and any change of a value gives another one. The definition
+    of a script is every plain value of its namespace (PlainDefinition), not a
+    list of names to keep up to date. The key also has the SHA-256 of the
+    sources of the analysis libraries (SourceFiles, SourceHash), so a change of
+    the code gives other keys too.
+
+    An entry is a directory of the cache named by its key, with the result files
+    (e.g. the recorder files of dataDir), optional arrays (Arrays.npz) and a
+    meta.json file of the definition, the scalar results (Info) and the size.
+    Entries are written under a temporary name and renamed, so a reader only
+    sees complete entries. The modification time of meta.json is the last use:
+    when the cache grows beyond MaxBytes, the least recently used entries are
+    removed. An fcntl lock file orders the processes sharing the cache: reads
+    under a shared lock, insertions and evictions under an exclusive one.
+    The code of the main script is not in the key, only its values: raise
+    CacheVersion after a change of its analysis commands.
+
+    Usage:
+    Cache = ResultCache("ResultCache", MaxBytes=2*1024**3)
+    Key = CanonicalHash(PlainDefinition(globals(), Exclude=['dataDir']))
+    Entry = Cache.Fetch(Key, dataDir)          # None, or the files are copied to dataDir
+    Cache.Store(Key, dataDir, Info={'ok': ok}, Definition=...)
+    Result = CachedCyclicPushover(Params, dataDir, Cache)    # RunCyclicPushover through the cache
+
+    Run : python LibResultCache.py   (first and cached runs of a small cyclic pushover)
+"""
+
+# ===========================================================================
+# Import Libraries
+# ===========================================================================
+import numpy as np
+import os as os1
+import json
+import time
+import shutil
+import hashlib
+import fcntl
+import contextlib
+import glob
+from LibFrameModel import RunCyclicPushover
+
+
+# ===========================================================================
+# Main Code
+# ===========================================================================
+CacheVersion = 1
+
+# sources of the analysis, in the directory of this file
+SourceFiles = ["Lib*.py", "BuildRCrectSection.py"]
+
+
+def Canonical(Value):
+    """
+    Plain JSON value of a definition value: numpy scalars and arrays as numbers and lists, tuples as lists,
+    integral floats as integers (18 and 18.0 are the same value), -0.0 as 0.
+    """
+    if isinstance(Value, dict):
+        return {str(Key): Canonical(Item) for Key, Item in Value.items()}
+    if isinstance(Value, (list, tuple, np.ndarray)):
+        return [Canonical(Item) for Item in Value]
+    if isinstance(Value, np.generic):
+        Value = Value.item()
+    if isinstance(Value, float):
+        if not np.isfinite(Value):
+            return repr(Value)
+        return int(Value) if Value.is_integer() else Value
+    return Value
+
+
+def _Plain(Value):
+    if Value is None or isinstance(Value, (bool, int, float, str, np.generic)):
+        return True
+    if isinstance(Value, np.ndarray):
+        return Value.dtype.kind in 'biuf'
+    if isinstance(Value, (list, tuple)):
+        return all(_Plain(Item) for Item in Value)
+    if isinstance(Value, dict):
+        return all(isinstance(Key, str) and _Plain(Item) for Key, Item in Value.items())
+    return False
+
+
+def PlainDefinition(Namespace, Exclude=()):
+    """
+    Definition of a script: the values of its namespace (e.g. globals()) that are numbers, strings, None, numeric
+    arrays, or lists and dictionaries of them, i.e. its parameters and the values derived from them; the modules,
+    functions and OpenSees objects are left out, as the names of Exclude and the names starting with '_'.
+    """
+    return {Name: Value for Name, Value in Namespace.items()
+            if not Name.startswith('_') and Name not in Exclude and _Plain(Value)}
+
+
+def SourceHash(Patterns=None):
+    """
+    SHA-256 of the names and contents of the source files of Patterns in the directory of this file
+    (optional, default=SourceFiles), all of them, whether imported or not.
+    """
+    Dir = os1.path.dirname(os1.path.abspath(__file__))
+    Hash = hashlib.sha256()
+    for Path in sorted({Path for Pattern in Patterns or SourceFiles for Path in glob.glob(os1.path.join(Dir, Pattern))}):
+        Hash.update(os1.path.basename(Path).encode() + b'\0')
+        with open(Path, 'rb') as File:
+            Hash.update(hashlib.sha256(File.read()).digest())
+    return Hash.hexdigest()
+
+
+def CanonicalHash(Definition):
+    """
+    Key of a definition (dictionary of names and values): SHA-256 of its canonical JSON text, keys sorted,
+    with the SourceHash of the libraries.
+    """
+    Text = json.dumps(Canonical({'CacheVersion': CacheVersion, 'Sources': SourceHash(), 'Definition': Definition}),
+                      sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(Text.encode()).hexdigest()
+
+
+def _DirSize(Path):
+    return sum(os1.path.getsize(os1.path.join(Dir, Name)) for Dir, _, Names in os1.walk(Path) for Name in Names)
+
+
+class ResultCache:
+    """
+    Content-addressed cache of results in the directory Root, at most MaxBytes (least recently used evicted).
+    """
+
+    def __init__(self, Root="ResultCache", MaxBytes=2*1024**3):
+        self.Root = Root
+        self.MaxBytes = MaxBytes
+        self.Hits = 0
+        self.Misses = 0
+        os1.makedirs(Root, exist_ok=True)
+
+    @contextlib.contextmanager
+    def _Lock(self, Mode):
+        with open(os1.path.join(self.Root, ".lock"), 'a') as File:
+            fcntl.flock(File, Mode)
+            try:
+                yield
+            finally:
+                fcntl.flock(File, fcntl.LOCK_UN)
+
+    def EntryPath(self, Key):
+        return os1.path.join(self.Root, Key[:2], Key)
+
+    def Fetch(self, Key, DestDir=None, Before=None):
+        """
+        Entry of Key, its last use set to now.
+
+        Args:
+        DestDir: The result files of the entry are copied there (optional, default=None).
+        Before: Function called when the entry is found, before the files are copied, e.g. to close the
+                recorders writing to DestDir (optional, default=None).
+
+        Returns:
+        Entry: None if Key is not in the cache, else a dictionary with the 'Info' and the 'Arrays' stored
+               with the entry, its 'Path' and its 'Definition'.
+        """
+        Path = self.EntryPath(Key)
+        with self._Lock(fcntl.LOCK_SH):
+            if not os1.path.exists(os1.path.join(Path, "meta.json")):
+                self.Misses += 1
+                return None
+            with open(os1.path.join(Path, "meta.json")) as File:
+                Meta = json.load(File)
+            if Before is not None:
+                Before()
+            Files = os1.path.join(Path, "files")
+            if DestDir is not None and os1.path.exists(Files):
+                shutil.copytree(Files, DestDir, dirs_exist_ok=True)
+            Arrays = {}
+            if os1.path.exists(os1.path.join(Path, "Arrays.npz")):
+                with np.load(os1.path.join(Path, "Arrays.npz")) as Data:
+                    Arrays = {Name: Data[Name] for Name in Data.files}
+            os1.utime(os1.path.join(Path, "meta.json"))
+        self.Hits += 1
+
+        return {'Info': Meta['Info'], 'Arrays': Arrays, 'Path': Path, 'Definition': Meta['Definition']}
+
+    def Store(self, Key, SourceDir=None, Info=None, Arrays=None, Definition=None):
+        """
+        Add the entry of Key: the files of SourceDir, the JSON dictionary Info, the numpy Arrays (dictionary),
+        and the Definition of the key for reference. An entry of Key already there (stored meanwhile by
+        another process) is kept. The least recently used entries are then evicted down to MaxBytes.
+        """
+        Stage = os1.path.join(self.Root, ".tmp-%i-%i" % (os1.getpid(), time.monotonic_ns()))
+        os1.makedirs(Stage)
+        if SourceDir is not None:
+            shutil.copytree(SourceDir, os1.path.join(Stage, "files"))
+        if Arrays:
+            np.savez(os1.path.join(Stage, "Arrays.npz"), **Arrays)
+        Meta = {'Key': Key, 'Definition': Canonical(Definition), 'Info': Canonical(Info or {}), 'Created': time.time()}
+        Meta['Size'] = _DirSize(Stage)
+        with open(os1.path.join(Stage, "meta.json"), 'w') as File:
+            json.dump(Meta, File, indent=1)
+
+        Path = self.EntryPath(Key)
+        with self._Lock(fcntl.LOCK_EX):
+            os1.makedirs(os1.path.dirname(Path), exist_ok=True)
+            try:
+                os1.rename(Stage, Path)
+            except OSError:
+                shutil.rmtree(Stage, ignore_errors=True)
+            self._Evict(Keep=Key)
+
+    def Entries(self):
+        """
+        (last use, size, key) of every entry, the least recently used first.
+        """
+        Entries = []
+        for Prefix in os1.listdir(self.Root):
+            PrefixDir = os1.path.join(self.Root, Prefix)
+            if Prefix.startswith('.') or not os1.path.isdir(PrefixDir):
+                continue
+            for Key in os1.listdir(PrefixDir):
+                MetaPath = os1.path.join(PrefixDir, Key, "meta.json")
+                try:
+                    with open(MetaPath) as File:
+                        Size = json.load(File)['Size']
+                    Entries.append((os1.path.getmtime(MetaPath), Size, Key))
+                except (OSError, ValueError, KeyError):
+                    continue
+        return sorted(Entries)
+
+    def _Evict(self, Keep=None):
+        Entries = self.Entries()
+        Total = sum(Size for _, Size, _ in Entries)
+        for _, Size, Key in Entries:
+            if Total <= self.MaxBytes:
+                break
+            if Key == Keep:
+                continue
+            shutil.rmtree(self.EntryPath(Key), ignore_errors=True)
+            with contextlib.suppress(OSError):
+                os1.rmdir(os1.path.dirname(self.EntryPath(Key)))        # only if empty
+            Total -= Size
+
+    def Evict(self):
+        """
+        Remove the least recently used entries down to MaxBytes.
+        """
+        with self._Lock(fcntl.LOCK_EX):
+            self._Evict()
+
+    def Clear(self):
+        with self._Lock(fcntl.LOCK_EX):
+            for _, _, Key in self.Entries():
+                shutil.rmtree(self.EntryPath(Key), ignore_errors=True)
+
+    def Report(self):
+        Entries = self.Entries()
+        return "Result cache %s: %i entries, %.1f MB of %.1f MB, %i hits, %i misses" % (
+            self.Root, len(Entries), sum(Size for _, Size, _ in Entries)/1024**2, self.MaxBytes/1024**2,
+            self.Hits, self.Misses)
+
+
+def CachedCyclicPushover(Params, dataDir, Cache, Verbose=False):
+    """
+    RunCyclicPushover through the cache: the key is the hash of the whole Params, on a hit the recorder
+    files are copied to dataDir and the response is returned without any analysis.
+
+    Args:
+    Cache: ResultCache, or the directory of one.
+
+    Returns:
+    Result: As RunCyclicPushover, with 'Cached' True on a hit.
+    """
+    if isinstance(Cache, str):
+        Cache = ResultCache(Cache)
+    Key = CanonicalHash(Params)
+    os1.makedirs(dataDir, exist_ok=True)
+    Entry = Cache.Fetch(Key, dataDir)
+    if Entry is not None:
+        return dict(Entry['Info'], **Entry['Arrays'], Cached=True)
+
+    Result = RunCyclicPushover(Params, dataDir, Verbose)
+    Arrays = {Name: Result[Name] for Name in ['Time', 'Disp', 'BaseShear', 'Profile'] if Name in Result}
+    Info = {Name: Result[Name] for Name in ['ok', 'okGravity', 'Stats']}
+    Cache.Store(Key, dataDir if Params['Output'] != "memory" else None, Info, Arrays, Params)
+    Result['Cached'] = False
+
+    return Result
+
+
+if __name__ == "__main__":
+    import tempfile
+    from LibFrameModel import FrameParameters
+
+    # Transformation and the roof diaphragm master as control node, as in BenchSuite.py
+    Params = FrameParameters(constraintsType="Transformation", IDctrlNode=1141, iDmax=[0.005, 0.01])
+    with tempfile.TemporaryDirectory() as TmpDir:
+        Cache = ResultCache(os1.path.join(TmpDir, "ResultCache"))
+        for Run in range(2):
+            tStart = time.perf_counter()
+            Result = CachedCyclicPushover(Params, os1.path.join(TmpDir, "DataOut"), Cache)
+            print("Run %i: %s in %.3f s, %i steps, peak base shear %.1f" % (
+                Run + 1, "cached" if Result['Cached'] else "analysed", time.perf_counter() - tStart,
+                len(Result['Disp']), np.abs(Result['BaseShear']).max()))
+        print(Cache.Report())
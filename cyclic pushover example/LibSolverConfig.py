@@ -0,0 +1,397 @@
+"""
+Purpose :
+    LibSolverConfig.py contains the selection of the constraint handler, the DOF
+    numberer and the system of equations of an analysis from the size of the
+    model, instead of the fixed BandGeneral/RCM of the main script.
+
+    ModelSignature describes the model in the domain: nodes, elements, number of
+    equations, bandwidth after a reverse Cuthill-McKee numbering, multi-point
+    constraints. SelectConfig chooses from it with simple rules:
+        constraints   Plain without multi-point constraints, Transformation with
+                      them, Penalty when a constrained node is also fixed (which
+                      Transformation does not handle), Lagrange when the control
+                      node of a DisplacementControl integrator is a constrained node
+                      (e.g. a slave node of a rigid diaphragm, whose displacement
+                      only Lagrange multipliers can impose)
+        system        BandGeneral while the work of a band factorization
+                      (equations x bandwidth^2) stays below BandWork, UmfPack above
+        numberer      RCM
+    CalibrateConfig times the candidates of CandidateConfigs on the actual model
+    (e.g. the whole gravity analysis), each run in a child process forked from
+    the current state (os.fork, POSIX only): the domain of the caller is not
+    changed, and a candidate that crashes the process (e.g. Lagrange multipliers
+    on some OpenSeesPy builds) is only marked as invalid. A candidate is valid if
+    its steps converge to the displacements of the first candidate, the one of
+    the rules. Every candidate is run Repeat times and its best time is kept;
+    the rules' configuration is only replaced by a candidate faster by more
+    than Margin, since smaller differences are within the timing noise. The
+    selected configuration is kept per model signature in a .json cache
+    (ConfigCache).
+
+    Usage:
+    Config = AutoConfig("calibrate", IDctrlNode, Define, Step, "SolverCache.json")
+"""
+
+# ===========================================================================
+# Import Libraries
+# ===========================================================================
+import openseespy.opensees as os
+import numpy as np
+import os as os1
+import sys
+import json
+import time
+import pickle
+import hashlib
+from collections import Counter, deque
+
+
+# ===========================================================================
+# Main Code
+# ===========================================================================
+def NodeGraph():
+    """
+    Node connectivity of the domain: nodes of the same element and the nodes of every multi-point constraint.
+
+    Returns:
+    Tags: Node tags.
+    Adjacency: List with the set of neighbour indices of every node.
+    """
+    Tags = list(os.getNodeTags())
+    Index = {Tag: i for i, Tag in enumerate(Tags)}
+    Adjacency = [set() for _ in Tags]
+
+    def Connect(Nodes):
+        Nodes = [Index[Tag] for Tag in Nodes]
+        for i in Nodes:
+            Adjacency[i].update(j for j in Nodes if j != i)
+
+    for EleTag in os.getEleTags():
+        Connect(os.eleNodes(EleTag))
+    for Retained in os.getRetainedNodes():
+        for Constrained in os.getConstrainedNodes(Retained):
+            Connect([Retained, Constrained])
+
+    return Tags, Adjacency
+
+
+def ReverseCuthillMcKee(Adjacency):
+    """
+    Reverse Cuthill-McKee ordering of a graph (each connected part from a node of lowest degree).
+
+    Returns:
+    Order: Node indices in their new order.
+    """
+    Degree = [len(Neighbours) for Neighbours in Adjacency]
+    Visited = [False]*len(Adjacency)
+    Order = []
+    for Start in sorted(range(len(Adjacency)), key=Degree.__getitem__):
+        if Visited[Start]:
+            continue
+        Visited[Start] = True
+        Queue = deque([Start])
+        while Queue:
+            Node = Queue.popleft()
+            Order.append(Node)
+            for Next in sorted(Adjacency[Node], key=Degree.__getitem__):
+                if not Visited[Next]:
+                    Visited[Next] = True
+                    Queue.append(Next)
+
+    return Order[::-1]
+
+
+def NodeBandwidth(Adjacency, Order):
+    """
+    Largest distance in Order between two connected nodes.
+    """
+    Position = np.empty(len(Order), dtype=int)
+    Position[Order] = np.arange(len(Order))
+    return max((abs(Position[i] - Position[j]) for i, Neighbours in enumerate(Adjacency) for j in Neighbours), default=0)
+
+
+def ModelSignature(IDctrlNode=None):
+    """
+    Size and constraints of the model in the domain, with which the configuration is selected and cached.
+
+    Args:
+    IDctrlNode: Control node of a DisplacementControl integrator (optional, default=None).
+
+    Returns:
+    Signature: Dictionary with the number of nodes, elements and equations ('Neq', before the constraints),
+               the half-bandwidth in equations after an RCM numbering ('Bandwidth'), the number of element
+               types, the constrained and retained nodes of the multi-point constraints, and whether a
+               constrained node is fixed or is the control node.
+    """
+    Tags, Adjacency = NodeGraph()
+    Ndf = max((len(os.nodeDisp(Tag)) for Tag in Tags), default=0)
+    Retained = list(os.getRetainedNodes())
+    Constrained = sorted({Tag for Node in Retained for Tag in os.getConstrainedNodes(Node)})
+    Fixed = set(os.getFixedNodes())
+
+    return {'Nnodes': len(Tags), 'Nelements': len(os.getEleTags()), 'Neq': Ndf*len(Tags),
+            'Bandwidth': Ndf*(int(NodeBandwidth(Adjacency, ReverseCuthillMcKee(Adjacency))) + 1),
+            'ElementTypes': dict(sorted(Counter(os.eleType(Tag) for Tag in os.getEleTags()).items())),
+            'Nconstrained': len(Constrained), 'Nretained': len(Retained),
+            'ConstrainedFixed': bool(Fixed.intersection(Constrained)),
+            'CtrlConstrained': IDctrlNode in Constrained}
+
+
+def SignatureKey(Signature):
+    """
+    Short hash of a signature, the key of the configuration cache.
+    """
+    return hashlib.sha1(json.dumps(Signature, sort_keys=True).encode()).hexdigest()[:16]
+
+
+def SelectConfig(Signature, BandWork=1.e8, Penalty=1.e12):
+    """
+    Configuration chosen from the signature by the rules of the module description.
+
+    Args:
+    Signature: From ModelSignature.
+    BandWork: Largest Neq*Bandwidth^2 solved with BandGeneral (optional, default=1.e8).
+    Penalty: Penalty factor of the Penalty constraint handler (optional, default=1.e12).
+
+    Returns:
+    Config: Dictionary with the arguments of os.constraints, os.numberer and os.system.
+    """
+    if Signature['Nconstrained'] == 0:
+        Constraints = ('Plain',)
+    elif Signature['CtrlConstrained']:
+        Constraints = ('Lagrange',)
+    elif Signature['ConstrainedFixed']:
+        Constraints = ('Penalty', Penalty, Penalty)
+    else:
+        Constraints = ('Transformation',)
+    System = 'BandGeneral' if Signature['Neq']*Signature['Bandwidth']**2 <= BandWork else 'UmfPack'
+
+    return {'constraints': Constraints, 'numberer': ('RCM',), 'system': (System,)}
+
+
+def CandidateConfigs(Signature, Lagrange=False, Penalty=1.e12):
+    """
+    Configurations timed by CalibrateConfig, the one of SelectConfig first: every constraint handler that
+    can work with the model with BandGeneral, UmfPack, SparseGeneral and, without Lagrange multipliers
+    (the system is then not positive definite), ProfileSPD. Lagrange multipliers are only candidates if
+    Lagrange=True or the control node is constrained: the first calibration steps (e.g. of the gravity
+    analysis) do not show that they fail later under DisplacementControl on some OpenSeesPy builds.
+    """
+    Rule = SelectConfig(Signature, Penalty=Penalty)
+    if Signature['Nconstrained'] == 0:
+        Handlers = [('Plain',)]
+    elif Signature['CtrlConstrained']:
+        Handlers = [('Lagrange',)]
+    else:
+        Handlers = [('Penalty', Penalty, Penalty)]
+        if not Signature['ConstrainedFixed']:
+            Handlers.insert(0, ('Transformation',))
+        if Lagrange:
+            Handlers.append(('Lagrange',))
+
+    Configs = [Rule]
+    for Constraints in Handlers:
+        for System in ['BandGeneral', 'UmfPack', 'SparseGeneral', 'ProfileSPD']:
+            if System == 'ProfileSPD' and Constraints[0] == 'Lagrange':
+                continue
+            Config = {'constraints': Constraints, 'numberer': ('RCM',), 'system': (System,)}
+            if Config not in Configs:
+                Configs.append(Config)
+
+    return Configs
+
+
+def DefineConfig(Config):
+    """
+    Define the constraint handler, numberer and system of equations of Config.
+    """
+    os.constraints(*Config['constraints'])
+    os.numberer(*Config['numberer'])
+    os.system(*Config['system'])
+
+
+def ConfigName(Config):
+    return "%s/%s/%s" % (Config['constraints'][0], Config['numberer'][0], Config['system'][0])
+
+
+def _MuteFiles(Keep):
+    """
+    Send the writes to the open files of this process (e.g. the recorder files) to /dev/null,
+    except to the file descriptors of Keep (Linux: the files are found in /proc/self/fd).
+    """
+    if not os1.path.isdir('/proc/self/fd'):
+        return
+    Null = os1.open(os1.devnull, os1.O_WRONLY)
+    for Fd in map(int, os1.listdir('/proc/self/fd')):
+        if Fd <= 2 or Fd == Null or Fd in Keep:
+            continue
+        try:
+            if os1.path.isfile(os1.readlink('/proc/self/fd/%i' % Fd)):
+                os1.dup2(Null, Fd)
+        except OSError:
+            continue
+
+
+def _TimeConfig(Config, Define, Step):
+    """
+    Time the steps of Config in a child process forked from the current state.
+
+    Returns:
+    ok: Status of the steps, None if the child ended without a result (e.g. it crashed).
+    Time: Wall time of the steps.
+    Disp: Displacements of all the nodes after the steps.
+    """
+    sys.stdout.flush()
+    sys.stderr.flush()
+    Read, Write = os1.pipe()
+    Pid = os1.fork()
+    if Pid == 0:
+        os1.close(Read)
+        _MuteFiles([Write])      # the recorders of the caller must not record the steps of the candidates
+        Status = 1
+        try:
+            DefineConfig(Config)
+            Define()
+            tStart = time.perf_counter()
+            ok = Step()
+            Time = time.perf_counter() - tStart
+            Disp = np.concatenate([os.nodeDisp(Tag) for Tag in os.getNodeTags()])
+            with os1.fdopen(Write, 'wb') as File:
+                pickle.dump((ok, Time, Disp), File)
+            Status = 0
+        finally:
+            os1._exit(Status)
+
+    os1.close(Write)
+    with os1.fdopen(Read, 'rb') as File:
+        Data = File.read()
+    os1.waitpid(Pid, 0)
+    if not Data:
+        return None, np.nan, None
+
+    return pickle.loads(Data)
+
+
+def CalibrateConfig(Configs, Define, Step, Tol=1.e-6, Verbose=True, Repeat=5, Margin=0.1):
+    """
+    Time every configuration on the current model, from its current state (which is not changed).
+
+    Args:
+    Configs: Candidate configurations, e.g. CandidateConfigs(Signature); the first one is the reference.
+    Define: Function that defines the rest of the analysis (test, algorithm, integrator, analysis).
+    Step: Function that runs the timed steps and returns their status, e.g. lambda: os.analyze(NstepGravity);
+          a window of a few tenths of a second at least, shorter ones are mostly noise.
+    Tol: Relative difference of the displacements to the reference above which a configuration is invalid
+         (optional, default=1.e-6).
+    Verbose: Print the time of every configuration (optional, default=True).
+    Repeat: Runs of every valid configuration, the best time is kept (optional, default=5).
+    Margin: A configuration replaces the reference only if it is faster by more than this fraction
+            (optional, default=0.1).
+
+    Returns:
+    Best: The reference if it is valid and no configuration beats it by Margin, else the fastest valid
+          configuration, None if none is valid.
+    Timings: List of (configuration name, best time, valid, spread of the times relative to the best).
+    """
+    Timings = []
+    Best, BestTime, Reference, RefTime = None, np.inf, None, None
+    for i, Config in enumerate(Configs):
+        ok, Time, Disp = _TimeConfig(Config, Define, Step)
+        Valid = ok == 0
+        if Valid and Reference is None:
+            Reference = Disp
+        elif Valid:
+            Valid = np.abs(Disp - Reference).max() <= Tol*max(np.abs(Reference).max(), 1.e-12)
+        Times = [Time]
+        if Valid:
+            Times += [_TimeConfig(Config, Define, Step)[1] for _ in range(Repeat - 1)]
+            Time = min(Times)
+        Spread = (max(Times) - min(Times))/min(Times) if Valid else np.nan
+        Timings.append((ConfigName(Config), float(Time), bool(Valid), float(Spread)))
+        if Verbose:
+            print("%-36s %10.4f s (+%3.0f%%)  %s" % (ConfigName(Config), Time, 100*Spread if Valid else 0.0,
+                                                   "" if Valid else "INVALID" if ok is not None else "CRASHED"))
+        if not Valid:
+            continue
+        if i == 0:
+            RefTime = Time
+        if Time < BestTime and (RefTime is None or Time < (1.0 - Margin)*RefTime):
+            Best, BestTime = Config, Time
+        elif i == 0:
+            Best, BestTime = Config, Time
+
+    return Best, Timings
+
+
+class ConfigCache:
+    """
+    Configurations selected by CalibrateConfig, per model signature, in a .json file.
+
+    Args:
+    Path: Path of the .json file.
+    """
+
+    def __init__(self, Path):
+        self.Path = Path
+        self.Entries = {}
+        if os1.path.exists(Path):
+            with open(Path) as File:
+                self.Entries = json.load(File)
+
+    def Get(self, Signature):
+        """
+        Cached configuration of the signature, None if there is none.
+        """
+        Entry = self.Entries.get(SignatureKey(Signature))
+        if Entry is None:
+            return None
+        return {Key: tuple(Value) for Key, Value in Entry['Config'].items()}
+
+    def Put(self, Signature, Config, Timings):
+        """
+        Keep the configuration of the signature and write the file.
+        """
+        self.Entries[SignatureKey(Signature)] = {'Signature': Signature, 'Config': Config, 'Timings': Timings}
+        TmpPath = self.Path + ".tmp"
+        with open(TmpPath, 'w') as File:
+            json.dump(self.Entries, File, indent=1)
+        os1.replace(TmpPath, self.Path)
+
+
+def AutoConfig(Mode="auto", IDctrlNode=None, Define=None, Step=None, CachePath=None, Verbose=True):
+    """
+    Select and define the constraint handler, numberer and system of equations for the model in the domain.
+
+    Args:
+    Mode: "auto" for the rules of SelectConfig, "calibrate" to time the candidates (optional, default="auto").
+    IDctrlNode: Control node of a DisplacementControl integrator (optional, default=None).
+    Define, Step: As in CalibrateConfig, needed to calibrate (optional, default=None: the rules are used).
+    CachePath: .json cache of the calibrated configurations (optional, default=None).
+    Verbose: Print the selected configuration and the calibration times (optional, default=True).
+
+    Returns:
+    Config: The defined configuration.
+    """
+    Signature = ModelSignature(IDctrlNode)
+    Config = None
+    Source = "rules"
+    if Mode == "calibrate":
+        Cache = ConfigCache(CachePath) if CachePath else None
+        Config = Cache.Get(Signature) if Cache is not None else None
+        Source = "cache"
+        if Config is None and Define is not None and Step is not None:
+            Config, Timings = CalibrateConfig(CandidateConfigs(Signature), Define, Step, Verbose=Verbose)
+            Source = "calibration"
+            if Config is not None and Cache is not None:
+                Cache.Put(Signature, Config, Timings)
+    elif Mode != "auto":
+        raise ValueError("Unknown solver selection mode: %s" % Mode)
+    if Config is None:
+        Config, Source = SelectConfig(Signature), "rules"
+
+    if Verbose:
+        print("Solver %s (%s): %i equations, bandwidth %i, %i constrained nodes" % (
+            ConfigName(Config), Source, Signature['Neq'], Signature['Bandwidth'], Signature['Nconstrained']))
+    DefineConfig(Config)
+
+    return Config
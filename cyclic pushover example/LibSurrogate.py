@@ -0,0 +1,376 @@
+"""
+Purpose :
+    LibSurrogate.py contains a reduced-order model of the 3D RC frame for fast
+    screening (loss studies with thousands of cyclic runs): a shear building of
+    one hysteretic spring per story, calibrated on a few runs of the fiber model
+    of LibFrameModel.py.
+
+    The fiber runs capture the floor displacements of the diaphragm master nodes
+    and the base shear after every step. Under the lateral pattern of the main
+    script (floor forces F2, F3, F4 proportional to WjHj) the shear of a story is
+    the base shear times the share of the lateral loads above it, so every story
+    gives a story shear - story drift hysteresis. A Steel02 spring
+    (Menegotto-Pinto) is fitted to each of them: E0 on the first loading branches
+    of the calibration runs, then Fy, b and R0 by a grid search refined around the best point, all the
+    candidates replayed at once on the drift history with the array Steel02 of
+    LibFiberEngine.py.
+
+    The surrogate is a chain of zeroLength springs in a 1D OpenSees model (one
+    DOF per floor, floor masses), loaded with the same floor forces and analysed
+    with the same GenerateProtocol protocols and RunDisplacementProtocol as the
+    frame. SurrogateAccuracy compares the base shear - roof displacement
+    hysteresis with the one of the fiber model (rms error relative to the peak
+    base shear, peak base shear and dissipated energy).
+    The springs have no strength degradation: the surrogate is only as good as
+    the stated accuracy on protocols like the calibration ones.
+
+    Usage:
+    Surrogate = CalibrateSurrogate(Params)
+    Result = RunSurrogate(Surrogate, dict(Params, iDmax=[0.01, 0.02]))
+
+    Run : python LibSurrogate.py   (calibration on the frame of the main script, accuracy
+                                    and speed against the fiber model on another protocol)
+"""
+
+# ===========================================================================
+# Import Libraries
+# ===========================================================================
+import openseespy.opensees as os
+import numpy as np
+import json
+import time
+from LibUnits import g
+from LibMaterialsRC import Steel02
+from LibGeneratePeaks import GenerateProtocol, ProtocolIncrements
+from LibAnalysisDriver import RunDisplacementProtocol, StepHooks
+from LibCapture import ResultCapture
+from LibFiberEngine import Steel02Fibers
+from LibFrameModel import BuildFrameModel, RunGravityAnalysis, RunCyclicProtocol
+
+
+# ===========================================================================
+# Main Code
+# ===========================================================================
+# parameters of Params used by RunSurrogate (the protocol and the analysis of the steps)
+ProtocolParams = ['iDmax', 'Dincr', 'CycleType', 'Ncycles', 'BatchSteps']
+
+
+def StoryHistory(Floors, BaseShear, FloorForce):
+    """
+    Story drifts and shears from the floor displacements (steps, NStory) and the base shear of each step.
+    The shear of story i is the base shear times the share of the lateral loads of the floors i and above.
+    """
+    Floors = np.asarray(Floors, dtype=float)
+    FloorForce = np.asarray(FloorForce, dtype=float)
+    Share = np.cumsum(FloorForce[::-1])[::-1]/FloorForce.sum()
+    Drift = np.diff(Floors, axis=1, prepend=0.0)
+    Shear = np.asarray(BaseShear, dtype=float)[:, None]*Share
+
+    return {'Drift': Drift, 'Shear': Shear, 'Disp': Floors[:, -1], 'BaseShear': np.asarray(BaseShear, dtype=float)}
+
+
+def FiberStoryResponse(Params, Verbose=False):
+    """
+    Run the fiber model of Params (gravity analysis and cyclic protocol) and capture the story response,
+    without recorder files.
+
+    Returns:
+    History: Dictionary of StoryHistory ('Drift', 'Shear', 'Disp' of the roof, 'BaseShear'), with 'ok' and
+             the 'WallTime' of the run.
+    """
+    tStart = time.perf_counter()
+    Model = BuildFrameModel(Params)
+    IDctrlDOF = Model['IDctrlDOF']
+    Capture = ResultCapture()
+    Capture.AddNode('Floors', Model['MasterNodes'], [IDctrlDOF], 'disp')
+    Capture.AddNode('RBase', Model['iSupportNode'], [IDctrlDOF], 'reaction')
+
+    ok = RunGravityAnalysis(Model, Params)
+    Floors0 = np.array([os.nodeDisp(Node, IDctrlDOF) for Node in Model['MasterNodes']])
+    if ok == 0:
+        ok, _ = RunCyclicProtocol(Model, Params, Verbose, OnStep=Capture.Sample)
+    os.wipe()
+
+    Floors = Capture.Data('Floors')[:, 1:] - Floors0
+    BaseShear = -Capture.Data('RBase')[:, 1:].sum(axis=1)
+    History = StoryHistory(Floors, BaseShear, Model['FloorForce'])
+    History.update({'ok': ok, 'WallTime': time.perf_counter() - tStart})
+    History['Frame'] = {'NStory': Model['NStory'], 'LBuilding': Model['LBuilding'],
+                        'FloorForce': np.asarray(Model['FloorForce'], dtype=float).tolist(),
+                        'FloorMass': (np.asarray(Model['FloorWeight'], dtype=float)/g).tolist()}
+
+    return History
+
+
+def ReplaySteel02(Drifts, Fy, E0, b, R0, cR1=0.925, cR2=0.15):
+    """
+    Force histories of Steel02 springs (one per candidate, the arguments are arrays of the candidates)
+    under each of the drift histories of Drifts, starting from the virgin state.
+
+    Returns:
+    Forces: List of arrays (candidates, steps), one per drift history.
+    """
+    Forces = []
+    for Drift in Drifts:
+        Spring = Steel02Fibers(*[np.array(Arg, dtype=float) for Arg in np.broadcast_arrays(Fy, E0, b, R0, cR1, cR2)])
+        Force = np.empty((np.size(Spring.Fy), len(Drift)))
+        for Step, Value in enumerate(Drift):
+            Force[:, Step], _ = Spring.Trial(np.full(np.shape(Spring.Fy), Value))
+            Spring.Commit()
+        Forces.append(Force)
+    return Forces
+
+
+def _InitialStiffness(Drift, Shear):
+    """
+    Least squares stiffness through the origin on the first loading branch of a history (up to the first
+    reversal, roundoff-size increments aside), below 40% of its peak shear (the first two steps if fewer).
+
+    Returns:
+    E0: Stiffness, 0.0 if the history does not move.
+    Npoints: Number of points of the fit.
+    """
+    Increment = np.diff(Drift, prepend=0.0)
+    Moving = np.flatnonzero(np.abs(Increment) > 1.e-6*np.abs(Drift).max())
+    if len(Moving) == 0:
+        return 0.0, 0
+    Reversal = Moving[np.sign(Increment[Moving]) != np.sign(Increment[Moving[0]])]
+    Branch = slice(0, Reversal[0] if len(Reversal) else len(Drift))
+    d, V = Drift[Branch], Shear[Branch]
+    Elastic = np.abs(V) <= 0.4*np.abs(V).max()
+    if Elastic.sum() < 2:
+        Elastic = np.arange(len(d)) < 2
+    return np.dot(d[Elastic], V[Elastic])/np.dot(d[Elastic], d[Elastic]), int(Elastic.sum())
+
+
+def FitStorySpring(Drifts, Shears, Ngrid=7, Nrefine=2, R0Values=(2.0, 4.0, 8.0, 14.0, 20.0)):
+    """
+    Fit a Steel02 spring to the shear - drift histories of one story.
+
+    Args:
+    Drifts, Shears: Lists of the drift and shear histories of the story, one per calibration run.
+    Ngrid: Number of values of Fy, E0 and b in the grid (optional, default=7).
+    Nrefine: Number of refinements of the grid around the best point, halving its ranges (optional, default=2).
+    R0Values: Values of R0 in the grid (optional, default=(2, 4, 8, 14, 20)).
+
+    Returns:
+    Spring: Dictionary with the Steel02 arguments ('Fy', 'E0', 'b', 'R0', 'cR1', 'cR2') and the 'Error', rms
+            of the shear error relative to the peak shear.
+    """
+    # initial stiffness: mean of the ones of the first loading branches of the runs, weighted by their points
+    E0, Npoints = np.array([_InitialStiffness(np.asarray(Drift, dtype=float), np.asarray(Shear, dtype=float))
+                            for Drift, Shear in zip(Drifts, Shears)]).T
+    if Npoints.sum() == 0:
+        raise ValueError("No loading branch in the calibration runs")
+    E0 = np.dot(E0, Npoints)/Npoints.sum()
+
+    Vmax = max(np.abs(Shear).max() for Shear in Shears)
+    Norm = np.sqrt(sum(len(Shear) for Shear in Shears))*Vmax
+
+    def Errors(Fy, E, b, R0):
+        Forces = ReplaySteel02(Drifts, Fy, E, b, R0)
+        return np.sqrt(sum(((Force - Shear)**2).sum(axis=1) for Force, Shear in zip(Forces, Shears)))/Norm
+
+    # grid of Fy, E0 (around the initial stiffness, which cracking already softens) and b, halved around the
+    # best point at each refinement; R0 from R0Values, then between the neighbours of the best value
+    Ranges = [(0.3*Vmax, 1.1*Vmax), (0.6*E0, 1.4*E0), (0.0, 0.3)]
+    Lower = [0.05*Vmax, 0.1*E0, 0.0]
+    R0Grid = np.asarray(R0Values, dtype=float)
+    for Refine in range(Nrefine + 1):
+        Axes = [np.linspace(*Range, Ngrid) for Range in Ranges] + [R0Grid]
+        Fy, E, b, R0 = [Axis.ravel() for Axis in np.meshgrid(*Axes, indexing='ij')]
+        Error = Errors(Fy, E, b, R0)
+        Best = np.argmin(Error)
+        Ranges = [(max(Value - 0.25*(High - Low), Bound), Value + 0.25*(High - Low))
+                  for Value, (Low, High), Bound in zip([Fy[Best], E[Best], b[Best]], Ranges, Lower)]
+        Near = np.unique(np.clip(np.searchsorted(R0Grid, R0[Best]) + np.array([-1, 0, 1]), 0, len(R0Grid) - 1))
+        R0Grid = np.linspace(R0Grid[Near[0]], R0Grid[Near[-1]], 3) if len(Near) > 1 else R0Grid[Near]
+
+    return {'Fy': float(Fy[Best]), 'E0': float(E[Best]), 'b': float(b[Best]), 'R0': float(R0[Best]),
+            'cR1': 0.925, 'cR2': 0.15, 'Error': float(Error[Best])}
+
+
+def CalibrateSurrogate(Params, Protocols=None, Tol=0.1, Verbose=True):
+    """
+    Calibrate the story springs of the surrogate on fiber-model runs of the frame of Params.
+
+    Args:
+    Params: Frame parameters (LibFrameModel.FrameParameters).
+    Protocols: List of overrides of the protocol of Params (ProtocolParams), one fiber run each, e.g.
+               [{'iDmax': [0.005, 0.01, 0.025]}] (optional, default=[{}], the protocol of Params).
+    Tol: Rms base-shear error, relative to the peak base shear, the surrogate should be within on the
+         calibration runs; a warning is printed otherwise (optional, default=0.1).
+
+    Returns:
+    Surrogate: Dictionary with the frame data ('NStory', 'LBuilding', 'FloorForce', 'FloorMass', 'IDctrlDOF'),
+               the 'Springs' (FitStorySpring), the 'Accuracy' on each calibration run (SurrogateAccuracy),
+               the 'Tol' and the wall time of the fiber runs and of the fit ('FiberTime', 'FitTime').
+    """
+    Protocols = Protocols or [{}]
+    for Overrides in Protocols:
+        Unknown = set(Overrides) - set(ProtocolParams)
+        if Unknown:
+            raise ValueError("Not protocol parameters: %s" % sorted(Unknown))
+
+    Histories = []
+    for Overrides in Protocols:
+        History = FiberStoryResponse(dict(Params, **Overrides))
+        if History['ok'] != 0:
+            print("Fiber run of %s incomplete, calibrated on the converged steps" % (Overrides or "Params"))
+        Histories.append(History)
+
+    tStart = time.perf_counter()
+    Surrogate = dict(Histories[0]['Frame'], IDctrlDOF=Params['IDctrlDOF'], Tol=Tol,
+                     FiberTime=sum(History['WallTime'] for History in Histories))
+    Surrogate['Springs'] = [FitStorySpring([History['Drift'][:, Story] for History in Histories],
+                                           [History['Shear'][:, Story] for History in Histories])
+                            for Story in range(Surrogate['NStory'])]
+    Surrogate['FitTime'] = time.perf_counter() - tStart
+
+    Surrogate['Accuracy'] = []
+    for Overrides, History in zip(Protocols, Histories):
+        Result = RunSurrogate(Surrogate, dict(Params, **Overrides))
+        Surrogate['Accuracy'].append(SurrogateAccuracy(History, Result))
+    if Verbose:
+        for Story, Spring in enumerate(Surrogate['Springs']):
+            print("Story %i: Fy %.4g, E0 %.4g, b %.3f, R0 %.1f, shear error %.3f" % (
+                Story + 1, Spring['Fy'], Spring['E0'], Spring['b'], Spring['R0'], Spring['Error']))
+        for Accuracy in Surrogate['Accuracy']:
+            print(AccuracyReport(Accuracy))
+    Worst = max(Accuracy['Error'] for Accuracy in Surrogate['Accuracy'])
+    if Worst > Tol:
+        print("WARNING: surrogate error %.3f above the tolerance %.3f on the calibration runs" % (Worst, Tol))
+
+    return Surrogate
+
+
+def SaveSurrogate(Surrogate, Path):
+    with open(Path, 'w') as File:
+        json.dump(Surrogate, File, indent=1)
+
+
+def LoadSurrogate(Path):
+    with open(Path) as File:
+        return json.load(File)
+
+
+def BuildSurrogate(Surrogate):
+    """
+    Define the surrogate in a clean domain: node 0 fixed at the base, node i at floor i with the floor mass,
+    a zeroLength Steel02 spring between the floors i-1 and i (material and element tag i).
+    """
+    os.wipe()
+    os.model('basic', '-ndm', 1, '-ndf', 1)
+    os.node(0, 0.0)
+    os.fix(0, 1)
+    for Floor, (Spring, Mass) in enumerate(zip(Surrogate['Springs'], Surrogate['FloorMass']), start=1):
+        os.node(Floor, 0.0, '-mass', Mass)
+        Steel02(*[Spring[Key] for Key in ['Fy', 'E0', 'b', 'R0', 'cR1', 'cR2']]).Define(Floor)
+        os.element('zeroLength', Floor, Floor - 1, Floor, '-mat', Floor, '-dir', 1)
+
+
+def RunSurrogate(Surrogate, Params, OnStep=None):
+    """
+    Run the cyclic protocol of Params (iDmax, Dincr, CycleType, Ncycles) on the surrogate, with the floor
+    forces of the frame and the displacement controlled at the roof.
+
+    Returns:
+    Result: Dictionary with ok, the protocol statistics, the roof displacement 'Disp' and the base shear
+            'BaseShear' (positive in the direction of the lateral loads) of every step, and the 'Time'.
+    """
+    BuildSurrogate(Surrogate)
+    IDctrlNode = Surrogate['NStory']
+    os.timeSeries("Linear", 200)
+    os.pattern("Plain", 200, 200)
+    for Floor, F in enumerate(Surrogate['FloorForce'], start=1):
+        os.load(Floor, F)
+
+    Test = ('NormDispIncr', 1.e-10*Surrogate['LBuilding'], 25, 0)
+    Algorithm = ('Newton',)
+    os.constraints('Plain')
+    os.numberer('Plain')
+    os.system('BandGeneral')
+    os.test(*Test)
+    os.algorithm(*Algorithm)
+
+    LBuilding = Surrogate['LBuilding']
+    Dincr = Params['Dincr']*LBuilding
+    os.integrator("DisplacementControl", IDctrlNode, 1, Dincr)
+    os.analysis("Static")
+    iDstep, iBlockStart = GenerateProtocol(Params['iDmax'], Dincr, Params['CycleType'], LBuilding, Params['Ncycles'])
+
+    Capture = ResultCapture()
+    Capture.AddNode('Roof', [IDctrlNode], [1], 'disp')
+    Capture.AddNode('RBase', [0], [1], 'reaction')
+    ok, Stats = RunDisplacementProtocol(IDctrlNode, 1, ProtocolIncrements(iDstep, iBlockStart), Test, Algorithm,
+                                        Batch=Params['BatchSteps'], OnStep=[Capture.Sample] + StepHooks(OnStep),
+                                        Verbose=False)
+    os.wipe()
+
+    Roof = Capture.Data('Roof')
+    return {'ok': ok, 'Stats': Stats, 'Time': Roof[:, 0], 'Disp': Roof[:, 1], 'BaseShear': -Capture.Data('RBase')[:, 1]}
+
+
+def _Travel(Disp):
+    return np.concatenate(([0.0], np.cumsum(np.abs(np.diff(Disp)))))
+
+
+def SurrogateAccuracy(Reference, Result):
+    """
+    Accuracy of the base shear - roof displacement hysteresis of the surrogate (Result of RunSurrogate) against
+    the fiber model (Reference, e.g. FiberStoryResponse or LibFrameModel.LoadResponse). The histories are
+    compared at equal travel of the roof (cumulated absolute displacement), so that they need not have the
+    same steps, up to the end of the shorter one.
+
+    Returns:
+    Accuracy: Dictionary with the rms base-shear 'Error' relative to the peak base shear of the reference,
+              the relative errors of the peak base shear 'PeakError' and of the dissipated energy
+              'EnergyError', the number of compared steps 'Nsteps' and 'Complete' (both protocols analysed
+              to the same travel).
+    """
+    TravelRef, TravelNew = _Travel(Reference['Disp']), _Travel(Result['Disp'])
+    Common = TravelRef <= TravelNew[-1]*(1.0 + 1.e-9)
+    VRef = np.asarray(Reference['BaseShear'])[Common]
+    VNew = np.interp(TravelRef[Common], TravelNew, Result['BaseShear'])
+    UNew = np.interp(TravelRef[Common], TravelNew, Result['Disp'])
+    URef = np.asarray(Reference['Disp'])[Common]
+
+    Peak = np.abs(VRef).max()
+    EnergyRef = np.trapezoid(VRef, URef)
+    EnergyNew = np.trapezoid(VNew, UNew)
+    return {'Error': float(np.sqrt(np.mean((VNew - VRef)**2))/Peak),
+            'PeakError': float(np.abs(VNew).max()/Peak - 1.0),
+            'EnergyError': float(EnergyNew/EnergyRef - 1.0) if EnergyRef != 0.0 else 0.0,
+            'Nsteps': int(Common.sum()), 'Complete': bool(abs(TravelNew[-1] - TravelRef[-1]) <= 1.e-6*TravelRef[-1])}
+
+
+def AccuracyReport(Accuracy):
+    """
+    One line summary of SurrogateAccuracy.
+    """
+    return "rms base-shear error %.1f%% of the peak, peak %+.1f%%, dissipated energy %+.1f%% over %i steps%s" % (
+        100*Accuracy['Error'], 100*Accuracy['PeakError'], 100*Accuracy['EnergyError'], Accuracy['Nsteps'],
+        "" if Accuracy['Complete'] else " (INCOMPLETE)")
+
+
+if __name__ == "__main__":
+    from LibFrameModel import FrameParameters
+    from LibFrameGenerator import FrameLayout
+
+    # Transformation and the roof diaphragm master as control node, as in BenchSuite.py
+    Params = FrameParameters(constraintsType="Transformation", nfCoreY=10, nfCoreZ=10, nfCoverY=10, nfCoverZ=10)
+    Layout = FrameLayout(Params['NStory'], Params['NBay'], Params['NBayZ'], Params['LCol'], Params['LBeam'], Params['LGird'])
+    Params['IDctrlNode'] = int(Layout['MasterTag'][-1])
+
+    Surrogate = CalibrateSurrogate(Params, [{'iDmax': [0.005, 0.01, 0.02, 0.03]}])
+    print("Calibration: fiber runs %.1f s, fit %.1f s" % (Surrogate['FiberTime'], Surrogate['FitTime']))
+
+    # validation on another protocol: other amplitudes, two cycles each
+    Validation = dict(Params, iDmax=[0.0075, 0.015, 0.025], Ncycles=2)
+    Reference = FiberStoryResponse(Validation)
+    tStart = time.perf_counter()
+    Result = RunSurrogate(Surrogate, Validation)
+    tSurrogate = time.perf_counter() - tStart
+    print("Validation: " + AccuracyReport(SurrogateAccuracy(Reference, Result)))
+    print("Fiber model %.2f s, surrogate %.4f s (%i steps), %.0f times faster" % (
+        Reference['WallTime'], tSurrogate, len(Result['Disp']), Reference['WallTime']/tSurrogate))
@@ -0,0 +1,289 @@
+"""
+Purpose :
+    LibSweep.py contains a parametric sweep runner for the 3D RC frame.
+
+    Every parameter set is run in its own worker process of a process pool, where
+    the model is rebuilt from scratch (LibFrameModel.py), so the global openseespy
+    domain of one run never leaks into another. Each run records into its own
+    directory, and the force-displacement curves of all runs are gathered into
+    one result table.
+
+    RunProtocolSweep is for sweeps of the lateral protocol only (iDmax, CycleType,
+    Ncycles, analysis settings): the model is built and the gravity analysis is
+    run once, then every protocol is a branch of that converged state in a child
+    process (os.fork, copy-on-write, POSIX only), so N protocols cost one model
+    build and one gravity analysis.
+
+    Run : python LibSweep.py   (example sweep over column size and concrete strength)
+"""
+
+# ===========================================================================
+# Import Libraries
+# ===========================================================================
+import os as os1
+import sys
+import time
+import pickle
+import signal
+import itertools
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+import pandas as pd
+import openseespy.opensees as os
+from LibCapture import RecorderSetCapture
+from LibFrameModel import (FrameParameters, RunCyclicPushover, BuildFrameModel, DefineRecorders, RunGravityAnalysis,
+                           RunCyclicProtocol, LoadResponse)
+
+
+# ===========================================================================
+# Main Code
+# ===========================================================================
+# parameters that the branches of RunProtocolSweep may change, they only act after the gravity analysis
+LateralParams = ['IDctrlNode', 'IDctrlDOF', 'iDmax', 'Dincr', 'CycleType', 'Ncycles', 'BatchSteps', 'AdaptiveSteps',
+                 'AdaptiveFallback', 'testTypeStatic', 'TolStatic', 'maxNumIterStatic', 'algorithmTypeStatic', 'Tol',
+                 'Output', 'SpillChunkSize']
+
+
+def ParameterGrid(**Axes):
+    """
+    All combinations of the parameter values, e.g. ParameterGrid(HCol=[24, 28], fc=[-4.0, -5.0]).
+
+    Returns:
+    Cases: List of dictionaries of parameter overrides.
+    """
+    Names = list(Axes)
+    return [dict(zip(Names, Values)) for Values in itertools.product(*[Axes[Name] for Name in Names])]
+
+
+def RunCase(CaseID, Overrides, CaseDir):
+    """
+    Run one parameter set, this is the function executed in the worker processes.
+
+    Returns:
+    CaseID, Result: the Result of RunCyclicPushover with the wall time of the whole run.
+    """
+    tStart = time.perf_counter()
+    Params = FrameParameters(**Overrides)
+    Result = RunCyclicPushover(Params, CaseDir)
+    Result['WallTime'] = time.perf_counter() - tStart
+    Result['CaseDir'] = CaseDir
+
+    return CaseID, Result
+
+
+def SweepTables(Cases, Results):
+    """
+    Gather the results of a sweep into a summary table (one row per case) and a table of
+    force-displacement curves (one row per recorded step of every case).
+    """
+    Rows = []
+    Curves = []
+    for CaseID, Overrides in enumerate(Cases):
+        Result = Results[CaseID]
+        Row = {'Case': CaseID}
+        # list-valued parameters (e.g. iDmax) are stored as text
+        Row.update({Name: (Value if np.isscalar(Value) else repr(Value)) for Name, Value in Overrides.items()})
+        Row.update({'ok': Result['ok'], 'okGravity': Result['okGravity'], 'WallTime': Result['WallTime'],
+                    'Nsteps': Result['Stats'].get('Nsteps', 0), 'StopReason': Result['Stats'].get('StopReason'),
+                    'MaxBaseShear': np.max(np.abs(Result['BaseShear']), initial=0.0),
+                    'MaxDisp': np.max(np.abs(Result['Disp']), initial=0.0), 'CaseDir': Result['CaseDir']})
+        Rows.append(Row)
+        Curves.append(pd.DataFrame({'Case': CaseID, 'Step': np.arange(len(Result['Disp'])), 'Time': Result['Time'],
+                                    'Disp': Result['Disp'], 'BaseShear': Result['BaseShear']}))
+
+    Summary = pd.DataFrame(Rows)
+    Curves = pd.concat(Curves, ignore_index=True) if Curves else pd.DataFrame()
+
+    return Summary, Curves
+
+
+def RunSweep(Cases, OutDir="SweepOut", Nproc=None, Verbose=True):
+    """
+    Run every parameter set of Cases in a pool of worker processes.
+
+    Args:
+    Cases: List of dictionaries of parameter overrides (see FrameParameters and ParameterGrid).
+    OutDir: Directory of the sweep, each case records into OutDir/case_NNNN (optional, default="SweepOut").
+    Nproc: Number of worker processes (optional, default=all cores).
+    Verbose: Print the progress of the sweep (optional, default=True).
+
+    Returns:
+    Summary: pandas DataFrame with one row per case (parameters, status, wall time, peaks).
+    Curves: pandas DataFrame with the force-displacement curves of all cases.
+    Both are also written to OutDir/SweepSummary.csv and OutDir/SweepCurves.csv.
+    """
+    # check every parameter set before starting the pool
+    for Overrides in Cases:
+        FrameParameters(**Overrides)
+
+    if not os1.path.exists(OutDir):
+        os1.makedirs(OutDir)
+    Nproc = Nproc or os1.cpu_count()
+
+    tStart = time.perf_counter()
+    Results = {}
+    with ProcessPoolExecutor(max_workers=Nproc) as Pool:
+        Futures = [Pool.submit(RunCase, CaseID, Overrides, os1.path.join(OutDir, "case_%04i" % CaseID))
+                   for CaseID, Overrides in enumerate(Cases)]
+        for Future in as_completed(Futures):
+            CaseID, Result = Future.result()
+            Results[CaseID] = Result
+            if Verbose:
+                print("Case %i of %i %s in %.1f s: %s" % (CaseID + 1, len(Cases), "DONE" if Result['ok'] == 0 else "INCOMPLETE",
+                                                         Result['WallTime'], Cases[CaseID]))
+
+    Summary, Curves = SweepTables(Cases, Results)
+    Summary.to_csv(os1.path.join(OutDir, "SweepSummary.csv"), index=False)
+    Curves.to_csv(os1.path.join(OutDir, "SweepCurves.csv"), index=False)
+
+    if Verbose:
+        print("Sweep of %i cases on %i processes in %.1f s" % (len(Cases), Nproc, time.perf_counter() - tStart))
+
+    return Summary, Curves
+
+
+def RunBranch(Model, Params, CaseDir):
+    """
+    Run the cyclic protocol of Params from the gravity state of the domain, recording to CaseDir;
+    this is the function executed in the child processes of RunProtocolSweep.
+
+    Returns:
+    Result: As RunCyclicPushover, without the gravity steps in 'Time', 'Disp' and 'BaseShear'.
+    """
+    if not os1.path.exists(CaseDir):
+        os1.makedirs(CaseDir)
+    Model = dict(Model, IDctrlDOF=Params['IDctrlDOF'])
+    if Params['IDctrlNode'] is not None:
+        Model['IDctrlNode'] = Params['IDctrlNode']
+
+    Capture = None
+    if Params['Output'] == "memory":
+        SpillDir = CaseDir if Params['SpillChunkSize'] else None
+        Capture = RecorderSetCapture(Model['IDctrlNode'], Model['iSupportNode'], SpillDir, Params['SpillChunkSize'] or 100000)
+    else:
+        DefineRecorders(Model, Params, CaseDir, "binary" if Params['Output'] == "binary" else "text")
+    try:
+        ok, Stats = RunCyclicProtocol(Model, Params, OnStep=Capture.Sample if Capture is not None else None)
+        os.wipe()      # closes the recorder files
+    finally:
+        if Capture is not None:
+            Capture.Close()
+
+    Result = {'ok': ok, 'okGravity': 0, 'Stats': Stats}
+    Result.update(LoadResponse(Model, Params, CaseDir, Capture))
+    return Result
+
+
+def RunProtocolSweep(Base, Cases, OutDir="SweepOut", Nproc=None, Verbose=True):
+    """
+    Build the frame of Base and run its gravity analysis once, then run every lateral protocol of Cases
+    from the gravity state, each in a child process forked from this one (at most Nproc at a time).
+    The recorders of a branch are defined after the fork, so its files start with the first lateral step.
+
+    Args:
+    Base: Dictionary of parameter overrides of the model and of the gravity analysis (see FrameParameters).
+    Cases: List of dictionaries of overrides of the LateralParams only (see ParameterGrid).
+    OutDir, Nproc, Verbose: As in RunSweep.
+
+    Returns:
+    Summary, Curves: As in RunSweep, also written to OutDir/SweepSummary.csv and OutDir/SweepCurves.csv.
+    """
+    for Overrides in Cases:
+        Other = set(Overrides) - set(LateralParams)
+        if Other:
+            raise ValueError("Parameters of the model or of the gravity analysis in a protocol sweep: %s"
+                             % ", ".join(sorted(Other)))
+        FrameParameters(**dict(Base, **Overrides))
+
+    if not os1.path.exists(OutDir):
+        os1.makedirs(OutDir)
+    Nproc = Nproc or os1.cpu_count()
+
+    tStart = time.perf_counter()
+    Params = FrameParameters(**Base)
+    Model = BuildFrameModel(Params)
+    if RunGravityAnalysis(Model, Params) != 0:
+        os.wipe()
+        raise RuntimeError("The gravity analysis of the protocol sweep did not converge")
+    if Verbose:
+        print("Model and gravity analysis in %.1f s" % (time.perf_counter() - tStart))
+
+    Results = {}
+    Running = {}
+
+    def WaitBranch():
+        # the first of the branches of this sweep to end (os1.wait would also reap other children of the process)
+        Pid, Status = 0, 0
+        while not Pid:
+            for Branch in Running:
+                Pid, Status = os1.waitpid(Branch, os1.WNOHANG)
+                if Pid:
+                    break
+            else:
+                time.sleep(0.01)
+        CaseID = Running.pop(Pid)
+        ResultPath = os1.path.join(OutDir, "case_%04i" % CaseID, "Result.pkl")
+        ExitCode = os1.waitstatus_to_exitcode(Status)
+        if ExitCode != 0 or not os1.path.exists(ResultPath):
+            raise RuntimeError("Branch %i of the protocol sweep ended with exit status %i without a result"
+                               % (CaseID, ExitCode))
+        with open(ResultPath, 'rb') as File:
+            Results[CaseID] = pickle.load(File)
+        if Verbose:
+            print("Case %i of %i %s in %.1f s: %s" % (CaseID + 1, len(Cases), "DONE" if Results[CaseID]['ok'] == 0
+                                                     else "INCOMPLETE", Results[CaseID]['WallTime'], Cases[CaseID]))
+
+    try:
+        for CaseID, Overrides in enumerate(Cases):
+            while len(Running) >= Nproc:
+                WaitBranch()
+            CaseDir = os1.path.join(OutDir, "case_%04i" % CaseID)
+            # the result of an earlier sweep in OutDir is not the result of this branch
+            if os1.path.exists(os1.path.join(CaseDir, "Result.pkl")):
+                os1.remove(os1.path.join(CaseDir, "Result.pkl"))
+            sys.stdout.flush()
+            sys.stderr.flush()
+            Pid = os1.fork()
+            if Pid == 0:
+                # the branch: never returns to the caller
+                Status = 1
+                try:
+                    tCase = time.perf_counter()
+                    Result = RunBranch(Model, FrameParameters(**dict(Base, **Overrides)), CaseDir)
+                    Result['WallTime'] = time.perf_counter() - tCase
+                    Result['CaseDir'] = CaseDir
+                    with open(os1.path.join(CaseDir, "Result.pkl"), 'wb') as File:
+                        pickle.dump(Result, File)
+                    Status = 0
+                except BaseException:
+                    traceback.print_exc()
+                finally:
+                    sys.stdout.flush()
+                    sys.stderr.flush()
+                    os1._exit(Status)
+            Running[Pid] = CaseID
+        while Running:
+            WaitBranch()
+    finally:
+        # after an error, the branches still running are ended and reaped
+        for Pid in Running:
+            os1.kill(Pid, signal.SIGKILL)
+            os1.waitpid(Pid, 0)
+        os.wipe()
+
+    Summary, Curves = SweepTables(Cases, Results)
+    Summary.to_csv(os1.path.join(OutDir, "SweepSummary.csv"), index=False)
+    Curves.to_csv(os1.path.join(OutDir, "SweepCurves.csv"), index=False)
+
+    if Verbose:
+        print("Protocol sweep of %i cases on %i processes in %.1f s" % (len(Cases), Nproc, time.perf_counter() - tStart))
+
+    return Summary, Curves
+
+
+if __name__ == "__main__":
+    from LibUnits import inch, ksi
+    Cases = ParameterGrid(HCol=[24*inch, 28*inch, 32*inch], fc=[-4.0*ksi, -5.0*ksi], iDmax=[[0.005, 0.01, 0.025]])
+    Summary, Curves = RunSweep(Cases)
+    print(Summary)
@@ -0,0 +1,134 @@
+"""
+Purpose :
+    LibTermination.py contains the early termination of the cyclic and monotonic
+    (CycleType "Push") pushover protocols: a TerminationMonitor is sampled after
+    every converged step (OnStep) and its Stop function, given to
+    RunDisplacementProtocol, ends the protocol cleanly at the first step where a
+    criterion is met, with the reason in Stats['StopReason'].
+
+    Criteria (None: not used):
+    MinShearRatio  the base shear, sum of the support reactions, drops below this
+                   fraction of its peak in the same direction at a displacement
+                   on the envelope (as far as or beyond the largest one so far in
+                   that direction): the strength loss, not the unloading branches
+    DriftLimit     the roof drift ratio reaches this value
+    Fibers         the strain of a fiber (e.g. the core concrete and steel fibers
+                   of the SSconcEle1sec1/SSreinfEle1sec1 recorders, RecorderFibers)
+                   goes below or above its limits
+
+    Usage:
+    Monitor = TerminationMonitor(IDctrlNode, IDctrlDOF, iSupportNode, LBuilding, MinShearRatio=0.8,
+                                 Fibers=RecorderFibers(1111, np, yFiber, zFiber, ConcreteStrain=-0.02))
+    ok, Stats = RunDisplacementProtocol(..., OnStep=Monitor.Sample, Stop=Monitor.Stop)
+    Stats['StopReason']                   # None if the whole protocol was analysed
+"""
+
+# ===========================================================================
+# Import Libraries
+# ===========================================================================
+import openseespy.opensees as os
+import numpy as np
+from LibMaterialsRC import IDconcCore, IDSteel
+
+
+# ===========================================================================
+# Main Code
+# ===========================================================================
+def RecorderFibers(IDele, Section, yFiber, zFiber, ConcreteStrain=None, SteelStrain=None):
+    """
+    Fibers of the SSconcEle1sec1 (core concrete) and SSreinfEle1sec1 (steel) recorders with their strain limits.
+
+    Args:
+    IDele, Section, yFiber, zFiber: Element, integration point and fiber location of the recorders.
+    ConcreteStrain: Compressive (negative) strain limit of the core concrete (optional, default=None).
+    SteelStrain: Limit of the absolute strain of the steel (optional, default=None).
+
+    Returns:
+    Fibers: List of (Name, eleResponse arguments, StrainMin, StrainMax) for TerminationMonitor.
+    """
+    Fibers = []
+    if ConcreteStrain is not None:
+        Fibers.append(("core concrete strain (SSconcEle1sec1)",
+                       (IDele, 'section', Section, 'fiber', yFiber, zFiber, IDconcCore, 'stressStrain'), ConcreteStrain, np.inf))
+    if SteelStrain is not None:
+        Fibers.append(("steel strain (SSreinfEle1sec1)",
+                       (IDele, 'section', Section, 'fiber', yFiber, zFiber, IDSteel, 'stressStrain'), -SteelStrain, SteelStrain))
+    return Fibers
+
+
+class TerminationMonitor:
+    """
+    Termination criteria of a displacement-controlled protocol, evaluated after every step (Sample);
+    Stop() gives the reason of the termination, None before.
+    """
+
+    def __init__(self, IDctrlNode, IDctrlDOF, SupportNodes, Height, MinShearRatio=None, DriftLimit=None, Fibers=()):
+        """
+        Args:
+        IDctrlNode, IDctrlDOF: Control node and degree of freedom of the protocol.
+        SupportNodes: Nodes of the support reactions, summed to the base shear in IDctrlDOF.
+        Height: Height of the building, for the drift ratio.
+        MinShearRatio, DriftLimit, Fibers: Criteria (optional, see the module, default=None, None, ()).
+        """
+        self.IDctrlNode, self.IDctrlDOF = IDctrlNode, IDctrlDOF
+        self.SupportNodes = list(SupportNodes)
+        self.Height = Height
+        self.MinShearRatio, self.DriftLimit, self.Fibers = MinShearRatio, DriftLimit, list(Fibers)
+        self.MaxDisp = {1.0: 0.0, -1.0: 0.0}        # largest displacement and peak base shear in each direction
+        self.PeakShear = {1.0: 0.0, -1.0: 0.0}
+        self.Tol = 1.e-9*Height
+        self.Nsteps = 0
+        self.Reason = None
+
+    def BaseShear(self):
+        os.reactions()
+        return -sum(os.nodeReaction(Node, self.IDctrlDOF) for Node in self.SupportNodes)
+
+    def Sample(self):
+        self.Nsteps += 1
+        if self.Reason is not None:
+            return
+        D = os.nodeDisp(self.IDctrlNode, self.IDctrlDOF)
+        Drift = abs(D)/self.Height
+        if self.DriftLimit is not None and Drift >= self.DriftLimit*(1.0 - 1.e-9):
+            self.Reason = "roof drift %.4f reached the limit %.4f" % (Drift, self.DriftLimit)
+
+        if self.MinShearRatio is not None and self.Reason is None:
+            Direction = float(np.sign(D)) if abs(D) > self.Tol else 0.0
+            if Direction != 0.0:
+                V = Direction*self.BaseShear()
+                if Direction*D >= self.MaxDisp[Direction] - self.Tol:
+                    if self.PeakShear[Direction] > 0.0 and V < self.MinShearRatio*self.PeakShear[Direction]:
+                        self.Reason = "base shear %.4g below %.2f of its peak %.4g at drift %.4f" % (
+                            Direction*V, self.MinShearRatio, Direction*self.PeakShear[Direction], Drift)
+                    self.MaxDisp[Direction] = max(self.MaxDisp[Direction], Direction*D)
+                self.PeakShear[Direction] = max(self.PeakShear[Direction], V)
+
+        for Name, Args, StrainMin, StrainMax in self.Fibers:
+            if self.Reason is not None:
+                break
+            Strain = os.eleResponse(*Args)[1]
+            if not StrainMin <= Strain <= StrainMax:
+                self.Reason = "%s %.5f beyond the limit %.5f at drift %.4f" % (
+                    Name, Strain, StrainMin if Strain < StrainMin else StrainMax, Drift)
+
+        if self.Reason is not None:
+            self.Reason = "step %i: %s" % (self.Nsteps, self.Reason)
+
+    def Stop(self):
+        return self.Reason
+
+
+def FrameTermination(Model, Params):
+    """
+    TerminationMonitor of the frame of LibFrameModel.BuildFrameModel from Params['Termination'], a dictionary of
+    'MinShearRatio', 'DriftLimit', 'ConcreteStrain' and 'SteelStrain' (the fibers of DefineRecorders).
+    """
+    Criteria = dict(Params['Termination'])
+    Unknown = set(Criteria) - {'MinShearRatio', 'DriftLimit', 'ConcreteStrain', 'SteelStrain'}
+    if Unknown:
+        raise ValueError("Unknown termination criteria: %s" % sorted(Unknown))
+    Fibers = RecorderFibers(Model['Columns'][0], Params['np'], Params['HCol']/2 - Params['cover'],
+                            Params['BCol']/2 - Params['cover'], Criteria.get('ConcreteStrain'), Criteria.get('SteelStrain'))
+    return TerminationMonitor(Model['IDctrlNode'], Model['IDctrlDOF'], Model['iSupportNode'], Model['LBuilding'],
+                              Criteria.get('MinShearRatio'), Criteria.get('DriftLimit'), Fibers)
@@ -0,0 +1,267 @@
+"""
+Purpose :
+    LibTransient.py contains the driver of the nonlinear time-history analyses
+    of the frame under a ground-motion record (LibGroundMotion.py).
+
+    RayleighDamping sets mass and committed-stiffness proportional damping with
+    the damping ratio at the periods of two modes of an eigen analysis, by
+    default the first two modes with a share of the mass in the direction of
+    the excitation (ParticipatingModes): the first modes of a frame about as
+    stiff in X and Z are X, Z and torsion at nearly the same period, and
+    anchoring at two of them would leave the higher modes almost undamped by
+    the mass term and overdamped by the stiffness term.
+    GroundMotionPattern applies a record as a uniform excitation of all the
+    supports (a Path time series of the accelerations in g, scaled to the model
+    units). The accelerations are passed as -values arguments: about 1 ms for
+    8000 points and 17 ms for 40000, where OpenSees takes 5 to 10 times longer
+    to read them back from a text file (-filePath).
+    RunTransient analyses the record with the Newmark average acceleration
+    method: the steps are analysed with a single analyze(n, dt)
+    call, as in LibAnalysisDriver.py, and a step that fails is analysed again
+    with the time step halved (up to MaxHalvings times, with the fallback
+    algorithms of the static driver at the smallest one), then the analysis
+    goes back to dt. A Stop function (e.g. StoryDriftMonitor.Stop at the
+    collapse drift of an IDA, LibIDA.py) ends the analysis early.
+
+    Usage (LibFrameModel.RunTimeHistory does all of it for the frame):
+    Periods = RayleighDamping(0.05, Direction=1)
+    GroundMotionPattern(LoadRecord(Path), Scale=1.0, Direction=1)
+    ok, Stats = RunTransient(Record['Duration'], Record['dt'], ('EnergyIncr', 1.e-8, 10, 0), ('Newton',))
+"""
+
+# ===========================================================================
+# Import Libraries
+# ===========================================================================
+import openseespy.opensees as os
+import numpy as np
+import time
+from LibUnits import g
+from LibAnalysisDriver import StepHooks
+
+
+# ===========================================================================
+# Main Code
+# ===========================================================================
+def _Eigen(Nmodes):
+    # Arpack needs about twice Nmodes independent masses, more than a rigid-floor model of a few stories has
+    try:
+        return np.array(os.eigen(Nmodes))
+    except os.OpenSeesError:
+        return np.array(os.eigen('-fullGenLapack', Nmodes))
+
+
+def ParticipatingModes(Direction=1, Nmodes=6, MinMassRatio=0.02):
+    """
+    Effective modal masses of the first Nmodes modes of the current model in Direction, from the nodal masses and
+    the mode shapes: (sum m phi_d)^2/(sum m phi.phi) over the total mass in Direction.
+
+    Args:
+    Direction: Degree of freedom of the excitation (optional, default=1).
+    Nmodes: Number of modes of the eigen analysis (optional, default=6: the first two translational modes in
+            each direction and the first two torsional modes of a regular frame).
+    MinMassRatio: Modes with a smaller share of the mass in Direction do not participate (optional, default=0.02).
+
+    Returns:
+    Modes: Numbers of the participating modes.
+    Periods: Periods of the Nmodes modes.
+    MassRatio: Effective modal mass of the Nmodes modes in Direction, relative to the total mass in Direction.
+    """
+    Omega = np.sqrt(_Eigen(Nmodes))
+    Nodes = [Node for Node in os.getNodeTags() if any(os.nodeMass(Node))]
+    Mass = np.array([os.nodeMass(Node) for Node in Nodes])
+    Phi = np.array([[os.nodeEigenvector(Node, Mode) for Node in Nodes] for Mode in range(1, Nmodes + 1)])
+    L = np.einsum('n,kn->k', Mass[:, Direction - 1], Phi[:, :, Direction - 1])
+    MassRatio = L**2/np.einsum('nd,knd->k', Mass, Phi**2)/Mass[:, Direction - 1].sum()
+    return [int(Mode) for Mode in np.flatnonzero(MassRatio >= MinMassRatio) + 1], 2.0*np.pi/Omega, MassRatio
+
+
+def RayleighDamping(Zeta=0.05, Modes=None, Direction=1, Nmodes=6):
+    """
+    Rayleigh damping of the current model, proportional to the mass and to the committed stiffness, with the
+    damping ratio Zeta at the circular frequencies wi, wj of two modes:
+    alphaM = 2 Zeta wi wj/(wi + wj), betaK = 2 Zeta/(wi + wj).
+
+    Args:
+    Zeta: Damping ratio (optional, default=0.05).
+    Modes: Numbers of the two modes, None for the first two modes that participate in Direction (optional,
+           see ParticipatingModes, default=None).
+    Direction: Degree of freedom of the excitation (optional, default=1).
+    Nmodes: Number of modes of the eigen analysis with Modes None (optional, default=6).
+
+    Returns:
+    Periods: Periods of the first Nmodes modes, or max(Modes).
+    """
+    if Modes is None:
+        Modes, Periods, _ = ParticipatingModes(Direction, Nmodes)
+        if len(Modes) < 2:
+            raise ValueError("Less than 2 of the first %i modes participate in direction %i" % (Nmodes, Direction))
+        Omega = 2.0*np.pi/Periods
+    else:
+        Omega = np.sqrt(_Eigen(max(Modes)))
+    wi, wj = Omega[Modes[0] - 1], Omega[Modes[1] - 1]
+    alphaM = 2.0*Zeta*wi*wj/(wi + wj)
+    betaK = 2.0*Zeta/(wi + wj)
+    os.rayleigh(alphaM, 0.0, 0.0, betaK)
+
+    return 2.0*np.pi/Omega
+
+
+def GroundMotionPattern(Record, Scale=1.0, Direction=1, Tag=300):
+    """
+    Uniform excitation of the supports in Direction by the accelerations of Record (LibGroundMotion.LoadRecord),
+    times Scale, in the units of the model (the record units are g).
+    """
+    if Record['Units'] != "g":
+        raise ValueError("Record %s is in %s, not in g" % (Record['Name'], Record['Units']))
+    os.timeSeries('Path', Tag, '-dt', Record['dt'], '-values', *np.asarray(Record['Accel']).tolist(), '-factor', Scale*g)
+    os.pattern('UniformExcitation', Tag, Direction, '-accel', Tag)
+
+
+def _Fallbacks(dt, Test, Algorithm, TolConverge, Verbose):
+    """
+    The fallback algorithms of LibAnalysisDriver.TryFallbacks for one transient step of dt.
+    """
+    Fallbacks = [(('NormDispIncr', TolConverge, 2000, 0), ('Newton', '-initial')),
+                 (Test, ('Broyden', 8)),
+                 (Test, ('NewtonLineSearch', 0.8))]
+    ok = -1
+    for FallbackTest, FallbackAlgorithm in Fallbacks:
+        if Verbose:
+            print("Trying %s .." % " ".join(str(Arg) for Arg in FallbackAlgorithm))
+        os.test(*FallbackTest)
+        os.algorithm(*FallbackAlgorithm)
+        ok = os.analyze(1, dt)
+        os.test(*Test)
+        os.algorithm(*Algorithm)
+        if ok == 0:
+            break
+    return ok
+
+
+class StoryDriftMonitor:
+    """
+    Peak interstory drift ratio of the frame during an analysis, from the displacements of the floor
+    nodes after every step (Sample as an OnStep function), with Stop() True once it reaches Limit.
+    """
+
+    def __init__(self, Nodes, Elevations, DOF=1, Limit=None):
+        """
+        Args:
+        Nodes: Node of every floor, from the first one up (e.g. Model['MasterNodes']).
+        Elevations: Elevation of every floor above the base (e.g. Model['FloorHeight']).
+        DOF: Direction of the drifts (optional, default=1).
+        Limit: Drift ratio of Stop (optional, default=None: never).
+        """
+        self.Nodes = list(Nodes)
+        self.Heights = np.diff(np.asarray(Elevations, dtype=float), prepend=0.0)
+        self.DOF = DOF
+        self.Limit = Limit
+        self.Peak = 0.0
+        self.Story = 0
+
+    def Sample(self):
+        U = np.array([os.nodeDisp(Node, self.DOF) for Node in self.Nodes])
+        Drift = np.abs(np.diff(U, prepend=0.0))/self.Heights
+        iStory = int(np.argmax(Drift))
+        if Drift[iStory] > self.Peak:
+            self.Peak, self.Story = float(Drift[iStory]), iStory + 1
+
+    def Stop(self):
+        return self.Limit is not None and self.Peak >= self.Limit
+
+
+def RunTransient(Duration, dt, Test, Algorithm, TolConverge=1.e-6, MaxHalvings=4, OnStep=None, Verbose=True,
+                 Gamma=0.5, Beta=0.25, Stop=None):
+    """
+    Run a transient analysis of the current model from the current time for Duration, with time steps dt.
+    The constraints, numberer, system, test and algorithm are defined, without a static analysis
+    (os.wipeAnalysis() after the gravity analysis).
+
+    Args:
+    Duration: Length of the analysis, e.g. Record['Duration'] plus some free vibration.
+    dt: Time step of the analysis (the record dt or a fraction of it).
+    Test: Arguments of the default convergence test, e.g. ('EnergyIncr', 1.e-8, 10, 0).
+    Algorithm: Arguments of the default algorithm, e.g. ('Newton',).
+    TolConverge: Tolerance of the NormDispIncr test of the fallback with initial tangent (optional, default=1.e-6).
+    MaxHalvings: A failed step is analysed again with dt/2, dt/4, ... dt/2**MaxHalvings, then with the fallbacks
+                 at the smallest one (optional, default=4; 0: the fallbacks at dt).
+    OnStep: Function or list of functions called after every converged step, the steps are then analysed
+            with analyze(1, dt) calls (optional, default=None).
+    Verbose: Print the time step reductions and fallbacks (optional, default=True).
+    Gamma, Beta: Newmark parameters (optional, default=average acceleration).
+    Stop: Function called after every step, that returns True to end the analysis there, the steps are then
+          analysed with analyze(1, dt) calls (optional, default=None).
+
+    Returns:
+    ok: 0 if the whole duration was analysed, or if Stop ended it.
+    Stats: Dictionary with the number of steps (of dt, and of the reduced steps 'NstepsReduced'), analyze calls,
+           reductions of the time step ('Nhalvings'), fallbacks, the smallest time step, the wall time and
+           whether Stop ended the analysis ('Stopped').
+    """
+    Nsteps = int(round(Duration/dt))
+    Stats = {'Nsteps': 0, 'NstepsTotal': Nsteps, 'Nanalyze': 0, 'NstepsReduced': 0, 'Nhalvings': 0,
+             'Nfallback': 0, 'dtMin': dt, 'WallTime': 0.0, 'Stopped': False}
+    tStart = time.perf_counter()
+    Hooks = StepHooks(OnStep)
+    os.integrator('Newmark', Gamma, Beta)
+    os.analysis('Transient')
+
+    Time0 = os.getTime()
+    ok = 0
+    while Stats['Nsteps'] < Nsteps:
+        if Stop is not None and Stop():
+            Stats['Stopped'] = True
+            break
+        Nstep = 1 if Hooks or Stop is not None else Nsteps - Stats['Nsteps']
+        Stats['Nanalyze'] += 1
+        ok = os.analyze(Nstep, dt)
+        if ok == 0:
+            Stats['Nsteps'] += Nstep
+            for Hook in Hooks:
+                Hook()
+            continue
+
+        # steps of this call that converged before the failing one, then the failed step with reduced time steps
+        Stats['Nsteps'] = int(round((os.getTime() - Time0)/dt))
+        Target = Time0 + (Stats['Nsteps'] + 1)*dt
+        Level = min(1, MaxHalvings)       # MaxHalvings=0: the fallbacks at dt
+        Stats['Nhalvings'] += Level
+        while os.getTime() < Target - 1.e-9*dt:
+            dtReduced = min(dt/2**Level, Target - os.getTime())
+            ok = -1
+            if Level > 0:
+                if Verbose:
+                    print("Time %.4f: time step reduced to %.3g" % (os.getTime(), dtReduced))
+                Stats['Nanalyze'] += 1
+                ok = os.analyze(1, dtReduced)
+            if ok != 0 and Level >= MaxHalvings:
+                Stats['Nfallback'] += 1
+                ok = _Fallbacks(dtReduced, Test, Algorithm, TolConverge, Verbose)
+                if ok != 0:
+                    break
+            if ok != 0:
+                Level += 1
+                Stats['Nhalvings'] += 1
+                continue
+            Stats['NstepsReduced'] += 1
+            Stats['dtMin'] = min(Stats['dtMin'], dtReduced)
+            for Hook in Hooks:
+                Hook()
+        if ok != 0:
+            break
+        Stats['Nsteps'] += 1
+
+    Stats['WallTime'] = time.perf_counter() - tStart
+    return ok, Stats
+
+
+def TransientReport(Stats):
+    """
+    Text summary of the statistics returned by RunTransient.
+    """
+    return ("%i steps of %i in %.3f s (%.3f ms/step), %i analyze calls, %i time step halvings (smallest %.3g), "
+            "%i reduced steps, %i fallbacks" % (Stats['Nsteps'], Stats['NstepsTotal'], Stats['WallTime'],
+                                                1e3*Stats['WallTime']/max(Stats['Nsteps'], 1), Stats['Nanalyze'],
+                                                Stats['Nhalvings'], Stats['dtMin'], Stats['NstepsReduced'],
+                                                Stats['Nfallback'])
+            + (", stopped" if Stats.get('Stopped') else ""))
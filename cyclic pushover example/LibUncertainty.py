@@ -0,0 +1,333 @@
+"""
+Purpose :
+    LibUncertainty.py contains the propagation of the uncertainty of the material
+    constants of LibMaterialsRC.py (fc, Kfc, Fy, Es, Bs, ... parameters of
+    LibFrameModel.FrameParameters) to the cyclic pushover of the frame.
+
+    The constants are sampled by Latin hypercube (LatinHypercube): one stratum
+    of probability 1/n per sample and per variable, mapped to normal, lognormal
+    or uniform distributions, with an optional rank correlation between the
+    variables imposed by the Iman-Conover reordering (ImanConover), which keeps
+    the stratified marginals. The samples are drawn in Latin hypercube batches,
+    and a batch is always run whole: the samples are a union of Latin hypercubes.
+
+    Every sample is a run in a pool of worker processes, either of the fiber
+    frame (RunSampleFrame, results in memory) or of a surrogate of
+    LibSurrogate.py (RunSampleSurrogate, story springs scaled with the steel
+    yield stress, the steel hardening ratio and the concrete modulus of the
+    sample; the surrogate has no model of the other constants, which can then
+    not be sampled, see SurrogateVariables). A worker returns only
+    the scalar outputs of its run (peak base shear, dissipated energy, residual
+    drift), added to running means and variances (RunningStats, Welford), so no
+    time history is kept. The sampling ends after the first complete batch where
+    the confidence interval of the mean of every output is within RelTol of the
+    mean, or at MaxSamples.
+
+    Usage:
+    Samples, Summary = RunUncertainty(Params, DefaultVariables, Correlation={('fc', 'Kfc'): 0.5})
+    print(Summary)
+
+    Run : python LibUncertainty.py   (surrogate of the frame of the main script, sampled until
+                                      the 95% confidence intervals are within 1%)
+"""
+
+# ===========================================================================
+# Import Libraries
+# ===========================================================================
+import numpy as np
+import pandas as pd
+import os as os1
+import time
+from statistics import NormalDist
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+import LibMaterialsRC
+from LibFrameModel import FrameParameters, RunCyclicPushover
+from LibHysteresis import HysteresisMetrics
+from LibSurrogate import RunSurrogate
+
+
+# ===========================================================================
+# Main Code
+# ===========================================================================
+# distributions of the material constants: (Distribution, mean, coefficient of variation) for "normal"
+# and "lognormal" (a negative mean, e.g. fc, keeps its sign), ("uniform", low, high)
+DefaultVariables = {
+    'fc': ("lognormal", LibMaterialsRC.fc, 0.15),
+    'Kfc': ("normal", LibMaterialsRC.Kfc, 0.05),
+    'Fy': ("lognormal", LibMaterialsRC.Fy, 0.10),
+    'Es': ("normal", LibMaterialsRC.Es, 0.03),
+    'Bs': ("uniform", 0.005, 0.02),
+}
+
+# constants modelled by ScaleSurrogate, and their distributions
+SurrogateVariables = {Name: DefaultVariables[Name] for Name in ['fc', 'Fy', 'Bs']}
+
+# outputs of a sample run
+Outputs = ['MaxBaseShear', 'Energy', 'MaxResidualDrift']
+
+InverseNormal = np.vectorize(NormalDist().inv_cdf)
+
+
+class RunningStats:
+    """
+    Running count, mean, variance, minimum and maximum of named outputs (Welford), one sample at a time.
+    """
+
+    def __init__(self, Names):
+        self.Names = list(Names)
+        self.N = 0
+        self.Mean = np.zeros(len(self.Names))
+        self.M2 = np.zeros(len(self.Names))
+        self.Min = np.full(len(self.Names), np.inf)
+        self.Max = np.full(len(self.Names), -np.inf)
+
+    def Add(self, Row):
+        x = np.array([Row[Name] for Name in self.Names], dtype=float)
+        self.N += 1
+        Delta = x - self.Mean
+        self.Mean += Delta/self.N
+        self.M2 += Delta*(x - self.Mean)
+        np.minimum(self.Min, x, out=self.Min)
+        np.maximum(self.Max, x, out=self.Max)
+
+    def Std(self):
+        return np.sqrt(self.M2/(self.N - 1)) if self.N > 1 else np.full(len(self.Names), np.nan)
+
+    def HalfWidth(self, Confidence=0.95):
+        """
+        Half width of the confidence interval of the means (normal approximation, conservative for
+        Latin hypercube samples).
+        """
+        return NormalDist().inv_cdf(0.5 + 0.5*Confidence)*self.Std()/np.sqrt(max(self.N, 1))
+
+    def Converged(self, RelTol, Confidence=0.95):
+        return self.N > 1 and bool(np.all(self.HalfWidth(Confidence) <= RelTol*np.abs(self.Mean)))
+
+    def Table(self, Confidence=0.95):
+        return pd.DataFrame({'N': self.N, 'Mean': self.Mean, 'Std': self.Std(),
+                             'CoV': self.Std()/np.abs(self.Mean), 'HalfWidth': self.HalfWidth(Confidence),
+                             'Min': self.Min, 'Max': self.Max}, index=self.Names)
+
+
+def LatinHypercube(Nsamples, Nvariables, rng):
+    """
+    Latin hypercube of uniform variables: every column has one value in each of the Nsamples strata of (0, 1).
+    """
+    Strata = np.argsort(rng.random((Nsamples, Nvariables)), axis=0)
+    return (Strata + rng.random((Nsamples, Nvariables)))/Nsamples
+
+
+def ImanConover(Sample, Correlation, rng):
+    """
+    Reorder the columns of Sample so that their rank correlation is close to the matrix Correlation
+    (Iman and Conover, 1982); the values of every column are kept.
+    """
+    Nsamples, Nvariables = Sample.shape
+    Scores = InverseNormal(np.arange(1, Nsamples + 1)/(Nsamples + 1))
+    S = np.column_stack([rng.permutation(Scores) for _ in range(Nvariables)])
+    Q = np.linalg.cholesky(np.corrcoef(S, rowvar=False))
+    P = np.linalg.cholesky(Correlation)
+    T = S @ np.linalg.inv(Q).T @ P.T
+    Ranks = np.argsort(np.argsort(T, axis=0), axis=0)
+    return np.take_along_axis(np.sort(Sample, axis=0), Ranks, axis=0)
+
+
+def CorrelationMatrix(Names, Correlation):
+    """
+    Correlation matrix of the variables Names from a dictionary {(Name1, Name2): rho}.
+    """
+    C = np.eye(len(Names))
+    for (Name1, Name2), rho in Correlation.items():
+        i, j = Names.index(Name1), Names.index(Name2)
+        C[i, j] = C[j, i] = rho
+    return C
+
+
+def SampleVariables(Variables, Nsamples, rng, Correlation=None):
+    """
+    Latin hypercube sample of the variables.
+
+    Args:
+    Variables: Dictionary of the distributions (see DefaultVariables).
+    Nsamples: Number of samples.
+    rng: numpy random Generator.
+    Correlation: Rank correlations {(Name1, Name2): rho}, imposed on more samples than variables only
+                 (optional, default=None: independent).
+
+    Returns:
+    Samples: List of Nsamples dictionaries of parameter overrides.
+    """
+    Names = list(Variables)
+    if Correlation and Nsamples <= len(Names):
+        raise ValueError("The rank correlations need more samples than the %i variables, not %i" % (len(Names), Nsamples))
+    U = LatinHypercube(Nsamples, len(Names), rng)
+    Values = np.empty_like(U)
+    for j, Name in enumerate(Names):
+        Distribution, a, b = Variables[Name]
+        if Distribution == "normal":
+            Values[:, j] = a*(1.0 + b*InverseNormal(U[:, j]))
+        elif Distribution == "lognormal":
+            SigmaLn = np.sqrt(np.log(1.0 + b**2))
+            Values[:, j] = np.sign(a)*np.exp(np.log(abs(a)) - 0.5*SigmaLn**2 + SigmaLn*InverseNormal(U[:, j]))
+        elif Distribution == "uniform":
+            Values[:, j] = a + (b - a)*U[:, j]
+        else:
+            raise ValueError("Unknown distribution %s of %s" % (Distribution, Name))
+    if Correlation:
+        Values = ImanConover(Values, CorrelationMatrix(Names, Correlation), rng)
+
+    return [{Name: float(Value) for Name, Value in zip(Names, Row)} for Row in Values]
+
+
+def _SampleOutputs(Disp, BaseShear, Height, ok):
+    Metrics = HysteresisMetrics(Disp, BaseShear, Height)
+    return {'ok': ok, 'MaxBaseShear': Metrics['PeakShear'], 'Energy': Metrics['EnergyTotal'],
+            'MaxResidualDrift': float(np.nanmax(np.abs(Metrics['ResidualDrift']), initial=0.0))}
+
+
+def RunSampleFrame(Params, Overrides, CaseDir):
+    """
+    Cyclic pushover of the fiber frame with the material constants of a sample (worker process).
+
+    Returns:
+    Row: Dictionary with ok, the Outputs and the wall time.
+    """
+    tStart = time.perf_counter()
+    Params = FrameParameters(**dict(Params, Output="memory", SpillChunkSize=None, **Overrides))
+    Result = RunCyclicPushover(Params, CaseDir)
+    Start = Params['NstepGravity']
+    Row = _SampleOutputs(Result['Disp'][Start:], Result['BaseShear'][Start:], Params['NStory']*Params['LCol'], Result['ok'])
+    Row['WallTime'] = time.perf_counter() - tStart
+    return Row
+
+
+def ScaleSurrogate(Surrogate, Params, Overrides):
+    """
+    Surrogate of a sample from one calibrated at the material constants of Params: the strength of the story
+    springs scaled with the steel yield stress Fy, their stiffness with the concrete modulus (sqrt(fc)), their
+    hardening ratio with the one of the steel Bs. A first-order model of the material effects, for screening
+    only; the other constants (e.g. Kfc, Es) are not modelled and raise a ValueError.
+    """
+    Unknown = sorted(set(Overrides) - set(SurrogateVariables))
+    if Unknown:
+        raise ValueError("The surrogate does not model %s" % ", ".join(Unknown))
+    FyRatio = Overrides.get('Fy', Params['Fy'])/Params['Fy']
+    EcRatio = np.sqrt(Overrides.get('fc', Params['fc'])/Params['fc'])
+    BsRatio = Overrides.get('Bs', Params['Bs'])/Params['Bs']
+    Springs = [dict(Spring, Fy=Spring['Fy']*FyRatio, E0=Spring['E0']*EcRatio, b=Spring['b']*BsRatio)
+               for Spring in Surrogate['Springs']]
+    return dict(Surrogate, Springs=Springs)
+
+
+def RunSampleSurrogate(Params, Overrides, Surrogate):
+    """
+    Cyclic protocol of Params on the surrogate scaled to the material constants of a sample (worker process).
+
+    Returns:
+    Row: Dictionary with ok, the Outputs and the wall time.
+    """
+    tStart = time.perf_counter()
+    Result = RunSurrogate(ScaleSurrogate(Surrogate, Params, Overrides), Params)
+    Row = _SampleOutputs(Result['Disp'], Result['BaseShear'], Surrogate['LBuilding'], Result['ok'])
+    Row['WallTime'] = time.perf_counter() - tStart
+    return Row
+
+
+def RunUncertainty(Params, Variables=None, Correlation=None, Surrogate=None, OutDir="UncertaintyOut",
+                   BatchSize=None, MinSamples=20, MaxSamples=500, RelTol=0.02, Confidence=0.95, Nproc=None, Seed=1,
+                   Verbose=True):
+    """
+    Sample the material constants and run the frame, or a surrogate, for each sample until the confidence
+    intervals of the means of the Outputs converge.
+
+    Args:
+    Params: Parameters of the frame (LibFrameModel.FrameParameters) at the mean material constants.
+    Variables: Distributions of the sampled parameters (optional, default=DefaultVariables, or SurrogateVariables
+               with a Surrogate, which only takes these).
+    Correlation: Rank correlations {(Name1, Name2): rho} (optional, default=None: independent).
+    Surrogate: Surrogate calibrated on Params (LibSurrogate.CalibrateSurrogate) to run instead of the frame
+               (optional, default=None).
+    OutDir: Samples.csv and Summary.csv are written there, and the frame runs (optional, default="UncertaintyOut").
+    BatchSize: Samples of a Latin hypercube, more than the variables with a Correlation
+               (optional, default=max(MinSamples, 4 Nproc)).
+    MinSamples, MaxSamples: Number of samples at least and at most, both rounded up to whole batches
+                            (optional, default=20, 500).
+    RelTol: Half width of the confidence intervals, relative to the means, to stop at (optional, default=0.02).
+    Confidence: Level of the confidence intervals (optional, default=0.95).
+    Nproc: Number of worker processes (optional, default=all cores).
+    Seed: Seed of the random generator (optional, default=1).
+    Verbose: Print the statistics after each batch (optional, default=True).
+
+    Returns:
+    Samples: pandas DataFrame with the sampled constants and the outputs of every run.
+    Summary: pandas DataFrame of the running statistics of the Outputs (RunningStats.Table), the runs that
+             did not complete the protocol included.
+    """
+    Variables = Variables or (DefaultVariables if Surrogate is None else SurrogateVariables)
+    if Surrogate is not None:
+        ScaleSurrogate(Surrogate, Params, dict.fromkeys(Variables, 1.0))
+    if not os1.path.exists(OutDir):
+        os1.makedirs(OutDir)
+    Nproc = Nproc or os1.cpu_count()
+    BatchSize = BatchSize or max(MinSamples, 4*Nproc)
+    rng = np.random.default_rng(Seed)
+    Stats = RunningStats(Outputs)
+
+    tStart = time.perf_counter()
+    Rows = []
+    Queue = []
+    Running = {}
+    Nsubmitted = 0
+    with ProcessPoolExecutor(max_workers=Nproc) as Pool:
+        while True:
+            if not Queue and not Running:
+                # the next Latin hypercube once the last one is complete: the sampling only stops at whole batches
+                if Stats.N >= MaxSamples or (Stats.N >= MinSamples and Stats.Converged(RelTol, Confidence)):
+                    break
+                Queue = SampleVariables(Variables, BatchSize, rng, Correlation)
+            while Queue and len(Running) < Nproc:
+                Overrides = Queue.pop(0)
+                if Surrogate is None:
+                    Future = Pool.submit(RunSampleFrame, Params, Overrides, os1.path.join(OutDir, "sample_%05i" % Nsubmitted))
+                else:
+                    Future = Pool.submit(RunSampleSurrogate, Params, Overrides, Surrogate)
+                Running[Future] = (Nsubmitted, Overrides)
+                Nsubmitted += 1
+            Finished, _ = wait(Running, return_when=FIRST_COMPLETED)
+            for Future in Finished:
+                SampleID, Overrides = Running.pop(Future)
+                Row = Future.result()
+                Stats.Add(Row)
+                Rows.append(dict({'Sample': SampleID}, **Overrides, **Row))
+                if Verbose and Stats.N % BatchSize == 0:
+                    print("%i samples, %.1f s: %s" % (Stats.N, time.perf_counter() - tStart, ", ".join(
+                        "%s %.4g +- %.2f%%" % (Name, Mean, 100.0*HalfWidth/abs(Mean)) for Name, Mean, HalfWidth in
+                        zip(Stats.Names, Stats.Mean, Stats.HalfWidth(Confidence)))))
+
+    Samples = pd.DataFrame(Rows).sort_values('Sample', ignore_index=True)
+    Summary = Stats.Table(Confidence)
+    Samples.to_csv(os1.path.join(OutDir, "Samples.csv"), index=False)
+    Summary.to_csv(os1.path.join(OutDir, "Summary.csv"))
+    if Verbose:
+        print("%s after %i samples in %.1f s, %i runs incomplete" % (
+            "Converged" if Stats.Converged(RelTol, Confidence) else "Not converged", Stats.N,
+            time.perf_counter() - tStart, int((Samples['ok'] != 0).sum())))
+
+    return Samples, Summary
+
+
+if __name__ == "__main__":
+    import tempfile
+    from LibFrameGenerator import FrameLayout
+    from LibSurrogate import CalibrateSurrogate
+
+    # Transformation and the roof diaphragm master as control node, as in BenchSuite.py
+    Params = FrameParameters(constraintsType="Transformation", nfCoreY=10, nfCoreZ=10, nfCoverY=10, nfCoverZ=10,
+                             iDmax=[0.005, 0.01, 0.02, 0.03])
+    Layout = FrameLayout(Params['NStory'], Params['NBay'], Params['NBayZ'], Params['LCol'], Params['LBeam'], Params['LGird'])
+    Params['IDctrlNode'] = int(Layout['MasterTag'][-1])
+
+    Surrogate = CalibrateSurrogate(Params, Verbose=False)
+    with tempfile.TemporaryDirectory() as TmpDir:
+        Samples, Summary = RunUncertainty(Params, Surrogate=Surrogate, OutDir=TmpDir, RelTol=0.01)
+    print(Summary.to_string())
@@ -27,19 +27,35 @@ Purpose :
 # Import Libraries
 # ===========================================================================
 import openseespy.opensees as os
-import opsvis as osv
-import matplotlib.pyplot as plt
-from mpl_toolkits.mplot3d import Axes3D
 import numpy as npy
-import pandas as pd
 import os as os1
-import time
 import shutil
-import math as mt
-from LibGeneratePeaks import GeneratePeaks
+from concurrent.futures import ProcessPoolExecutor
+from LibGeneratePeaks import GenerateProtocol, ProtocolIncrements
+from LibAnalysisDriver import RunDisplacementProtocol, ProtocolReport
+from LibAdaptiveStep import AdaptiveDisplacementControl
+from LibConvergence import StrategyEngine
+from LibProfiler import StepProfiler
+from LibCheckpoint import ForkCheckpoint, RunCheckpointedProtocol
+from LibSolverConfig import AutoConfig, DefineConfig
+from LibHysteresis import SupportBaseShear, HysteresisMetrics, MetricsReport
+from LibFiberTuner import TuneSection
+from LibResultCache import ResultCache, CanonicalHash, PlainDefinition
+from LibTermination import TerminationMonitor, RecorderFibers
+from LibFrameGenerator import FrameLayout, TributaryWeights, LateralLoads, DefineNodes, DefineElements, DefineMasses, DefineGravityLoads
+from LibPlotting import SetHeadless, PlotMode, Pyplot, Opsvis, FinishFigure, WriteDeferredFigures
 import numpy as np
 
-plt.rcParams['figure.dpi'] = 900
+# Headless = True for batch runs (e.g. on a cluster node, or set OPS_HEADLESS=1): nothing is drawn while the
+# model is built and analysed, the section, model and result plots are written to FigDir afterwards (skipped if
+# FigDir = None)
+Headless = False
+FigDir = None
+if Headless:
+    SetHeadless(True, FigDir)
+
+if PlotMode() == "show":
+    Pyplot().rcParams['figure.dpi'] = 900
 
 
 # ===========================================================================
@@ -51,9 +67,11 @@ os.model('basic', '-ndm', 3,'-ndf', 6)    # This is a 3D model with 3 translatio
 
 
 from LibUnits import *               # Define units
-from LibMaterialsRC import *         # Define RC materials
+from LibMaterialsRC import *         # RC material constants
 from BuildRCrectSection import *     # Procedure for defining RC fiber section
 
+DefineMaterialsRC()                  # Define RC materials (IDconcCore, IDconcCover, IDSteel)
+
 dataDir = "DataOut"
 if os1.path.exists(dataDir):
     shutil.rmtree(dataDir) # This deletes the existing Data directory
@@ -79,71 +97,28 @@ print('Number of Stories in Y: ', NStory, '\nNumber of bays in X: ', NBay, '\nNu
 
 
 # define NODAL COORDINATES
-# calculate locations of beam/column intersections:
-X1 = 0.
-X2 = X1 + LBeam
-Y1 = 0.
-Y2 = Y1 + LCol
-Y3 = Y2 + LCol
-Y4 = Y3 + LCol
-Z1 = 0.0
-Z2 = Z1 + LGird
-
-
-os.node(111, X1, Y1, Z1)	# frame 1
-os.node(112, X2, Y1, Z1)
-os.node(121, X1, Y2, Z1)
-os.node(122, X2, Y2, Z1)
-os.node(131, X1, Y3, Z1)
-os.node(132, X2, Y3, Z1)
-os.node(141, X1, Y4, Z1)
-os.node(142, X2, Y4, Z1)
-os.node(211, X1, Y1, Z2)	# frame 2
-os.node(212, X2, Y1, Z2)
-os.node(221, X1, Y2, Z2)
-os.node(222, X2, Y2, Z2)
-os.node(231, X1, Y3, Z2)
-os.node(232, X2, Y3, Z2)
-os.node(241, X1, Y4, Z2)
-os.node(242, X2, Y4, Z2)
-
-# define Rigid Floor Diaphragm
-Xa = (X2+X1)/2		        # mid-span coordinate for rigid diaphragm
-Za = (Z2+Z1)/2
-
-# rigid-diaphragm nodes in center of each diaphram
-RigidDiaphragm = "ON"		    # this communicates to the analysis parameters that I will be using rigid diaphragms
-os.node(1121, Xa, Y2, Za)		# master nodes for rigid diaphragm -- story 2, bay 1, frame 1-2
-os.node(1131, Xa, Y3, Za)		# master nodes for rigid diaphragm -- story 3, bay 1, frame 1-2
-os.node(1141, Xa, Y4, Za)		# master nodes for rigid diaphragm -- story 4, bay 1, frame 1-2
-
-# Constraints for rigid diaphragm master nodes
-os.fix(1121, 0,  1,  0,  1, 0,  1) # UX, UY=0, UZ, RX=0, RY, RZ=0
-os.fix(1131, 0,  1,  0,  1, 0,  1) # UX, UY=0, UZ, RX=0, RY, RZ=0
-os.fix(1141, 0,  1,  0,  1, 0,  1) # UX, UY=0, UZ, RX=0, RY, RZ=0
+# calculate locations of beam/column intersections and of the rigid-diaphragm master nodes (LibFrameGenerator.py), tags:
+#   nodes frame|level|pier (111 ... 242), master nodes 1|1|level|1 (1121 ... 1141) for the 3x1x1 frame
+Layout = FrameLayout(NStory, NBay, NBayZ, LCol, LBeam, LGird)
 
-# define Rigid Diaphram, dof 2 is normal to floor
-perpDirn = 2
-os.rigidDiaphragm(perpDirn, 1121, *[121, 122, 221, 222]) # level 2
-os.rigidDiaphragm(perpDirn, 1131, *[131, 132, 231, 232]) # level 3
-os.rigidDiaphragm(perpDirn, 1141, *[141, 142, 241, 242]) # level 4
+# define Rigid Floor Diaphragm, with the master nodes in center of each diaphram
+RigidDiaphragm = "ON"		    # this communicates to the analysis parameters that I will be using rigid diaphragms
+perpDirn = 2                    # dof 2 is normal to floor
 
+# BOUNDARY CONDITIONS
+# the master nodes are fixed in UY, RX, RZ and all Y=0.0 nodes are pinned (fixY)
+DefineNodes(Layout, perpDirn)
 
 # determine support nodes where ground motions are input,
 # This setting is only for multiple-support excitation (earthquake analysis)
-iSupportNode = [111, 112, 211, 212]
-
-# BOUNDARY CONDITIONS
-# fixY constrains the specified dofs of all nodes at a particluar level along Y-Direction
-# this level is defined by the Y coordinate
-os.fixY(0.0, *[1, 1, 1, 0, 1, 0])		# pin all Y=0.0 nodes
+iSupportNode = Layout['SupportNodes'].tolist()
 
 
 # calculated MODEL PARAMETERS, particular to this model
 # Set up parameters that are particular to the model for displacement control
-IDctrlNode = 141		# node where displacement is applied for displacement control
+IDctrlNode = int(Layout['NodeTag'][0, -1, 0])		# node where displacement is applied for displacement control (141)
 IDctrlDOF  = 1			# degree of freedom of displacement applied for displacement control
-LBuilding  = Y4		    # total building height
+LBuilding  = Layout['LBuilding']		    # total building height
 
 
 # Define SECTIONS
@@ -198,6 +173,30 @@ nfCoreZ  = 20		# number of fibers in the core patch in the z direction
 nfCoverY = 20		# number of fibers in the cover patches with long sides in the y direction
 nfCoverZ = 20		# number of fibers in the cover patches with long sides in the z direction
 
+# TuneFiberMesh = True replaces these numbers of fibers, section by section, by the ones of the mesh auto-tuner
+# (LibFiberTuner.py): the coarsest nfCoreY = nfCoverY and nfCoreZ = nfCoverZ whose moment-curvature responses about
+# z and y stay within TuneTol of the peak moment of a 40 x 40 mesh (columns under 10% of their squash load). The
+# tuner wipes the OpenSees domain, it runs in a worker process so that the model defined above is kept.
+TuneFiberMesh = False
+TuneTol = 0.01
+nfSections = {Tag: (nfCoreY, nfCoreZ, nfCoverY, nfCoverZ) for Tag in [ColSecTagFiber, BeamSecTagFiber, GirdSecTagFiber]}
+if TuneFiberMesh:
+    TuneSections = {}
+    for Tag, HSec, BSec, Bars, AxialRatio in [
+            (ColSecTagFiber, HCol, BCol, [numBarsTopCol, barAreaTopCol, numBarsBotCol, barAreaBotCol, numBarsIntCol, barAreaIntCol], 0.1),
+            (BeamSecTagFiber, HBeam, BBeam, [numBarsTopBeam, barAreaTopBeam, numBarsBotBeam, barAreaBotBeam, numBarsIntBeam, barAreaIntBeam], 0.0),
+            (GirdSecTagFiber, HGird, BGird, [numBarsTopGird, barAreaTopGird, numBarsBotGird, barAreaBotGird, numBarsIntGird, barAreaIntGird], 0.0)]:
+        Section = dict(zip(['HSec', 'BSec', 'coverH', 'coverB', 'coreID', 'coverID', 'steelID', 'numBarsTop', 'barAreaTop',
+                            'numBarsBot', 'barAreaBot', 'numBarsIntTot', 'barAreaInt'],
+                           [HSec, BSec, cover, cover, IDconcCore, IDconcCover, IDSteel, *Bars]))
+        TuneSections[Tag] = (Section, AxialRatio*fc*HSec*BSec, TuneTol)
+    with ProcessPoolExecutor(max_workers=1) as Pool:
+        Tuned = dict(zip(TuneSections, Pool.map(TuneSection, *zip(*TuneSections.values()))))
+    for Tag, Result in Tuned.items():
+        nfSections[Tag] = Result['nfSection']
+        print("Section %i: nfCoreY = nfCoverY = %i, nfCoreZ = nfCoverZ = %i (error %.2f%%)"
+              % (Tag, Result['z']['nf'], Result['y']['nf'], 100*Result['Error']))
+
 
 # rectangular section with one layer of steel evenly distributed around the perimeter and a confined core.
 
@@ -205,17 +204,17 @@ nfCoverZ = 20		# number of fibers in the cover patches with long sides in the z
 BuildRCrectSection(ColSecTagFiber, HCol, BCol, cover, cover, IDconcCore,
                    IDconcCover, IDSteel, numBarsTopCol, barAreaTopCol,
                    numBarsBotCol, barAreaBotCol, numBarsIntCol, barAreaIntCol,
-                   nfCoreY, nfCoreZ, nfCoverY, nfCoverZ)
+                   *nfSections[ColSecTagFiber])
 
 BuildRCrectSection(BeamSecTagFiber, HBeam, BBeam, cover, cover, IDconcCore,
                    IDconcCover, IDSteel, numBarsTopBeam, barAreaTopBeam,
                    numBarsBotBeam, barAreaBotBeam, numBarsIntBeam, barAreaIntBeam,
-                   nfCoreY, nfCoreZ, nfCoverY, nfCoverZ)
+                   *nfSections[BeamSecTagFiber])
 
 BuildRCrectSection(GirdSecTagFiber, HGird, BGird, cover, cover, IDconcCore,
                    IDconcCover, IDSteel, numBarsTopGird, barAreaTopGird,
                    numBarsBotGird, barAreaBotGird, numBarsIntGird, barAreaIntGird,
-                   nfCoreY, nfCoreZ, nfCoverY, nfCoverZ)
+                   *nfSections[GirdSecTagFiber])
 
 
 # assign torsional Stiffness for 3D Model
@@ -253,42 +252,8 @@ np = 5	# number of Gauss integration points for nonlinear curvature distribution
 
 
 
-# Frame 1
-# columns
-os.element('nonlinearBeamColumn', 1111, *[111, 121], np, ColSecTag, IDColTransf)		# level 1-2
-os.element('nonlinearBeamColumn', 1112, *[112, 122], np, ColSecTag, IDColTransf)
-os.element('nonlinearBeamColumn', 1121, *[121, 131], np, ColSecTag, IDColTransf)		# level 2-3
-os.element('nonlinearBeamColumn', 1122, *[122, 132], np, ColSecTag, IDColTransf)
-os.element('nonlinearBeamColumn', 1131, *[131, 141], np, ColSecTag, IDColTransf)		# level 3-4
-os.element('nonlinearBeamColumn', 1132, *[132, 142], np, ColSecTag, IDColTransf)
-# beams
-os.element('nonlinearBeamColumn', 1221, *[121, 122], np, BeamSecTag, IDBeamTransf)	    # level 2
-os.element('nonlinearBeamColumn', 1231, *[131, 132], np, BeamSecTag, IDBeamTransf)	    # level 3
-os.element('nonlinearBeamColumn', 1241, *[141, 142], np, BeamSecTag, IDBeamTransf)	    # level 4
-
-
-# Frame 2
-# columns
-os.element('nonlinearBeamColumn', 2111, *[211, 221], np, ColSecTag, IDColTransf)		# level 1-2
-os.element('nonlinearBeamColumn', 2112, *[212, 222], np, ColSecTag, IDColTransf)
-os.element('nonlinearBeamColumn', 2121, *[221, 231], np, ColSecTag, IDColTransf)		# level 2-3
-os.element('nonlinearBeamColumn', 2122, *[222, 232], np, ColSecTag, IDColTransf)
-os.element('nonlinearBeamColumn', 2131, *[231, 241], np, ColSecTag, IDColTransf)		# level 3-4
-os.element('nonlinearBeamColumn', 2132, *[232, 242], np, ColSecTag, IDColTransf)
-# beams
-os.element('nonlinearBeamColumn', 2221, *[221, 222], np, BeamSecTag, IDBeamTransf)	# level 2
-os.element('nonlinearBeamColumn', 2231, *[231, 232], np, BeamSecTag, IDBeamTransf)	# level 3
-os.element('nonlinearBeamColumn', 2241, *[241, 242], np, BeamSecTag, IDBeamTransf)	# level 4
-
-
-# girders connecting frames
-# Frame 1-2
-os.element('nonlinearBeamColumn', 1321, *[121, 221], np, GirdSecTag, IDGirdTransf)	# level 2
-os.element('nonlinearBeamColumn', 1322, *[122, 222], np, GirdSecTag, IDGirdTransf)
-os.element('nonlinearBeamColumn', 1331, *[131, 231], np, GirdSecTag, IDGirdTransf)	# level 3
-os.element('nonlinearBeamColumn', 1332, *[132, 232], np, GirdSecTag, IDGirdTransf)
-os.element('nonlinearBeamColumn', 1341, *[141, 241], np, GirdSecTag, IDGirdTransf)	# level 4
-os.element('nonlinearBeamColumn', 1342, *[142, 242], np, GirdSecTag, IDGirdTransf)
+# columns, beams (tags frame|2|level|bay) and girders connecting frames (tags bayZ|3|level|pier)
+DefineElements(Layout, ColSecTag, BeamSecTag, GirdSecTag, IDColTransf, IDBeamTransf, IDGirdTransf, np)
 
 
 print('Model Built Succesfully')
@@ -300,43 +265,20 @@ print('Model Built Succesfully')
 # calculate dead load of frame, assume this to be an internal frame (do LL in a similar manner)
 # calculate distributed weight along the beam length
 Tslab = 6*inch			# 6-inch slab
-Lslab = LGird/2 			# slab extends a distance of LGird/2 in/out of plane
 DLfactor = 1.0				# scale dead load up a little
-Qslab = GammaConcrete*Tslab*Lslab*DLfactor
-QdlBeam = Qslab + QBeam 	# dead load distributed along beam (one-way slab)
+QslabArea = GammaConcrete*Tslab*DLfactor	# slab weight per area, carried by the beams (one-way slab)
 QdlGird = QGird 			# dead load distributed along girder
-WeightCol = QdlCol*LCol  		# total Column weight
-WeightBeam = QdlBeam*LBeam 	# total Beam weight
-WeightGird = QdlGird*LGird 	# total Beam weight
-
-# assign masses to the nodes that the columns are connected to
-# each connection takes the mass of 1/2 of each element framing into it (mass=weight/g)
-Mmid  = (WeightCol/2 + WeightCol/2 +WeightBeam/2+WeightGird/2)/g
-Mtop  = (WeightCol/2 + WeightBeam/2+WeightGird/2)/g
-
 
-# frame 1
-os.mass(121, *[Mmid, 0, Mmid, 0., 0., 0.])		# level 2
-os.mass(122, *[Mmid, 0, Mmid, 0., 0., 0.])
-os.mass(131, *[Mmid, 0, Mmid, 0., 0., 0.])		# level 3
-os.mass(132, *[Mmid, 0, Mmid, 0., 0., 0.])
-os.mass(141, *[Mtop, 0, Mtop, 0., 0., 0.])		# level 4
-os.mass(142, *[Mtop, 0, Mtop, 0., 0., 0.])
-
-# frame 2
-os.mass(221, *[Mmid, 0, Mmid, 0., 0., 0.])		# level 2
-os.mass(222, *[Mmid, 0, Mmid, 0., 0., 0.])
-os.mass(231, *[Mmid, 0, Mmid, 0., 0., 0.])		# level 3
-os.mass(232, *[Mmid, 0, Mmid, 0., 0., 0.])
-os.mass(241, *[Mtop, 0, Mtop, 0., 0., 0.])		# level 4
-os.mass(242, *[Mtop, 0, Mtop, 0., 0., 0.])
+# dead load along the beams: slab extends to mid-span of the girders in/out of plane (Lslab = LGird/2 for the edge frames)
+# masses: each connection takes the mass of 1/2 of each element framing into it (mass=weight/g)
+Weights = TributaryWeights(Layout, QdlCol, QBeam, QdlGird, QslabArea)
 
+# assign masses to the nodes that the columns are connected to
+DefineMasses(Layout, Weights['NodeMass'])
 
-FloorWeight2 = 4*WeightCol + 2*WeightGird + 2*WeightBeam
-FloorWeight3 = 4*WeightCol + 2*WeightGird + 2*WeightBeam
-FloorWeight4 = 2*WeightCol + 2*WeightGird + 2*WeightBeam
-WeightTotal  = FloorWeight2+FloorWeight3+FloorWeight4			# total building weight
-MassTotal    = WeightTotal/g							        # total building mass
+FloorWeight = Weights['FloorWeight']		# weight of each floor above ground
+WeightTotal = Weights['WeightTotal']		# total building weight
+MassTotal   = Weights['MassTotal']			# total building mass
 
 
 # ---------------------------------------------------------------------------
@@ -345,22 +287,16 @@ MassTotal    = WeightTotal/g							        # total building mass
 
 # calculate distribution of lateral load based on mass/weight distributions along building height
 # Fj = WjHj/sum(WiHi)  * Weight   at each floor j
-sumWiHi = FloorWeight2*Y2+FloorWeight3*Y3+FloorWeight4*Y4 		# sum of storey weight times height, for lateral-load distribution
-WiHi2   = FloorWeight2*Y2 		# storey weight times height, for lateral-load distribution
-WiHi3   = FloorWeight3*Y3 		# storey weight times height, for lateral-load distribution
-WiHi4   = FloorWeight4*Y4 		# storey weight times height, for lateral-load distribution
-F2      = WiHi2/sumWiHi*WeightTotal	# lateral load at level
-F3      = WiHi3/sumWiHi*WeightTotal	# lateral load at level
-F4      = WiHi4/sumWiHi*WeightTotal	# lateral load at level
+FloorForce = LateralLoads(FloorWeight, Layout['FloorHeight'])	# lateral load at each level above ground
 
 
 # ---------------------------------------------------------------------------
 # Define RECORDERS
 # ---------------------------------------------------------------------------
 
-os.recorder('Node', '-file', f"{dataDir}/DFree.out", '-time', '-node', *[141],                '-dof', *[1, 2, 3], 'disp');			# displacements of free node
-os.recorder('Node', '-file', f"{dataDir}/DBase.out", '-time', '-node', *[111, 112, 211, 212], '-dof', *[1, 2, 3], 'disp')		# displacements of support nodes
-os.recorder('Node', '-file', f"{dataDir}/RBase.out", '-time', '-node', *[111, 112, 211, 212], '-dof', *[1, 2, 3], 'reaction')		# support reaction
+os.recorder('Node', '-file', f"{dataDir}/DFree.out", '-time', '-node', *[IDctrlNode],         '-dof', *[1, 2, 3], 'disp');			# displacements of free node
+os.recorder('Node', '-file', f"{dataDir}/DBase.out", '-time', '-node', *iSupportNode,         '-dof', *[1, 2, 3], 'disp')		# displacements of support nodes
+os.recorder('Node', '-file', f"{dataDir}/RBase.out", '-time', '-node', *iSupportNode,         '-dof', *[1, 2, 3], 'reaction')		# support reaction
 
 os.recorder('Element', '-file', f"{dataDir}/Fel1.out",             '-time', '-ele', *[1111],  'localForce')				# element forces in local coordinates
 os.recorder('Element', '-xml',  f"{dataDir}/PlasticRotation1.out", '-time', '-ele', *[1111],  'plasticRotation')				# element forces in local coordinates
@@ -390,43 +326,8 @@ os.timeSeries("Linear", tsTagGravity)   # Linear time series (syntax - timeSerie
 os.pattern("Plain", patternTagGravity, tsTagGravity)    # Plain pattern (syntax - pattern(patternType, patternTag, *patternArgs))
 
 
-# Frame 1
-# columns
-os.eleLoad('-ele', *[1111], '-type', '-beamUniform', 0., 0., -QdlCol)      # level 1-2
-os.eleLoad('-ele', *[1112], '-type', '-beamUniform', 0., 0., -QdlCol)
-os.eleLoad('-ele', *[1121], '-type', '-beamUniform', 0., 0., -QdlCol)      # level 2-3
-os.eleLoad('-ele', *[1122], '-type', '-beamUniform', 0., 0., -QdlCol)
-os.eleLoad('-ele', *[1131], '-type', '-beamUniform', 0., 0., -QdlCol)      # level 3-4
-os.eleLoad('-ele', *[1132], '-type', '-beamUniform', 0., 0., -QdlCol)
-
-
-# beams
-os.eleLoad('-ele', *[1221], '-type', '-beamUniform', -QdlBeam, 0.)    # level 2
-os.eleLoad('-ele', *[1231], '-type', '-beamUniform', -QdlBeam, 0.)    # level 3
-os.eleLoad('-ele', *[1241], '-type', '-beamUniform', -QdlBeam, 0.)    # level 4
-
-# Frame 2
-# columns
-os.eleLoad('-ele', *[2111], '-type', '-beamUniform', 0., 0., -QdlCol)      # level 1-2
-os.eleLoad('-ele', *[2112], '-type', '-beamUniform', 0., 0., -QdlCol)
-os.eleLoad('-ele', *[2121], '-type', '-beamUniform', 0., 0., -QdlCol)      # level 2-3
-os.eleLoad('-ele', *[2122], '-type', '-beamUniform', 0., 0., -QdlCol)
-os.eleLoad('-ele', *[2131], '-type', '-beamUniform', 0., 0., -QdlCol)      # level 3-4
-os.eleLoad('-ele', *[2132], '-type', '-beamUniform', 0., 0., -QdlCol)
-
-# beams
-os.eleLoad('-ele', *[2221], '-type', '-beamUniform', -QdlBeam, 0.)    # level 2
-os.eleLoad('-ele', *[2231], '-type', '-beamUniform', -QdlBeam, 0.)    # level 3
-os.eleLoad('-ele', *[2241], '-type', '-beamUniform', -QdlBeam, 0.)    # level 4
-
-# girders connecting frames
-# Frame 1-2
-os.eleLoad('-ele', *[1321], '-type', '-beamUniform', -QdlGird, 0.)		# level 2
-os.eleLoad('-ele', *[1322], '-type', '-beamUniform', -QdlGird, 0.)
-os.eleLoad('-ele', *[1331], '-type', '-beamUniform', -QdlGird, 0.)		# level 3
-os.eleLoad('-ele', *[1332], '-type', '-beamUniform', -QdlGird, 0.)
-os.eleLoad('-ele', *[1341], '-type', '-beamUniform', -QdlGird, 0.)		# level 4
-os.eleLoad('-ele', *[1342], '-type', '-beamUniform', -QdlGird, 0.)
+# columns, beams and girders of all frames
+DefineGravityLoads(Layout, Weights)
 
 
 # Gravity-analysis parameters -- load-controlled static analysis
@@ -450,7 +351,36 @@ DGravity = 1./NstepGravity
 os.integrator('LoadControl', DGravity)        #  0.1 is the load increment -this applies gravity in 10 steps
 
 os.analysis('Static')     #  define type of analysis static or transient
-gravityAnalysisStatus  = os.analyze(NstepGravity)
+
+# Constraint handler, numberer and system selected for the size of the model (LibSolverConfig.py) instead of the
+# ones above: "auto" (rules) or "calibrate" (the candidates timed on the whole gravity analysis, 5 runs each, the
+# rules' choice kept unless a candidate is faster by more than 10%; the choice is kept in SolverCache)
+SolverConfig = None
+SolverCache = "SolverCache.json"
+if SolverConfig is not None:
+    def DefineGravityAnalysis():
+        os.test('EnergyIncr', Tol, 6)
+        os.algorithm('Newton')
+        os.integrator('LoadControl', DGravity)
+        os.analysis('Static')
+    SelectedConfig = AutoConfig(SolverConfig, IDctrlNode, DefineGravityAnalysis, lambda: os.analyze(NstepGravity), SolverCache)
+    os.analysis('Static')
+
+# Per-step profile of the gravity and cyclic analyses (LibProfiler.py): wall time, iterations, norm, algorithm,
+# peak/cycle/half-cycle of every step, written to ProfileFile (.npy or .csv) with a report per half-cycle
+Profile = False
+ProfileFile = f"{dataDir}/Profile.csv"
+Profiler = None
+if Profile:
+    Profiler = StepProfiler(IDctrlNode, IDctrlDOF, 'Newton')
+    Profiler.Start('gravity')
+    for _ in range(NstepGravity):
+        gravityAnalysisStatus = os.analyze(1)
+        if gravityAnalysisStatus != 0:
+            break
+        Profiler.Sample()
+else:
+    gravityAnalysisStatus  = os.analyze(NstepGravity)
 
 if (gravityAnalysisStatus == 0):
     print('Gravity Analysis Successfull')
@@ -482,9 +412,8 @@ patternTagPushover  = 200
 os.timeSeries("Linear", tsTagPushover)   # Linear time series (syntax - timeSeries(tsType, tsTag, *tsArgs))
 os.pattern("Plain", patternTagPushover, tsTagPushover)    # Plain pattern (syntax - pattern(patternType, patternTag, *patternArgs))
 
-os.load(1121, F2, 0.0, 0.0, 0.0, 0.0, 0.0)
-os.load(1131, F3, 0.0, 0.0, 0.0, 0.0, 0.0)
-os.load(1141, F4, 0.0, 0.0, 0.0, 0.0, 0.0)
+for IDmaster, F in zip(Layout['MasterTag'].tolist(), FloorForce.tolist()):
+    os.load(IDmaster, F, 0.0, 0.0, 0.0, 0.0, 0.0)
 
 #os.wipeAnalysis()            # Only deletes the previously defined analysis objects in the model
 # CONSTRAINTS handler -- Determines how the constraint equations are enforced in the analysis (http://opensees.berkeley.edu/OpenSees/manuals/usermanual/617.htm)
@@ -495,7 +424,7 @@ os.load(1141, F4, 0.0, 0.0, 0.0, 0.0, 0.0)
 constraintsTypeStatic= "Plain"		# default;
 if 'RigidDiaphragm' in locals() or 'RigidDiaphragm' in globals():  # Check if a variable named RigidDiaphragm exxists in either local or global varaibles
     if RigidDiaphragm == "ON":
-        constraintsTypeGravity = "Lagrange"  # large model: try Transformation
+        constraintsTypeStatic = "Lagrange"  # large model: try Transformation
 
 os.constraints(constraintsTypeStatic)
 
@@ -517,6 +446,8 @@ os.numberer(numbererTypeStatic)
 #          UmfPack -- Direct UmfPack solver for unsymmetric matrices
 systemTypeStatic = "BandGeneral"		# try UmfPack for large model
 os.system(systemTypeStatic)
+if SolverConfig is not None:
+    DefineConfig(SelectedConfig)		# the configuration selected for the gravity analysis
 
 # TEST: # convergence test to
 # Convergence TEST (http://opensees.berkeley.edu/OpenSees/manuals/usermanual/360.htm)
@@ -577,112 +508,181 @@ fmt1 = "%s Cyclic analysis: CtrlNode %.3i, dof %.1i, Disp=%.4f %s"
 ok = 0
 
 
-for Dmax in iDmax:
-    iDstep = GeneratePeaks(Dmax, Dincr, CycleType, Fact)
-
-    for i in range(1, Ncycles + 1):
-        zeroD = 0
-        D0 = 0.0
-
-        for Dstep in iDstep:
-            D1 = Dstep
-            Dincr = D1 - D0
-
-            # Integrator DisplacementControl
-            os.integrator("DisplacementControl",  IDctrlNode, IDctrlDOF, Dincr)
-
-            # Analysis Static
-            os.analysis(analysisTypeStatic)
-
-            # First analyze command
-            ok = os.analyze(1)
-
-            # If convergence failure
-            if ok != 0:
-				# if analysis fails, we try some other stuff
-				# performance is slower inside this loop	global maxNumIterStatic;	    # max no. of iterations performed before "failure to converge" is ret'd
-                if ok != 0:
-                    print("Trying Newton with Initial Tangent ..")
-                    os.test('NormDispIncr', Tol, 2000, 0)
-                    os.algorithm('Newton', '-initial')
-                    ok = os.analyze(1)
-                    os.test(testTypeStatic, TolStatic, maxNumIterStatic, 0)
-                    os.algorithm(algorithmTypeStatic)
-
-                if ok != 0:
-                    print("Trying Broyden ..")
-                    os.algorithm('Broyden', 8)
-                    ok = os.analyze(1)
-                    os.algorithm(algorithmTypeStatic)
-
-                if ok != 0:
-                    print("Trying NewtonWithLineSearch ..")
-                    os.algorithm('NewtonLineSearch', 0.8)
-                    ok = os.analyze(1)
-                    os.algorithm(algorithmTypeStatic)
-
-                if ok != 0:
-                    putout = fmt1 % ("PROBLEM INCOMPLETE", IDctrlNode, IDctrlDOF, os.nodeDisp(IDctrlNode, IDctrlDOF), LunitTXT)
-                    print(putout)
-                    break
-
-            D0 = D1
+# The whole protocol (every peak in iDmax, repeated Ncycles times) is generated in one call
+iDstep, iBlockStart = GenerateProtocol(iDmax, Dincr, CycleType, Fact, Ncycles)
+iDincr = ProtocolIncrements(iDstep, iBlockStart)     # increments D1-D0, with D0 reset to 0.0 at the start of each cycle
+
+# Runs of equal increments are analysed with one integrator and one analyze(n) call each,
+# set BatchSteps = False to analyse one step per integrator/analysis as before (for timing comparisons)
+BatchSteps = True
+
+# Adaptive increments: the step grows up to DincrMax while convergence is easy and is
+# bisected down to DincrMin when a step fails, before the fallback algorithms are tried
+AdaptiveSteps = False
+DincrMax = 5*Dincr
+DincrMin = Dincr/64
+
+testArgsStatic = (testTypeStatic, TolStatic, maxNumIterStatic, 0)
+algorithmArgsStatic = (algorithmTypeStatic,)
+
+# Fallbacks of the failed steps ordered by their success rate and cost (LibConvergence.py) instead of always
+# Newton -initial, Broyden, NewtonLineSearch; the statistics are kept in FallbackStats for the next runs
+AdaptiveFallback = False
+FallbackStats = "FallbackStats.json"
+Fallback = None
+if AdaptiveFallback:
+    Fallback = StrategyEngine(testArgsStatic, algorithmArgsStatic, TolConverge=Tol)
+    if os1.path.exists(FallbackStats):
+        Fallback.Load(FallbackStats)
+
+OnStep = None
+if Profiler is not None:
+    # the fallbacks of TryFallbacks, in the same order, so that the profile knows which one converged
+    if Fallback is None:
+        Fallback = StrategyEngine(testArgsStatic, algorithmArgsStatic, TolConverge=Tol, Adaptive=False)
+    Profiler.Fallback = Fallback
+    Profiler.Start('cyclic', iDincr, iBlockStart, iDmax, Ncycles)
+    OnStep = Profiler.Sample
+
+# Early termination (LibTermination.py): the protocol ends cleanly, with the reason in the report, when the base
+# shear drops below MinShearRatio of its peak on the envelope, the roof drift reaches DriftLimit, or the strain of
+# the SSconcEle1sec1/SSreinfEle1sec1 fibers passes ConcreteStrain/SteelStrain; criteria left out are not used
+Termination = None			# e.g. {'MinShearRatio': 0.8, 'DriftLimit': 0.06, 'ConcreteStrain': -0.02, 'SteelStrain': 0.05}
+Stop = None
+if Termination is not None:
+    Monitor = TerminationMonitor(IDctrlNode, IDctrlDOF, iSupportNode, LBuilding, Termination.get('MinShearRatio'),
+                                 Termination.get('DriftLimit'),
+                                 RecorderFibers(1111, np, yFiber, zFiber, Termination.get('ConcreteStrain'), Termination.get('SteelStrain')))
+    OnStep = [Monitor.Sample] + ([OnStep] if OnStep is not None else [])
+    Stop = Monitor.Stop
+
+Controller = None
+if AdaptiveSteps:
+    Controller = AdaptiveDisplacementControl(IDctrlNode, IDctrlDOF, DincrMax, DincrMin,
+                                             testArgsStatic, algorithmArgsStatic, Tol, Fallback=Fallback)
+
+# Checkpoints at the peak boundaries (LibCheckpoint.py): the process is copied (fork) every CheckpointInterval
+# blocks, when a block fails it is analysed again from the copy with the increments divided by CheckpointRefine,
+# the recorder files are cut back to the checkpoint; the copy analyses the rest of the protocol and sends its result
+# back, this process waits for it (its domain stays at the failed step, ProtocolStats['Disp'] is the final one).
+# The database checkpoints of LibCheckpoint.py can not be used here: os.restore crashes on nonlinearBeamColumn.
+Checkpoint = False
+CheckpointInterval = Ncycles		# one checkpoint per peak
+CheckpointRefine = (2, 4)
+
+# Results of a run of the same model, protocol and analysis options are restored to dataDir from ResultCacheDir
+# (LibResultCache.py) instead of being analysed again, e.g. while working on the post-processing and the plots;
+# the least recently used results are removed beyond ResultCacheSize bytes. ResultCacheDir = None: always analyse,
+# e.g. ResultCacheDir = "ResultCache"
+ResultCacheDir = None
+ResultCacheSize = 2*1024**3
+# the key is every parameter above and the values derived from them (numbers, strings, lists, arrays), but these
+# names that only change where and how the results are written, and the sources of the Lib*.py libraries
+CacheExclude = ['dataDir', 'GMdir', 'FigDir', 'Headless', 'ResultCacheDir', 'ResultCacheSize', 'SolverCache',
+                'ProfileFile', 'FallbackStats', 'printFlagStatic', 'printFlagConvergeStatic', 'fmt1']
+Cache = None
+CacheHit = False
+if ResultCacheDir is not None:
+    Cache = ResultCache(ResultCacheDir, ResultCacheSize)
+    CacheDefinition = PlainDefinition(globals(), CacheExclude)
+    CacheKey = CanonicalHash(CacheDefinition)
+    # the recorders are closed before their files are replaced by the cached ones
+    CacheEntry = Cache.Fetch(CacheKey, dataDir, Before=lambda: os.remove('recorders'))
+    CacheHit = CacheEntry is not None
+
+if CacheHit:
+    ok, ProtocolStats, CtrlDisp = [CacheEntry['Info'][Name] for Name in ['ok', 'ProtocolStats', 'CtrlDisp']]
+    print("Results restored from the cache %s (key %s)" % (ResultCacheDir, CacheKey[:12]))
+elif Checkpoint:
+    RecorderFiles = [f"{dataDir}/{Name}.out" for Name in ["DFree", "DBase", "RBase", "Fel1", "ForceEle1sec1", "DefoEle1sec1",
+                                                          "ForceEle1secnp", "DefoEle1secnp", "SSconcEle1sec1", "SSreinfEle1sec1"]]
+    ok, ProtocolStats = RunCheckpointedProtocol(IDctrlNode, IDctrlDOF, iDincr, iBlockStart, testArgsStatic, algorithmArgsStatic,
+                                                Tol, ForkCheckpoint(), CheckpointInterval, CheckpointRefine, RecorderFiles,
+                                                Batch=BatchSteps, Controller=Controller, OnStep=OnStep, Fallback=Fallback, Stop=Stop)
+    CtrlDisp = ProtocolStats['Disp']
+else:
+    ok, ProtocolStats = RunDisplacementProtocol(IDctrlNode, IDctrlDOF, iDincr, testArgsStatic, algorithmArgsStatic,
+                                                Tol, Batch=BatchSteps, Controller=Controller, OnStep=OnStep, Fallback=Fallback, Stop=Stop)
+    CtrlDisp = os.nodeDisp(IDctrlNode, IDctrlDOF)
+print(ProtocolReport(ProtocolStats))
+if AdaptiveFallback and not CacheHit:
+    print(Fallback.Report())
+    Fallback.Save(FallbackStats)
+if Profiler is not None and not CacheHit:
+    print(Profiler.Report())
+    Profiler.Save(ProfileFile)
+if Cache is not None and not CacheHit:
+    os.remove('recorders')		# closes the recorder files before they are stored
+    Cache.Store(CacheKey, dataDir, {'ok': ok, 'ProtocolStats': ProtocolStats, 'CtrlDisp': CtrlDisp},
+                Definition=CacheDefinition)
 
 
 if ok != 0:
-    putout = fmt1 % ("PROBLEM INCOMPLETE", IDctrlNode, IDctrlDOF, os.nodeDisp(IDctrlNode, IDctrlDOF), LunitTXT)
+    putout = fmt1 % ("PROBLEM INCOMPLETE", IDctrlNode, IDctrlDOF, CtrlDisp, LunitTXT)
     print(putout)
 else:
-    putout = fmt1 % ("DONE", IDctrlNode, IDctrlDOF, os.nodeDisp(IDctrlNode, IDctrlDOF), LunitTXT)
+    putout = fmt1 % ("DONE", IDctrlNode, IDctrlDOF, CtrlDisp, LunitTXT)
     print(putout)
 
 
+#%% Hysteresis post-processing
+
+# the base shear is the sum of the reactions of all the support nodes; the first NstepGravity rows are the gravity steps
+freeDisp = npy.loadtxt(f"{dataDir}/DFree.out")
+baseReaction = npy.loadtxt(f"{dataDir}/RBase.out")
+dof_id = IDctrlDOF
+baseShear = SupportBaseShear(baseReaction, len(iSupportNode), dof_id)
+Hysteresis = HysteresisMetrics(freeDisp[NstepGravity:, dof_id], baseShear[NstepGravity:], Height=LBuilding)
+print(MetricsReport(Hysteresis))
 
 
 
 
 
-#%% Model Visualisations
 
-ax = osv.plot_model(node_labels=0, element_labels=0,gauss_points=False, local_axes=False, axis_off=0)
-plt.xlabel('Length')
-plt.ylabel('Height')
-# plt.title('Undeformed Model')
 
-# Turn off the x-axis and y-axis tick labels
-# ax.set_xticks([])  # Hide x-axis tick labels
-# ax.set_yticks([])  # Hide y-axis tick labels
-# ax.set_zticks([])  # Hide z-axis tick labels
+#%% Model Visualisations
+
+if PlotMode() != "skip":
+    WriteDeferredFigures()       # the section plots of a headless run
+    plt = Pyplot()
+    osv = Opsvis()
 
-# Turn off grid lines
-# ax.grid(False)
+    ax = osv.plot_model(node_labels=0, element_labels=0,gauss_points=False, local_axes=False, axis_off=0)
+    plt.xlabel('Length')
+    plt.ylabel('Height')
+    # plt.title('Undeformed Model')
 
-# Invert the y-axis to make it vertical
-# Adjust the view perspective to make y vertical and z horizontal
-ax.view_init(elev=125, azim=-45, roll = 45, vertical_axis='z')  # Adjust the angles as needed
+    # Turn off the x-axis and y-axis tick labels
+    # ax.set_xticks([])  # Hide x-axis tick labels
+    # ax.set_yticks([])  # Hide y-axis tick labels
+    # ax.set_zticks([])  # Hide z-axis tick labels
 
+    # Turn off grid lines
+    # ax.grid(False)
 
-plt.show()
-ax.cla()
+    # Invert the y-axis to make it vertical
+    # Adjust the view perspective to make y vertical and z horizontal
+    ax.view_init(elev=125, azim=-45, roll = 45, vertical_axis='z')  # Adjust the angles as needed
 
 
-# Only Python Result Plot
+    FinishFigure('Model')
+    ax.cla()
 
-freeDisp = npy.loadtxt('DataOut/DFree.out')
-baseReaction = npy.loadtxt('DataOut/RBase.out')
 
-#freeDisp_tcl = npy.loadtxt('Data/DFree.out')
-#baseReaction_tcl = npy.loadtxt('Data/RBase.out')
+    # Only Python Result Plot
 
-dof_id = 1
+    #freeDisp_tcl = npy.loadtxt('Data/DFree.out')
+    #baseReaction_tcl = npy.loadtxt('Data/RBase.out')
 
-plt.plot(freeDisp[10:, dof_id], -baseReaction[10:, dof_id], 'b-', label='Python')
-# plt.plot(freeDisp_tcl[10:, 1], -baseReaction_tcl[10:, 1], 'r-', label='Tcl')
+    plt.plot(freeDisp[NstepGravity:, dof_id], baseShear[NstepGravity:], 'b-', label='Python')
+    plt.plot(Hysteresis['BackboneDisp'], Hysteresis['BackboneForce'], 'ko--', label='Backbone')
+    # plt.plot(freeDisp_tcl[10:, 1], -baseReaction_tcl[10:, 1], 'r-', label='Tcl')
 
-plt.xlabel('Displacement (mm)')
-plt.ylabel('Force (kN)')
-plt.title('Force Displacement Response')
-plt.legend()
-plt.grid(True)
-plt.show()
+    plt.xlabel('Displacement (mm)')
+    plt.ylabel('Force (kN)')
+    plt.title('Force Displacement Response')
+    plt.legend()
+    plt.grid(True)
+    FinishFigure('ForceDisplacement')
 
@@ -0,0 +1,96 @@
+"""
+Purpose :
+    Checks of the NumPy fiber-section engine of LibFiberEngine.py against OpenSees
+    (zeroLengthSection, OpenSeesMomentCurvature) on the sections of the frame.
+
+    Run : python -m pytest test_LibFiberEngine.py
+"""
+
+# ===========================================================================
+# Import Libraries
+# ===========================================================================
+import numpy as np
+import pytest
+from LibFrameModel import FrameParameters
+from LibFiberTuner import SectionParams
+from LibFiberEngine import (SectionFibers, MergeFibers, BendingFibers, MaterialMap, SectionBatch, MomentCurvatureBatch,
+                            OpenSeesMomentCurvature, CompareWithOpenSees)
+
+
+# ===========================================================================
+# Main Code
+# ===========================================================================
+@pytest.fixture(scope="module")
+def Params():
+    return FrameParameters()
+
+
+def test_CyclicMatchesOpenSees(Params):
+    # cyclic curvature up to 4 times the yield curvature, column under axial load, beam and girder without
+    for Member, Nfibers, Nsteps, Difference in CompareWithOpenSees(Params, nf=4, Ductility=4.0):
+        assert Nsteps > 0
+        assert Difference < 1.e-8, Member
+
+
+def test_MergeFibersIsExact(Params):
+    Fibers = SectionFibers(SectionParams(Params, 'Col'), 6)
+    Merged = MergeFibers(Fibers)
+    assert len(Merged) < len(Fibers)
+    assert np.isclose(Merged[:, 2].sum(), Fibers[:, 2].sum(), rtol=1.e-12)
+
+    Batch = SectionBatch([Fibers, Merged])
+    Kappa = 2.e-4
+    N, Mz, _, EA = Batch.Trial(np.full(2, -5.e-4), np.full(2, Kappa))
+    assert np.allclose(N[0], N[1], rtol=1.e-12)
+    assert np.allclose(Mz[0], Mz[1], rtol=1.e-12)
+    assert np.allclose(EA[0], EA[1], rtol=1.e-12)
+
+
+@pytest.mark.parametrize("Member, nf", [('Col', 6), ('Beam', (10, 8, 12, 5)), ('Gird', 20)])
+def test_BendingFibersEqualMergedFibers(Params, Member, nf):
+    Section = SectionParams(Params, Member)
+    Batch = SectionBatch([MergeFibers(SectionFibers(Section, nf)), BendingFibers(Section, nf)])
+    for Kappa in [2.e-4, -1.e-3]:
+        N, Mz, _, EA = Batch.Trial(np.full(2, -5.e-4), np.full(2, Kappa))
+        assert np.allclose(N[0], N[1], rtol=1.e-12)
+        assert np.allclose(Mz[0], Mz[1], rtol=1.e-12)
+        assert np.allclose(EA[0], EA[1], rtol=1.e-12)
+
+
+def test_HalvingConvergesLikeOpenSees(Params):
+    # a column design of the throughput batch whose Newton iterations cycle between two fiber branches at
+    # one of the curvature steps: it only converges with the step halved, to the response of OpenSees
+    Section = SectionParams(Params, 'Col')
+    HSec = 1.0501045937660427*Section['HSec']
+    Section = dict(Section, HSec=HSec, BSec=HSec)
+    P = 0.28475882574163913*Params['fc']*HSec**2
+    Kappa = np.linspace(1, 100, 100)*20*Params['Fy']/Params['Es']/SectionParams(Params, 'Col')['HSec']/100
+
+    _, _, ok = MomentCurvatureBatch(SectionBatch([MergeFibers(SectionFibers(Section, 6))]), P, Kappa, MaxHalving=0)
+    assert not ok[0]
+
+    M, Eps0, ok = MomentCurvatureBatch(SectionBatch([MergeFibers(SectionFibers(Section, 6))]), P, Kappa)
+    assert ok[0]
+    assert np.isfinite(M).all() and np.isfinite(Eps0).all()
+    MRef = OpenSeesMomentCurvature(Section, 6, P, Kappa)
+    assert np.abs(M[0] - MRef).max() < 1.e-8*np.abs(MRef).max()
+
+
+def test_BatchEqualsSingleSections(Params):
+    # the sections of a batch do not interact, whatever their numbers of fibers
+    Sections = [SectionParams(Params, Member) for Member in ['Col', 'Beam', 'Gird']]
+    Fibers = [MergeFibers(SectionFibers(Section, nf)) for Section, nf in zip(Sections, [4, 6, 8])]
+    P = np.array([0.1*Params['fc']*Sections[0]['HSec']*Sections[0]['BSec'], 0.0, 0.0])
+    Kappa = np.linspace(0.0, 4.0, 21)*Params['Fy']/Params['Es']/Sections[1]['HSec']
+    M, _, ok = MomentCurvatureBatch(SectionBatch(Fibers), P, Kappa)
+    assert ok.all()
+    for i in range(3):
+        MSingle, _, _ = MomentCurvatureBatch(SectionBatch([Fibers[i]]), P[i], Kappa)
+        assert np.allclose(M[i], MSingle[0], rtol=1.e-12, atol=0.0)
+
+
+def test_UnknownMaterialRaises(Params):
+    Fibers = SectionFibers(SectionParams(Params, 'Col'), 4)
+    Fibers[0, 3] = 999
+    with pytest.raises(ValueError):
+        SectionBatch([Fibers], MaterialMap())
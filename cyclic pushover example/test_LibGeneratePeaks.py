@@ -0,0 +1,69 @@
+"""
+Purpose :
+    Checks of LibGeneratePeaks.py against the step-by-step list implementation
+    that GeneratePeaks used before it was vectorized (BenchGeneratePeaks.py).
+
+    Run : python -m pytest test_LibGeneratePeaks.py
+"""
+
+# ===========================================================================
+# Import Libraries
+# ===========================================================================
+import numpy as np
+import pytest
+from LibGeneratePeaks import GeneratePeaks, GenerateProtocol, ProtocolIncrements
+from BenchGeneratePeaks import GeneratePeaksLoop, GenerateProtocolLoop
+
+
+# ===========================================================================
+# Main Code
+# ===========================================================================
+Cases = [(2.0, 0.02, 1.5), (-0.05, 0.001, 432.), (0.1, 0.0001, 432.), (0.0, 0.01, 1.), (0.0137, 0.003, 1.)]
+
+
+@pytest.mark.parametrize("CycleType", ["Push", "Half", "Full"])
+@pytest.mark.parametrize("Dmax, DincrStatic, Fact", Cases)
+def test_GeneratePeaksMatchesLoop(Dmax, DincrStatic, Fact, CycleType):
+    assert np.array_equal(GeneratePeaks(Dmax, DincrStatic, CycleType, Fact),
+                          GeneratePeaksLoop(Dmax, DincrStatic, CycleType, Fact))
+
+
+@pytest.mark.parametrize("CycleType", ["Push", "Half", "Full"])
+@pytest.mark.parametrize("Ncycles", [1, 3])
+def test_GenerateProtocolMatchesLoop(CycleType, Ncycles):
+    iDmax = [0.005, 0.01, 0.025, 0.05, 0.1]
+    iDstep, iBlockStart = GenerateProtocol(iDmax, 0.432, CycleType, 432., Ncycles)
+    assert np.array_equal(iDstep, GenerateProtocolLoop(iDmax, 0.432, CycleType, 432., Ncycles))
+
+    # one block per peak and cycle, each one the targets of GeneratePeaks
+    assert len(iBlockStart) == len(iDmax)*Ncycles
+    Ends = np.append(iBlockStart[1:], len(iDstep))
+    for Block, (Start, End) in enumerate(zip(iBlockStart, Ends)):
+        assert np.array_equal(iDstep[Start:End], GeneratePeaksLoop(iDmax[Block//Ncycles], 0.432, CycleType, 432.))
+
+
+def test_GenerateProtocolCyclesPerPeak():
+    iDstep, iBlockStart = GenerateProtocol([0.01, 0.02], 0.001, "Full", 1.0, [2, 1])
+    Old = np.concatenate([GeneratePeaksLoop(0.01, 0.001), GeneratePeaksLoop(0.01, 0.001), GeneratePeaksLoop(0.02, 0.001)])
+    assert np.array_equal(iDstep, Old)
+    assert len(iBlockStart) == 3
+
+
+def test_GenerateProtocolEmpty():
+    iDstep, iBlockStart = GenerateProtocol([], 0.01)
+    assert len(iDstep) == 0 and len(iBlockStart) == 0
+
+
+def test_ProtocolIncrementsFromZeroAtEveryBlock():
+    # the cyclic loop resets the reference displacement D0 to 0 at the start of every block
+    iDmax = [0.01, 0.02]
+    iDstep, iBlockStart = GenerateProtocol(iDmax, 0.001, "Full", 1.0, 2)
+    iDincr = ProtocolIncrements(iDstep, iBlockStart)
+    Expected = []
+    for Dmax in iDmax:
+        for _ in range(2):
+            D0 = 0.0
+            for Target in GeneratePeaksLoop(Dmax, 0.001):
+                Expected.append(Target - D0)
+                D0 = Target
+    assert np.array_equal(iDincr, Expected)
@@ -0,0 +1,118 @@
+"""
+Purpose :
+    Checks of the hysteresis metrics of LibHysteresis.py on force-displacement
+    histories of known response: elastic, elastic-perfectly plastic, a monotonic
+    push and histories ended at a peak.
+
+    Run : python -m pytest test_LibHysteresis.py
+"""
+
+# ===========================================================================
+# Import Libraries
+# ===========================================================================
+import numpy as np
+import pytest
+from LibGeneratePeaks import GenerateProtocol
+from LibHysteresis import SupportBaseShear, Reversals, Peaks, CumulativeEnergy, Backbone, HysteresisMetrics, MetricsReport
+
+
+# ===========================================================================
+# Main Code
+# ===========================================================================
+def ElasticPlastic(Disp, K=1.0, Fy=1.0):
+    """
+    Force of an elastic-perfectly plastic spring along Disp.
+    """
+    Force = np.zeros(len(Disp))
+    for i in range(1, len(Disp)):
+        Force[i] = np.clip(Force[i - 1] + K*(Disp[i] - Disp[i - 1]), -Fy, Fy)
+    return Force
+
+
+@pytest.fixture
+def Cyclic():
+    Disp, _ = GenerateProtocol([2.0, 3.0], 0.1, "Full", 1.0, 1)
+    return Disp, ElasticPlastic(Disp)
+
+
+def test_ReversalsAndPeaks(Cyclic):
+    Disp, _ = Cyclic
+    Rev = Reversals(Disp)
+    assert np.allclose(Disp[Rev], [2.0, -2.0, 3.0, -3.0])
+    # unloaded back to zero at the end: no peak at the last step
+    assert np.array_equal(Peaks(Disp), Rev)
+
+
+def test_ElasticPlasticCycle(Cyclic):
+    Disp, Force = Cyclic
+    Metrics = HysteresisMetrics(Disp, Force, Height=100.0)
+    assert np.allclose(Metrics['PeakDisp'], [2.0, -2.0, 3.0, -3.0])
+    assert np.allclose(Metrics['PeakForce'], [1.0, -1.0, 1.0, -1.0])
+    assert Metrics['PeakShear'] == pytest.approx(1.0)
+    # unloading at the elastic stiffness to the plastic displacement of each peak
+    assert np.allclose(Metrics['UnloadingStiffness'], 1.0)
+    assert np.allclose(Metrics['ResidualDisp'], [1.0, -1.0, 2.0, -2.0])
+    assert np.allclose(Metrics['ResidualDrift'], Metrics['ResidualDisp']/100.0)
+    assert np.allclose(Metrics['SecantStiffness'], [0.5, 1.0/3.0])
+    # work of the force: Fy times the plastic displacements 1 + 2 + 3 + 4 + 1, and the elastic energy
+    # Fy^2/2K stored at the end (the spring yields again on the way back to zero)
+    assert Metrics['EnergyTotal'] == pytest.approx(11.0 + 0.5)
+    assert Metrics['HalfCycleEnergy'].sum() == pytest.approx(Metrics['EnergyTotal'])
+    assert np.allclose(Metrics['BackboneDisp'], [-3.0, -2.0, 0.0, 2.0, 3.0])
+    assert np.allclose(Metrics['BackboneForce'], [-1.0, -1.0, 0.0, 1.0, 1.0])
+    assert len(MetricsReport(Metrics).splitlines()) == 2 + 4
+
+
+def test_ElasticLoopDissipatesNothing(Cyclic):
+    Disp, _ = Cyclic
+    assert CumulativeEnergy(Disp, 3.0*Disp)[-1] == pytest.approx(0.0, abs=1.e-12)
+
+
+def test_MonotonicPush():
+    Disp, _ = GenerateProtocol([3.0], 0.1, "Push", 1.0, 1)
+    Force = ElasticPlastic(Disp)
+    Metrics = HysteresisMetrics(Disp, Force)
+    assert len(Metrics['Reversals']) == 0
+    assert np.allclose(Metrics['PeakDisp'], [3.0])
+    assert np.allclose(Metrics['BackboneDisp'], [0.0, 3.0])
+    assert np.allclose(Metrics['BackboneForce'], [0.0, 1.0])
+    # no unloading after the last peak
+    assert np.isnan(Metrics['ResidualDisp']).all()
+
+
+@pytest.mark.parametrize("Hold", [0, 3])
+def test_TruncatedAtPeak(Cyclic, Hold):
+    # a cyclic history cut at its last positive peak, possibly held there for a few steps
+    Disp, _ = Cyclic
+    Last = int(np.flatnonzero(np.isclose(Disp, 3.0))[0])
+    Disp = np.concatenate((Disp[:Last + 1], np.full(Hold, Disp[Last])))
+    Metrics = HysteresisMetrics(Disp, ElasticPlastic(Disp))
+    assert np.allclose(Metrics['PeakDisp'], [2.0, -2.0, 3.0])
+    assert Metrics['Peaks'][-1] == Last
+    assert np.allclose(Metrics['BackboneDisp'], [-2.0, 0.0, 2.0, 3.0])
+
+
+def test_TruncatedWhileUnloading(Cyclic):
+    # cut on the way back from the peak: the end is not a peak
+    Disp, _ = Cyclic
+    Last = int(np.flatnonzero(np.isclose(Disp, 3.0))[0])
+    Disp = Disp[:Last + 5]
+    assert np.allclose(Disp[Peaks(Disp)], [2.0, -2.0, 3.0])
+
+
+def test_BackboneMax():
+    Disp, Force = [1.0, -1.0, 1.0, -1.0, 2.0], [0.8, -0.7, 0.9, -0.75, 1.2]
+    BackboneDisp, BackboneForce = Backbone(Disp, Force, Method="max")
+    assert np.allclose(BackboneDisp, [-1.0, 0.0, 1.0, 2.0])
+    assert np.allclose(BackboneForce, [-0.75, 0.0, 0.9, 1.2])
+    with pytest.raises(ValueError):
+        Backbone(Disp, Force, Method="mean")
+
+
+def test_SupportBaseShear():
+    # time, then 3 DOFs per support node
+    RBase = np.array([[0.0, 1.0, 5.0, 0.0, 2.0, 6.0, 0.0],
+                      [1.0, -3.0, 5.0, 0.0, -4.0, 6.0, 0.0]])
+    assert np.allclose(SupportBaseShear(RBase, 2, DOF=1), [-3.0, 7.0])
+    with pytest.raises(ValueError):
+        SupportBaseShear(RBase, 3)
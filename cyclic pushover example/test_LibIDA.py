@@ -0,0 +1,88 @@
+"""
+Purpose :
+    Checks of the hunt and fill sequence of intensities of LibIDA.HuntFill, on
+    records that collapse the frame above a given intensity, run one at a time
+    and by several workers.
+
+    Run : python -m pytest test_LibIDA.py
+"""
+
+# ===========================================================================
+# Import Libraries
+# ===========================================================================
+import numpy as np
+import pytest
+from LibIDA import HuntFill
+
+
+# ===========================================================================
+# Main Code
+# ===========================================================================
+def RunRecord(Tracer, Capacity, Nworkers=1):
+    """
+    Runs of Tracer on a record that collapses the frame at Capacity and above, by Nworkers workers that
+    finish in the order the runs were started.
+
+    Returns:
+    Order: Intensities in the order the runs were started.
+    """
+    Running, Order = [], []
+    while True:
+        while len(Running) < Nworkers:
+            IM = Tracer.Next()
+            if IM is None:
+                break
+            Tracer.Pending.add(IM)
+            Running.append(IM)
+            Order.append(float(IM))
+        if not Running:
+            return Order
+        IM = Running.pop(0)
+        Tracer.Add(IM, IM >= Capacity)
+
+
+def test_SequenceOneWorker():
+    Tracer = HuntFill()
+    Order = RunRecord(Tracer, 1.23)
+    # hunt: steps of 0.1, 0.2, ... from 0.1; bisection down to 0.05; fill of the gaps above 0.2
+    assert np.allclose(Order, [0.1, 0.2, 0.4, 0.7, 1.1, 1.6, 1.35, 1.225, 1.2875, 1.25625, 0.9, 0.55])
+    Lo, Hi = Tracer.Bracket()
+    assert Lo == pytest.approx(1.225) and Hi == pytest.approx(1.25625)
+    assert Hi - Lo <= Tracer.Resolution
+    assert Tracer.CollapseIntensity() == pytest.approx(0.5*(Lo + Hi))
+    assert Tracer.Finished()
+
+
+@pytest.mark.parametrize("Nworkers", [2, 3])
+def test_FillsWhileBisectionPending(Nworkers):
+    Tracer = HuntFill()
+    Order = RunRecord(Tracer, 1.23, Nworkers)
+    # the same runs as one at a time, the fills started before the last bisections
+    assert sorted(Order) == pytest.approx(sorted(RunRecord(HuntFill(), 1.23)))
+    assert Order.index(0.9) < Order.index(1.25625)
+    assert Tracer.Bracket() == pytest.approx((1.225, 1.25625))
+
+
+def test_HuntWaitsForLastRun():
+    Tracer = HuntFill()
+    assert Tracer.Next() == pytest.approx(0.1)
+    Tracer.Pending.add(0.1)
+    assert Tracer.Next() is None
+
+
+@pytest.mark.parametrize("MaxRuns", [6, 8, 9])
+def test_MaxRunsKeepsBisection(MaxRuns):
+    Tracer = HuntFill(MaxRuns=MaxRuns)
+    Order = RunRecord(Tracer, 1.23, Nworkers=3)
+    assert len(Order) <= MaxRuns
+    # the fills never take the runs of the bisection
+    Reference = HuntFill(MaxRuns=MaxRuns)
+    RunRecord(Reference, 1.23)
+    assert Tracer.Bracket() == pytest.approx(Reference.Bracket())
+
+
+def test_NoCollapse():
+    Tracer = HuntFill(IMmax=1.0)
+    Order = RunRecord(Tracer, np.inf)
+    assert max(Order) <= 1.0
+    assert np.isnan(Tracer.CollapseIntensity())
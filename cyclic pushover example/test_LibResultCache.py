@@ -0,0 +1,114 @@
+"""
+Purpose :
+    Checks of the keys and of the least-recently-used eviction of the result
+    cache of LibResultCache.py, in a temporary directory.
+
+    Run : python -m pytest test_LibResultCache.py
+"""
+
+# ===========================================================================
+# Import Libraries
+# ===========================================================================
+import numpy as np
+import os as os1
+import json
+import pytest
+import LibResultCache
+from LibResultCache import Canonical, CanonicalHash, PlainDefinition, SourceHash, ResultCache
+
+
+# ===========================================================================
+# Main Code
+# ===========================================================================
+def test_KeyIndependentOfRepresentation():
+    Definition = {'HCol': 28.0, 'iDmax': [0.005, 0.01], 'CycleType': "Full", 'Ncycles': 1}
+    Same = {'Ncycles': np.int64(1), 'CycleType': "Full", 'iDmax': np.array([0.005, 0.01]), 'HCol': 28}
+    assert CanonicalHash(Definition) == CanonicalHash(Same)
+    assert CanonicalHash({'D': (1.0, -0.0)}) == CanonicalHash({'D': [1, 0.0]})
+    assert Canonical({'x': np.float64(18.0), 'y': float('inf')}) == {'x': 18, 'y': 'inf'}
+
+
+def test_KeyChangesWithAnyValue():
+    Definition = {'HCol': 28.0, 'iDmax': [0.005, 0.01], 'Termination': None}
+    Key = CanonicalHash(Definition)
+    assert CanonicalHash(dict(Definition, HCol=28.0000001)) != Key
+    assert CanonicalHash(dict(Definition, iDmax=[0.005, 0.01, 0.02])) != Key
+    assert CanonicalHash(dict(Definition, Termination={'DriftLimit': 0.06})) != Key
+    assert CanonicalHash(dict(Definition, Extra=1)) != Key
+
+
+def test_KeyChangesWithSources(monkeypatch):
+    Key = CanonicalHash({'a': 1})
+    monkeypatch.setattr(LibResultCache, 'SourceHash', lambda: "0"*64)
+    assert CanonicalHash({'a': 1}) != Key
+
+
+def test_SourceHashOfAllLibraries():
+    assert SourceHash() == SourceHash()
+    assert SourceHash() != SourceHash(["LibUnits.py"])
+
+
+def test_PlainDefinition():
+    Namespace = {'HCol': 28.0, 'iDmax': [0.005, 0.01], 'Layout': {'NodeTag': np.arange(3)}, 'Name': "Full",
+                 'Termination': None, 'dataDir': "DataOut", '_private': 1, 'np': 5, 'Module': os1, 'Func': len,
+                 'Objects': [object()]}
+    Definition = PlainDefinition(Namespace, Exclude=['dataDir'])
+    assert sorted(Definition) == ['HCol', 'Layout', 'Name', 'Termination', 'iDmax', 'np']
+    json.dumps(Canonical(Definition))
+
+
+def _Entry(Cache, Key, Size, Time):
+    Source = os1.path.join(Cache.Root, "..", "src-" + Key)
+    os1.makedirs(Source)
+    with open(os1.path.join(Source, "DFree.out"), 'wb') as File:
+        File.write(b"0"*Size)
+    Cache.Store(Key, Source, Info={'ok': 0}, Arrays={'Disp': np.arange(4.0)}, Definition={'Key': Key})
+    os1.utime(os1.path.join(Cache.EntryPath(Key), "meta.json"), (Time, Time))
+
+
+def test_StoreAndFetch(tmp_path):
+    Cache = ResultCache(str(tmp_path/"Cache"))
+    Key = CanonicalHash({'Run': 1})
+    assert Cache.Fetch(Key) is None
+    _Entry(Cache, Key, 100, 1.e9)
+    Entry = Cache.Fetch(Key, str(tmp_path/"Dest"))
+    assert Entry['Info'] == {'ok': 0}
+    assert np.array_equal(Entry['Arrays']['Disp'], np.arange(4.0))
+    assert os1.path.getsize(tmp_path/"Dest"/"DFree.out") == 100
+    assert (Cache.Hits, Cache.Misses) == (1, 1)
+    # a fetch is a use
+    assert os1.path.getmtime(os1.path.join(Entry['Path'], "meta.json")) > 1.e9
+
+
+def test_EvictLeastRecentlyUsed(tmp_path):
+    Cache = ResultCache(str(tmp_path/"Cache"), MaxBytes=10**9)
+    Keys = [CanonicalHash({'Run': i}) for i in range(4)]
+    for i, Key in enumerate(Keys):
+        _Entry(Cache, Key, 10000, 1.e9 + i)
+    Sizes = {Key: Size for _, Size, Key in Cache.Entries()}
+    assert [Key for _, _, Key in Cache.Entries()] == Keys
+
+    # Keys[0] used last: Keys[1] and Keys[2] are the least recently used
+    Cache.Fetch(Keys[0])
+    Cache.MaxBytes = Sizes[Keys[0]] + Sizes[Keys[3]]
+    Cache.Evict()
+    assert sorted(Key for _, _, Key in Cache.Entries()) == sorted([Keys[0], Keys[3]])
+    assert Cache.Fetch(Keys[1]) is None
+
+
+def test_StoreKeepsNewEntry(tmp_path):
+    # an entry larger than the whole cache is kept when it is stored, the older ones are evicted
+    Cache = ResultCache(str(tmp_path/"Cache"), MaxBytes=1000)
+    Old, New = CanonicalHash({'Run': 0}), CanonicalHash({'Run': 1})
+    _Entry(Cache, Old, 10, 1.e9)
+    _Entry(Cache, New, 5000, 2.e9)
+    assert [Key for _, _, Key in Cache.Entries()] == [New]
+
+
+def test_StoreTwiceKeepsFirst(tmp_path):
+    Cache = ResultCache(str(tmp_path/"Cache"))
+    Key = CanonicalHash({'Run': 0})
+    Cache.Store(Key, Info={'ok': 0})
+    Cache.Store(Key, Info={'ok': 1})
+    assert Cache.Fetch(Key)['Info'] == {'ok': 0}
+    assert not [Name for Name in os1.listdir(Cache.Root) if Name.startswith(".tmp")]
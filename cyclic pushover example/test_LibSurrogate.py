@@ -0,0 +1,48 @@
+"""
+Purpose :
+    Checks of the story-spring fit of LibSurrogate.py on shear - drift histories
+    of a known Steel02 spring (ReplaySteel02), and of SurrogateAccuracy.
+
+    Run : python -m pytest test_LibSurrogate.py
+"""
+
+# ===========================================================================
+# Import Libraries
+# ===========================================================================
+import numpy as np
+import pytest
+from LibGeneratePeaks import GenerateProtocol
+from LibSurrogate import ReplaySteel02, FitStorySpring, SurrogateAccuracy
+
+
+# ===========================================================================
+# Main Code
+# ===========================================================================
+Spring = {'Fy': 50.0, 'E0': 2000.0, 'b': 0.05, 'R0': 14.0}
+
+
+@pytest.fixture(scope="module")
+def Histories():
+    # two calibration runs of different amplitudes, up to 3 and 1.5 times the yield drift
+    Drifts = [GenerateProtocol(iDmax, 0.002, "Full", 1.0, 1)[0] for iDmax in ([0.01, 0.02, 0.04, 0.06], [0.015, 0.03])]
+    Shears = [Force[0] for Force in ReplaySteel02(Drifts, *[np.array([Spring[Key]]) for Key in ['Fy', 'E0', 'b', 'R0']])]
+    return Drifts, Shears
+
+
+def test_FitStorySpring(Histories):
+    Fit = FitStorySpring(*Histories)
+    assert Fit['E0'] == pytest.approx(Spring['E0'], rel=1.e-6)
+    assert Fit['Fy'] == pytest.approx(Spring['Fy'], rel=0.02)
+    assert Fit['b'] == pytest.approx(Spring['b'], abs=0.005)
+    assert Fit['R0'] == pytest.approx(Spring['R0'], rel=0.2)
+    assert Fit['Error'] < 0.01
+
+
+def test_SurrogateAccuracySelf(Histories):
+    Drifts, Shears = Histories
+    Reference = {'Disp': Drifts[0], 'BaseShear': Shears[0]}
+    Accuracy = SurrogateAccuracy(Reference, Reference)
+    assert Accuracy['Error'] == 0.0
+    assert Accuracy['PeakError'] == 0.0
+    assert Accuracy['EnergyError'] == 0.0
+    assert Accuracy['Complete'] and Accuracy['Nsteps'] == len(Drifts[0])